@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 import os
 import sys
+import threading
 import time
+from enum import Enum
 
 import cv2
 import numpy as np
@@ -11,13 +13,36 @@ ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
 
+from utils.affinity import pin_thread, setup_from_env
+from utils.arc_planner import ArcPlanner
+from utils.bus import Bus, Command, Detections
+from utils.freshness import (
+    MAX_ULTRASONIC_AGE_S,
+    MAX_VISION_AGE_S,
+    FreshnessGate,
+    TimestampedCapture,
+    age_report,
+)
+from utils.fsm import LatchedDrive, State, StateMachine, Transition
+from utils.hard_frames import detections_from_boxes, open_capture
+from utils.inference_daemon import load_model
+from utils.inference_quality import QualityController
+from utils.metrics import REGISTRY, LoopMetrics, serve_from_env
 from utils.picarx_wrapper import PX
-
-try:
-    from ultralytics import YOLO
-except ImportError:
-    print("ERROR: ultralytics not installed. Run: pip3 install ultralytics")
-    sys.exit(1)
+from utils.profiling import install as install_profiler, span
+from utils.recorder import (
+    FLAG_MANEUVER,
+    FLAG_STALE_INPUT,
+    FLAG_ULTRASONIC_OBSTACLE,
+    FLAG_VISION_OBSTACLE,
+    FLAG_VISION_PAUSED,
+    FLAG_VISION_WARMUP,
+    open_session,
+)
+from utils.remote_inference import OffloadModel
+from utils.startup import BackgroundLoader, StartupLog
+from utils.status import StatusLine
+from vision.free_space import FreeSpaceDetector
 
 
 # ---------------------- CONFIG -----------------------------------
@@ -29,11 +54,54 @@ ULTRASONIC_STOP_CM = 25.0  # stop distance
 FORWARD_SPEED = 25  # base forward speed (0–100)
 TURN_ANGLE = 25  # steering angle for avoidance
 TURN_TIME = 0.5  # seconds to hold a turn
+ULTRASONIC_ONLY_SPEED = 15  # forward speed until vision is ready (0 = wait in place)
+FREE_SPACE_STOP_CM = 30.0  # floor segmentation: stop when free floor ahead is shorter
+CLEAR_MARGIN_CM = 5.0  # hysteresis: resume only this far past a stop distance
+
+# Steering: "arc" picks it every tick with utils/arc_planner.py from the
+# ultrasonic range, detections and free space; "alternate" is the old
+# alternating left/right avoidance turn
+PLANNER = os.environ.get("PICARX_PLANNER", "arc")
+
+# Vision sources: "yolo" (COCO objects), "floor" (free-space segmentation,
+# vision/free_space.py; sees walls and boxes, runs at camera rate), "both"
+VISION_MODE = os.environ.get("PICARX_VISION", "yolo")
+USE_YOLO = VISION_MODE in ("yolo", "both")
+USE_FLOOR = VISION_MODE in ("floor", "both")
 
 # If you want to limit which classes count as obstacles, you can
 # set this to a list of indexes (e.g. [0] for person) or None for all:
 OBSTACLE_CLASSES = None  # or something like [0, 1, 2]
 
+# Binary session recording (utils/recorder.py); None disables it
+RECORD_DIR = os.environ.get("PICARX_RECORD_DIR")
+
+# Low-confidence, sensor-disagreement and stop frames saved as a YOLO
+# dataset for retraining (utils/hard_frames.py); None disables it
+CAPTURE_DIR = os.environ.get("PICARX_CAPTURE_DIR")
+
+
+# ---------------------- METRICS ----------------------------------
+# Served over HTTP when PICARX_METRICS_PORT is set (utils/metrics.py)
+
+LOOP_METRICS = LoopMetrics(target_period_s=0.05)
+CAPTURE_SECONDS = REGISTRY.histogram("picarx_capture_seconds", "cap.read() wall time")
+INFERENCE_SECONDS = REGISTRY.histogram("picarx_inference_seconds", "YOLO predict() wall time")
+FRAMES = REGISTRY.counter("picarx_frames_total", "Frames processed")
+ULTRASONIC_AGE = REGISTRY.age_gauge(
+    "picarx_ultrasonic_age_seconds", "Age of the newest valid ultrasonic reading"
+)
+OBSTACLE_EVENTS = REGISTRY.counter("picarx_obstacle_events_total", "Avoidance maneuvers started")
+
+# Inputs older than PICARX_MAX_*_AGE_S at decision time are ignored
+VISION_GATE = FreshnessGate("vision", MAX_VISION_AGE_S)
+ULTRASONIC_GATE = FreshnessGate("ultrasonic", MAX_ULTRASONIC_AGE_S)
+
+
+class Mode(Enum):
+    DRIVE = 0
+    AVOID = 1
+
 
 # ---------------------- HELPERS ----------------------------------
 
@@ -66,97 +134,465 @@ def is_obstacle_in_front(detections, frame_width: int) -> bool:
     return False
 
 
-# ---------------------- MAIN LOOP --------------------------------
+def summarize_detections(detections, frame_width: int, frame_height: int):
+    """
+    Compact summary for the recorder:
+    (count, best class, best score, best cx_norm, best cy_norm).
+    """
+    if detections is None or len(detections) == 0:
+        return 0, -1, 0.0, 0.0, 0.0
 
+    best = max(detections, key=lambda b: float(b.conf[0]))
+    x1, y1, x2, y2 = best.xyxy[0]
+    cx = (float(x1) + float(x2)) / 2.0
+    cy = (float(y1) + float(y2)) / 2.0
+    return (
+        len(detections),
+        int(best.cls[0]),
+        float(best.conf[0]),
+        (cx - frame_width / 2.0) / (frame_width / 2.0),
+        (cy - frame_height / 2.0) / (frame_height / 2.0),
+    )
 
-def main():
-    if not os.path.exists(MODEL_PATH):
-        print(f"ERROR: model not found at {MODEL_PATH}")
-        sys.exit(1)
 
-    print(f"Loading YOLO model from: {MODEL_PATH}")
-    model = YOLO(MODEL_PATH)
+# ---------------------- STARTUP ----------------------------------
+
+
+def load_vision(startup):
+    """
+    Background stage: model import/load, camera, warm-up inference.
+    Runs while the ultrasonic safety loop is already driving.
+    """
+    # torch's pool, created during warm-up, inherits the inference cores
+    pin_thread("inference")
+    model = None
+    if USE_YOLO:
+        # Served by utils/inference_daemon.py when it is running, else loaded
+        # here; PICARX_OFFLOAD sends frames to another machine instead
+        # (utils/remote_inference.py)
+        print(f"Loading YOLO model from: {MODEL_PATH}")
+        try:
+            model = load_model(MODEL_PATH)
+        except ImportError:
+            raise RuntimeError("ultralytics not installed. Run: pip3 install ultralytics")
+        startup.mark("model_loaded")
 
     # Open camera (0 = default)
     cap = cv2.VideoCapture(0)
     if not cap.isOpened():
-        print("ERROR: Could not open camera (/dev/video0).")
-        sys.exit(1)
+        raise RuntimeError("Could not open camera (/dev/video0).")
+    # Keep the driver queue short so grabbed frames are recent
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    cap = TimestampedCapture(cap)
+
+    # The first predict() builds torch's thread pool and fuses the model;
+    # pay for it here rather than on the first real frame
+    if model is not None:
+        model.predict(
+            np.zeros((480, 640, 3), dtype=np.uint8),
+            imgsz=320,
+            conf=CONF_THRESHOLD,
+            verbose=False,
+            device="cpu",
+        )
+    startup.mark("vision_ready")
+    return model, cap
 
-    car = PX()
-    print("YOLO + Ultrasonic obstacle avoidance started.")
-    print("Press Ctrl+C to stop.")
 
-    try:
-        last_turn_dir = 1  # 1 = right, -1 = left, to alternate turns
+# ---------------------- MAIN LOOP --------------------------------
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("WARNING: Failed to grab frame.")
-                time.sleep(0.1)
-                continue
 
-            h, w, _ = frame.shape
+def main():
+    if USE_YOLO and not os.path.exists(MODEL_PATH):
+        print(f"ERROR: model not found at {MODEL_PATH}")
+        sys.exit(1)
 
-            # Run YOLO inference
+    # Optional core layout (PICARX_CPU_LAYOUT): this loop carries the
+    # ultrasonic safety logic, so it gets the control core (and priority).
+    # With a layout, predict() runs on its own thread on the inference
+    # cores and reaches the loop over the bus; without one it stays inline.
+    threaded = setup_from_env() is not None
+    pin_thread("control")
+
+    # Vision loads behind the ultrasonic-only safety loop; milestones are
+    # timed from process start (utils/startup.py)
+    startup = StartupLog()
+    vision = BackgroundLoader(lambda: load_vision(startup), name="vision-loader").start()
+    model = cap = offload = offload_mode = None
+    # Steps imgsz down (and finally to ultrasonic only) when predict() runs
+    # over PICARX_INFER_BUDGET_MS (utils/inference_quality.py)
+    quality = QualityController()
+    floor = FreeSpaceDetector() if USE_FLOOR else None
+    planner = ArcPlanner(speeds=(ULTRASONIC_ONLY_SPEED, FORWARD_SPEED)) if PLANNER == "arc" else None
+
+    car = PX()
+    rec = open_session(RECORD_DIR)
+    capture = open_capture(CAPTURE_DIR)
+    serve_from_env()
+    install_profiler()
+    print("YOLO + Ultrasonic obstacle avoidance started (ultrasonic only until vision is ready).")
+    if rec:
+        print(f"Recording session {rec.session} to {rec.directory}")
+    if capture:
+        print(f"Capturing hard frames to {capture.directory}")
+    print("Press Ctrl+C to stop.")
+    status = StatusLine("{state}. Distance:{distance:.1f}cm{note}").start()
+
+    drive = LatchedDrive(car.robot, on_command=planner.command if planner is not None else None)
+    last_turn_dir = [1]  # 1 = right, -1 = left, to alternate turns
+
+    def hold(ctx):
+        # No current range: an old one says nothing about what is ahead now
+        drive.set(0)
+        status.set(state="Stopped", distance=-1, note=" (ultrasonic stale)")
+        ctx["speed"], ctx["steer"], ctx["flags"] = 0, drive.steer or 0, 0
+
+    def avoid(ctx):
+        if not ctx["ultrasonic_fresh"]:
+            hold(ctx)
+            return
+        plan = ctx["plan"]
+        drive.set(0)
+        OBSTACLE_EVENTS.inc()
+        status.event(
+            f"Obstacle! YOLO:{ctx['yolo_front']} Floor:{ctx['floor_front']} "
+            f"Ultrasonic:{ctx['distance'] if ctx['distance'] > 0 else -1:.1f}cm"
+        )
+        status.set(state="Avoiding", distance=ctx["distance"] if ctx["distance"] > 0 else -1, note="")
+
+        # Simple avoidance: turn a bit, then try forward again
+        if plan is not None:
+            # Back up with the wheels turned away from the best arc
+            # so the nose swings towards the free side
+            steer_angle = plan.steer if plan.blocked else -plan.steer
+            steer_angle = steer_angle or TURN_ANGLE * last_turn_dir[0]
+        else:
+            steer_angle = TURN_ANGLE * last_turn_dir[0]
+        drive.set(0, steer_angle)
+        time.sleep(0.1)
+        drive.set(-FORWARD_SPEED)  # small wiggle back
+        time.sleep(TURN_TIME)
+        drive.set(0)
+
+        # Alternate direction next time
+        last_turn_dir[0] *= -1
+        # Center steering back
+        drive.set(0, 0)
+
+        ctx["speed"], ctx["steer"] = -FORWARD_SPEED, steer_angle
+        ctx["flags"] = FLAG_MANEUVER
+        ctx["flags"] |= FLAG_VISION_OBSTACLE if ctx["yolo_front"] or ctx["floor_front"] else 0
+        ctx["flags"] |= FLAG_ULTRASONIC_OBSTACLE if ctx["ultrasonic_close"] else 0
+
+    def cruise(ctx):
+        # Clear path -> go forward (slowly while only ultrasonic is watching)
+        if not ctx["ultrasonic_fresh"]:
+            hold(ctx)
+            return
+        plan = ctx["plan"]
+        # A stale frame leaves only ultrasonic watching
+        seeing = ctx["fused"] and not ctx["vision_stale"]
+        if seeing:
+            speed_cmd = int(FORWARD_SPEED * quality.speed_scale)
+        else:
+            speed_cmd = ULTRASONIC_ONLY_SPEED
+        steer_angle = 0
+        if plan is not None:
+            steer_angle = plan.steer
+            speed_cmd = min(speed_cmd, plan.speed)
+        drive.set(max(speed_cmd, 0), steer_angle)
+        status.set(
+            state="Clear",
+            distance=ctx["distance"] if ctx["distance"] > 0 else -1,
+            note="" if seeing and quality.vision_enabled else " (ultrasonic only)",
+        )
+        ctx["speed"], ctx["steer"], ctx["flags"] = speed_cmd, steer_angle, 0
+
+    # Drive until something is in the way, avoid until it is cleared
+    # (utils/fsm.py); motor and servo are only written on change
+    machine = StateMachine(
+        "avoidance",
+        states={Mode.DRIVE: State(on_tick=cruise), Mode.AVOID: State(on_tick=avoid)},
+        transitions=[
+            Transition(Mode.DRIVE, Mode.AVOID, lambda ctx: ctx["obstacle"]),
+            Transition(Mode.AVOID, Mode.DRIVE, lambda ctx: ctx["clear"]),
+        ],
+        initial=Mode.DRIVE,
+    )
+
+    # Sensors, detectors and the controller talk over latest-value topics
+    # (utils/bus.py): each stage below only publishes or polls, so any of
+    # them can move to its own thread or rate without touching the others.
+    # Everything runs in this loop for now, in publish order.
+    bus = Bus()
+    frames = bus.topic("frames", np.ndarray)
+    detections = bus.topic("detections", Detections)
+    free_space = bus.topic("free_space")
+    ranges = bus.topic("ranges", (int, float))
+    commands = bus.topic("commands", Command)
+    floor_in = bus.subscribe("frames")
+    detector_in = bus.subscribe("frames")
+    ctl_frames = bus.subscribe("frames")
+    ctl_detections = bus.subscribe("detections")
+    ctl_free = bus.subscribe("free_space")
+    ctl_ranges = bus.subscribe("ranges")
+    rec_commands = bus.subscribe("commands", maxsize=8)
+    rec_detections = bus.subscribe("detections")
+    rec_ranges = bus.subscribe("ranges")
+
+    def camera_stage():
+        """Publish the next frame; False if the grab failed."""
+        with CAPTURE_SECONDS.time(), span("capture"):
+            ret, frame, t_frame = cap.read()
+        if not ret:
+            return False
+        FRAMES.inc()
+        frames.publish(frame, t=t_frame)
+        return True
+
+    def floor_stage():
+        msg = floor_in.poll()
+        if msg is not None:
+            with span("free_space"):
+                free_space.publish(floor.update(msg.value), t=msg.t)
+
+    def detector_stage(imgsz, wait_s=None):
+        nonlocal offload_mode
+        msg = detector_in.poll() if wait_s is None else detector_in.wait(wait_s)
+        if msg is None:
+            return
+        frame = msg.value
+        t_infer = time.monotonic()
+        with INFERENCE_SECONDS.time(), span("predict"):
             results = model.predict(
                 frame,
-                imgsz=320,  # smaller image for speed
+                imgsz=imgsz,
                 conf=CONF_THRESHOLD,
                 verbose=False,
                 device="cpu",
             )
-            boxes = results[0].boxes if len(results) > 0 else None
-
-            # Ultrasonic reading
-            distance = car.get_distance_cm()
-
-            yolo_front = is_obstacle_in_front(boxes, w)
-            ultrasonic_close = (distance > 0) and (distance < ULTRASONIC_STOP_CM)
-
-            # --- Decision logic -----------------------------------------
-            if yolo_front or ultrasonic_close:
-                car.stop()
-                print(
-                    f"\rObstacle! YOLO:{yolo_front} "
-                    f"Ultrasonic:{distance:.1f if distance > 0 else -1}cm   ",
-                    end="",
-                    flush=True,
+        if quality.observe(time.monotonic() - t_infer):
+            status.event(f"Inference quality -> {quality.describe()}")
+        boxes = results[0].boxes if len(results) > 0 else None
+        lag_s = 0.0
+        if offload is not None:
+            if offload.mode != offload_mode:
+                offload_mode = offload.mode
+                status.event(f"Inference offload -> {offload.describe()}")
+            # Pipelined: the result may be for an earlier frame
+            lag_s = offload.lag_s
+            frame = offload.source
+            if not offload.available:
+                boxes = None  # empty results mean "no vision", not "no obstacle"
+        h, w = frame.shape[:2]
+        detections.publish(Detections(boxes, frame, w, h, lag_s), t=msg.t)
+
+    stop_detector = threading.Event()
+
+    def detector_worker():
+        pin_thread("inference")
+        while not stop_detector.is_set():
+            # Input size from the adaptive controller; None = YOLO paused
+            imgsz = quality.next_imgsz()
+            if imgsz is None:
+                time.sleep(0.05)
+                continue
+            detector_stage(imgsz, wait_s=0.2)
+
+    detector_thread = threading.Thread(target=detector_worker, name="detector", daemon=True)
+
+    def ultrasonic_stage():
+        with span("ultrasonic"):
+            sample = car.get_distance_sample()
+        if sample.value > 0:
+            ULTRASONIC_AGE.mark(sample.t)
+        ranges.publish(sample.value, t=sample.t)
+
+    def record_stage(loop_start):
+        det = rec_detections.poll()
+        boxes, w, h = (det.value.boxes, det.value.width, det.value.height) if det else (None, 0, 0)
+        distance = (rec_ranges.poll() or rec_ranges.last).value
+        n_dets, best_cls, best_score, best_cx, best_cy = summarize_detections(boxes, w, h)
+        for msg in rec_commands.drain():
+            with span("record"):
+                rec.record(
+                    dist_cm=distance,
+                    speed=msg.value.speed,
+                    steer=msg.value.steer,
+                    n_dets=n_dets,
+                    best_class=best_cls,
+                    best_score=best_score,
+                    best_cx=best_cx,
+                    best_cy=best_cy,
+                    loop_ms=(time.monotonic() - loop_start) * 1000.0,
+                    flags=msg.value.flags,
+                    t=loop_start,
                 )
 
-                # Simple avoidance: turn a bit, then try forward again
-                turn_dir = last_turn_dir
-                steer_angle = TURN_ANGLE * turn_dir
-                car.steer(steer_angle)
-                time.sleep(0.1)
-                car.backward(FORWARD_SPEED)  # small wiggle back
-                time.sleep(TURN_TIME)
-                car.stop()
+    try:
 
-                # Alternate direction next time
-                last_turn_dir *= -1
-                # Center steering back
-                car.steer(0)
+        while True:
+            loop_start = time.monotonic()
+            LOOP_METRICS.tick()
+
+            if vision.failed:
+                status.event(f"ERROR: vision failed to start: {vision.error}")
+                sys.exit(1)
+            fused = vision.ready
+            if fused and cap is None:
+                model, cap = vision.result
+                offload = model if isinstance(model, OffloadModel) else None
+                status.event(f"Vision ready after {vision.seconds:.1f} s; switching to fused mode.")
+                if threaded and model is not None:
+                    detector_thread.start()
+
+            # Input size from the adaptive controller; None = YOLO paused
+            imgsz = quality.next_imgsz() if fused and model is not None and not threaded else None
+            yolo_wants_frame = imgsz is not None or (threaded and fused and model is not None)
+            if fused and (yolo_wants_frame or floor is not None):
+                if not camera_stage():
+                    status.event("WARNING: Failed to grab frame.")
+                    time.sleep(0.1)
+                    continue
+            if floor is not None:
+                floor_stage()
+            if imgsz is not None:
+                detector_stage(imgsz)
+            ultrasonic_stage()
+
+            # --- Controller: the newest of each input -------------------
+            frame_msg = ctl_frames.poll()
+            det_msg = ctl_detections.poll()
+            # A threaded detector does not finish every tick; its newest
+            # result stands until the freshness gate rejects it
+            det = det_msg or (ctl_detections.last if threaded else None)
+            free_msg = ctl_free.poll()
+            range_msg = ctl_ranges.poll()
+            have_frame = frame_msg is not None
+            frame, t_frame = (frame_msg.value, frame_msg.t) if have_frame else (None, None)
+            h, w = frame.shape[:2] if have_frame else (0, 0)
+            boxes, lag_s = (det.value.boxes, det.value.lag_s) if det else (None, 0.0)
+            if det and have_frame:
+                lag_s += t_frame - det.t  # 0 inline: same frame
+            free = free_msg.value if free_msg else None
+            distance, t_range = range_msg.value, range_msg.t
+
+            with span("decide"):
+                # A result from a frame that sat in a queue or behind a slow
+                # predict() describes where obstacles were, not where they are
+                vision_fresh = have_frame and VISION_GATE.check(t_frame - lag_s)
+                yolo_front = vision_fresh and is_obstacle_in_front(boxes, w)
+                floor_front = (
+                    vision_fresh
+                    and free is not None
+                    and free.front_cm(CENTER_REGION) < FREE_SPACE_STOP_CM
+                )
+                ultrasonic_fresh = ULTRASONIC_GATE.check(t_range)
+                ultrasonic_close = ultrasonic_fresh and 0 < distance < ULTRASONIC_STOP_CM
+            startup.mark("first_safe_loop")
+            if det_msg is not None:
+                startup.mark("first_detection")
+
+            plan = None
+            if planner is not None:
+                with span("plan"):
+                    if ultrasonic_fresh:
+                        planner.observe_ultrasonic(distance, t_range)
+                    if vision_fresh and boxes is not None:
+                        planner.observe_detections(boxes, w, h, min_conf=CONF_THRESHOLD)
+                    if vision_fresh and free is not None:
+                        planner.observe_free_space(free)
+                    plan = planner.plan()
 
+            # --- Decision logic -----------------------------------------
+            # Hysteresis: an obstacle is cleared only CLEAR_MARGIN_CM past
+            # the distance that stopped the car. A stale reading clears
+            # nothing, and a stale frame is "unknown", not "no obstacle"
+            ultrasonic_clear = ultrasonic_fresh and not 0 < distance < ULTRASONIC_STOP_CM + CLEAR_MARGIN_CM
+            vision_stale = have_frame and not vision_fresh
+            floor_clear = not (
+                vision_fresh
+                and free is not None
+                and free.front_cm(CENTER_REGION) < FREE_SPACE_STOP_CM + CLEAR_MARGIN_CM
+            )
+            if plan is not None:
+                # Detections and free space reach the planner as obstacle
+                # points with a range; it steers around them and asks to
+                # back up only when no arc is free
+                obstacle = ultrasonic_close or plan.blocked
+                clear = ultrasonic_clear and not plan.blocked
             else:
-                # Clear path -> go forward
-                car.steer(0)
-                car.forward(FORWARD_SPEED)
-                print(
-                    f"\rClear. Distance:{distance:.1f if distance > 0 else -1}cm   ",
-                    end="",
-                    flush=True,
-                )
+                obstacle = yolo_front or floor_front or ultrasonic_close
+                clear = ultrasonic_clear and floor_clear and not yolo_front
+            vision_blind = offload is not None and not offload.available
+            ctx = {
+                "obstacle": obstacle,
+                "clear": clear,
+                "plan": plan,
+                "fused": fused and not vision_blind,
+                "distance": distance,
+                "yolo_front": yolo_front,
+                "floor_front": floor_front,
+                "ultrasonic_close": ultrasonic_close,
+                "ultrasonic_fresh": ultrasonic_fresh,
+                "vision_stale": vision_stale,
+            }
+            mode_before = machine.state
+            mode = machine.update(ctx)
+            speed_cmd, steer_angle, flags = ctx["speed"], ctx["steer"], ctx["flags"]
+
+            if capture and have_frame:
+                with span("hard_frames"):
+                    # Queued for the writer thread; never blocks. Labels go
+                    # with the frame the boxes were computed on, an earlier
+                    # one than `frame` when offload is pipelined
+                    vision_front = yolo_front or floor_front
+                    if det_msg:
+                        shot, t_shot = det_msg.value.frame, det_msg.t - det_msg.value.lag_s
+                    else:
+                        shot, t_shot = frame, t_frame
+                    capture.offer(
+                        shot,
+                        detections_from_boxes(boxes) if vision_fresh and det_msg else (),
+                        disagree=vision_fresh and ultrasonic_fresh and vision_front != ultrasonic_close,
+                        stop=mode is Mode.AVOID and mode_before is not Mode.AVOID,
+                        dist_cm=distance,
+                        t=t_shot,
+                    )
+
+            if not fused:
+                flags |= FLAG_VISION_WARMUP
+            elif (model is not None and not quality.vision_enabled) or vision_blind:
+                flags |= FLAG_VISION_PAUSED
+            if not ultrasonic_fresh or vision_stale:
+                flags |= FLAG_STALE_INPUT
+            commands.publish(Command(speed_cmd, steer_angle, flags))
+            record_stage(loop_start)
 
             # small delay to avoid pegging CPU
             time.sleep(0.05)
 
     except KeyboardInterrupt:
-        print("\nStopping (Ctrl+C).")
+        status.event("Stopping (Ctrl+C).")
     finally:
+        stop_detector.set()
+        if detector_thread.is_alive():
+            detector_thread.join()
+        status.close()
+        print(f"Startup: {startup.report()}")
+        print("States: " + machine.report())
+        print("Input age at decision time:\n" + age_report(VISION_GATE, ULTRASONIC_GATE))
+        if offload is not None:
+            print(f"Offload: {offload.report()}")
+            offload.close()
+        rec.close()
+        capture.close()
+        if capture:
+            print(f"Hard frames: {capture.report()}")
+        print("Bus:\n" + bus.report())
         car.cleanup()
-        cap.release()
+        if cap is not None:
+            cap.release()
         cv2.destroyAllWindows()
 
 
@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
+import os
+import sys
 import time
 import cv2
-from ultralytics import YOLO
 from picarx import Picarx
 
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.inference_daemon import load_model
+from utils.inference_quality import QualityController
+
 # Load YOLO nano model (pretrained on COCO)
-model = YOLO("yolov8n.pt")
+model = load_model("yolov8n.pt")  # shared daemon if running, else local
+# Smaller imgsz when inference runs over budget (PICARX_INFER_BUDGET_MS)
+quality = QualityController(allow_ultrasonic_only=False)
 
 # Initialize camera (adjust index if needed)
 cap = cv2.VideoCapture(0)
@@ -33,7 +44,9 @@ def main():
                 break
 
             # Run YOLO (small image size for speed)
-            results = model(frame, imgsz=320, verbose=False)[0]
+            t0 = time.monotonic()
+            results = model(frame, imgsz=quality.imgsz, verbose=False)[0]
+            quality.observe(time.monotonic() - t0)
 
             # Draw detection boxes
             for box in results.boxes:
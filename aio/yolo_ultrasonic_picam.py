@@ -1,13 +1,29 @@
 #!/usr/bin/env python3
+import os
+import sys
 import time
-from ultralytics import YOLO
 from picarx import Picarx
 
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.hard_frames import CAPTURE_DIR, detections_from_boxes, open_capture
+from utils.inference_daemon import load_model
+from utils.inference_quality import QualityController
+from utils.power_save import PowerGovernor
+from utils.status import StatusLine
+
 # NEW: use picamera2
 from picamera2 import Picamera2
 
 # Load YOLO nano model
-model = YOLO("yolov8n.pt")
+model = load_model("yolov8n.pt")  # shared daemon if running, else local
+# Smaller imgsz when inference runs over budget (PICARX_INFER_BUDGET_MS)
+quality = QualityController(allow_ultrasonic_only=False)
+# Low-confidence frames saved for retraining when PICARX_CAPTURE_DIR is set
+capture = open_capture(CAPTURE_DIR)
 
 # Initialize PiCar-X for ultrasonic sensor
 px = Picarx()
@@ -32,17 +48,30 @@ def main():
     time.sleep(2)  # let the camera warm up
 
     print("Starting YOLO + Ultrasonic (picamera2) demo. Ctrl+C to stop.")
+    status = StatusLine("{det:25s} | Ultrasonic: {dist:6.1f} cm | {power}").start()
+    governor = PowerGovernor()
 
     try:
         while True:
-            # Capture a frame as a numpy array (RGB)
-            frame = picam2.capture_array()
-
-            # Run YOLO on the frame (smaller imgsz for speed)
-            results = model(frame, imgsz=320, verbose=False)[0]
-
-            # Get ultrasonic distance
-            dist = get_distance_cm()
+            governor.update()
+            new_frame = governor.due("camera")
+            if new_frame:
+                # Capture a frame as a numpy array (RGB)
+                frame = picam2.capture_array()
+                governor.observe_frame(frame)
+
+            if governor.due("ultrasonic"):
+                # Get ultrasonic distance
+                dist = get_distance_cm()
+                governor.observe_distance(dist)
+
+            if new_frame and governor.due("inference"):
+                # Run YOLO on the frame (smaller imgsz for speed)
+                t0 = time.monotonic()
+                results = model(frame, imgsz=quality.imgsz, verbose=False)[0]
+                quality.observe(time.monotonic() - t0)
+                if capture:
+                    capture.offer(frame, detections_from_boxes(results.boxes), dist_cm=dist)
 
             # Pick best detection if any
             if len(results.boxes) > 0:
@@ -50,22 +79,21 @@ def main():
                 cls_id = int(best_box.cls[0])
                 conf = float(best_box.conf[0])
                 label = model.names[cls_id]
-                print(
-                    f"Det: {label:10s} conf={conf:.2f} | Ultrasonic: {dist:6.1f} cm",
-                    end="\r",
-                )
+                status.set(det=f"Det: {label:10s} conf={conf:.2f}", dist=dist, power=governor.mode)
             else:
-                print(
-                    f"No detections        | Ultrasonic: {dist:6.1f} cm",
-                    end="\r",
-                )
+                status.set(det="No detections", dist=dist, power=governor.mode)
 
-            time.sleep(0.1)
+            time.sleep(governor.wait_s(0.1))
 
     except KeyboardInterrupt:
-        print("\nStopping...")
+        status.event("Stopping...")
 
     finally:
+        status.close()
+        print(f"Power: {governor.report()}")
+        capture.close()
+        if capture:
+            print(f"Hard frames: {capture.report()}")
         picam2.stop()
         px.stop()
 
@@ -1,11 +1,27 @@
 #!/usr/bin/env python3
+import os
+import sys
 import time
 import cv2
-from ultralytics import YOLO
 from picarx import Picarx
 
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.hard_frames import CAPTURE_DIR, detections_from_boxes, open_capture
+from utils.inference_daemon import load_model
+from utils.inference_quality import QualityController
+from utils.power_save import PowerGovernor
+from utils.status import StatusLine
+
 # Load YOLO nano model
-model = YOLO("yolov8n.pt")
+model = load_model("yolov8n.pt")  # shared daemon if running, else local
+# Smaller imgsz when inference runs over budget (PICARX_INFER_BUDGET_MS)
+quality = QualityController(allow_ultrasonic_only=False)
+# Low-confidence frames saved for retraining when PICARX_CAPTURE_DIR is set
+capture = open_capture(CAPTURE_DIR)
 
 # Init camera (try /dev/video0; change index if needed)
 cap = cv2.VideoCapture(0)
@@ -24,20 +40,35 @@ def main():
     if not cap.isOpened():
         print("Error: Cannot open camera (/dev/video0).")
         return
+    # Idle reads are seconds apart; a short driver queue keeps them current
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
     print("Starting YOLO + Ultrasonic text demo. Ctrl+C to stop.")
+    status = StatusLine("{det:25s} | Ultrasonic: {dist:6.1f} cm | {power}").start()
+    governor = PowerGovernor()
     try:
         while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Failed to grab frame.")
-                break
-
-            # Run YOLO on the frame (smaller size for speed)
-            results = model(frame, imgsz=320, verbose=False)[0]
-
-            # Get ultrasonic distance
-            dist = get_distance_cm()
+            governor.update()
+            new_frame = governor.due("camera")
+            if new_frame:
+                ret, frame = cap.read()
+                if not ret:
+                    status.event("Failed to grab frame.")
+                    break
+                governor.observe_frame(frame)
+
+            if governor.due("ultrasonic"):
+                # Get ultrasonic distance
+                dist = get_distance_cm()
+                governor.observe_distance(dist)
+
+            if new_frame and governor.due("inference"):
+                # Run YOLO on the frame (smaller size for speed)
+                t0 = time.monotonic()
+                results = model(frame, imgsz=quality.imgsz, verbose=False)[0]
+                quality.observe(time.monotonic() - t0)
+                if capture:
+                    capture.offer(frame, detections_from_boxes(results.boxes), dist_cm=dist)
 
             # Take the "best" detection if any
             if len(results.boxes) > 0:
@@ -46,19 +77,21 @@ def main():
                 cls_id = int(best_box.cls[0])
                 conf = float(best_box.conf[0])
                 label = model.names[cls_id]
-                print(
-                    f"Det: {label:10s} conf={conf:.2f} | Ultrasonic: {dist:6.1f} cm",
-                    end="\r",
-                )
+                status.set(det=f"Det: {label:10s} conf={conf:.2f}", dist=dist, power=governor.mode)
             else:
-                print(f"No detections        | Ultrasonic: {dist:6.1f} cm", end="\r")
+                status.set(det="No detections", dist=dist, power=governor.mode)
 
-            time.sleep(0.1)
+            time.sleep(governor.wait_s(0.1))
 
     except KeyboardInterrupt:
-        print("\nStopping...")
+        status.event("Stopping...")
 
     finally:
+        status.close()
+        print(f"Power: {governor.report()}")
+        capture.close()
+        if capture:
+            print(f"Hard frames: {capture.report()}")
         cap.release()
         px.stop()
 
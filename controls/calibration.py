@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+
+"""
+Servo calibration helpers: debounced, atomic persistence and automatic
+vision-assisted centering.
+
+SunFounder's `dir_servo_calibrate()` / `cam_*_servo_calibrate()` rewrite
+/opt/picar-x/picar-x.conf on every call. DebouncedCalibration instead
+updates the live calibration value on the Picarx object (so the servo moves
+immediately) and writes the config file only once the value has been left
+alone for SETTLE_S, or on close(); suspend() holds writes back while a
+search tries values out. Writes go to a temp file in the same directory,
+are fsync'ed and renamed over the original, so a power cut never leaves a
+half-written config.
+
+Automatic centering (auto_center) bisects each offset while watching where
+a reference target appears in the camera image: put a coloured card
+straight ahead of the car at camera height, and the pan/tilt offsets are
+searched until the card sits in the image centre. Steering is centered by
+driving a short distance and bisecting on the target's sideways drift.
+"""
+
+import contextlib
+import os
+import tempfile
+import threading
+import time
+
+CONFIG_PATH = "/opt/picar-x/picar-x.conf"
+CONFIG_KEYS = {
+    "dir": "picarx_dir_servo",
+    "pan": "picarx_cam_pan_servo",
+    "tilt": "picarx_cam_tilt_servo",
+}
+CALI_ATTRS = {
+    "dir": "dir_cali_val",
+    "pan": "cam_pan_cali_val",
+    "tilt": "cam_tilt_cali_val",
+}
+SETTLE_S = 1.0  # write once a value has been left alone this long
+
+# Auto-centering
+SEARCH_RANGE = 20.0  # degrees either side of zero
+SEARCH_TOL = 0.5  # stop bisecting when the bracket is this narrow
+SERVO_SETTLE_S = 0.25  # wait after moving a servo before measuring
+MEASURE_FRAMES = 3  # target positions averaged per measurement
+STEER_TEST_SPEED = 20
+STEER_TEST_TIME = 0.6
+
+
+class CalibrationError(RuntimeError):
+    pass
+
+
+# ---- Config file ----------------------------------------------------------
+
+
+def read_config(path=CONFIG_PATH):
+    """Parse the 'key = value' config file; missing file -> {}."""
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#") or "=" not in line:
+                    continue
+                key, value = line.split("=", 1)
+                values[key.strip()] = value.strip()
+    except FileNotFoundError:
+        pass
+    return values
+
+
+def write_config_atomic(path, updates):
+    """
+    Replace (or append) `updates` keys in the config file, keeping every
+    other line as-is, via temp file + fsync + rename.
+    """
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        lines = []
+        mode = 0o644
+
+    remaining = dict(updates)
+    out = []
+    for line in lines:
+        key = None
+        if "=" in line and not line.lstrip().startswith("#"):
+            key = line.split("=", 1)[0].strip()
+        if key in remaining:
+            out.append(f"{key} = {remaining.pop(key)}")
+        else:
+            out.append(line)
+    for key, value in remaining.items():
+        out.append(f"{key} = {value}")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".picar-x.conf.", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join(out) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def _format(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else f"{value:.1f}"
+
+
+# ---- Debounced persistence ------------------------------------------------
+
+
+class DebouncedCalibration:
+    def __init__(self, px, path=CONFIG_PATH, settle_s=SETTLE_S, background=True,
+                 clock=None):
+        self.px = px
+        self.path = path
+        self.settle_s = float(settle_s)
+        self.clock = clock or time.monotonic
+        self.writes = 0
+
+        self._pending = {}
+        self._last_change = None
+        self._held = 0  # suspend() depth
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name="calibration-writer", daemon=True)
+            self._thread.start()
+
+    def get(self, servo):
+        return getattr(self.px, CALI_ATTRS[servo])
+
+    def set(self, servo, value):
+        """Apply a calibration value live and schedule it for writing."""
+        value = float(value)
+        setattr(self.px, CALI_ATTRS[servo], value)
+        self._move(servo)
+        with self._cond:
+            self._pending[servo] = value
+            self._last_change = self.clock()
+            self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return dict(self._pending)
+
+    def restore(self, servo, value):
+        """
+        Put back a value saved with get(), e.g. after a failed search: live
+        at once, and in the file with the next write.
+        """
+        self.set(servo, value)
+
+    @contextlib.contextmanager
+    def suspend(self):
+        """Hold back writes (but not live changes) until the block ends."""
+        with self._cond:
+            self._held += 1
+        try:
+            yield self
+        finally:
+            with self._cond:
+                self._held -= 1
+                self._cond.notify()
+
+    def _move(self, servo):
+        # Re-issue logical 0 so the servo moves to the new offset now
+        if servo == "dir":
+            self.px.set_dir_servo_angle(0)
+        elif servo == "pan":
+            self.px.set_cam_pan_angle(0)
+        else:
+            self.px.set_cam_tilt_angle(0)
+
+    def poll(self):
+        """Write if the pending values have settled. Returns True if written."""
+        with self._cond:
+            if self._held or not self._pending or self.clock() - self._last_change < self.settle_s:
+                return False
+        return self.flush()
+
+    def flush(self):
+        with self._cond:
+            if not self._pending:
+                return False
+            updates = {CONFIG_KEYS[s]: _format(v) for s, v in self._pending.items()}
+            self._pending.clear()
+        write_config_atomic(self.path, updates)
+        self.writes += 1
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                if self._held or not self._pending:
+                    self._cond.wait()
+                    continue
+                remaining = self.settle_s - (self.clock() - self._last_change)
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+            self.poll()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
+# ---- Automatic centering --------------------------------------------------
+
+
+def bisect_offset(measure, lo=-SEARCH_RANGE, hi=SEARCH_RANGE, tol=SEARCH_TOL, max_iter=10):
+    """
+    Find the offset where measure(offset) changes sign, assuming it is
+    monotonic over [lo, hi]. measure() returns a signed error or None if
+    the target was not seen. Returns (offset, measurements used).
+    """
+    e_lo, e_hi = measure(lo), measure(hi)
+    calls = 2
+    if e_lo is None or e_hi is None:
+        raise CalibrationError("reference target not visible at the search limits")
+    if e_lo == 0:
+        return lo, calls
+    if e_hi == 0:
+        return hi, calls
+    if (e_lo > 0) == (e_hi > 0):
+        raise CalibrationError("target never crosses the image centre within the search range")
+
+    for _ in range(max_iter):
+        if hi - lo <= tol:
+            break
+        mid = (lo + hi) / 2.0
+        e_mid = measure(mid)
+        calls += 1
+        if e_mid is None:
+            raise CalibrationError("reference target lost during search")
+        if e_mid == 0:
+            return mid, calls
+        if (e_mid > 0) == (e_lo > 0):
+            lo, e_lo = mid, e_mid
+        else:
+            hi, e_hi = mid, e_mid
+
+    # Final linear interpolation inside the bracket
+    offset = lo - e_lo * (hi - lo) / (e_hi - e_lo)
+    return round(offset, 1), calls
+
+
+def _average_target(locate, frames, sleep):
+    xs, ys = [], []
+    for _ in range(frames):
+        pos = locate()
+        if pos is not None:
+            xs.append(pos[0])
+            ys.append(pos[1])
+        sleep(0.033)
+    if not xs:
+        return None
+    return sum(xs) / len(xs), sum(ys) / len(ys)
+
+
+def auto_center(cal, locate, servos=("pan", "tilt"), sleep=None,
+                settle_s=SERVO_SETTLE_S, frames=MEASURE_FRAMES):
+    """
+    Center each servo in `servos` against the reference target.
+    locate() returns the target's (cx_norm, cy_norm) in [-1, 1] or None.
+    Returns {servo: (offset, measurements)}. Offsets are applied through
+    `cal` (a DebouncedCalibration), so they persist once settled; probes
+    are never written. If a search fails, that servo's previous offset is
+    put back, live and in the file, before the CalibrationError
+    propagates; servos already centered keep their result.
+    """
+    px = cal.px
+    sleep = sleep or time.sleep
+    results = {}
+
+    def measure_camera(servo, axis):
+        def measure(offset):
+            cal.set(servo, offset)
+            sleep(settle_s)
+            pos = _average_target(locate, frames, sleep)
+            return None if pos is None else pos[axis]
+
+        return measure
+
+    def measure_steering(offset):
+        cal.set("dir", offset)
+        sleep(settle_s)
+        before = _average_target(locate, frames, sleep)
+        px.forward(STEER_TEST_SPEED)
+        sleep(STEER_TEST_TIME)
+        px.stop()
+        after = _average_target(locate, frames, sleep)
+        # Return to the start line for the next trial
+        px.backward(STEER_TEST_SPEED)
+        sleep(STEER_TEST_TIME)
+        px.stop()
+        if before is None or after is None:
+            return None
+        # Veering right makes the target drift left in the image
+        return -(after[0] - before[0])
+
+    searches = {
+        "pan": lambda: bisect_offset(measure_camera("pan", 0)),
+        "tilt": lambda: bisect_offset(measure_camera("tilt", 1)),
+        "dir": lambda: bisect_offset(measure_steering),
+    }
+    for servo in servos:
+        if servo not in searches:
+            raise ValueError(f"unknown servo {servo!r}")
+        # A probe sequence outlasts the debounce; write only the outcome
+        saved = cal.get(servo)
+        with cal.suspend():
+            try:
+                results[servo] = searches[servo]()
+            except BaseException:
+                cal.restore(servo, saved)
+                raise
+        cal.set(servo, results[servo][0])
+    return results
+
+
+class VilibColorTarget:
+    """
+    Reference target located with Vilib's colour detection (e.g. a red
+    card). Call start() after Vilib.camera_start().
+    """
+
+    def __init__(self, color="red"):
+        self.color = color
+
+    def start(self):
+        from vilib import Vilib
+
+        Vilib.color_detect(self.color)
+
+    def stop(self):
+        from vilib import Vilib
+
+        Vilib.color_detect("close")
+
+    def __call__(self):
+        from vilib import Vilib
+
+        p = Vilib.detect_obj_parameter
+        if not p.get("color_n"):
+            return None
+        w, h = Vilib.camera_width or 640, Vilib.camera_height or 480
+        return (
+            (p["color_x"] - w / 2.0) / (w / 2.0),
+            (p["color_y"] - h / 2.0) / (h / 2.0),
+        )
@@ -1,3 +1,4 @@
+import os
 import sys
 import termios
 import tty
@@ -7,6 +8,17 @@ import select
 from picarx import Picarx
 from vilib import Vilib  # Camera
 
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import REGISTRY, LoopMetrics, serve_from_env
+from utils.power_save import PowerGovernor
+from utils.profiling import install as install_profiler, span
+from utils.servo_motion import ServoPlanner
+from utils.status import StatusLine
+
 # ===== Config =====
 ULTRASONIC_STOP_CM = 20.0
 SLEEP_DT = 0.05
@@ -25,6 +37,15 @@ CAM_PAN_MAX = 45  # left/right limit
 CAM_TILT_MAX = 45  # up/down limit
 
 
+# ===== Metrics (served when PICARX_METRICS_PORT is set) =====
+LOOP_METRICS = LoopMetrics(target_period_s=2 * SLEEP_DT)  # select timeout + sleep
+KEY_EVENTS = REGISTRY.counter("picarx_key_events_total", "Keys received")
+SAFETY_STOPS = REGISTRY.counter("picarx_safety_stops_total", "Ultrasonic safety stops")
+ULTRASONIC_AGE = REGISTRY.age_gauge(
+    "picarx_ultrasonic_age_seconds", "Age of the newest valid ultrasonic reading"
+)
+
+
 def read_key_nonblocking(timeout=SLEEP_DT):
     fd = sys.stdin.fileno()
     rlist, _, _ = select.select([fd], [], [], timeout)
@@ -51,6 +72,8 @@ def start_camera():
 
 def main():
     px = Picarx()
+    # Pan/tilt glide at a limited slew rate instead of jumping CAM_STEP
+    planner = ServoPlanner(px)
 
     speed = DEFAULT_SPEED
     steering_angle = 0
@@ -97,43 +120,53 @@ Camera stream:
 
     start_camera()
 
+    serve_from_env()
+    install_profiler()
+
     # Put terminal in raw mode
     fd = sys.stdin.fileno()
     old_settings = termios.tcgetattr(fd)
     tty.setraw(fd)
+    status = StatusLine(
+        "{motion:8s} speed={speed} steer={steer}° | ultrasonic {dist:.1f} cm | {power}"
+    ).start()
+    governor = PowerGovernor()
 
     try:
         # Initial pose
         px.set_dir_servo_angle(steering_angle)
-        px.set_cam_pan_angle(cam_pan)
-        px.set_cam_tilt_angle(cam_tilt)
+        planner.move(pan=cam_pan, tilt=cam_tilt)
         px.stop()
 
         while True:
-            ch = read_key_nonblocking()
+            LOOP_METRICS.tick()
+            with span("read_key"):
+                ch = read_key_nonblocking(governor.wait_s(SLEEP_DT))
 
             # ========== KEY HANDLING ==========
             if ch is not None:
+                KEY_EVENTS.inc()
+                governor.wake("key")
 
                 # --- Quit / Stop ---
                 if ch == "q":
-                    print("\nQuitting...")
+                    status.event("Quitting...")
                     break
 
                 elif ch == " ":
-                    print("[SPACE] STOP")
+                    status.event("[SPACE] STOP")
                     px.stop()
                     motion = "stop"
 
                 # --- Drive ---
                 elif ch == "w":
-                    print(f"[W] Forward @ {speed}, steering={steering_angle}°")
+                    status.event(f"[W] Forward @ {speed}, steering={steering_angle}°")
                     px.set_dir_servo_angle(steering_angle)
                     px.forward(speed)
                     motion = "forward"
 
                 elif ch == "s":
-                    print(f"[S] Backward @ {speed}, steering={steering_angle}°")
+                    status.event(f"[S] Backward @ {speed}, steering={steering_angle}°")
                     px.set_dir_servo_angle(steering_angle)
                     px.backward(speed)
                     motion = "backward"
@@ -143,73 +176,84 @@ Camera stream:
                     steering_angle -= STEER_STEP
                     steering_angle = clamp(steering_angle, -MAX_STEER, MAX_STEER)
                     px.set_dir_servo_angle(steering_angle)
-                    print(f"[A] Steering LEFT → {steering_angle}°")
+                    status.event(f"[A] Steering LEFT → {steering_angle}°")
 
                 elif ch == "d":
                     steering_angle += STEER_STEP
                     steering_angle = clamp(steering_angle, -MAX_STEER, MAX_STEER)
                     px.set_dir_servo_angle(steering_angle)
-                    print(f"[D] Steering RIGHT → {steering_angle}°")
+                    status.event(f"[D] Steering RIGHT → {steering_angle}°")
 
                 # --- Speed control ---
                 elif ch in ["+", "="]:
                     speed = clamp(speed + SPEED_STEP, MIN_SPEED, MAX_SPEED)
-                    print(f"[+] Speed increased → {speed}")
+                    status.event(f"[+] Speed increased → {speed}")
 
                 elif ch in ["-", "_"]:
                     speed = clamp(speed - SPEED_STEP, MIN_SPEED, MAX_SPEED)
-                    print(f"[-] Speed decreased → {speed}")
+                    status.event(f"[-] Speed decreased → {speed}")
 
                 # --- Camera pan/tilt ---
                 elif ch == "j":  # pan LEFT
                     cam_pan -= CAM_STEP
                     cam_pan = clamp(cam_pan, -CAM_PAN_MAX, CAM_PAN_MAX)
-                    px.set_cam_pan_angle(cam_pan)
-                    print(f"[J] Camera PAN LEFT → {cam_pan}°")
+                    planner.move(pan=cam_pan)
+                    status.event(f"[J] Camera PAN LEFT → {cam_pan}°")
 
                 elif ch == "l":  # pan RIGHT
                     cam_pan += CAM_STEP
                     cam_pan = clamp(cam_pan, -CAM_PAN_MAX, CAM_PAN_MAX)
-                    px.set_cam_pan_angle(cam_pan)
-                    print(f"[L] Camera PAN RIGHT → {cam_pan}°")
+                    planner.move(pan=cam_pan)
+                    status.event(f"[L] Camera PAN RIGHT → {cam_pan}°")
 
                 elif ch == "i":  # tilt UP
                     cam_tilt += CAM_STEP
                     cam_tilt = clamp(cam_tilt, -CAM_TILT_MAX, CAM_TILT_MAX)
-                    px.set_cam_tilt_angle(cam_tilt)
-                    print(f"[I] Camera TILT UP → {cam_tilt}°")
+                    planner.move(tilt=cam_tilt)
+                    status.event(f"[I] Camera TILT UP → {cam_tilt}°")
 
                 elif ch == "k":  # tilt DOWN
                     cam_tilt -= CAM_STEP
                     cam_tilt = clamp(cam_tilt, -CAM_TILT_MAX, CAM_TILT_MAX)
-                    px.set_cam_tilt_angle(cam_tilt)
-                    print(f"[K] Camera TILT DOWN → {cam_tilt}°")
+                    planner.move(tilt=cam_tilt)
+                    status.event(f"[K] Camera TILT DOWN → {cam_tilt}°")
 
             # ========== ULTRASONIC SAFETY ==========
-            try:
-                dist = px.get_distance()
-            except Exception:
-                dist = -1
+            governor.drive(motion != "stop")
+            if governor.due("ultrasonic"):
+                try:
+                    with span("ultrasonic"):
+                        dist = px.get_distance()
+                except Exception:
+                    dist = -1
+                if dist > 0:
+                    ULTRASONIC_AGE.mark()
+                governor.observe_distance(dist)
 
             if motion == "forward" and dist > 0 and dist < ULTRASONIC_STOP_CM:
                 px.stop()
+                SAFETY_STOPS.inc()
                 motion = "stop"
-                print(f"\r[SAFETY] Obstacle at {dist:.1f} cm → STOPPED.", end="")
+                status.event(f"[SAFETY] Obstacle at {dist:.1f} cm → STOPPED.")
 
+            status.set(motion=motion, speed=speed, steer=steering_angle, dist=dist, power=governor.mode)
             time.sleep(SLEEP_DT)
 
     except KeyboardInterrupt:
         print("\nInterrupted; stopping.")
     finally:
+        status.close()
         # Restore terminal
         termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+        print(f"\nPower: {governor.report()}")
 
         print("\nResetting steering and camera, stopping motors...")
         try:
             px.stop()
             px.set_dir_servo_angle(0)
-            px.set_cam_pan_angle(0)
-            px.set_cam_tilt_angle(0)
+            planner.move(pan=0, tilt=0)
+            planner.wait(timeout=1.0)
+            planner.close()
             px.close()
         except Exception:
             pass
@@ -1,3 +1,4 @@
+import os
 import sys
 import termios
 import tty
@@ -6,6 +7,16 @@ import select
 
 from picarx import Picarx
 
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import REGISTRY, LoopMetrics, serve_from_env
+from utils.power_save import PowerGovernor
+from utils.profiling import install as install_profiler, span
+from utils.status import StatusLine
+
 # ===== Config =====
 ULTRASONIC_STOP_CM = 20.0
 SLEEP_DT = 0.05
@@ -15,6 +26,15 @@ MAX_STEER = 35        # maximum left/right steering angle
 DEFAULT_SPEED = 30    # forward/backward speed
 
 
+# ===== Metrics (served when PICARX_METRICS_PORT is set) =====
+LOOP_METRICS = LoopMetrics(target_period_s=2 * SLEEP_DT)  # select timeout + sleep
+KEY_EVENTS = REGISTRY.counter("picarx_key_events_total", "Keys received")
+SAFETY_STOPS = REGISTRY.counter("picarx_safety_stops_total", "Ultrasonic safety stops")
+ULTRASONIC_AGE = REGISTRY.age_gauge(
+    "picarx_ultrasonic_age_seconds", "Age of the newest valid ultrasonic reading"
+)
+
+
 def read_key_nonblocking(timeout=SLEEP_DT):
     fd = sys.stdin.fileno()
     rlist, _, _ = select.select([fd], [], [], timeout)
@@ -27,6 +47,47 @@ def clamp(x, lo, hi):
     return max(lo, min(hi, x))
 
 
+def handle_key(px, ch, speed, steering_angle, motion, status):
+    """
+    Apply one key press. Returns (motion, steering_angle); motion is None
+    after "q".
+    """
+    if ch == "q":
+        status.event("Quitting...")
+        return None, steering_angle
+
+    elif ch == " ":
+        status.event("[SPACE] Stop")
+        px.stop()
+        motion = "stop"
+
+    elif ch == "w":
+        status.event(f"[W] Forward, steering={steering_angle}°")
+        px.set_dir_servo_angle(steering_angle)
+        px.forward(speed)
+        motion = "forward"
+
+    elif ch == "s":
+        status.event(f"[S] Backward, steering={steering_angle}°")
+        px.set_dir_servo_angle(steering_angle)
+        px.backward(speed)
+        motion = "backward"
+
+    elif ch == "a":
+        steering_angle -= STEER_STEP
+        steering_angle = clamp(steering_angle, -MAX_STEER, MAX_STEER)
+        px.set_dir_servo_angle(steering_angle)
+        status.event(f"[A] Steering LEFT → {steering_angle}° (no movement)")
+
+    elif ch == "d":
+        steering_angle += STEER_STEP
+        steering_angle = clamp(steering_angle, -MAX_STEER, MAX_STEER)
+        px.set_dir_servo_angle(steering_angle)
+        status.event(f"[D] Steering RIGHT → {steering_angle}° (no movement)")
+
+    return motion, steering_angle
+
+
 def main():
     px = Picarx()
 
@@ -52,10 +113,17 @@ Safety:
 ===============================================================================
 """)
 
+    serve_from_env()
+    install_profiler()
+
     # Put terminal in raw mode
     fd = sys.stdin.fileno()
     old_settings = termios.tcgetattr(fd)
     tty.setraw(fd)
+    status = StatusLine(
+        "{motion:8s} speed={speed} steer={steer}° | ultrasonic {dist:.1f} cm | {power}"
+    ).start()
+    governor = PowerGovernor()
 
     try:
         # Initialize safe state
@@ -63,61 +131,46 @@ Safety:
         px.stop()
 
         while True:
-            ch = read_key_nonblocking()
+            LOOP_METRICS.tick()
+            with span("read_key"):
+                ch = read_key_nonblocking(governor.wait_s(SLEEP_DT))
 
             # ======= KEY HANDLING =======
             if ch is not None:
+                KEY_EVENTS.inc()
+                governor.wake("key")
 
-                if ch == "q":
-                    print("\nQuitting...")
+                motion, steering_angle = handle_key(px, ch, speed, steering_angle, motion, status)
+                if motion is None:
                     break
 
-                elif ch == " ":
-                    print("[SPACE] Stop")
-                    px.stop()
-                    motion = "stop"
-
-                elif ch == "w":
-                    print(f"[W] Forward, steering={steering_angle}°")
-                    px.set_dir_servo_angle(steering_angle)
-                    px.forward(speed)
-                    motion = "forward"
-
-                elif ch == "s":
-                    print(f"[S] Backward, steering={steering_angle}°")
-                    px.set_dir_servo_angle(steering_angle)
-                    px.backward(speed)
-                    motion = "backward"
-
-                elif ch == "a":
-                    steering_angle -= STEER_STEP
-                    steering_angle = clamp(steering_angle, -MAX_STEER, MAX_STEER)
-                    px.set_dir_servo_angle(steering_angle)
-                    print(f"[A] Steering LEFT → {steering_angle}° (no movement)")
-
-                elif ch == "d":
-                    steering_angle += STEER_STEP
-                    steering_angle = clamp(steering_angle, -MAX_STEER, MAX_STEER)
-                    px.set_dir_servo_angle(steering_angle)
-                    print(f"[D] Steering RIGHT → {steering_angle}° (no movement)")
-
             # ======= ULTRASONIC SAFETY =======
-            try:
-                dist = px.get_distance()
-            except Exception:
-                dist = -1
+            governor.drive(motion != "stop")
+            if governor.due("ultrasonic"):
+                try:
+                    with span("ultrasonic"):
+                        dist = px.get_distance()
+                except Exception:
+                    dist = -1
+                if dist > 0:
+                    ULTRASONIC_AGE.mark()
+                governor.observe_distance(dist)
 
             if motion == "forward" and dist > 0 and dist < ULTRASONIC_STOP_CM:
                 px.stop()
+                SAFETY_STOPS.inc()
                 motion = "stop"
-                print(f"\r[SAFETY] Obstacle at {dist:.1f} cm → STOPPED.", end="")
+                status.event(f"[SAFETY] Obstacle at {dist:.1f} cm → STOPPED.")
 
+            status.set(motion=motion, speed=speed, steer=steering_angle, dist=dist, power=governor.mode)
             time.sleep(SLEEP_DT)
 
     except KeyboardInterrupt:
         print("\nInterrupted; stopping.")
     finally:
+        status.close()
         termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+        print(f"\nPower: {governor.report()}")
 
         print("\nResetting motors and steering...")
         px.stop()
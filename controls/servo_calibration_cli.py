@@ -1,9 +1,27 @@
+import os
+import sys
+
 from picarx import Picarx
 import time
 
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from controls.calibration import (
+    CONFIG_PATH,
+    SETTLE_S,
+    CalibrationError,
+    DebouncedCalibration,
+    VilibColorTarget,
+    auto_center,
+)
+
 
 def main():
     px = Picarx()
+    cal = DebouncedCalibration(px, CONFIG_PATH)
 
     # Use the existing calibration values from the object
     current = {
@@ -31,13 +49,17 @@ Controls:
   [c]  Re-center logical angles to 0 using current calibration
         - After calibration, calling set_*_angle(0) should look "straight"
 
+  [x]  Auto-center camera PAN/TILT on a red card placed straight ahead
+  [X]  Auto-center PAN/TILT and STEERING (the car drives ~10 cm back and forth)
+
   [h]  Show this help again
   [q]  Quit
 
 Current servo angle is the *calibration offset* in degrees.
-Changes are written to /opt/picar-x/picar-x.conf as you adjust.
+Changes apply immediately and are written to /opt/picar-x/picar-x.conf
+once a value has been left alone for {settle:.0f} s, and on exit.
 =============================================================
-"""
+""".format(settle=SETTLE_S)
 
     print(help_text)
 
@@ -49,23 +71,52 @@ Changes are written to /opt/picar-x/picar-x.conf as you adjust.
         print(f"Step           : {step}°")
 
     def apply_calibration():
-        # Apply calibration to the selected servo
-        if selected == "dir":
-            px.dir_servo_calibrate(current["dir"])
-        elif selected == "pan":
-            px.cam_pan_servo_calibrate(current["pan"])
-        elif selected == "tilt":
-            px.cam_tilt_servo_calibrate(current["tilt"])
+        # Apply calibration to the selected servo (written once it settles)
+        cal.set(selected, current[selected])
+
+    def run_auto_center(servos):
+        from vilib import Vilib
+
+        target = VilibColorTarget("red")
+        Vilib.camera_start(vflip=False, hflip=False)
+        target.start()
+        time.sleep(1.0)  # let the camera and colour detection warm up
+        try:
+            t0 = time.monotonic()
+            results = auto_center(cal, target, servos=servos)
+        except CalibrationError as e:
+            print(f"Auto-center failed: {e}")
+            return
+        finally:
+            target.stop()
+            Vilib.camera_close()
+            # Servos centered before a failure keep their new offset; the
+            # failed one is back where it was
+            for servo in current:
+                current[servo] = cal.get(servo)
+        for servo, (offset, n) in results.items():
+            current[servo] = offset
+            print(f"  {servo:4s} -> {offset:+.1f}° ({n} measurements)")
+        print(f"Auto-center finished in {time.monotonic() - t0:.1f} s.")
 
     show_status()
 
     try:
         while True:
-            cmd = input("\nCommand ([h]elp): ").strip().lower()
+            cmd = input("\nCommand ([h]elp): ").strip()
+            if cmd != "X":
+                cmd = cmd.lower()
 
             if not cmd:
                 continue
 
+            if cmd in ("x", "X"):
+                servos = ("pan", "tilt", "dir") if cmd == "X" else ("pan", "tilt")
+                print(f"Auto-centering {', '.join(servos)}...")
+                run_auto_center(servos)
+                show_status()
+                continue
+
             if cmd == "q":
                 print("Exiting and resetting servos to logical 0°...")
                 px.reset()
@@ -136,7 +187,8 @@ Changes are written to /opt/picar-x/picar-x.conf as you adjust.
 
     finally:
         # Make sure we leave the robot in a safe state
-        print("Stopping motors and resetting servos...")
+        print("Saving calibration, stopping motors and resetting servos...")
+        cal.close()
         px.reset()
         px.close()
 
@@ -1,18 +1,25 @@
-from picarx import Picarx
+import os
+import sys
 import time
 
-px = Picarx()
+from picarx import Picarx
 
-print("Centering steering (direction) servo to 0°...")
-px.set_dir_servo_angle(0)
-time.sleep(1)
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
 
-print("Centering camera PAN servo to 0°...")
-px.set_cam_pan_angle(0)
-time.sleep(1)
+from utils.servo_motion import ServoPlanner
+
+px = Picarx()
+# Angles are unknown at power-up: the first write jumps and the wait budgets
+# worst-case travel for it
+planner = ServoPlanner(px, initial=dict(dir=None, pan=None, tilt=None))
 
-print("Centering camera TILT servo to 0°...")
-px.set_cam_tilt_angle(0)
-time.sleep(1)
+print("Centering steering, camera PAN and camera TILT servos to 0°...")
+t0 = time.monotonic()
+print(f"  estimated {planner.center():.2f} s")
+planner.wait()
+planner.close()
 
-print("All servos centered. Adjust offsets as needed.") # 
+print(f"All servos centered in {time.monotonic() - t0:.2f} s. Adjust offsets as needed.")
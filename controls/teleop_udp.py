@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+
+"""
+Low-latency UDP teleop for the PiCar-X.
+
+Run the server on the car and the client on a laptop on the same network:
+
+    sudo python3 controls/teleop_udp.py server            # on the Pi
+    python3 controls/teleop_udp.py client <pi-ip>         # on the laptop
+
+The client keeps the key mapping of kb_ctrl_cam_move_stream_cd.py but
+reads the keyboard locally and streams the *whole* desired state
+(drive/steer/pan/tilt) as one 25-byte datagram 20 times a second, so no
+SSH or terminal echo sits in the control path and a lost packet is simply
+superseded by the next one.
+
+Server rules:
+- only the newest command is applied; packets with a sequence number not
+  newer than the last applied one (reordered or duplicated) are dropped;
+- if no command arrives within DEADMAN_S the motors are stopped;
+- the ultrasonic safety stop of the keyboard scripts still applies;
+- every packet is acknowledged with the client's own timestamp echoed,
+  so the client can show round-trip latency without synchronized clocks.
+"""
+
+import os
+import select
+import socket
+import struct
+import sys
+import time
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import REGISTRY, serve_from_env
+from utils.status import StatusLine
+
+# ===== Config =====
+PORT = 9010
+DEADMAN_S = 0.25  # stop if no command for this long
+SEND_HZ = 20.0  # client command rate (also the deadman heartbeat)
+SAFETY_DT = 0.05  # ultrasonic safety check period
+ULTRASONIC_STOP_CM = 20.0
+
+MAX_SPEED = 100
+MAX_STEER = 35
+CAM_PAN_MAX = 45
+CAM_TILT_MAX = 45
+
+# ===== Protocol =====
+# magic, session, seq, client time, drive, steer, pan, tilt, flags
+CMD = struct.Struct("<4sHIdhhhhB")
+CMD_MAGIC = b"PXT1"
+# magic, session, seq, echoed client time, server processing s, status
+ACK = struct.Struct("<4sHIdfB")
+ACK_MAGIC = b"PXA1"
+
+FLAG_ESTOP = 1 << 0
+
+STATUS_APPLIED = 0
+STATUS_STALE = 1
+STATUS_SAFETY_STOP = 2
+STATUS_ESTOP = 3
+
+# ===== Metrics =====
+PACKETS = REGISTRY.counter("picarx_teleop_packets_total", "Teleop packets received")
+STALE_DROPS = REGISTRY.counter("picarx_teleop_stale_total", "Reordered/duplicate packets dropped")
+DEADMAN_STOPS = REGISTRY.counter("picarx_teleop_deadman_stops_total", "Deadman timeouts")
+SAFETY_STOPS = REGISTRY.counter("picarx_teleop_safety_stops_total", "Ultrasonic safety stops")
+COMMAND_AGE = REGISTRY.age_gauge("picarx_teleop_command_age_seconds", "Age of the last applied command")
+
+
+def clamp(x, lo, hi):
+    return max(lo, min(hi, x))
+
+
+def seq_newer(a, b):
+    """True if 32-bit sequence number a is newer than b (wraparound-safe)."""
+    return 0 < ((a - b) & 0xFFFFFFFF) < 0x80000000
+
+
+class TeleopServer:
+    def __init__(self, robot, host="0.0.0.0", port=PORT, deadman_s=DEADMAN_S,
+                 stop_cm=ULTRASONIC_STOP_CM, clock=None):
+        self.robot = robot
+        self.deadman_s = float(deadman_s)
+        self.stop_cm = float(stop_cm)
+        self.clock = clock or time.monotonic
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+
+        self.session = None
+        self.last_seq = None
+        self.last_cmd_t = None
+        self.running = False
+
+        # What the hardware was last told, to skip redundant writes
+        self.drive = 0
+        self.steer = None
+        self.pan = None
+        self.tilt = None
+        self._next_safety = 0.0
+
+        self.applied = 0
+        self.stale = 0
+        self.deadman_stops = 0
+        self.safety_stops = 0
+
+    # ---- Actuation --------------------------------------------------------
+
+    def _set_drive(self, drive):
+        if drive == self.drive:
+            return
+        if drive > 0:
+            self.robot.forward(drive)
+        elif drive < 0:
+            self.robot.backward(-drive)
+        else:
+            self.robot.stop()
+        self.drive = drive
+
+    def _apply(self, drive, steer, pan, tilt, flags):
+        if flags & FLAG_ESTOP:
+            self._set_drive(0)
+            return STATUS_ESTOP
+
+        steer = clamp(steer, -MAX_STEER, MAX_STEER)
+        pan = clamp(pan, -CAM_PAN_MAX, CAM_PAN_MAX)
+        tilt = clamp(tilt, -CAM_TILT_MAX, CAM_TILT_MAX)
+        if steer != self.steer:
+            self.robot.set_dir_servo_angle(steer)
+            self.steer = steer
+        if pan != self.pan:
+            self.robot.set_cam_pan_angle(pan)
+            self.pan = pan
+        if tilt != self.tilt:
+            self.robot.set_cam_tilt_angle(tilt)
+            self.tilt = tilt
+
+        drive = clamp(drive, -MAX_SPEED, MAX_SPEED)
+        if drive > 0 and self._obstacle_ahead():
+            self._set_drive(0)
+            return STATUS_SAFETY_STOP
+        self._set_drive(drive)
+        return STATUS_APPLIED
+
+    def _obstacle_ahead(self):
+        try:
+            dist = self.robot.get_distance()
+        except Exception:
+            return False
+        return dist is not None and 0 < dist < self.stop_cm
+
+    # ---- Packet handling --------------------------------------------------
+
+    def _ack(self, addr, session, seq, client_t, t_recv, status):
+        processing = self.clock() - t_recv
+        try:
+            self.sock.sendto(ACK.pack(ACK_MAGIC, session, seq, client_t, processing, status), addr)
+        except OSError:
+            pass
+
+    def poll(self, timeout=0.0):
+        """
+        Drain pending datagrams, apply the newest command, run the deadman
+        and safety checks. Returns the number of packets read.
+        """
+        readable, _, _ = select.select([self.sock], [], [], timeout)
+        now = self.clock()
+        batch = []
+        if readable:
+            while True:
+                try:
+                    data, addr = self.sock.recvfrom(64)
+                except (BlockingIOError, InterruptedError):
+                    break
+                if len(data) != CMD.size:
+                    continue
+                pkt = CMD.unpack(data)
+                if pkt[0] != CMD_MAGIC:
+                    continue
+                batch.append((pkt, addr))
+        PACKETS.inc(len(batch))
+
+        newest = None
+        for pkt, addr in batch:
+            _, session, seq = pkt[:3]
+            if session != self.session:
+                # New client (or restarted one): start a fresh sequence
+                self.session, self.last_seq = session, None
+                newest = None
+            if self.last_seq is not None and not seq_newer(seq, self.last_seq):
+                self.stale += 1
+                STALE_DROPS.inc()
+                self._ack(addr, session, seq, pkt[3], now, STATUS_STALE)
+                continue
+            if newest is not None:
+                # Superseded within the same batch
+                self._ack(newest[1], session, newest[0][2], newest[0][3], now, STATUS_STALE)
+                self.stale += 1
+                STALE_DROPS.inc()
+            newest = (pkt, addr)
+            self.last_seq = seq
+
+        if newest is not None:
+            pkt, addr = newest
+            _, session, seq, client_t, drive, steer, pan, tilt, flags = pkt
+            status = self._apply(drive, steer, pan, tilt, flags)
+            self.applied += 1
+            self.last_cmd_t = now
+            COMMAND_AGE.mark(now)
+            self._ack(addr, session, seq, client_t, now, status)
+
+        # Deadman: the link went quiet while the car is moving
+        if self.drive != 0 and (self.last_cmd_t is None or now - self.last_cmd_t > self.deadman_s):
+            self._set_drive(0)
+            self.deadman_stops += 1
+            DEADMAN_STOPS.inc()
+
+        # Ultrasonic safety between commands
+        if self.drive > 0 and now >= self._next_safety:
+            self._next_safety = now + SAFETY_DT
+            if self._obstacle_ahead():
+                self._set_drive(0)
+                self.safety_stops += 1
+                SAFETY_STOPS.inc()
+
+        return len(batch)
+
+    def serve_forever(self):
+        self.running = True
+        tick = min(self.deadman_s / 2.0, SAFETY_DT)
+        try:
+            while self.running:
+                self.poll(timeout=tick)
+        finally:
+            self._set_drive(0)
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        self.sock.close()
+
+
+class TeleopClient:
+    def __init__(self, host, port=PORT, session=None):
+        self.addr = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.session = (os.getpid() if session is None else session) & 0xFFFF
+        self.seq = 0
+        self.rtts = []
+        self.last_status = None
+
+    def send(self, drive=0, steer=0, pan=0, tilt=0, estop=False):
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        flags = FLAG_ESTOP if estop else 0
+        self.sock.sendto(
+            CMD.pack(CMD_MAGIC, self.session, self.seq, time.monotonic(),
+                     int(drive), int(steer), int(pan), int(tilt), flags),
+            self.addr,
+        )
+        return self.seq
+
+    def poll_acks(self, timeout=0.0):
+        """Read pending acks; returns a list of (seq, rtt_s, status)."""
+        out = []
+        readable, _, _ = select.select([self.sock], [], [], timeout)
+        if not readable:
+            return out
+        while True:
+            try:
+                data = self.sock.recv(64)
+            except (BlockingIOError, InterruptedError, ConnectionRefusedError):
+                break
+            if len(data) != ACK.size:
+                continue
+            magic, session, seq, client_t, _, status = ACK.unpack(data)
+            if magic != ACK_MAGIC or session != self.session:
+                continue
+            rtt = time.monotonic() - client_t
+            self.rtts.append(rtt)
+            del self.rtts[:-100]
+            self.last_status = status
+            out.append((seq, rtt, status))
+        return out
+
+    def close(self):
+        self.sock.close()
+
+
+# ===== CLI =====
+
+
+def run_server(port=PORT):
+    from picarx import Picarx
+
+    px = Picarx()
+    server = TeleopServer(px, port=port)
+    serve_from_env()
+    print(f"Teleop server on udp://{server.address[0]}:{server.address[1]} "
+          f"(deadman {DEADMAN_S * 1000:.0f} ms). Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping.")
+    finally:
+        px.stop()
+        px.set_dir_servo_angle(0)
+        px.set_cam_pan_angle(0)
+        px.set_cam_tilt_angle(0)
+        server.close()
+        px.close()
+
+
+def run_client(host, port=PORT):
+    import termios
+    import tty
+
+    steer_step, cam_step, speed_step = 8, 5, 5
+    speed, steer, pan, tilt = 30, 0, 0, 0
+    motion = 0  # -1 backward, 0 stop, 1 forward
+
+    client = TeleopClient(host, port)
+    print(
+        "w/s drive, a/d steer, space stop, +/- speed, i/k tilt, j/l pan, q quit\n"
+        f"Sending to udp://{host}:{port} at {SEND_HZ:.0f} Hz"
+    )
+
+    fd = sys.stdin.fileno()
+    old_settings = termios.tcgetattr(fd)
+    tty.setraw(fd)
+    status = StatusLine(
+        "drive={drive:4d} steer={steer:4d} pan={pan:4d} tilt={tilt:4d} | rtt p50 {rtt_ms:5.1f} ms"
+    ).start()
+    period = 1.0 / SEND_HZ
+    next_send = time.monotonic()
+    next_status = next_send
+    try:
+        while True:
+            timeout = max(0.0, next_send - time.monotonic())
+            rlist, _, _ = select.select([fd], [], [], timeout)
+            if rlist:
+                ch = sys.stdin.read(1)
+                if ch == "q":
+                    break
+                elif ch == " ":
+                    motion = 0
+                elif ch == "w":
+                    motion = 1
+                elif ch == "s":
+                    motion = -1
+                elif ch == "a":
+                    steer = clamp(steer - steer_step, -MAX_STEER, MAX_STEER)
+                elif ch == "d":
+                    steer = clamp(steer + steer_step, -MAX_STEER, MAX_STEER)
+                elif ch in ("+", "="):
+                    speed = clamp(speed + speed_step, 10, MAX_SPEED)
+                elif ch in ("-", "_"):
+                    speed = clamp(speed - speed_step, 10, MAX_SPEED)
+                elif ch == "j":
+                    pan = clamp(pan - cam_step, -CAM_PAN_MAX, CAM_PAN_MAX)
+                elif ch == "l":
+                    pan = clamp(pan + cam_step, -CAM_PAN_MAX, CAM_PAN_MAX)
+                elif ch == "i":
+                    tilt = clamp(tilt + cam_step, -CAM_TILT_MAX, CAM_TILT_MAX)
+                elif ch == "k":
+                    tilt = clamp(tilt - cam_step, -CAM_TILT_MAX, CAM_TILT_MAX)
+                # Send key changes immediately instead of waiting for the tick
+                next_send = time.monotonic()
+
+            now = time.monotonic()
+            if now >= next_send:
+                client.send(motion * speed, steer, pan, tilt)
+                next_send = now + period
+            client.poll_acks()
+
+            if now >= next_status and client.rtts:
+                next_status = now + 0.5
+                rtt_ms = sorted(client.rtts)[len(client.rtts) // 2] * 1000.0
+                status.set(drive=motion * speed, steer=steer, pan=pan, tilt=tilt, rtt_ms=rtt_ms)
+    finally:
+        for _ in range(3):  # best effort: stop now rather than waiting for the deadman
+            client.send(0, steer, pan, tilt, estop=True)
+        status.close()
+        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+        client.close()
+
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == "server":
+        run_server(int(sys.argv[2]) if len(sys.argv) > 2 else PORT)
+    elif len(sys.argv) >= 3 and sys.argv[1] == "client":
+        run_client(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else PORT)
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from controls.calibration import (
+    CalibrationError,
+    DebouncedCalibration,
+    auto_center,
+    bisect_offset,
+    read_config,
+    write_config_atomic,
+)
+
+
+class SimServoRig:
+    """
+    Picarx-like servos with unknown mechanical errors, plus a camera that
+    sees a reference target straight ahead. The target's image offset is
+    proportional to the residual pan/tilt error; driving forward makes it
+    drift sideways in proportion to the residual steering error.
+    """
+
+    def __init__(self, pan_err=7.3, tilt_err=-4.1, dir_err=5.6, px_per_deg=0.02):
+        self.err = {"pan": pan_err, "tilt": tilt_err, "dir": dir_err}
+        self.k = px_per_deg
+        self.dir_cali_val = 0.0
+        self.cam_pan_cali_val = 0.0
+        self.cam_tilt_cali_val = 0.0
+        self.servo_writes = 0
+        self.drift_x = 0.0
+        self._speed = 0
+
+    # Picarx API
+    def set_dir_servo_angle(self, a):
+        self.servo_writes += 1
+
+    def set_cam_pan_angle(self, a):
+        self.servo_writes += 1
+
+    def set_cam_tilt_angle(self, a):
+        self.servo_writes += 1
+
+    def forward(self, speed):
+        self._speed = speed
+
+    def backward(self, speed):
+        self._speed = -speed
+
+    def stop(self):
+        self._speed = 0
+
+    # Simulated time / camera
+    def sleep(self, dt):
+        if self._speed:
+            # Residual steering error makes the car yaw; target drifts opposite
+            residual = self.dir_cali_val + self.err["dir"]
+            self.drift_x -= self.k * residual * dt * (1 if self._speed > 0 else -1)
+
+    def locate(self):
+        # Positive pan (right) moves the target left in the image
+        x = -self.k * (self.cam_pan_cali_val + self.err["pan"]) + self.drift_x
+        y = -self.k * (self.cam_tilt_cali_val + self.err["tilt"])
+        if abs(x) > 1 or abs(y) > 1:
+            return None
+        return x, y
+
+
+def test_debounce_coalesces_rapid_changes_into_one_atomic_write(tmp_path):
+    path = tmp_path / "picar-x.conf"
+    path.write_text("# picar-x config\npicarx_dir_servo = 0\nother_key = keep\n")
+    now = [0.0]
+    rig = SimServoRig()
+    cal = DebouncedCalibration(rig, str(path), settle_s=1.0, background=False, clock=lambda: now[0])
+
+    for i in range(10):  # ten keypresses, 0.1 s apart
+        cal.set("dir", i - 5)
+        now[0] += 0.1
+        assert not cal.poll()
+    assert cal.writes == 0
+    assert rig.dir_cali_val == 4  # applied live
+
+    now[0] += 1.0
+    assert cal.poll()
+    assert cal.writes == 1
+    text = path.read_text()
+    assert text.startswith("# picar-x config\n")
+    assert read_config(str(path)) == {"picarx_dir_servo": "4", "other_key": "keep"}
+    assert [p.name for p in tmp_path.iterdir()] == ["picar-x.conf"]  # no temp files left
+
+
+def test_close_flushes_pending_value(tmp_path):
+    path = tmp_path / "picar-x.conf"
+    cal = DebouncedCalibration(SimServoRig(), str(path), settle_s=60.0)
+    cal.set("pan", -2.5)
+    cal.close()
+    assert read_config(str(path)) == {"picarx_cam_pan_servo": "-2.5"}
+
+
+def test_write_is_atomic_on_failure(tmp_path, monkeypatch):
+    path = tmp_path / "picar-x.conf"
+    path.write_text("picarx_dir_servo = 1\n")
+
+    def boom(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", boom)
+    with pytest.raises(OSError):
+        write_config_atomic(str(path), {"picarx_dir_servo": "9"})
+    assert path.read_text() == "picarx_dir_servo = 1\n"
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_auto_center_converges_on_simulated_rig(tmp_path):
+    rig = SimServoRig()
+    cal = DebouncedCalibration(rig, str(tmp_path / "c.conf"), background=False)
+    results = auto_center(cal, rig.locate, servos=("pan", "tilt", "dir"), sleep=rig.sleep)
+
+    assert results["pan"][0] == pytest.approx(-7.3, abs=0.3)
+    assert results["tilt"][0] == pytest.approx(4.1, abs=0.3)
+    assert results["dir"][0] == pytest.approx(-5.6, abs=0.3)
+    # Bisection over +-20 deg to 0.5 deg: 2 endpoints + ~7 midpoints each
+    assert all(n <= 9 for _, n in results.values())
+    cal.close()
+    assert read_config(str(tmp_path / "c.conf"))["picarx_cam_pan_servo"] == "-7.3"
+
+
+def test_bisect_reports_target_out_of_range():
+    with pytest.raises(CalibrationError):
+        bisect_offset(lambda o: 1.0)
+    with pytest.raises(CalibrationError):
+        bisect_offset(lambda o: None)
+
+
+def test_failed_search_restores_the_previous_offset(tmp_path):
+    path = tmp_path / "c.conf"
+    write_config_atomic(str(path), {"picarx_cam_tilt_servo": "3"})
+    rig = SimServoRig(tilt_err=25.0)  # the card stays above centre at every tilt
+    rig.cam_tilt_cali_val = 3.0
+    cal = DebouncedCalibration(rig, str(path), background=False)
+    with pytest.raises(CalibrationError):
+        auto_center(cal, rig.locate, servos=("pan", "tilt"), sleep=rig.sleep)
+    assert rig.cam_tilt_cali_val == 3.0
+    assert rig.cam_pan_cali_val == pytest.approx(-7.3, abs=0.3)  # centered before the failure
+    assert cal.pending() == {"pan": rig.cam_pan_cali_val, "tilt": 3.0}  # no probes
+    cal.close()
+    assert read_config(str(path))["picarx_cam_tilt_servo"] == "3"
+
+
+def test_no_probe_reaches_the_file_during_a_long_failed_search(tmp_path):
+    path = tmp_path / "c.conf"
+    write_config_atomic(str(path), {"picarx_dir_servo": "2"})
+    rig = SimServoRig(dir_err=60.0)  # beyond the search range
+    rig.dir_cali_val = 2.0
+    cal = DebouncedCalibration(rig, str(path), settle_s=0.01)  # real background writer
+
+    def sleep(dt):
+        rig.sleep(dt)
+        time.sleep(0.005)  # the search takes many times settle_s
+
+    t0 = time.monotonic()
+    with pytest.raises(CalibrationError):
+        auto_center(cal, rig.locate, servos=("dir",), sleep=sleep)
+    assert time.monotonic() - t0 > 5 * cal.settle_s
+    assert rig.dir_cali_val == 2.0
+    cal.close()
+    assert cal.writes == 1  # the restored value only
+    assert read_config(str(path)) == {"picarx_dir_servo": "2"}
@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from controls.teleop_udp import (
+    CMD,
+    CMD_MAGIC,
+    STATUS_APPLIED,
+    STATUS_SAFETY_STOP,
+    STATUS_STALE,
+    TeleopClient,
+    TeleopServer,
+    seq_newer,
+)
+
+
+class FakeRobot:
+    def __init__(self, distance=100.0):
+        self.distance = distance
+        self.calls = []
+        self.speed = 0
+        self.steer = 0
+
+    def forward(self, speed):
+        self.calls.append(("forward", speed))
+        self.speed = speed
+
+    def backward(self, speed):
+        self.calls.append(("backward", speed))
+        self.speed = -speed
+
+    def stop(self):
+        self.calls.append(("stop",))
+        self.speed = 0
+
+    def set_dir_servo_angle(self, a):
+        self.calls.append(("steer", a))
+        self.steer = a
+
+    def set_cam_pan_angle(self, a):
+        self.calls.append(("pan", a))
+
+    def set_cam_tilt_angle(self, a):
+        self.calls.append(("tilt", a))
+
+    def get_distance(self):
+        return self.distance
+
+
+def make_pair(robot, **kwargs):
+    server = TeleopServer(robot, host="127.0.0.1", port=0, **kwargs)
+    client = TeleopClient("127.0.0.1", server.address[1], session=7)
+    return server, client
+
+
+def pump(server, client, expect_acks=1):
+    acks = []
+    deadline = time.monotonic() + 2.0
+    while len(acks) < expect_acks and time.monotonic() < deadline:
+        server.poll(timeout=0.01)
+        acks += client.poll_acks(timeout=0.01)
+    return acks
+
+
+def test_seq_newer_handles_wraparound():
+    assert seq_newer(2, 1)
+    assert not seq_newer(1, 2)
+    assert not seq_newer(5, 5)
+    assert seq_newer(1, 0xFFFFFFFF)
+
+
+def test_applies_command_and_echoes_timestamp():
+    robot = FakeRobot()
+    server, client = make_pair(robot)
+    try:
+        client.send(drive=40, steer=10, pan=-5, tilt=3)
+        (seq, rtt, status), = pump(server, client)
+        assert status == STATUS_APPLIED
+        assert 0 <= rtt < 1.0
+        assert robot.speed == 40 and robot.steer == 10
+        assert ("pan", -5) in robot.calls and ("tilt", 3) in robot.calls
+    finally:
+        server.close()
+        client.close()
+
+
+def test_only_newest_of_a_burst_is_applied_and_old_packets_are_dropped():
+    robot = FakeRobot()
+    server, client = make_pair(robot)
+    try:
+        for drive in (10, 20, 30):
+            client.send(drive=drive)
+        # A reordered packet from the past arrives late
+        late = CMD.pack(CMD_MAGIC, 7, 1, time.monotonic(), 99, 0, 0, 0, 0)
+        client.sock.sendto(late, client.addr)
+        time.sleep(0.05)
+        acks = pump(server, client, expect_acks=4)
+        assert [c for c in robot.calls if c[0] == "forward"] == [("forward", 30)]
+        assert sorted(s for _, _, s in acks).count(STATUS_STALE) == 3
+        assert server.stale == 3
+    finally:
+        server.close()
+        client.close()
+
+
+def test_deadman_stops_motors_when_link_goes_quiet():
+    robot = FakeRobot()
+    server, client = make_pair(robot, deadman_s=0.1)
+    try:
+        client.send(drive=30)
+        pump(server, client)
+        assert robot.speed == 30
+        deadline = time.monotonic() + 1.0
+        while robot.speed != 0 and time.monotonic() < deadline:
+            server.poll(timeout=0.02)
+        assert robot.speed == 0
+        assert server.deadman_stops == 1
+    finally:
+        server.close()
+        client.close()
+
+
+def test_ultrasonic_safety_blocks_forward_but_not_reverse():
+    robot = FakeRobot(distance=10.0)
+    server, client = make_pair(robot)
+    try:
+        client.send(drive=30)
+        (_, _, status), = pump(server, client)
+        assert status == STATUS_SAFETY_STOP and robot.speed == 0
+        client.send(drive=-30)
+        (_, _, status), = pump(server, client)
+        assert status == STATUS_APPLIED and robot.speed == -30
+    finally:
+        server.close()
+        client.close()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+
+"""
+Synthetic camera and detection feed for the headless simulator.
+
+SimCamera renders a cheap column-raycast view of the world from the car's
+camera (floor, walls and posts as flat colour) and projects classed
+obstacles into pixel bounding boxes. The stand-ins below expose it through
+the interfaces the scripts already use:
+
+- SimVideoCapture  -> cv2.VideoCapture(0)
+- SimPicamera2     -> picamera2.Picamera2()
+- SimYOLO          -> ultralytics.YOLO(...)  (results[0].boxes API)
+- make_vilib()     -> vilib.Vilib with object_detection_list_parameter
+"""
+
+import math
+
+import numpy as np
+
+from sim.world import CLASS_NONE
+
+FRAME_W = 640
+FRAME_H = 480
+HFOV_DEG = 90.0  # matches the linear model in OpponentTracker._update_from_bbox
+CAMERA_HEIGHT_CM = 12.0
+RENDER_STRIDE = 4  # one ray per 4 image columns
+
+# BGR, like frames from cv2.VideoCapture
+FLOOR_BGR = (90, 110, 130)
+SKY_BGR = (40, 40, 40)
+WALL_BGR = (200, 200, 200)
+CLASS_BGR = {0: (40, 160, 40), 2: (40, 40, 180)}
+
+COCO_NAMES = {0: "person", 1: "bicycle", 2: "car", 3: "motorcycle", 7: "truck"}
+
+
+class SimCamera:
+    def __init__(self, car, clock=None, width=FRAME_W, height=FRAME_H, hfov_deg=HFOV_DEG):
+        self.car = car
+        self.world = car.world
+        self.clock = clock
+        self.w = int(width)
+        self.h = int(height)
+        self.f = (self.w / 2.0) / math.tan(math.radians(hfov_deg) / 2.0)
+        self.max_range = 1000.0
+
+        cols = np.arange(0, self.w, RENDER_STRIDE) + RENDER_STRIDE / 2.0
+        self._col_angles = np.arctan((cols - self.w / 2.0) / self.f)
+        self._rows = np.arange(self.h, dtype=np.float64)[:, None]
+        self._palette = np.array([SKY_BGR, FLOOR_BGR, WALL_BGR], dtype=np.uint8)
+
+        self.frames = 0
+        # Detections are sampled at capture time and looked up again by
+        # frame when the "model" runs, so results are as stale as the
+        # inference latency makes them, like on the real car.
+        self._recent = []
+
+    # ---- Geometry ---------------------------------------------------------
+
+    def _pose(self):
+        cx, cy = self.car.sensor_position()
+        yaw = self.car.heading + math.radians(self.car.cam_pan)
+        horizon = self.h / 2.0 + self.f * math.tan(math.radians(self.car.cam_tilt))
+        return cx, cy, yaw, horizon
+
+    def detections(self):
+        """
+        Project every classed obstacle that is in view and not occluded.
+        Returns a list of dicts in Vilib's format:
+        {"bbox": [xmin, ymin, xmax, ymax], "class_id": int, "score": float}
+        """
+        c = self.world.circles
+        if not len(c):
+            return []
+        c = c[c[:, 4] != CLASS_NONE]
+        if not len(c):
+            return []
+
+        ox, oy, yaw, horizon = self._pose()
+        rx = c[:, 0] - ox
+        ry = c[:, 1] - oy
+        z = rx * math.cos(yaw) + ry * math.sin(yaw)  # depth along optical axis
+        lat = -rx * math.sin(yaw) + ry * math.cos(yaw)  # positive = right
+        front = z > c[:, 2] + 1.0
+        if not np.any(front):
+            return []
+        c, z, lat, rx, ry = c[front], z[front], lat[front], rx[front], ry[front]
+
+        u0 = self.w / 2.0 + self.f * (lat - c[:, 2]) / z
+        u1 = self.w / 2.0 + self.f * (lat + c[:, 2]) / z
+        v0 = horizon - self.f * (c[:, 3] - CAMERA_HEIGHT_CM) / z
+        v1 = horizon + self.f * CAMERA_HEIGHT_CM / z
+        visible = (u1 > 0) & (u0 < self.w) & (v1 > 0) & (v0 < self.h)
+        if not np.any(visible):
+            return []
+
+        # Occlusion: the ray to the centre must not hit something nearer
+        rng = np.hypot(rx, ry)
+        bearings = np.arctan2(ry, rx)
+        hits = self.world.cast_rays(ox, oy, bearings, self.max_range)
+        visible &= hits >= rng - c[:, 2] - 1.0
+
+        dets = []
+        for i in np.flatnonzero(visible):
+            score = float(np.clip(0.95 - rng[i] / 800.0, 0.3, 0.95))
+            dets.append(
+                {
+                    "bbox": [
+                        int(max(0, u0[i])),
+                        int(max(0, v0[i])),
+                        int(min(self.w, u1[i])),
+                        int(min(self.h, v1[i])),
+                    ],
+                    "class_id": int(c[i, 4]),
+                    "score": score,
+                }
+            )
+        return dets
+
+    def render(self):
+        """Flat-shaded BGR frame of what the camera currently sees."""
+        ox, oy, yaw, horizon = self._pose()
+        dist, heights, classes = self.world.cast_rays(
+            ox, oy, yaw + self._col_angles, self.max_range, with_info=True
+        )
+        depth = dist * np.cos(self._col_angles)  # perpendicular, no fisheye
+        with np.errstate(divide="ignore"):
+            top = horizon - self.f * (heights - CAMERA_HEIGHT_CM) / depth
+            bottom = horizon + self.f * CAMERA_HEIGHT_CM / depth
+        top[~np.isfinite(depth)] = horizon
+        bottom[~np.isfinite(depth)] = horizon
+
+        rows = self._rows
+        # 0 = background above the horizon, 1 = floor, 2 = obstacle
+        label = (rows >= horizon).astype(np.uint8)
+        label = np.where((rows >= top[None, :]) & (rows < bottom[None, :]), 2, label)
+        narrow = self._palette[label]
+        for cls, bgr in CLASS_BGR.items():
+            mask = (classes == cls)[None, :] & (label == 2)
+            narrow[mask] = bgr
+
+        self.frames += 1
+        return np.repeat(narrow, RENDER_STRIDE, axis=1)[:, : self.w]
+
+    def capture(self):
+        """Render a frame and remember the detections sampled with it."""
+        frame = self.render()
+        self.remember(frame, self.detections())
+        return frame
+
+    def remember(self, frame, dets):
+        self._recent.append((frame, dets))
+        del self._recent[:-4]
+
+    def detections_for(self, frame):
+        """Detections captured together with `frame` (by identity)."""
+        for f, dets in reversed(self._recent):
+            if f is frame:
+                return dets
+        return []
+
+
+# ---- Library stand-ins ----------------------------------------------------
+
+
+class SimVideoCapture:
+    """cv2.VideoCapture replacement; read() blocks (in sim time) to the next frame."""
+
+    def __init__(self, camera, fps=30.0):
+        self.camera = camera
+        self.period = 1.0 / fps
+        self._next_t = 0.0
+        self._opened = True
+        self._grabbed = None
+
+    def isOpened(self):
+        return self._opened
+
+    def grab(self):
+        clock = self.camera.clock
+        if clock is not None:
+            clock.wait_until(self._next_t)
+            self._next_t = clock.now + self.period
+        self._grabbed = self.camera.capture()
+        return True
+
+    def retrieve(self):
+        frame, self._grabbed = self._grabbed, None
+        return frame is not None, frame
+
+    def read(self):
+        self.grab()
+        return self.retrieve()
+
+    def set(self, prop, value):
+        return True
+
+    def get(self, prop):
+        return 0.0
+
+    def release(self):
+        self._opened = False
+
+
+class SimPicamera2:
+    """picamera2.Picamera2 replacement (RGB frames)."""
+
+    def __init__(self, camera, fps=30.0):
+        self._cap = SimVideoCapture(camera, fps)
+
+    def create_preview_configuration(self, main=None, **kwargs):
+        return {"main": main or {}}
+
+    def configure(self, config):
+        pass
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def capture_array(self):
+        _, frame = self._cap.read()
+        rgb = frame[:, :, ::-1]
+        self._cap.camera.remember(rgb, self._cap.camera.detections_for(frame))
+        return rgb
+
+
+class _Boxes:
+    """Minimal ultralytics Boxes: iterable of per-box views with cls/conf/xyxy."""
+
+    def __init__(self, dets):
+        self._items = [_Box(d) for d in dets]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __getitem__(self, i):
+        return self._items[i]
+
+
+class _Box:
+    def __init__(self, det):
+        self.cls = np.array([float(det["class_id"])])
+        self.conf = np.array([float(det["score"])])
+        self.xyxy = np.array([det["bbox"]], dtype=np.float32)
+
+
+class _Result:
+    def __init__(self, dets):
+        self.boxes = _Boxes(dets)
+
+
+class SimYOLO:
+    """
+    ultralytics.YOLO replacement. Each call charges `infer_cost_s` of
+    simulated time, then returns the detections captured with the frame.
+    """
+
+    def __init__(self, camera, clock=None, infer_cost_s=0.12):
+        self.camera = camera
+        self.clock = clock
+        self.infer_cost_s = float(infer_cost_s)
+        self.names = dict(COCO_NAMES)
+        self.calls = 0
+
+    def predict(self, frame, conf=0.25, **kwargs):
+        self.calls += 1
+        if self.clock is not None and self.infer_cost_s > 0:
+            self.clock.advance(self.infer_cost_s)
+        dets = [d for d in self.camera.detections_for(frame) if d["score"] >= conf]
+        return [_Result(dets)]
+
+    __call__ = predict
+
+
+def make_vilib(camera, clock=None, detect_interval_s=0.1):
+    """
+    Build a class that looks like vilib.Vilib. Its detection list is
+    refreshed from the camera every `detect_interval_s` of simulated time
+    (Vilib runs its own detection thread at a fixed-ish rate).
+    """
+
+    class Vilib:
+        camera_width = camera.w
+        camera_height = camera.h
+        object_detection_list_parameter = []
+        detect_obj_parameter = {}
+        img = None
+        _detect_on = False
+        _next_refresh = 0.0
+
+        @staticmethod
+        def camera_start(vflip=False, hflip=False, size=None):
+            pass
+
+        @staticmethod
+        def camera_close():
+            pass
+
+        @staticmethod
+        def display(local=True, web=True):
+            pass
+
+        @staticmethod
+        def show_fps(*args, **kwargs):
+            pass
+
+        @staticmethod
+        def object_detect_set_model(path):
+            pass
+
+        @staticmethod
+        def object_detect_set_labels(path):
+            pass
+
+        @staticmethod
+        def object_detect_switch(flag):
+            Vilib._detect_on = bool(flag)
+
+        @staticmethod
+        def _tick(now):
+            if not Vilib._detect_on or now < Vilib._next_refresh:
+                return
+            Vilib._next_refresh = now + detect_interval_s
+            Vilib.object_detection_list_parameter = camera.detections()
+
+    if clock is not None:
+        clock.add_hook(Vilib._tick)
+    return Vilib
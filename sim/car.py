@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+"""
+Simulated PiCar-X.
+
+SimPicarx mirrors the subset of SunFounder's `picarx.Picarx` API that the
+scripts in this repo call (forward/backward/stop, servo setters,
+get_distance, calibration values, reset/close), so it can be dropped in
+wherever a Picarx is expected, including behind utils.picarx_wrapper.PX.
+
+Motion is a kinematic bicycle model integrated by `step(dt)`; nothing
+happens between steps, so time is entirely under the caller's control.
+"""
+
+import math
+
+import numpy as np
+
+from sim.world import wrap_angle
+
+WHEELBASE_CM = 11.5
+CAR_RADIUS_CM = 9.0  # collision disc around the rear-axle centre
+SENSOR_OFFSET_CM = 10.0  # ultrasonic sits ahead of the rear axle
+CM_PER_SPEED_UNIT = 0.6  # speed 100 ~= 60 cm/s
+
+ULTRASONIC_MAX_CM = 300.0
+ULTRASONIC_HALF_CONE_DEG = 15.0
+ULTRASONIC_RAYS = 9
+
+MAX_STEER_DEG = 35.0
+CAM_PAN_MAX_DEG = 90.0
+CAM_TILT_MAX_DEG = 65.0
+
+
+class SimPicarx:
+    def __init__(self, world, x=40.0, y=None, heading_deg=0.0, noise_cm=0.0, seed=0):
+        self.world = world
+        self.x = float(x)
+        self.y = float(world.height / 2.0 if y is None else y)
+        self.heading = math.radians(heading_deg)
+
+        self.speed = 0.0  # signed, Picarx units (-100..100)
+        self.dir_angle = 0.0
+        self.cam_pan = 0.0
+        self.cam_tilt = 0.0
+
+        # Calibration offsets, same attribute names as picarx.Picarx
+        self.dir_cali_val = 0.0
+        self.cam_pan_cali_val = 0.0
+        self.cam_tilt_cali_val = 0.0
+
+        self.noise_cm = float(noise_cm)
+        self._rng = np.random.default_rng(seed)
+        self._ray_offsets = np.radians(
+            np.linspace(-ULTRASONIC_HALF_CONE_DEG, ULTRASONIC_HALF_CONE_DEG, ULTRASONIC_RAYS)
+        )
+
+        # Run statistics
+        self.odometer_cm = 0.0
+        self.max_x = self.x
+        self.collisions = 0
+        self.in_collision = False
+        self.distance_reads = 0
+        self.closed = False
+
+    # ---- Picarx API -------------------------------------------------------
+
+    def forward(self, speed):
+        self.speed = float(max(-100, min(100, speed)))
+
+    def backward(self, speed):
+        self.speed = -float(max(-100, min(100, speed)))
+
+    def stop(self):
+        self.speed = 0.0
+
+    def set_dir_servo_angle(self, angle):
+        self.dir_angle = float(max(-MAX_STEER_DEG, min(MAX_STEER_DEG, angle)))
+
+    def set_cam_pan_angle(self, angle):
+        self.cam_pan = float(max(-CAM_PAN_MAX_DEG, min(CAM_PAN_MAX_DEG, angle)))
+
+    def set_cam_tilt_angle(self, angle):
+        self.cam_tilt = float(max(-CAM_TILT_MAX_DEG, min(CAM_TILT_MAX_DEG, angle)))
+
+    def dir_servo_calibrate(self, value):
+        self.dir_cali_val = float(value)
+
+    def cam_pan_servo_calibrate(self, value):
+        self.cam_pan_cali_val = float(value)
+
+    def cam_tilt_servo_calibrate(self, value):
+        self.cam_tilt_cali_val = float(value)
+
+    def get_distance(self):
+        """Ultrasonic reading in cm; -1 when nothing is in range (timeout)."""
+        self.distance_reads += 1
+        sx, sy = self.sensor_position()
+        hits = self.world.cast_rays(
+            sx, sy, self.heading + self._ray_offsets, ULTRASONIC_MAX_CM
+        )
+        d = float(hits.min())
+        if not math.isfinite(d):
+            return -1
+        if self.noise_cm > 0:
+            d = max(2.0, d + float(self._rng.normal(0.0, self.noise_cm)))
+        return round(d, 2)
+
+    def reset(self):
+        self.stop()
+        self.set_dir_servo_angle(0)
+        self.set_cam_pan_angle(0)
+        self.set_cam_tilt_angle(0)
+
+    def close(self):
+        self.stop()
+        self.closed = True
+
+    # ---- Simulation -------------------------------------------------------
+
+    def sensor_position(self):
+        return (
+            self.x + SENSOR_OFFSET_CM * math.cos(self.heading),
+            self.y + SENSOR_OFFSET_CM * math.sin(self.heading),
+        )
+
+    def step(self, dt):
+        """Advance the bicycle model by dt seconds."""
+        if self.speed == 0.0:
+            return
+        v = self.speed * CM_PER_SPEED_UNIT
+        steer = math.radians(self.dir_angle)
+        heading = wrap_angle(self.heading + v / WHEELBASE_CM * math.tan(steer) * dt)
+        nx = self.x + v * math.cos(heading) * dt
+        ny = self.y + v * math.sin(heading) * dt
+
+        if self.world.collides(nx, ny, CAR_RADIUS_CM):
+            # Bumper contact: the car stays put but the heading change from
+            # the steered wheels still applies, like pushing against a wall.
+            if not self.in_collision:
+                self.collisions += 1
+            self.in_collision = True
+            self.heading = heading
+            return
+
+        self.in_collision = False
+        self.odometer_cm += abs(v) * dt
+        self.x, self.y, self.heading = nx, ny, heading
+        self.max_x = max(self.max_x, nx)
+
+    def pose(self):
+        return self.x, self.y, math.degrees(self.heading)
+
+    def __repr__(self):
+        return (
+            f"<SimPicarx x={self.x:.1f} y={self.y:.1f} "
+            f"heading={math.degrees(self.heading):.1f}° speed={self.speed:.0f} "
+            f"steer={self.dir_angle:.0f}°>"
+        )
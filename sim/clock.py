@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+"""
+Simulated time for the headless simulator.
+
+SimClock owns "now" for a simulation run. Nothing advances on its own:
+`sleep()` (the scripts' time.sleep), camera frame waits and simulated
+inference cost move the clock forward, and the physics bodies are stepped
+in fixed substeps as it goes. Because no real sleeping happens, policies
+run as fast as the host CPU allows.
+
+`clock.time_module` is a drop-in for the `time` module that the harness
+swaps into a script's globals.
+"""
+
+import threading
+import time as _real_time
+
+
+class SimTimeUp(KeyboardInterrupt):
+    """
+    Raised once per thread when the simulated time budget runs out (a
+    script's worker thread may hit it before the main loop). Subclasses
+    KeyboardInterrupt so the scripts' existing Ctrl+C handling and
+    `finally:` cleanup run exactly as they would on the car.
+    """
+
+
+class SimClock:
+    def __init__(self, physics_dt=0.01, limit_s=None):
+        self.now = 0.0
+        self.physics_dt = float(physics_dt)
+        self.limit_s = limit_s
+        self.expired = False
+        self._told = set()  # threads that have had SimTimeUp
+
+        self._bodies = []
+        self._hooks = []
+        self._accum = 0.0
+
+        # Policy cost accounting: real seconds of work between two blocking
+        # calls (sleeps or camera frame waits)
+        self.sleeps = 0
+        self.step_wall_s = []
+        self._work_started = _real_time.perf_counter()
+        self._advance_wall = 0.0
+
+        self.time_module = _TimeModule(self)
+
+    # ---- Wiring -----------------------------------------------------------
+
+    def add_body(self, body):
+        """Anything with step(dt); stepped every physics substep."""
+        self._bodies.append(body)
+
+    def add_hook(self, fn):
+        """fn(now) called after every physics substep."""
+        self._hooks.append(fn)
+
+    # ---- Time -------------------------------------------------------------
+
+    def advance_to(self, t):
+        if self.expired:
+            self._time_up()
+            return
+        if self.limit_s is not None and t >= self.limit_s:
+            t = self.limit_s
+
+        t0 = _real_time.perf_counter()
+        self._accum += t - self.now
+        self.now = t
+        dt = self.physics_dt
+        while self._accum >= dt:
+            self._accum -= dt
+            for body in self._bodies:
+                body.step(dt)
+            for fn in self._hooks:
+                fn(self.now)
+        self._advance_wall += _real_time.perf_counter() - t0
+
+        if self.limit_s is not None and self.now >= self.limit_s:
+            self.expired = True
+            self._time_up()
+
+    def _time_up(self):
+        ident = threading.get_ident()
+        if ident not in self._told:
+            self._told.add(ident)
+            raise SimTimeUp()
+
+    def advance(self, dt):
+        self.advance_to(self.now + max(0.0, float(dt)))
+
+    def wait_until(self, t):
+        """A blocking call in the script: close the current work step, then advance."""
+        if not self.expired:
+            work = _real_time.perf_counter() - self._work_started - self._advance_wall
+            self.step_wall_s.append(work)
+        self._advance_wall = 0.0
+        try:
+            self.advance_to(max(self.now, t))
+        finally:
+            self._work_started = _real_time.perf_counter()
+            self._advance_wall = 0.0
+
+    def sleep(self, dt):
+        if not self.expired:
+            self.sleeps += 1
+        self.wait_until(self.now + max(0.0, float(dt)))
+
+
+class _TimeModule:
+    """Stands in for the `time` module inside a simulated script."""
+
+    def __init__(self, clock):
+        self._clock = clock
+        self._epoch = _real_time.time()
+
+    def sleep(self, secs):
+        self._clock.sleep(secs)
+
+    def time(self):
+        return self._epoch + self._clock.now
+
+    def monotonic(self):
+        return self._clock.now
+
+    perf_counter = monotonic
+
+    def time_ns(self):
+        return int(self.time() * 1e9)
+
+    def monotonic_ns(self):
+        return int(self._clock.now * 1e9)
+
+    perf_counter_ns = monotonic_ns
+
+    def __getattr__(self, name):
+        return getattr(_real_time, name)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+"""
+Run the repo's scripts headless against the simulator.
+
+A SimSession builds a world, a SimPicarx, a synthetic camera and a clock,
+then loads an unmodified script with `picarx`, `vilib`, `ultralytics`,
+`cv2` and `picamera2` replaced by simulator-backed stand-ins and its
+`time` module swapped for simulated time. The script's own `main()` runs
+until the simulated time budget is used up, which surfaces as a
+KeyboardInterrupt so the normal cleanup path runs.
+
+The swap replaces the `time` attribute of project modules, so a class that
+takes an optional clock reads it when constructed (`clock or
+time.monotonic`); a `clock=time.monotonic` default would keep real time.
+
+Example:
+    python3 sim/harness.py ultrasonic/collision_avoidance_fsm.py --seconds 120
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import math
+import os
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sim.camera import SimCamera, SimPicamera2, SimVideoCapture, SimYOLO, make_vilib
+from sim.car import SimPicarx
+from sim.clock import SimClock, SimTimeUp
+from sim.world import World
+
+# Scripts check that their weights file exists; SimYOLO ignores weights, so
+# any existing file will do.
+SIM_MODEL_PATH = os.path.abspath(__file__)
+SIM_DIR = os.path.dirname(SIM_MODEL_PATH) + os.sep
+
+
+class SimReport:
+    def __init__(self, script, session, wall_s):
+        clock = session.clock
+        car = session.car
+        steps = np.asarray(clock.step_wall_s or [0.0]) * 1000.0
+
+        self.script = script
+        self.sim_s = clock.now
+        self.wall_s = wall_s
+        self.speedup = clock.now / wall_s if wall_s > 0 else math.inf
+        # Sleep-paced loops count sleeps; camera-paced loops count frames
+        self.loops = clock.sleeps or session.camera.frames
+        self.loop_hz = self.loops / clock.now if clock.now > 0 else 0.0
+        self.step_ms_mean = float(steps.mean())
+        self.step_ms_p95 = float(np.percentile(steps, 95))
+        self.step_ms_max = float(steps.max())
+        self.collisions = car.collisions
+        self.odometer_cm = car.odometer_cm
+        self.max_x_cm = car.max_x
+        self.final_pose = car.pose()
+        self.distance_reads = car.distance_reads
+        self.frames = session.camera.frames
+        self.inferences = session.model.calls
+        self.goal_x = session.goal_x
+        self.traverse_s = session.goal_time
+
+    def summary(self):
+        x, y, hdg = self.final_pose
+        return "\n".join(
+            [
+                f"[sim] {self.script}",
+                f"  sim time     : {self.sim_s:8.1f} s   wall: {self.wall_s:6.2f} s   "
+                f"speedup: {self.speedup:6.1f}x",
+                f"  control loop : {self.loops} iterations ({self.loop_hz:.1f} Hz sim)",
+                f"  step cost    : mean {self.step_ms_mean:.3f} ms   "
+                f"p95 {self.step_ms_p95:.3f} ms   max {self.step_ms_max:.3f} ms",
+                f"  driving      : {self.odometer_cm:.0f} cm travelled, "
+                f"max x {self.max_x_cm:.0f} cm, {self.collisions} collisions",
+                f"  sensors      : {self.distance_reads} ultrasonic reads, "
+                f"{self.frames} frames, {self.inferences} inferences",
+                f"  final pose   : x={x:.1f} y={y:.1f} heading={hdg:.1f}°",
+            ]
+            + (
+                [
+                    f"  traverse     : x={self.goal_x:.0f} cm "
+                    + ("not reached" if self.traverse_s is None else f"at {self.traverse_s:.1f} s")
+                ]
+                if self.goal_x is not None
+                else []
+            )
+        )
+
+    def __repr__(self):
+        return (
+            f"<SimReport {self.script} sim={self.sim_s:.1f}s "
+            f"speedup={self.speedup:.1f}x collisions={self.collisions}>"
+        )
+
+
+class SimSession:
+    def __init__(
+        self,
+        world=None,
+        seconds=60.0,
+        fps=30.0,
+        infer_cost_s=0.12,
+        detect_interval_s=0.1,
+        physics_dt=0.01,
+        goal_x=None,
+        **car_kwargs,
+    ):
+        self.world = world if world is not None else World.obstacle_course()
+        self.clock = SimClock(physics_dt=physics_dt, limit_s=seconds)
+        self.car = SimPicarx(self.world, **car_kwargs)
+        self.clock.add_body(self.car)
+        self.camera = SimCamera(self.car, clock=self.clock)
+        self.fps = fps
+        self.model = SimYOLO(self.camera, clock=self.clock, infer_cost_s=infer_cost_s)
+        self.vilib = make_vilib(self.camera, clock=self.clock, detect_interval_s=detect_interval_s)
+
+        # Time-to-traverse: first time the car gets past goal_x
+        self.goal_x = goal_x
+        self.goal_time = None
+        if goal_x is not None:
+            self.clock.add_hook(self._check_goal)
+
+    def _check_goal(self, now):
+        if self.goal_time is None and self.car.x >= self.goal_x:
+            self.goal_time = now
+
+    # ---- Fake libraries ---------------------------------------------------
+
+    def fake_modules(self):
+        session = self
+
+        picarx = types.ModuleType("picarx")
+        picarx.Picarx = lambda *args, **kwargs: session.car
+
+        vilib = types.ModuleType("vilib")
+        vilib.Vilib = self.vilib
+
+        ultralytics = types.ModuleType("ultralytics")
+        ultralytics.YOLO = lambda *args, **kwargs: session.model
+
+        picamera2 = types.ModuleType("picamera2")
+        picamera2.Picamera2 = lambda *args, **kwargs: SimPicamera2(session.camera, session.fps)
+
+        return {
+            "picarx": picarx,
+            "vilib": vilib,
+            "ultralytics": ultralytics,
+            "picamera2": picamera2,
+            "cv2": _headless_cv2(lambda *args: SimVideoCapture(session.camera, session.fps)),
+        }
+
+    @contextlib.contextmanager
+    def installed(self, script_dir=None):
+        """
+        Temporarily install the fake libraries in sys.modules. Project
+        modules imported while installed (e.g. utils.picarx_wrapper) are
+        dropped again afterwards so they never keep a reference to a
+        finished session. A script's worker threads that end on SimTimeUp
+        do so quietly.
+        """
+        fakes = self.fake_modules()
+        saved = {name: sys.modules.get(name) for name in fakes}
+        project = {name: mod for name, mod in sys.modules.items() if _is_project_module(mod)}
+        for name in project:
+            del sys.modules[name]
+        sys.modules.update(fakes)
+        added_path = script_dir is not None and script_dir not in sys.path
+        if added_path:
+            sys.path.insert(0, script_dir)
+        excepthook = threading.excepthook
+
+        def quiet_time_up(args):
+            if not issubclass(args.exc_type, SimTimeUp):
+                excepthook(args)
+
+        threading.excepthook = quiet_time_up
+        try:
+            yield
+        finally:
+            threading.excepthook = excepthook
+            if added_path:
+                sys.path.remove(script_dir)
+            for name, mod in list(sys.modules.items()):
+                if _is_project_module(mod):
+                    del sys.modules[name]
+            for name, mod in saved.items():
+                if mod is None:
+                    sys.modules.pop(name, None)
+                else:
+                    sys.modules[name] = mod
+            sys.modules.update(project)
+
+    # ---- Running ----------------------------------------------------------
+
+    def load_script(self, path, overrides=None):
+        """Import a script under the fakes with simulated `time`."""
+        path = os.path.abspath(path)
+        name = "_sim_" + os.path.splitext(os.path.basename(path))[0]
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        # The script and any project modules it pulled in (e.g. the tracker's
+        # debug loop) all sleep on simulated time.
+        for mod in [module] + list(sys.modules.values()):
+            if _is_project_module(mod) and getattr(mod, "time", None) is time:
+                mod.time = self.clock.time_module
+        if hasattr(module, "MODEL_PATH") and not os.path.exists(module.MODEL_PATH):
+            module.MODEL_PATH = SIM_MODEL_PATH
+        for key, value in (overrides or {}).items():
+            setattr(module, key, value)
+        return module
+
+    def run_script(self, path, entry="main", overrides=None, quiet=True):
+        """Run `path`'s entry point until the time budget is spent."""
+        out = io.StringIO() if quiet else sys.stdout
+        t0 = time.perf_counter()
+        with self.installed(os.path.dirname(os.path.abspath(path))):
+            with contextlib.redirect_stdout(out):
+                module = self.load_script(path, overrides)
+                try:
+                    getattr(module, entry)()
+                except SimTimeUp:
+                    pass
+        return SimReport(os.path.relpath(path, ROOT), self, time.perf_counter() - t0)
+
+
+def _is_project_module(mod):
+    path = getattr(mod, "__file__", None) or ""
+    return path.startswith(ROOT + os.sep) and not path.startswith(SIM_DIR)
+
+
+def _headless_cv2(video_capture):
+    """cv2 with camera and GUI calls redirected; drawing falls through to real cv2."""
+    try:
+        import cv2 as real_cv2
+    except ImportError:
+        real_cv2 = None
+
+    cv2 = types.ModuleType("cv2")
+    cv2.VideoCapture = video_capture
+    cv2.imshow = lambda *args, **kwargs: None
+    cv2.namedWindow = lambda *args, **kwargs: None
+    cv2.waitKey = lambda *args, **kwargs: -1
+    cv2.destroyAllWindows = lambda *args, **kwargs: None
+    cv2.FONT_HERSHEY_SIMPLEX = 0
+    cv2.CAP_PROP_BUFFERSIZE = 38
+
+    def _getattr(name):
+        if real_cv2 is not None:
+            return getattr(real_cv2, name)
+        if name[:1].islower():
+            return lambda *args, **kwargs: None  # drawing helpers become no-ops
+        raise AttributeError(name)
+
+    cv2.__getattr__ = _getattr
+    return cv2
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a PiCar-X script in the simulator.")
+    parser.add_argument("script", help="path to the script, e.g. ultrasonic/collision_avoidance_fsm.py")
+    parser.add_argument("--seconds", type=float, default=60.0, help="simulated seconds to run")
+    parser.add_argument("--seed", type=int, default=0, help="obstacle course seed")
+    parser.add_argument("--empty", action="store_true", help="empty room instead of a course")
+    parser.add_argument("--infer-cost", type=float, default=0.12, help="simulated seconds per inference")
+    parser.add_argument("--fps", type=float, default=30.0, help="simulated camera frame rate")
+    parser.add_argument("--verbose", action="store_true", help="show the script's own output")
+    parser.add_argument("--goal-x", type=float, help="report when the car first gets past x (cm)")
+    args = parser.parse_args()
+
+    world = World.empty_room() if args.empty else World.obstacle_course(seed=args.seed)
+    session = SimSession(
+        world, seconds=args.seconds, fps=args.fps, infer_cost_s=args.infer_cost, goal_x=args.goal_x
+    )
+    report = session.run_script(args.script, quiet=not args.verbose)
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmarks with latency budgets for the per-tick hot functions.
+
+Runs on a plain Linux box: the scripts are loaded under the simulator's
+fake picarx, vilib and cv2 (sim/harness.py) and fed synthetic detections.
+Each case is timed in batches; its best per-call time (the least noisy
+statistic on a busy machine; the median is shown too) must stay
+
+  * under its budget (BUDGETS_US, the baseline file's "budgets_us", or
+    --budget NAME=US), and
+  * within (1 + tolerance) of the recorded baseline, when the baseline
+    was recorded on this machine (other machines only check budgets).
+
+Any miss is a regression and the run exits with status 1.
+
+Cases:
+    tracker_vilib_update   OpponentTracker.update_from_vilib_detections, a new list per call
+    tracker_bbox           OpponentTracker._update_from_bbox (linear bearing)
+    tracker_bbox_lens      the same with a calibrated lens (vision/camera_model.py tables)
+    obstacle_in_front      is_obstacle_in_front on 0-8 YOLO boxes
+    zone_update            the ultrasonic zone machine (classify_zone before utils/fsm.py)
+    teleop_key             handle_key in controls/keyboard_wasd_control_cd.py
+    bus_frame              a frame through utils/bus.py to the avoidance loop's subscribers
+
+    python3 sim/microbench.py                      # check against the baseline
+    python3 sim/microbench.py --record             # re-record it on this machine
+    python3 sim/microbench.py --budget tracker_bbox=20 --tolerance 0.25
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sim.camera import _Boxes
+from sim.harness import SimSession
+from sim.world import World
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "microbench_baseline.json")
+TOLERANCE = float(os.environ.get("PICARX_BENCH_TOLERANCE", "0.5"))
+# Per-call budgets, µs. Set at 10-20x a desktop core's time so they hold on
+# a Pi 4 (roughly 5-10x slower) and catch order-of-magnitude regressions;
+# the same-machine baseline catches the smaller ones
+BUDGETS_US = {
+    "tracker_vilib_update": 200.0,
+    "tracker_bbox": 60.0,
+    "tracker_bbox_lens": 60.0,
+    "obstacle_in_front": 150.0,
+    "zone_update": 60.0,
+    "teleop_key": 50.0,
+    "bus_frame": 60.0,
+}
+N_VARIANTS = 16  # distinct synthetic inputs cycled through per case
+
+
+def machine_id():
+    return f"{platform.node()} {platform.machine()} py{sys.version_info[0]}.{sys.version_info[1]}"
+
+
+# ---- Synthetic inputs ---------------------------------------------------------
+
+
+def synthetic_detections(rng, n, w=640, h=480):
+    """n Vilib-format detections with COCO classes and random boxes."""
+    dets = []
+    for _ in range(n):
+        x0, y0 = rng.uniform(0, w - 40), rng.uniform(0, h - 40)
+        dets.append({
+            "bbox": [x0, y0, x0 + rng.uniform(20, w / 2), y0 + rng.uniform(20, h / 2)],
+            "class_id": int(rng.choice([0, 1, 2, 3, 7, 41, 56])),
+            "score": float(rng.uniform(0.2, 0.95)),
+        })
+    return dets
+
+
+# ---- Cases --------------------------------------------------------------------
+# Each builder gets the loaded scripts, a seeded RNG and the fake Picarx and
+# returns a zero-argument callable (with an optional .close()); one call =
+# one tick's worth of the function under test.
+
+
+def case_tracker_vilib_update(scripts, rng, car):
+    tracking = scripts["tracking"]
+    tracker = tracking.OpponentTracker()
+    # Vilib assigns a new list per inference; cycling distinct lists keeps
+    # every call on the full update path
+    lists = [synthetic_detections(rng, int(rng.integers(1, 9))) for _ in range(N_VARIANTS)]
+    state = {"i": 0}
+
+    def run():
+        state["i"] = (state["i"] + 1) % N_VARIANTS
+        tracking.Vilib.object_detection_list_parameter = lists[state["i"]]
+        tracker.update_from_vilib_detections()
+
+    return run
+
+
+def case_tracker_bbox(scripts, rng, car, camera_model=None):
+    tracker = scripts["tracking"].OpponentTracker(camera_model=camera_model)
+    boxes = [d["bbox"] for d in synthetic_detections(rng, N_VARIANTS)]
+    state = {"i": 0}
+
+    def run():
+        state["i"] = (state["i"] + 1) % N_VARIANTS
+        xmin, ymin, xmax, ymax = boxes[state["i"]]
+        tracker._update_from_bbox(xmin, ymin, xmax, ymax, class_id=0, score=0.8, stamp=0.0)
+
+    return run
+
+
+def case_tracker_bbox_lens(scripts, rng, car):
+    from vision.camera_model import BENCH_MODEL, CameraModel
+
+    return case_tracker_bbox(scripts, rng, car, CameraModel(**BENCH_MODEL))
+
+
+def case_obstacle_in_front(scripts, rng, car):
+    is_obstacle_in_front = scripts["avoidance"].is_obstacle_in_front
+    boxes = [_Boxes(synthetic_detections(rng, i % 9)) for i in range(N_VARIANTS)]
+    state = {"i": 0}
+
+    def run():
+        state["i"] = (state["i"] + 1) % N_VARIANTS
+        is_obstacle_in_front(boxes[state["i"]], 640)
+
+    return run
+
+
+def case_zone_update(scripts, rng, car):
+    machine, _ = scripts["fsm"].build_machine(car)
+    # Readings around the SAFE/CAUTION threshold; DANGER would run the
+    # evasive maneuver, which sleeps
+    trace = rng.uniform(scripts["fsm"].CAUTION_DIST + 10.0, scripts["fsm"].SAFE_DIST + 20.0, 256)
+    state = {"i": 0, "now": 0.0}
+
+    def run():
+        state["i"] = (state["i"] + 1) % len(trace)
+        state["now"] += 0.05
+        machine.update({"dist": trace[state["i"]], "plan": None, "maneuver": False}, now=state["now"])
+
+    return run
+
+
+def case_teleop_key(scripts, rng, car):
+    teleop = scripts["teleop"]
+    from utils.status import StatusLine
+
+    # Started as in the script: key messages only queue for the render thread
+    status = StatusLine(stream=io.StringIO()).start()
+    keys = "wadsd wa"
+    state = {"i": 0, "motion": "stop", "steer": 0}
+
+    def run():
+        state["i"] = (state["i"] + 1) % len(keys)
+        state["motion"], state["steer"] = teleop.handle_key(
+            car, keys[state["i"]], teleop.DEFAULT_SPEED, state["steer"], state["motion"], status
+        )
+
+    run.close = status.close
+    return run
+
+
+def case_bus_frame(scripts, rng, car):
+    from utils.bus import Bus
+    from utils.metrics import Registry
+
+    # One publish, polled by the floor, detector and controller stages
+    bus = Bus(registry=Registry())
+    frames = bus.topic("frames", np.ndarray)
+    subs = [bus.subscribe("frames") for _ in range(3)]
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    def run():
+        frames.publish(frame)
+        for sub in subs:
+            sub.poll()
+
+    return run
+
+
+CASES = {
+    "tracker_vilib_update": case_tracker_vilib_update,
+    "tracker_bbox": case_tracker_bbox,
+    "tracker_bbox_lens": case_tracker_bbox_lens,
+    "obstacle_in_front": case_obstacle_in_front,
+    "zone_update": case_zone_update,
+    "teleop_key": case_teleop_key,
+    "bus_frame": case_bus_frame,
+}
+
+SCRIPTS = {
+    "tracking": "vision/opponent_tracking.py",
+    "avoidance": "aio/yolo_ultrasonic_avoidance.py",
+    "fsm": "ultrasonic/collision_avoidance_fsm.py",
+    "teleop": "controls/keyboard_wasd_control_cd.py",
+}
+
+
+# ---- Timing -------------------------------------------------------------------
+
+
+def time_call(fn, repeat=7, min_time_s=0.05):
+    """
+    Per-call seconds for each of `repeat` batches. The batch size doubles
+    until one batch takes min_time_s, so timer overhead is negligible.
+    """
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time_s:
+            break
+        number *= 2
+    batches = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        batches.append((time.perf_counter() - t0) / number)
+    return batches
+
+
+def run(cases=None, repeat=7, min_time_s=0.05, seed=0):
+    """Time each case; returns {name: {"best_us", "median_us"}}."""
+    names = list(cases or CASES)
+    session = SimSession(World.empty_room(), seconds=None)
+    results = {}
+    with session.installed():
+        scripts = {key: session.load_script(os.path.join(ROOT, path)) for key, path in SCRIPTS.items()}
+        for name in names:
+            fn = CASES[name](scripts, np.random.default_rng(seed), session.car)
+            try:
+                batches = time_call(fn, repeat, min_time_s)
+            finally:
+                getattr(fn, "close", lambda: None)()
+            results[name] = {
+                "median_us": statistics.median(batches) * 1e6,
+                "best_us": min(batches) * 1e6,
+            }
+    return results
+
+
+# ---- Budgets and baselines ----------------------------------------------------
+
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def record_baseline(results, path=BASELINE_PATH, budgets=None):
+    """Write results as this machine's baseline, keeping the file's budgets."""
+    limits = dict(load_baseline(path).get("budgets_us", BUDGETS_US))
+    limits.update(budgets or {})
+    baseline = {
+        "machine": machine_id(),
+        "baseline_us": {name: round(r["best_us"], 3) for name, r in results.items()},
+        "budgets_us": limits,
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return baseline
+
+
+def check(results, baseline=None, budgets=None, tolerance=TOLERANCE, machine=None):
+    """
+    Compare results with budgets and (same machine only) the baseline.
+    Returns (rows, failures); a row is (name, best_us, median_us,
+    budget_us, baseline_us or None, verdict).
+    """
+    baseline = baseline or {}
+    limits = dict(BUDGETS_US)
+    limits.update(baseline.get("budgets_us", {}))
+    limits.update(budgets or {})
+    same_machine = baseline.get("machine") == (machine or machine_id())
+    recorded = baseline.get("baseline_us", {}) if same_machine else {}
+
+    rows, failures = [], []
+    for name, r in results.items():
+        best = r["best_us"]
+        budget = limits.get(name)
+        base = recorded.get(name)
+        verdict = "ok"
+        if budget is not None and best > budget:
+            verdict = f"OVER BUDGET ({best / budget:.1f}x)"
+        elif base is not None and best > base * (1.0 + tolerance):
+            verdict = f"REGRESSED (+{(best / base - 1.0) * 100.0:.0f}%)"
+        if verdict != "ok":
+            failures.append(name)
+        rows.append((name, best, r["median_us"], budget, base, verdict))
+    return rows, failures
+
+
+def format_rows(rows):
+    lines = [f"{'case':22s} {'best µs':>9s} {'median µs':>10s} {'budget µs':>10s} {'baseline µs':>12s}  verdict"]
+    for name, best, median, budget, base, verdict in rows:
+        budget_s = f"{budget:10.1f}" if budget is not None else f"{'-':>10s}"
+        base_s = f"{base:12.2f}" if base is not None else f"{'-':>12s}"
+        lines.append(f"{name:22s} {best:9.2f} {median:10.2f} {budget_s} {base_s}  {verdict}")
+    return "\n".join(lines)
+
+
+def parse_budget(text):
+    name, _, value = text.partition("=")
+    if name not in CASES or not value:
+        raise argparse.ArgumentTypeError(f"expected NAME=US with NAME one of {', '.join(CASES)}")
+    return name, float(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hot-function micro-benchmarks with latency budgets.")
+    parser.add_argument("cases", nargs="*", help=f"cases to run (default all): {', '.join(CASES)}")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument("--record", action="store_true", help="write this run as the baseline")
+    parser.add_argument("--budget", type=parse_budget, action="append", default=[],
+                        help="override a budget, NAME=US (repeatable)")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="allowed slowdown over the baseline (0.5 = +50%%)")
+    parser.add_argument("--repeat", type=int, default=7, help="timed batches per case")
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per batch")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.cases if name not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    results = run(args.cases or None, repeat=args.repeat, min_time_s=args.min_time)
+    budgets = dict(args.budget)
+    if args.record:
+        record_baseline(results, args.baseline, budgets)
+        print(f"Recorded baseline for {machine_id()} in {args.baseline}")
+    rows, failures = check(results, load_baseline(args.baseline), budgets, args.tolerance)
+    print(format_rows(rows))
+    if failures:
+        print(f"FAIL: {', '.join(failures)}")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import json
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sim import microbench
+
+
+@pytest.fixture(scope="module")
+def results():
+    return microbench.run(repeat=2, min_time_s=0.001)
+
+
+def test_every_case_runs_without_pi_packages(results):
+    assert set(results) == set(microbench.CASES)
+    for r in results.values():
+        assert 0 < r["best_us"] <= r["median_us"]
+
+
+def test_budgets_fail_the_run(results):
+    rows, failures = microbench.check(results, budgets={"teleop_key": 1e-6})
+    assert failures == ["teleop_key"]
+    assert [row[-1] for row in rows if row[0] == "teleop_key"][0].startswith("OVER BUDGET")
+
+
+def test_baseline_regressions_only_count_on_the_same_machine(results):
+    baseline = {"machine": "pi", "baseline_us": {name: 1e-6 for name in results}}
+    assert microbench.check(results, baseline, budgets={}, machine="pi")[1] == list(results)
+    assert microbench.check(results, baseline, budgets={}, machine="laptop")[1] == []
+
+
+def test_record_keeps_the_budgets(results, tmp_path):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"budgets_us": {"tracker_bbox": 7.0}}))
+    microbench.record_baseline(results, str(path), budgets={"zone_update": 9.0})
+    saved = json.loads(path.read_text())
+    assert saved["machine"] == microbench.machine_id()
+    assert saved["budgets_us"] == {"tracker_bbox": 7.0, "zone_update": 9.0}
+    assert saved["baseline_us"]["teleop_key"] == round(results["teleop_key"]["best_us"], 3)
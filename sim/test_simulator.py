@@ -0,0 +1,96 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sim.car import SimPicarx
+from sim.harness import SimSession
+from sim.world import CLASS_PERSON, World
+
+
+def test_ultrasonic_sees_wall_ahead():
+    world = World.empty_room(400, 300)
+    car = SimPicarx(world, x=100, y=150)
+    # Sensor is 10 cm ahead of the car origin, far wall at x=400
+    assert car.get_distance() == pytest.approx(290.0, abs=0.5)
+
+
+def test_ray_cast_hits_nearest_circle():
+    world = World(walls=False)
+    world.add_circle(100, 0, 10)
+    world.add_circle(50, 0, 5)
+    d = world.cast_rays(0, 0, [0.0, np.pi], 1000)
+    assert d[0] == pytest.approx(45.0)
+    assert np.isinf(d[1])
+
+
+def test_car_stops_at_obstacle_and_counts_collision():
+    world = World.empty_room(400, 300)
+    car = SimPicarx(world, x=350, y=150)
+    car.forward(50)
+    for _ in range(500):
+        car.step(0.01)
+    assert car.collisions == 1
+    assert car.x < 400 - 9.0
+
+
+def test_camera_reports_person_ahead():
+    world = World(walls=False)
+    world.add_circle(200, 150, 12, height=60, class_id=CLASS_PERSON)
+    session = SimSession(world, seconds=1.0, x=40, y=150)
+    dets = session.camera.detections()
+    assert len(dets) == 1
+    xmin, _, xmax, _ = dets[0]["bbox"]
+    assert xmin < 320 < xmax
+    assert dets[0]["class_id"] == CLASS_PERSON
+
+
+def test_fsm_script_runs_faster_than_real_time():
+    session = SimSession(World.obstacle_course(seed=1), seconds=20.0)
+    report = session.run_script(os.path.join(ROOT, "ultrasonic", "collision_avoidance_fsm.py"))
+    assert report.sim_s == pytest.approx(20.0)
+    assert report.loops > 100
+    assert report.speedup > 10
+    assert session.car.closed is False  # FSM script only stops, never closes
+    assert session.car.speed == 0
+
+
+def test_reports_time_to_traverse():
+    session = SimSession(World.empty_room(400, 300), seconds=10.0, goal_x=100)
+    report = session.run_script(os.path.join(ROOT, "ultrasonic", "collision_avoidance_fsm.py"))
+    # FAST_SPEED 15 ~= 9 cm/s from x=40
+    assert report.traverse_s == pytest.approx(60.0 / 9.0, abs=0.5)
+
+
+class LaggingRanges:
+    """The script's PX, with every ultrasonic sample a second old when read."""
+
+    def __init__(self):
+        from utils.freshness import Stamped
+        from utils.picarx_wrapper import PX
+
+        self.car = PX()
+        self._stamped = Stamped
+
+    def get_distance_sample(self):
+        sample = self.car.get_distance_sample()
+        return self._stamped(sample.value, sample.t - 1.0)
+
+    def __getattr__(self, name):
+        return getattr(self.car, name)
+
+
+def test_avoidance_does_not_cruise_on_stale_ranges():
+    session = SimSession(World.empty_room(400, 300), seconds=5.0)
+    report = session.run_script(
+        os.path.join(ROOT, "aio", "yolo_ultrasonic_avoidance.py"), overrides={"PX": LaggingRanges}
+    )
+    assert report.loops > 20
+    assert report.odometer_cm == pytest.approx(0.0, abs=1.0)
+    assert session.car.speed == 0
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+"""
+2D world for the headless PiCar-X simulator.
+
+Everything is in centimetres and degrees, matching the units the real
+scripts use (ultrasonic cm, servo degrees). Coordinates follow screen
+convention (y grows downwards) so that a positive heading change is a
+right turn, like a positive steering angle on the car. Obstacles are either circles
+(posts, people, other cars) or wall segments. Ray casting is vectorized in
+NumPy over all rays x all obstacles in one shot so the ultrasonic cone can
+be sampled every simulated tick without dominating run time.
+"""
+
+import math
+
+import numpy as np
+
+# COCO ids used by the synthetic detector (see vision/opponent_tracking.py)
+CLASS_PERSON = 0
+CLASS_CAR = 2
+CLASS_NONE = -1  # walls / boxes: seen by ultrasonic, not by YOLO
+
+
+class World:
+    def __init__(self, width_cm=400.0, height_cm=300.0, walls=True):
+        self.width = float(width_cm)
+        self.height = float(height_cm)
+
+        # Circles: (x, y, r, height, class_id)
+        self._circles = np.zeros((0, 5), dtype=np.float64)
+        # Segments: (x1, y1, x2, y2, height)
+        self._segments = np.zeros((0, 5), dtype=np.float64)
+
+        if walls:
+            w, h = self.width, self.height
+            self.add_wall(0, 0, w, 0)
+            self.add_wall(w, 0, w, h)
+            self.add_wall(w, h, 0, h)
+            self.add_wall(0, h, 0, 0)
+
+    # ---- Building ---------------------------------------------------------
+
+    def add_circle(self, x, y, r, height=30.0, class_id=CLASS_NONE):
+        row = np.array([[x, y, r, height, class_id]], dtype=np.float64)
+        self._circles = np.vstack([self._circles, row])
+
+    def add_wall(self, x1, y1, x2, y2, height=30.0):
+        row = np.array([[x1, y1, x2, y2, height]], dtype=np.float64)
+        self._segments = np.vstack([self._segments, row])
+
+    def add_box(self, x, y, w, h, height=20.0):
+        """Axis-aligned box made of four wall segments."""
+        self.add_wall(x, y, x + w, y, height)
+        self.add_wall(x + w, y, x + w, y + h, height)
+        self.add_wall(x + w, y + h, x, y + h, height)
+        self.add_wall(x, y + h, x, y, height)
+
+    @property
+    def circles(self):
+        return self._circles
+
+    @property
+    def segments(self):
+        return self._segments
+
+    # ---- Queries ----------------------------------------------------------
+
+    def cast_rays(self, ox, oy, angles_rad, max_range, with_info=False):
+        """
+        Cast rays from (ox, oy) along world-frame angles.
+        Returns an array of hit distances (np.inf where nothing is hit
+        within max_range). With with_info=True also returns the height and
+        class id of whatever each ray hit (0 / CLASS_NONE on a miss).
+        """
+        angles = np.asarray(angles_rad, dtype=np.float64)
+        dx = np.cos(angles)[:, None]
+        dy = np.sin(angles)[:, None]
+        parts = []
+
+        c = self._circles
+        if len(c):
+            # |o + t*d - c|^2 = r^2 with |d| = 1
+            fx = (ox - c[:, 0])[None, :]
+            fy = (oy - c[:, 1])[None, :]
+            b = fx * dx + fy * dy
+            cc = fx * fx + fy * fy - (c[:, 2] ** 2)[None, :]
+            disc = b * b - cc
+            with np.errstate(invalid="ignore"):
+                sq = np.sqrt(np.where(disc >= 0, disc, np.nan))
+            t = -b - sq
+            t = np.where(t < 0, -b + sq, t)  # origin inside circle
+            parts.append(np.where((t >= 0) & ~np.isnan(t), t, np.inf))
+
+        s = self._segments
+        if len(s):
+            ex = (s[:, 2] - s[:, 0])[None, :]
+            ey = (s[:, 3] - s[:, 1])[None, :]
+            wx = (s[:, 0] - ox)[None, :]
+            wy = (s[:, 1] - oy)[None, :]
+            denom = dx * ey - dy * ex
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = (wx * ey - wy * ex) / denom
+                u = (wx * dy - wy * dx) / denom
+            hit = (np.abs(denom) > 1e-12) & (t >= 0) & (u >= 0) & (u <= 1)
+            parts.append(np.where(hit, t, np.inf))
+
+        if not parts:
+            best = np.full(angles.shape, np.inf)
+            if with_info:
+                return best, np.zeros(angles.shape), np.full(angles.shape, CLASS_NONE)
+            return best
+
+        t = np.concatenate(parts, axis=1) if len(parts) > 1 else parts[0]
+        idx = t.argmin(axis=1)
+        best = t[np.arange(len(angles)), idx]
+        miss = best > max_range
+        best[miss] = np.inf
+        if not with_info:
+            return best
+
+        heights = np.concatenate([c[:, 3], s[:, 4]])[idx]
+        classes = np.concatenate([c[:, 4], np.full(len(s), CLASS_NONE)])[idx]
+        heights[miss] = 0.0
+        classes[miss] = CLASS_NONE
+        return best, heights, classes.astype(np.int64)
+
+    def collides(self, x, y, radius):
+        """True if a disc of `radius` at (x, y) overlaps any obstacle."""
+        c = self._circles
+        if len(c):
+            d2 = (c[:, 0] - x) ** 2 + (c[:, 1] - y) ** 2
+            if np.any(d2 < (c[:, 2] + radius) ** 2):
+                return True
+
+        s = self._segments
+        if len(s):
+            ex = s[:, 2] - s[:, 0]
+            ey = s[:, 3] - s[:, 1]
+            len2 = np.maximum(ex * ex + ey * ey, 1e-12)
+            u = np.clip(((x - s[:, 0]) * ex + (y - s[:, 1]) * ey) / len2, 0.0, 1.0)
+            px = s[:, 0] + u * ex - x
+            py = s[:, 1] + u * ey - y
+            if np.any(px * px + py * py < radius * radius):
+                return True
+
+        return False
+
+    # ---- Presets ----------------------------------------------------------
+
+    @classmethod
+    def empty_room(cls, width_cm=400.0, height_cm=300.0):
+        return cls(width_cm, height_cm)
+
+    @classmethod
+    def obstacle_course(
+        cls, seed=0, n_posts=8, n_boxes=2, n_people=2, width_cm=600.0, height_cm=300.0
+    ):
+        """
+        Random-but-reproducible course: posts and boxes scattered between the
+        start area (left) and the far wall, plus a few "people" that the
+        synthetic camera reports as detections.
+        """
+        rng = np.random.default_rng(seed)
+        world = cls(width_cm, height_cm)
+        margin = 40.0
+        for _ in range(n_posts):
+            x = rng.uniform(120.0, width_cm - margin)
+            y = rng.uniform(margin, height_cm - margin)
+            world.add_circle(x, y, rng.uniform(6.0, 15.0), height=25.0)
+        for _ in range(n_boxes):
+            x = rng.uniform(150.0, width_cm - margin - 40.0)
+            y = rng.uniform(margin, height_cm - margin - 30.0)
+            world.add_box(x, y, rng.uniform(20.0, 40.0), rng.uniform(15.0, 30.0))
+        for _ in range(n_people):
+            x = rng.uniform(150.0, width_cm - margin)
+            y = rng.uniform(margin, height_cm - margin)
+            world.add_circle(x, y, 12.0, height=60.0, class_id=CLASS_PERSON)
+        return world
+
+    def __repr__(self):
+        return (
+            f"<World {self.width:.0f}x{self.height:.0f}cm "
+            f"circles={len(self._circles)} segments={len(self._segments)}>"
+        )
+
+
+def wrap_angle(a):
+    """Wrap radians to [-pi, pi)."""
+    return (a + math.pi) % (2.0 * math.pi) - math.pi
@@ -1,15 +1,32 @@
 #!/usr/bin/env python3
+import os
+import sys
 import time
+from enum import Enum
 from picarx import Picarx
 
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.fsm import ANY, LatchedDrive, State, StateMachine, Transition, above, below
+from utils.recorder import FLAG_MANEUVER, open_session
+from utils.status import StatusLine
+
 px = Picarx()
 
 SAFE_DIST = 40.0  # cm
 DANGER_DIST = 20.0  # cm
+HYSTERESIS_CM = 5.0  # a band is left this far past its threshold
+MIN_DWELL_S = 0.3  # minimum time cruising/slow before changing band
 
 FORWARD_SPEED = 10  # small, safe values; adjust later
 SLOW_SPEED = 5
 
+# Binary session recording (utils/recorder.py); None disables it
+RECORD_DIR = os.environ.get("PICARX_RECORD_DIR")
+
 
 def get_distance_cm():
     d = px.get_distance()
@@ -18,32 +35,81 @@ def get_distance_cm():
     return float(d)
 
 
+class Zone(Enum):
+    CRUISE = 0
+    SLOW = 1
+    REVERSE = 2
+
+
+def build_machine(robot):
+    """
+    The three distance bands on utils/fsm.py. Cruise and slow set the
+    speed once on entry; a band is left HYSTERESIS_CM past its threshold
+    (and after MIN_DWELL_S), the reverse pulse starts at once.
+    Returns (machine, drive).
+    """
+    drive = LatchedDrive(robot)
+
+    def reverse_pulse(ctx):
+        # Immediate stop & small reverse pulse
+        drive.set(0)
+        time.sleep(0.1)
+        drive.set(-SLOW_SPEED)
+        time.sleep(0.3)
+        drive.set(0)
+        ctx["maneuver"] = True
+
+    machine = StateMachine(
+        "basic",
+        states={
+            # All clear: normal slow cruising
+            Zone.CRUISE: State(on_enter=lambda ctx: drive.set(FORWARD_SPEED), min_dwell_s=MIN_DWELL_S),
+            # Caution zone: move slowly
+            Zone.SLOW: State(on_enter=lambda ctx: drive.set(SLOW_SPEED), min_dwell_s=MIN_DWELL_S),
+            Zone.REVERSE: State(on_tick=reverse_pulse),
+        },
+        transitions=[
+            Transition(ANY, Zone.REVERSE, below("dist", DANGER_DIST), min_dwell_s=0.0),
+            Transition(Zone.CRUISE, Zone.SLOW, below("dist", SAFE_DIST)),
+            Transition(Zone.SLOW, Zone.CRUISE, above("dist", SAFE_DIST + HYSTERESIS_CM)),
+            Transition(Zone.REVERSE, Zone.SLOW, above("dist", DANGER_DIST + HYSTERESIS_CM)),
+        ],
+        initial=Zone.CRUISE,
+    )
+    return machine, drive
+
+
 def main():
     print("Starting basic collision avoidance. Ctrl+C to stop.")
+    rec = open_session(RECORD_DIR)
+    machine, drive = build_machine(px)
+    status = StatusLine("Distance: {dist:6.1f} cm").start()
     try:
         while True:
+            loop_start = time.monotonic()
             dist = get_distance_cm()
-            print(f"Distance: {dist:6.1f} cm", end="\r")
-
-            if dist < DANGER_DIST:
-                # Immediate stop & small reverse pulse
-                px.stop()
-                time.sleep(0.1)
-                px.backward(SLOW_SPEED)
-                time.sleep(0.3)
-                px.stop()
-            elif dist < SAFE_DIST:
-                # Caution zone: move slowly
-                px.forward(SLOW_SPEED)
-            else:
-                # All clear: normal slow cruising
-                px.forward(FORWARD_SPEED)
+            status.set(dist=dist)
+
+            ctx = {"dist": dist, "maneuver": False}
+            state = machine.update(ctx)
+
+            rec.record(
+                dist_cm=dist,
+                speed=-SLOW_SPEED if ctx["maneuver"] else drive.speed,
+                loop_ms=(time.monotonic() - loop_start) * 1000.0,
+                state=state.value,
+                flags=FLAG_MANEUVER if ctx["maneuver"] else 0,
+                t=loop_start,
+            )
 
             time.sleep(0.05)
 
     except KeyboardInterrupt:
-        print("\nStopping.")
+        status.event("Stopping.")
     finally:
+        status.close()
+        print(machine.report())
+        rec.close()
         px.stop()
 
 
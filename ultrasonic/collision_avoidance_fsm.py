@@ -1,9 +1,21 @@
 #!/usr/bin/env python3
 # Finite State Machine based collision avoidance for PiCar-X using ultrasonic sensor (reflex agent)
+import os
+import sys
 import time
 from enum import Enum
 from picarx import Picarx
 
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.arc_planner import ArcPlanner
+from utils.fsm import ANY, LatchedDrive, State, StateMachine, Transition, above, below
+from utils.recorder import FLAG_MANEUVER, open_session
+from utils.status import StatusLine
+
 px = Picarx()
 
 
@@ -15,11 +27,22 @@ class Zone(Enum):
 
 SAFE_DIST = 50.0  # cm
 CAUTION_DIST = 30.0  # cm
+HYSTERESIS_CM = 5.0  # a zone is left this far past its threshold
+MIN_DWELL_S = 0.3  # minimum time in SAFE/CAUTION before changing zone
 
 FAST_SPEED = 15
 SLOW_SPEED = 8
 TURN_SPEED = 10
 
+# Binary session recording (utils/recorder.py); None disables it
+RECORD_DIR = os.environ.get("PICARX_RECORD_DIR")
+
+# Steering: "fixed" is a left bias in CAUTION and a right turn in DANGER;
+# "arc" picks it with utils/arc_planner.py every tick. With only the narrow
+# ultrasonic cone to go on, arc is no better than fixed in sim/harness.py,
+# so it is opt-in here (aio/yolo_ultrasonic_avoidance.py uses it by default)
+PLANNER = os.environ.get("PICARX_PLANNER", "fixed")
+
 
 def get_distance_cm():
     d = px.get_distance()
@@ -28,58 +51,116 @@ def get_distance_cm():
     return float(d)
 
 
-def classify_zone(dist: float) -> Zone:
-    if dist < CAUTION_DIST:
-        return Zone.DANGER
-    elif dist < SAFE_DIST:
-        return Zone.CAUTION
-    else:
-        return Zone.SAFE
+def build_machine(robot, planner=None):
+    """
+    The zone behavior on utils/fsm.py. Entering a zone sets the speed once;
+    leaving SAFE/CAUTION takes HYSTERESIS_CM past the threshold and
+    MIN_DWELL_S in the zone, DANGER is entered at once.
+    Returns (machine, drive).
+    """
+    drive = LatchedDrive(robot, on_command=planner.command if planner is not None else None)
+    drive.set(0, 0)
+
+    def steer_for(ctx, default):
+        plan = ctx.get("plan")
+        return plan.steer if plan is not None and not plan.blocked else default
+
+    def cruise(speed, default_steer):
+        # Speed once on entry; with the planner the steering follows it
+        # every tick (LatchedDrive skips unchanged angles)
+        def on_enter(ctx):
+            drive.set(speed, steer_for(ctx, default_steer))
+
+        def on_tick(ctx):
+            if ctx.get("plan") is not None:
+                drive.set(speed, steer_for(ctx, drive.steer))
+
+        return on_enter, on_tick
+
+    def evade(ctx):
+        # Stop and execute an evasive maneuver
+        drive.set(0)
+        time.sleep(0.1)
+
+        # Back up a bit, wheels turned away from the side the planner found
+        # free so the nose swings towards it
+        plan = ctx.get("plan")
+        turn = 30
+        if plan is not None:
+            turn = -plan.steer if plan.blocked else plan.steer
+            turn = turn or 30
+        drive.set(-SLOW_SPEED, -turn if plan is not None else drive.steer)
+        time.sleep(0.4)
+        drive.set(0, 0)
+
+        # Turn a bit to find a new heading (the planner picks the new
+        # heading itself on the next ticks)
+        if plan is None:
+            drive.set(TURN_SPEED, turn)
+            time.sleep(0.4)
+            drive.set(0, 0)
+        ctx["maneuver"] = True
+
+    # SAFE drives straight; CAUTION biases left to "search"
+    # for free space unless the planner picks a side
+    safe_enter, safe_tick = cruise(FAST_SPEED, 0)
+    caution_enter, caution_tick = cruise(SLOW_SPEED, -10)
+    machine = StateMachine(
+        "fsm",
+        states={
+            Zone.SAFE: State(on_enter=safe_enter, on_tick=safe_tick, min_dwell_s=MIN_DWELL_S),
+            Zone.CAUTION: State(on_enter=caution_enter, on_tick=caution_tick, min_dwell_s=MIN_DWELL_S),
+            Zone.DANGER: State(on_tick=evade),
+        },
+        transitions=[
+            Transition(ANY, Zone.DANGER, below("dist", CAUTION_DIST), min_dwell_s=0.0),
+            Transition(Zone.SAFE, Zone.CAUTION, below("dist", SAFE_DIST)),
+            Transition(Zone.CAUTION, Zone.SAFE, above("dist", SAFE_DIST + HYSTERESIS_CM)),
+            Transition(Zone.DANGER, Zone.CAUTION, above("dist", CAUTION_DIST + HYSTERESIS_CM)),
+        ],
+        initial=Zone.SAFE,
+    )
+    return machine, drive
 
 
 def main():
     print("Starting FSM-based collision avoidance. Ctrl+C to stop.")
-    state = Zone.SAFE
+    rec = open_session(RECORD_DIR)
+    planner = ArcPlanner(speeds=(SLOW_SPEED, FAST_SPEED)) if PLANNER == "arc" else None
+    machine, drive = build_machine(px, planner)
+    status = StatusLine("Dist: {dist:6.1f} cm | State: {state:7}").start()
 
     try:
         while True:
+            loop_start = time.monotonic()
             dist = get_distance_cm()
-            state = classify_zone(dist)
-            print(f"Dist: {dist:6.1f} cm | State: {state.name:7}", end="\r")
-
-            if state == Zone.SAFE:
-                # Drive forward at normal speed
-                px.forward(FAST_SPEED)
-
-            elif state == Zone.CAUTION:
-                # Slow down and maybe veer a bit
-                px.forward(SLOW_SPEED)
-                # Tiny steering bias to the left to "search" for free space
-                px.set_dir_servo_angle(-10)
-
-            elif state == Zone.DANGER:
-                # Stop and execute an evasive maneuver
-                px.stop()
-                time.sleep(0.1)
-
-                # Back up a bit
-                px.backward(SLOW_SPEED)
-                time.sleep(0.4)
-                px.stop()
-
-                # Turn in place a bit to find a new heading
-                px.set_dir_servo_angle(30)  # right turn
-                px.forward(TURN_SPEED)
-                time.sleep(0.4)
-                px.stop()
-                # Center steering again
-                px.set_dir_servo_angle(0)
+            plan = None
+            if planner is not None:
+                planner.observe_ultrasonic(dist)
+                plan = planner.plan()
+
+            ctx = {"dist": dist, "plan": plan, "maneuver": False}
+            state = machine.update(ctx)
+            status.set(dist=dist, state=state.name)
+
+            rec.record(
+                dist_cm=dist,
+                speed=-SLOW_SPEED if ctx["maneuver"] else drive.speed,
+                steer=drive.steer or 0,
+                loop_ms=(time.monotonic() - loop_start) * 1000.0,
+                state=state.value,
+                flags=FLAG_MANEUVER if ctx["maneuver"] else 0,
+                t=loop_start,
+            )
 
             time.sleep(0.05)
 
     except KeyboardInterrupt:
-        print("\nStopping.")
+        status.event("Stopping.")
     finally:
+        status.close()
+        print(machine.report())
+        rec.close()
         px.stop()
         px.set_dir_servo_angle(0)
 
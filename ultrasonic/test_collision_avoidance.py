@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sim.harness import SimSession
+from sim.world import World
+from utils.test_fsm import CountingRobot, hovering
+
+
+def load(name):
+    """Import an avoidance script under the simulator's fake picarx."""
+    session = SimSession(World.empty_room(), seconds=100.0)
+    path = os.path.join(ROOT, "ultrasonic", name)
+    with session.installed(os.path.dirname(path)):
+        return session.load_script(path)
+
+
+def run(machine, trace, dt=0.05):
+    states = []
+    for i, dist in enumerate(trace):
+        states.append(machine.update({"dist": dist, "plan": None, "maneuver": False}, now=i * dt))
+    return states
+
+
+def test_fsm_reading_hovering_at_safe_dist_does_not_chatter():
+    fsm = load("collision_avoidance_fsm.py")
+    robot = CountingRobot()
+    machine, drive = fsm.build_machine(robot)
+    states = run(machine, [80.0] * 10 + hovering(fsm.SAFE_DIST))
+    assert states[-1] is fsm.Zone.CAUTION and machine.transitions == 1
+    # Centre, stop, cruise; then slow with the left bias
+    assert robot.calls == [("steer", 0), ("stop",), ("forward", fsm.FAST_SPEED),
+                           ("steer", -10), ("forward", fsm.SLOW_SPEED)]
+
+
+def test_fsm_danger_repeats_the_maneuver_until_clear():
+    fsm = load("collision_avoidance_fsm.py")
+    robot = CountingRobot()
+    machine, drive = fsm.build_machine(robot)
+    trace = [80.0] * 5 + [20.0] * 3 + [fsm.CAUTION_DIST + 1.0] * 3 + [80.0] * 20
+    states = run(machine, trace)
+    assert states[5:11] == [fsm.Zone.DANGER] * 6  # not clear until HYSTERESIS_CM past
+    assert states[-1] is fsm.Zone.SAFE
+    assert robot.calls.count(("backward", fsm.SLOW_SPEED)) == 6
+    assert machine.transitions == 3
+
+
+def test_basic_reading_hovering_at_danger_dist():
+    basic = load("collision_avoidance_basic.py")
+    robot = CountingRobot()
+    machine, drive = basic.build_machine(robot)
+    # One reverse pulse, then the jitter around DANGER_DIST + 1 stays slow
+    trace = [80.0] * 5 + [basic.DANGER_DIST - 1.0] + hovering(basic.DANGER_DIST + 3.0, 1.0, 100)
+    states = run(machine, trace)
+    assert machine.transitions == 1
+    assert states[-1] is basic.Zone.REVERSE
+    trace = [basic.DANGER_DIST + basic.HYSTERESIS_CM + 1.0] * 20
+    states = run(machine, trace)
+    assert states[-1] is basic.Zone.SLOW
+    assert machine.stats()[basic.Zone.REVERSE].entries == 1
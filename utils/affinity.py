@@ -0,0 +1,286 @@
+"""CPU core affinity and thread budgets for the vision stack.
+
+On a 4-core Pi, torch's intra-op pool, OpenCV's pool, Vilib's threads and
+the control loop all compete for the same cores, and control-loop jitter
+spikes whenever inference runs. A CpuPlan gives each role its own cores:
+
+    layout    control  capture  inference   (4 cores)
+    shared    0-3      0-3      0-3         (thread budget only)
+    control   0        1-3      1-3
+    split     0        1        2-3
+    paired    0        0        1-3
+
+setup() restricts torch / OpenCV / BLAS / onnxruntime to as many threads
+as the inference role has cores. pin_thread(role) then moves the calling
+thread onto its cores. Threads inherit the mask of the thread that creates
+them, so pin before starting worker pools (e.g. before the first predict()).
+pin_thread("control") also raises the thread's priority when
+PICARX_CONTROL_PRIORITY is set ("fifo" for SCHED_FIFO, or a negative nice
+value such as "-10"; both need root or CAP_SYS_NICE).
+
+Opt-in from the environment, like the other PICARX_* switches:
+    PICARX_CPU_LAYOUT=split python3 aio/yolo_ultrasonic_avoidance.py
+
+Pick a layout by measuring it:
+    python3 utils/affinity.py --bench [--model yolov8n.pt] [--seconds 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+CPU_LAYOUT = os.environ.get("PICARX_CPU_LAYOUT")  # None = leave scheduling alone
+CONTROL_PRIORITY = os.environ.get("PICARX_CONTROL_PRIORITY")
+ROLES = ("control", "capture", "inference")
+LAYOUTS = ("shared", "control", "split", "paired")
+
+# Thread-count variables read by OpenMP / BLAS / torch at import time
+_THREAD_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def make_layout(name, cpus=None):
+    """Map each role to a set of CPUs for the named layout."""
+    cpus = list(cpus if cpus is not None else available_cpus())
+    if name not in LAYOUTS:
+        raise ValueError(f"unknown layout {name!r}; choose from {', '.join(LAYOUTS)}")
+    first, rest = set(cpus[:1]), set(cpus[1:])
+    if name == "shared" or not rest:
+        return {role: set(cpus) for role in ROLES}
+    if name == "control":
+        return {"control": first, "capture": rest, "inference": rest}
+    if name == "split" and len(cpus) >= 3:
+        return {"control": first, "capture": set(cpus[1:2]), "inference": set(cpus[2:])}
+    if name == "split":
+        return {"control": first, "capture": rest, "inference": rest}
+    return {"control": first, "capture": first, "inference": rest}  # paired
+
+
+def set_library_threads(n):
+    """
+    Cap the thread pools of the numeric libraries at n. Environment
+    variables only reach libraries imported afterwards; torch and OpenCV
+    are set directly if the script has already imported them (importing
+    torch just to configure it would cost seconds on a Pi).
+    """
+    n = max(1, int(n))
+    for var in _THREAD_ENV:
+        os.environ[var] = str(n)
+    applied = ["env"]
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(n)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # only settable before the first parallel op
+        applied.append("torch")
+    cv2 = sys.modules.get("cv2")
+    if cv2 is not None and hasattr(cv2, "setNumThreads"):
+        cv2.setNumThreads(n)
+        applied.append("cv2")
+    return applied
+
+
+def onnx_session_options(n=None):
+    """onnxruntime.SessionOptions sized for the inference role."""
+    import onnxruntime
+
+    opts = onnxruntime.SessionOptions()
+    opts.intra_op_num_threads = n or (len(_active.cpus["inference"]) if _active else 0)
+    opts.inter_op_num_threads = 1
+    return opts
+
+
+def raise_priority(spec=CONTROL_PRIORITY):
+    """Raise the calling thread's priority; returns a description or None."""
+    if not spec:
+        return None
+    try:
+        if spec == "fifo":
+            prio = os.sched_get_priority_min(os.SCHED_FIFO) + 10
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(prio))
+            return f"SCHED_FIFO {prio}"
+        # setpriority on a thread id reaches just that thread on Linux
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), int(spec))
+        return f"nice {int(spec)}"
+    except (OSError, ValueError, AttributeError) as e:
+        sys.stderr.write(f"[affinity] cannot raise priority ({spec}): {e}\n")
+        return None
+
+
+class CpuPlan:
+    def __init__(self, layout="split", cpus=None, control_priority=CONTROL_PRIORITY):
+        self.layout = layout
+        self.cpus = make_layout(layout, cpus)
+        self.control_priority = control_priority
+
+    def threads(self, role):
+        return len(self.cpus[role])
+
+    def pin(self, role):
+        """Move the calling thread (and threads it starts later) onto role's cores."""
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.cpus[role])  # 0 = calling thread on Linux
+        if role == "control":
+            raise_priority(self.control_priority)
+
+    def describe(self):
+        return "  ".join(
+            f"{role}={','.join(map(str, sorted(self.cpus[role])))}" for role in ROLES
+        )
+
+
+_active = None
+
+
+def setup(layout="split", cpus=None, control_priority=CONTROL_PRIORITY):
+    """Activate a plan for this process and size the library thread pools."""
+    global _active
+    _active = CpuPlan(layout, cpus, control_priority)
+    set_library_threads(_active.threads("inference"))
+    return _active
+
+
+def setup_from_env():
+    """setup(PICARX_CPU_LAYOUT) if set; returns the plan or None."""
+    if not CPU_LAYOUT:
+        return None
+    plan = setup(CPU_LAYOUT)
+    sys.stderr.write(f"[affinity] {plan.layout}: {plan.describe()}\n")
+    return plan
+
+
+def pin_thread(role):
+    """Pin the calling thread to its role's cores; a no-op without a plan."""
+    if _active is not None:
+        _active.pin(role)
+
+
+def active_plan():
+    return _active
+
+
+# ---- Benchmark --------------------------------------------------------------
+
+
+def _inference_workload(model_path):
+    """Returns a callable running one 'inference'."""
+    if model_path:
+        import numpy as np
+        from ultralytics import YOLO
+
+        model = YOLO(model_path)
+        frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+        return lambda: model.predict(frame, imgsz=320, verbose=False, device="cpu")
+    import numpy as np
+
+    a = np.random.default_rng(0).random((384, 384), dtype=np.float32)
+    return lambda: a @ a @ a  # BLAS releases the GIL, like torch kernels
+
+
+def _bench_one(layout, seconds, model_path, control_hz=50.0):
+    plan = setup(layout)
+    stop = threading.Event()
+    counts = {"inference": 0, "capture": 0}
+
+    def inference():
+        pin_thread("inference")
+        run = _inference_workload(model_path)
+        run()  # warm-up
+        counts["inference"] = 0
+        while not stop.is_set():
+            run()
+            counts["inference"] += 1
+
+    def capture():
+        import numpy as np
+
+        pin_thread("capture")
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        while not stop.is_set():
+            frame[::2, ::2] = frame[1::2, 1::2] + 1  # stand-in for decode/convert
+            counts["capture"] += 1
+            time.sleep(1 / 30.0)
+
+    workers = [threading.Thread(target=fn, daemon=True) for fn in (inference, capture)]
+    for w in workers:
+        w.start()
+    time.sleep(min(1.0, seconds / 4))  # let the model load and warm up
+
+    pin_thread("control")
+    period = 1.0 / control_hz
+    lateness = []
+    t0 = time.monotonic()
+    next_t = t0
+    while time.monotonic() - t0 < seconds:
+        next_t += period
+        delay = next_t - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        lateness.append(time.monotonic() - next_t)
+    elapsed = time.monotonic() - t0
+    stop.set()
+
+    lateness.sort()
+    pct = lambda q: lateness[min(len(lateness) - 1, int(q * len(lateness)))] * 1000.0  # noqa: E731
+    return {
+        "layout": layout,
+        "cpus": plan.describe(),
+        "inference_fps": counts["inference"] / elapsed,
+        "jitter_p50_ms": pct(0.5),
+        "jitter_p99_ms": pct(0.99),
+        "jitter_max_ms": lateness[-1] * 1000.0,
+    }
+
+
+def bench(layouts=LAYOUTS, seconds=10.0, model_path=None):
+    """Run each layout in a fresh interpreter (thread pools are sized at import)."""
+    rows = []
+    for layout in layouts:
+        cmd = [sys.executable, os.path.abspath(__file__), "--bench-one", layout,
+               "--seconds", str(seconds)]
+        if model_path:
+            cmd += ["--model", model_path]
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        rows.append(json.loads(out.strip().splitlines()[-1]))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU layout benchmark for the vision stack.")
+    parser.add_argument("--bench", action="store_true", help="sweep all layouts")
+    parser.add_argument("--bench-one", metavar="LAYOUT", help=argparse.SUPPRESS)
+    parser.add_argument("--layouts", nargs="+", default=list(LAYOUTS))
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--model", help="YOLO weights; default is a numpy matmul stand-in")
+    args = parser.parse_args()
+
+    if args.bench_one:
+        print(json.dumps(_bench_one(args.bench_one, args.seconds, args.model)))
+        return
+    if not args.bench:
+        parser.print_help()
+        return
+
+    print(f"cpus={available_cpus()}  workload={args.model or 'numpy matmul'}  "
+          f"priority={CONTROL_PRIORITY or 'default'}")
+    print("control-loop jitter = wake-up lateness in ms")
+    print(f"{'layout':8s} {'infer fps':>9s} {'p50':>7s} {'p99':>7s} {'max':>7s}  cpus")
+    for r in bench(args.layouts, args.seconds, args.model):
+        print(
+            f"{r['layout']:8s} {r['inference_fps']:9.1f} {r['jitter_p50_ms']:7.2f} "
+            f"{r['jitter_p99_ms']:7.2f} {r['jitter_max_ms']:7.2f}  {r['cpus']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""Arc-rollout steering planner.
+
+The avoidance scripts used to pick a turn direction blindly (alternating,
+or always right) and back up until the ultrasonic reading cleared.
+ArcPlanner instead keeps a short-lived local map of obstacle points around
+the car and, every control tick, rolls out one arc per candidate steering
+angle with the bicycle model in a single NumPy batch. It then picks the arc
+that makes the most obstacle-free progress along the goal heading:
+
+    planner = ArcPlanner(speeds=(10, 20, 25))
+    while True:
+        planner.observe_ultrasonic(distance_cm)
+        planner.observe_detections(results[0].boxes, w, h)    # optional
+        planner.observe_free_space(free)                      # optional
+        plan = planner.plan()
+        if plan.blocked:
+            back_up(plan.speed, plan.steer)   # speed < 0; steer swings the nose to free space
+        else:
+            drive(plan.speed, plan.steer)
+
+Obstacle points are kept in the car frame (x forward, y right, origin at
+the rear axle) and shifted by the commanded motion at every plan(), so an
+obstacle the ultrasonic cone swept past is still avoided when the car turns
+away from it. Points expire after MEMORY_S. A reading also clears remembered
+points it sees past, so stale points do not block a path that is now free.
+Scripts that drive the car without asking plan() (e.g. an avoidance
+maneuver) report it with command(speed, steer).
+
+Each arc is scored on four terms:
+- obstacle-free progress along the goal heading (the heading at start-up);
+- clearance to the nearest point, capped at CLEARANCE_CAP_CM;
+- a penalty for colliding before the end of the arc;
+- a small penalty for changing the steering angle.
+
+The speed is the largest candidate that covers no more than the free arc
+length within REACTION_S. If even the best arc collides within
+MIN_FREE_CM, plan() asks to back up.
+
+Per-tick planning time is exported as picarx_planner_seconds.
+
+    python3 utils/arc_planner.py --bench
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import REGISTRY
+
+# Vehicle geometry (PiCar-X; the simulator uses the same numbers)
+WHEELBASE_CM = 11.5
+SENSOR_OFFSET_CM = 10.0  # ultrasonic and camera ahead of the rear axle
+BODY_OFFSET_CM = 5.0  # collision disc centre ahead of the rear axle
+BODY_RADIUS_CM = 13.0
+CM_PER_SPEED_UNIT = 0.6  # Picarx speed 100 ~= 60 cm/s
+MAX_STEER_DEG = 30.0
+
+# Sensors
+ULTRASONIC_HALF_CONE_DEG = 15.0
+ULTRASONIC_MAX_CM = 300.0
+HFOV_DEG = 90.0
+CAMERA_HEIGHT_CM = 12.0
+DETECTION_DEFAULT_CM = 80.0  # range for a box whose bottom edge is above the horizon
+
+# Planner
+STEERS_DEG = tuple(range(-30, 31, 5))
+HORIZON_CM = 80.0
+STEPS = 16
+MARGIN_CM = 3.0
+MIN_FREE_CM = 12.0
+REACTION_S = 1.0
+REVERSE_SPEED = 15
+MEMORY_S = 3.0
+MAX_POINTS = 256
+CLEARANCE_CAP_CM = 30.0
+W_CLEARANCE = 0.5
+W_COLLISION = 100.0
+W_STEER_CHANGE = 5.0
+
+PLAN_SECONDS = REGISTRY.histogram("picarx_planner_seconds", "ArcPlanner.plan() time per tick")
+
+
+class Plan:
+    __slots__ = ("steer", "speed", "blocked", "free_cm", "score")
+
+    def __init__(self, steer, speed, blocked, free_cm, score):
+        self.steer = steer
+        self.speed = speed
+        self.blocked = blocked
+        self.free_cm = free_cm
+        self.score = score
+
+    def __repr__(self):
+        return (
+            f"<Plan steer={self.steer:+.0f} speed={self.speed} blocked={self.blocked} "
+            f"free={self.free_cm:.0f}cm>"
+        )
+
+
+class ArcPlanner:
+    def __init__(self, speeds=(10, 20, 25), steers_deg=STEERS_DEG, horizon_cm=HORIZON_CM,
+                 steps=STEPS, wheelbase_cm=WHEELBASE_CM, body_radius_cm=BODY_RADIUS_CM,
+                 margin_cm=MARGIN_CM, memory_s=MEMORY_S, reverse_speed=REVERSE_SPEED,
+                 cm_per_speed_unit=CM_PER_SPEED_UNIT, clock=None):
+        self.speeds = tuple(sorted(speeds))
+        self.steers = np.asarray(steers_deg, dtype=np.float64)
+        self.memory_s = float(memory_s)
+        self.reverse_speed = int(reverse_speed)
+        self.cm_per_speed_unit = float(cm_per_speed_unit)
+        self.wheelbase_cm = float(wheelbase_cm)
+        self.clock = clock or time.monotonic
+        self._clear_sq = (float(body_radius_cm) + float(margin_cm)) ** 2
+
+        # Rollouts depend only on geometry: precompute body-centre positions
+        # (C arcs x N steps) and headings along each arc
+        s = np.linspace(horizon_cm / steps, horizon_cm, steps)
+        self._s = s
+        curvature = np.tan(np.radians(self.steers)) / self.wheelbase_cm  # + = right
+        theta = curvature[:, None] * s[None, :]
+        straight = np.abs(curvature) < 1e-9
+        safe_k = np.where(straight, 1.0, curvature)[:, None]
+        x = np.where(straight[:, None], s[None, :], np.sin(theta) / safe_k)
+        y = np.where(straight[:, None], 0.0, (1.0 - np.cos(theta)) / safe_k)
+        self._theta = theta
+        self._body = np.stack(
+            [x + BODY_OFFSET_CM * np.cos(theta), y + BODY_OFFSET_CM * np.sin(theta)], axis=-1
+        ).astype(np.float32)
+
+        self.points = np.empty((0, 2), dtype=np.float32)
+        self._point_t = np.empty(0)
+        self.heading_to_goal = 0.0  # car heading relative to the goal, rad, + = right
+        self._speed = 0
+        self._steer = 0.0
+        self._t = None
+
+    # ---- Ego motion ---------------------------------------------------------
+
+    def command(self, speed, steer_deg, now=None):
+        """Report what the car is actually doing from now on."""
+        self._advance(self.clock() if now is None else now)
+        self._speed = speed
+        self._steer = float(steer_deg)
+
+    def _advance(self, now):
+        if self._t is not None and self._speed and now > self._t:
+            ds = self._speed * self.cm_per_speed_unit * (now - self._t)
+            k = math.tan(math.radians(self._steer)) / self.wheelbase_cm
+            dth = k * ds
+            if abs(k) < 1e-9:
+                dx, dy = ds, 0.0
+            else:
+                dx, dy = math.sin(dth) / k, (1.0 - math.cos(dth)) / k
+            c, s = math.cos(dth), math.sin(dth)
+            p = self.points - np.float32((dx, dy))
+            self.points = np.stack([p[:, 0] * c + p[:, 1] * s, -p[:, 0] * s + p[:, 1] * c], axis=1)
+            self.heading_to_goal += dth
+        self._t = now
+        keep = now - self._point_t <= self.memory_s
+        if not keep.all():
+            self.points, self._point_t = self.points[keep], self._point_t[keep]
+
+    def reset_goal(self):
+        """Make the current heading the goal heading."""
+        self.heading_to_goal = 0.0
+
+    # ---- Observations ---------------------------------------------------------
+
+    def observe(self, bearings_deg, ranges_cm, now=None, clear_to_cm=None, half_width_deg=0.0):
+        """
+        Obstacles at (bearing, range) from the sensor, bearing + = right.
+        clear_to_cm: also forget remembered points within half_width_deg of
+        each bearing that are nearer than this (what the sensor sees as free).
+        """
+        now = self.clock() if now is None else now
+        self._advance(now)
+        b = np.radians(np.asarray(bearings_deg, dtype=np.float64))
+        r = np.asarray(ranges_cm, dtype=np.float64)
+        if clear_to_cm is not None and len(self.points):
+            px = self.points[:, 0] - SENSOR_OFFSET_CM
+            pb = np.arctan2(self.points[:, 1], px)
+            pr = np.hypot(px, self.points[:, 1])
+            clear = np.broadcast_to(np.asarray(clear_to_cm, dtype=np.float64), b.shape)
+            seen = (np.abs(pb[:, None] - b[None, :]) <= math.radians(half_width_deg)) & (
+                pr[:, None] < clear[None, :] - MARGIN_CM
+            )
+            keep = ~seen.any(axis=1)
+            self.points, self._point_t = self.points[keep], self._point_t[keep]
+        hit = np.isfinite(r)
+        if hit.any():
+            b, r = b[hit], r[hit]
+            new = np.stack([SENSOR_OFFSET_CM + r * np.cos(b), r * np.sin(b)], axis=1)
+            self.points = np.concatenate([self.points, new.astype(np.float32)])[-MAX_POINTS:]
+            self._point_t = np.concatenate([self._point_t, np.full(len(new), now)])[-MAX_POINTS:]
+
+    def observe_ultrasonic(self, distance_cm, now=None, half_cone_deg=ULTRASONIC_HALF_CONE_DEG):
+        """One reading: an echo somewhere across the cone (<= 0 or max = nothing seen)."""
+        bearings = np.linspace(-half_cone_deg, half_cone_deg, 5)
+        hit = 0 < distance_cm < ULTRASONIC_MAX_CM
+        ranges = np.full(5, distance_cm if hit else np.inf)
+        self.observe(bearings, ranges, now, clear_to_cm=distance_cm if hit else ULTRASONIC_MAX_CM,
+                     half_width_deg=half_cone_deg / 4.0)
+
+    def observe_free_space(self, free, now=None):
+        """vision/free_space.py result: one boundary point per bearing bin."""
+        cm = np.asarray(free.cm, dtype=np.float64)
+        ranges = np.where(cm < free.max_cm, cm, np.inf)
+        half = float(np.abs(np.diff(free.bearings_deg)).min()) / 2.0 if len(cm) > 1 else 5.0
+        self.observe(free.bearings_deg, ranges, now, clear_to_cm=cm, half_width_deg=half)
+
+    def observe_detections(self, boxes, frame_width, frame_height, min_conf=0.0,
+                           hfov_deg=HFOV_DEG, camera_height_cm=CAMERA_HEIGHT_CM, now=None):
+        """
+        ultralytics boxes (cls/conf/xyxy). Bearing from the box edges, range
+        from where its bottom edge meets the floor.
+        """
+        f = (frame_width / 2.0) / math.tan(math.radians(hfov_deg) / 2.0)
+        bearings, ranges = [], []
+        for box in boxes if boxes is not None else ():
+            if float(box.conf[0]) < min_conf:
+                continue
+            x1, _, x2, y2 = (float(v) for v in box.xyxy[0])
+            below = (y2 - frame_height / 2.0) / f
+            rng = camera_height_cm / below if below > 1e-3 else DETECTION_DEFAULT_CM
+            for u in (x1, (x1 + x2) / 2.0, x2):
+                bearings.append(math.degrees(math.atan((u - frame_width / 2.0) / f)))
+                ranges.append(rng)
+        if bearings:
+            self.observe(bearings, ranges, now)
+
+    # ---- Planning -------------------------------------------------------------
+
+    def plan(self, now=None):
+        t0 = time.perf_counter()
+        now = self.clock() if now is None else now
+        self._advance(now)
+        n_arcs, n_steps = self._theta.shape
+
+        if len(self.points):
+            d = self._body[:, :, None, :] - self.points[None, None, :, :]
+            dist_sq = np.einsum("cnmk,cnmk->cnm", d, d).min(axis=2)
+        else:
+            dist_sq = np.full((n_arcs, n_steps), np.inf, dtype=np.float32)
+        hits = dist_sq < self._clear_sq
+        collides = hits.any(axis=1)
+        first = np.where(collides, hits.argmax(axis=1), n_steps)  # free steps per arc
+        free_cm = np.where(first > 0, self._s[np.maximum(first - 1, 0)], 0.0)
+
+        # Progress along the goal heading at the last free step
+        idx = np.maximum(first - 1, 0)
+        rows = np.arange(n_arcs)
+        bx, by = self._body[rows, idx, 0], self._body[rows, idx, 1]
+        c, s = math.cos(self.heading_to_goal), math.sin(self.heading_to_goal)
+        progress = np.where(first > 0, bx * c - by * s, 0.0)
+
+        clearance = np.sqrt(
+            np.where(np.arange(n_steps)[None, :] < first[:, None], dist_sq, np.inf).min(axis=1)
+        )
+        clearance = np.minimum(clearance, CLEARANCE_CAP_CM)
+
+        score = (
+            progress
+            + W_CLEARANCE * clearance
+            - W_COLLISION * collides * (1.0 - first / n_steps)
+            - W_STEER_CHANGE * np.abs(self.steers - self._steer) / MAX_STEER_DEG
+        )
+        best = int(np.argmax(score))
+        steer = float(self.steers[best])
+        free = float(free_cm[best])
+
+        if free < MIN_FREE_CM:
+            # Back up with the wheels turned away from the best arc, so the
+            # nose swings towards it
+            side = np.sign(steer) if steer else (1.0 if score[-1] >= score[0] else -1.0)
+            plan = Plan(-side * float(self.steers.max()), -self.reverse_speed, True, free,
+                        float(score[best]))
+        else:
+            speed = self.speeds[0]
+            for v in self.speeds:
+                if v * self.cm_per_speed_unit * REACTION_S <= free:
+                    speed = v
+            plan = Plan(steer, speed, False, free, float(score[best]))
+
+        self._speed, self._steer = plan.speed, plan.steer
+        PLAN_SECONDS.observe(time.perf_counter() - t0)
+        return plan
+
+
+# ---- Benchmark --------------------------------------------------------------
+
+
+def bench(n=2000, n_points=MAX_POINTS):
+    rng = np.random.default_rng(0)
+    planner = ArcPlanner(clock=lambda: 0.0)
+    planner.points = rng.uniform((-50, -100), (150, 100), (n_points, 2)).astype(np.float32)
+    planner._point_t = np.zeros(n_points)
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        planner.plan(now=0.0)
+        times.append(time.perf_counter() - t0)
+    times = np.asarray(times) * 1000.0
+    return float(np.median(times)), float(np.percentile(times, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arc-rollout steering planner.")
+    parser.add_argument("--bench", action="store_true", help="time plan() with a full point memory")
+    args = parser.parse_args()
+    if not args.bench:
+        parser.print_help()
+        return
+    p50, p99 = bench()
+    print(f"{len(STEERS_DEG)} arcs x {STEPS} steps, {MAX_POINTS} points: "
+          f"plan() p50 {p50:.3f} ms  p99 {p99:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
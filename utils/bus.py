@@ -0,0 +1,311 @@
+"""
+In-process publish/subscribe bus for sensors, detectors and controllers.
+
+The scripts wired camera, model, ultrasonic and motors together by hand in
+one loop. On a Bus each stage only publishes to and reads from named,
+typed topics, so stages can be reused, rearranged, or moved to their own
+thread and rate without touching the others:
+
+    bus = Bus()
+    frames = bus.topic("frames", np.ndarray)
+    latest = bus.subscribe("frames")                  # latest value
+    log = bus.subscribe("commands", maxsize=32)       # bounded queue
+
+    frames.publish(frame, t=t_capture)                # no copy is made
+    msg = latest.poll()                               # newest unseen, or None
+    msg.value, msg.t                                  # payload, capture stamp
+
+Subscriptions:
+  * latest value (maxsize=None): poll() returns the newest message this
+    subscriber has not seen yet; anything older is skipped. What a
+    controller wants from a camera or a range finder.
+  * bounded queue (maxsize=N): every message in order; when the consumer
+    falls N behind, the oldest is dropped and counted. For logs and
+    commands.
+Both have wait(timeout) for consumers on their own thread.
+
+Payloads are passed by reference (zero-copy for NumPy frames): a publisher
+must not modify an object after publishing it, and subscribers treat it
+as read-only. cv2's read() and YOLO's predict() return new objects each
+call, so the pipelines here need no copies.
+
+Per topic: picarx_bus_<topic>_messages_total, _dropped_total and
+_latency_seconds (publish to delivery); report() adds the rate.
+
+    python3 utils/bus.py --bench       # per-message overhead
+"""
+import argparse
+import collections
+import os
+import sys
+import threading
+import time
+
+# Make project root importable (also when run as a CLI)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import REGISTRY
+
+# Publish-to-delivery latency; the bus itself is microseconds, the rest is
+# how long the consumer took to get to it
+LATENCY_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0,
+)
+RATE_EMA = 0.1  # weight of the newest publish interval in the rate estimate
+
+# ---- Standard payloads ---------------------------------------------------------
+
+# YOLO output for one frame: ultralytics boxes, the frame they were computed
+# on (by reference; with pipelined offload, utils/remote_inference.py, an
+# earlier one than was just captured), its size, and how much older than
+# the newest frame that is
+Detections = collections.namedtuple("Detections", "boxes frame width height lag_s")
+# Motor/steering decision with utils/recorder.py flags
+Command = collections.namedtuple("Command", "speed steer flags")
+
+
+class Message:
+    __slots__ = ("value", "t", "seq", "t_pub")
+
+    def __init__(self, value, t, seq, t_pub):
+        self.value = value
+        self.t = t  # capture/measurement time (monotonic); t_pub if not given
+        self.seq = seq  # 1, 2, ... per topic
+        self.t_pub = t_pub
+
+    def __repr__(self):
+        return f"<Message #{self.seq} t={self.t:.3f} {type(self.value).__name__}>"
+
+
+class Topic:
+    def __init__(self, name, type=None, registry=REGISTRY, clock=None):
+        """type: class (or tuple) every payload must be an instance of; None = any."""
+        self.name = name
+        self.type = type
+        self.clock = clock or time.monotonic
+        self.latest = None
+        self.seq = 0
+        self.interval_s = None  # EMA of the time between publishes
+        self._queues = []
+        self._cond = threading.Condition()
+        self.messages = registry.counter(f"picarx_bus_{name}_messages_total", f"Messages on {name}")
+        self.dropped = registry.counter(
+            f"picarx_bus_{name}_dropped_total", f"{name} messages dropped by full subscriber queues"
+        )
+        self.latency = registry.histogram(
+            f"picarx_bus_{name}_latency_seconds", f"{name} publish-to-delivery time", LATENCY_BUCKETS
+        )
+
+    def publish(self, value, t=None):
+        """Deliver `value` (by reference) to every subscriber. Never blocks on them."""
+        if self.type is not None and not isinstance(value, self.type):
+            raise TypeError(f"topic {self.name!r} carries {self.type}, got {type(value).__name__}")
+        now = self.clock()
+        with self._cond:
+            self.seq += 1
+            msg = Message(value, now if t is None else t, self.seq, now)
+            if self.latest is not None:
+                dt = now - self.latest.t_pub
+                self.interval_s = dt if self.interval_s is None else self.interval_s + RATE_EMA * (dt - self.interval_s)
+            self.latest = msg
+            for queue in self._queues:
+                if len(queue) == queue.maxlen:
+                    self.dropped.inc()
+                queue.append(msg)
+            self._cond.notify_all()
+        self.messages.inc()
+        return msg
+
+    def subscribe(self, maxsize=None):
+        return Subscription(self, maxsize)
+
+    @property
+    def rate_hz(self):
+        return 1.0 / self.interval_s if self.interval_s else 0.0
+
+    def report(self):
+        if not self.seq:
+            return f"{self.name}: no messages"
+        text = (f"{self.name}: {self.seq} msgs, {self.rate_hz:.1f} Hz, "
+                f"latency p50 {self.latency.quantile(0.5) * 1000.0:.2f} ms "
+                f"p99 {self.latency.quantile(0.99) * 1000.0:.2f} ms")
+        if self.dropped.value:
+            text += f", {self.dropped.value:.0f} dropped"
+        return text
+
+
+class Subscription:
+    def __init__(self, topic, maxsize=None):
+        self.topic = topic
+        self.last = None  # last message handed out
+        self._seen = topic.seq  # only messages published from now on
+        self._queue = None
+        if maxsize is not None:
+            self._queue = collections.deque(maxlen=int(maxsize))
+            with topic._cond:
+                topic._queues.append(self._queue)
+
+    def poll(self):
+        """The next message (queue) or the newest unseen one (latest value); None if none."""
+        if self._queue is not None:
+            try:
+                msg = self._queue.popleft()
+            except IndexError:
+                return None
+        else:
+            msg = self.topic.latest
+            if msg is None or msg.seq <= self._seen:
+                return None
+        self._seen = msg.seq
+        self.last = msg
+        self.topic.latency.observe(self.topic.clock() - msg.t_pub)
+        return msg
+
+    def drain(self):
+        """Every queued message (queue), or the newest unseen one as a list."""
+        out = []
+        msg = self.poll()
+        while msg is not None:
+            out.append(msg)
+            if self._queue is None:
+                break
+            msg = self.poll()
+        return out
+
+    def wait(self, timeout=None):
+        """poll(), blocking up to `timeout` seconds for a message."""
+        msg = self.poll()
+        if msg is not None:
+            return msg
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.topic._cond:
+            while not self._pending():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.topic._cond.wait(remaining)
+        return self.poll()
+
+    def _pending(self):
+        if self._queue is not None:
+            return bool(self._queue)
+        latest = self.topic.latest
+        return latest is not None and latest.seq > self._seen
+
+    def close(self):
+        if self._queue is not None:
+            with self.topic._cond:
+                self.topic._queues.remove(self._queue)
+
+
+class Bus:
+    def __init__(self, registry=REGISTRY, clock=None):
+        """clock: message time stamps; time.monotonic by default."""
+        self.registry = registry
+        self.clock = clock or time.monotonic
+        self.topics = {}
+        self._lock = threading.Lock()
+
+    def topic(self, name, type=None):
+        """The topic `name`, created on first use; a declared type must match."""
+        with self._lock:
+            topic = self.topics.get(name)
+            if topic is None:
+                topic = self.topics[name] = Topic(name, type, self.registry, self.clock)
+            elif type is not None and topic.type is not None and topic.type != type:
+                raise TypeError(f"topic {name!r} already carries {topic.type}, not {type}")
+            elif type is not None:
+                topic.type = type
+            return topic
+
+    def publish(self, name, value, t=None):
+        return self.topic(name).publish(value, t)
+
+    def subscribe(self, name, maxsize=None):
+        return self.topic(name).subscribe(maxsize)
+
+    def report(self):
+        return "\n".join(topic.report() for topic in self.topics.values())
+
+
+# ---- Benchmark ----------------------------------------------------------------
+
+
+def bench(n=100000):
+    """Per-message cost of publish + poll against a plain attribute hand-off."""
+    import numpy as np
+
+    from utils.metrics import Registry
+
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    def per_msg(fn):
+        best = float("inf")
+        for _ in range(5):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, (time.perf_counter() - t0) / n)
+        return best * 1e6
+
+    class Slot:
+        value = None
+
+    slot = Slot()
+
+    def direct():
+        for _ in range(n):
+            slot.value = frame
+            _ = slot.value
+
+    bus = Bus(registry=Registry())
+    topic = bus.topic("frames", np.ndarray)
+    latest = bus.subscribe("frames")
+    queued = bus.subscribe("frames", maxsize=8)
+
+    def latest_value():
+        publish, poll = topic.publish, latest.poll
+        for _ in range(n):
+            publish(frame)
+            poll()
+
+    def with_queue():
+        publish, poll, qpoll = topic.publish, latest.poll, queued.poll
+        for _ in range(n):
+            publish(frame)
+            poll()
+            qpoll()
+
+    base = per_msg(direct)
+    print(f"plain hand-off              {base:6.2f} µs/msg")
+    print(f"bus, 1 latest subscriber    {per_msg(latest_value):6.2f} µs/msg")
+    print(f"bus, + 1 queue subscriber   {per_msg(with_queue):6.2f} µs/msg")
+    big = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        topic.publish(big)
+        latest.poll()
+    print(f"1920x1080 frames            {(time.perf_counter() - t0) * 1000.0:6.2f} µs/msg (no copy)")
+    print(f"a frame copy, for scale     {per_msg_copy(frame):6.2f} µs (640x480)")
+
+
+def per_msg_copy(frame, n=1000):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        frame.copy()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process pub/sub bus.")
+    parser.add_argument("--bench", action="store_true", help="per-message overhead")
+    args = parser.parse_args()
+    if not args.bench:
+        parser.print_help()
+        return
+    bench()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Capture timestamps and stale-input rejection.
+
+Every frame, detection and ultrasonic reading carries the time.monotonic()
+at which it was captured, so decision code can ask how old its inputs are
+instead of assuming "just now":
+
+    cap = TimestampedCapture(cv2.VideoCapture(0))
+    ret, frame, t_frame = cap.read()
+    ...
+    if VISION_GATE.check(t_frame):      # False -> too old, ignore it
+        act_on(boxes)
+
+A FreshnessGate records the capture-to-decision age of every input it sees
+as `picarx_<source>_decision_age_seconds`, counts rejections in
+`picarx_<source>_stale_total`, and offers weight() for down-weighting
+instead of a hard cut. age_report() prints the distributions at exit.
+
+Limits (seconds) are configurable per process:
+    PICARX_MAX_VISION_AGE_S      (default 0.5)
+    PICARX_MAX_ULTRASONIC_AGE_S  (default 0.2)
+"""
+import os
+import sys
+import time
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import REGISTRY
+
+MAX_VISION_AGE_S = float(os.environ.get("PICARX_MAX_VISION_AGE_S", "0.5"))
+MAX_ULTRASONIC_AGE_S = float(os.environ.get("PICARX_MAX_ULTRASONIC_AGE_S", "0.2"))
+
+# Seconds; inputs range from a fresh ultrasonic ping to a multi-second stall
+AGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.75, 1.0, 2.0, 5.0)
+
+
+class Stamped:
+    """A value plus the monotonic time it was captured."""
+
+    __slots__ = ("value", "t")
+
+    def __init__(self, value, t=None):
+        self.value = value
+        self.t = time.monotonic() if t is None else t
+
+    def age(self, now=None):
+        return (time.monotonic() if now is None else now) - self.t
+
+    def __repr__(self):
+        return f"<Stamped {self.value!r} age={self.age():.3f}s>"
+
+
+class TimestampedCapture:
+    """
+    cv2.VideoCapture wrapper whose read() also returns the capture time.
+
+    The stamp is taken when grab() returns, i.e. when the driver hands over
+    the frame, before the (slow) decode in retrieve(). Any other attribute
+    is passed through to the wrapped capture.
+    """
+
+    def __init__(self, cap):
+        self.cap = cap
+
+    def read(self):
+        if not self.cap.grab():
+            return False, None, time.monotonic()
+        t = time.monotonic()
+        ret, frame = self.cap.retrieve()
+        return ret, frame, t
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+def read_stamped(read_fn):
+    """
+    Call a blocking sensor read and stamp the result at the midpoint of the
+    call (an ultrasonic ping is measured somewhere inside it).
+    """
+    t0 = time.monotonic()
+    value = read_fn()
+    return Stamped(value, (t0 + time.monotonic()) / 2.0)
+
+
+class FreshnessGate:
+    def __init__(self, source, max_age_s, soft_age_s=None, registry=REGISTRY):
+        """
+        source: short name used in metric names ("vision", "ultrasonic").
+        max_age_s: inputs older than this are rejected by check().
+        soft_age_s: weight() starts dropping from 1 here (default max/2).
+        """
+        self.source = source
+        self.max_age_s = float(max_age_s)
+        self.soft_age_s = self.max_age_s / 2.0 if soft_age_s is None else float(soft_age_s)
+        self.ages = registry.histogram(
+            f"picarx_{source}_decision_age_seconds",
+            f"Capture-to-decision age of {source} inputs",
+            AGE_BUCKETS,
+        )
+        self.stale = registry.counter(
+            f"picarx_{source}_stale_total", f"{source} inputs rejected as too old"
+        )
+
+    def age(self, t, now=None):
+        return (time.monotonic() if now is None else now) - t
+
+    def check(self, t, now=None):
+        """Record the age of an input captured at t; True if still usable."""
+        if t is None:
+            self.stale.inc()
+            return False
+        age = self.age(t, now)
+        self.ages.observe(age)
+        if age > self.max_age_s:
+            self.stale.inc()
+            return False
+        return True
+
+    def weight(self, t, now=None):
+        """1.0 up to soft_age_s, falling linearly to 0.0 at max_age_s."""
+        if t is None:
+            return 0.0
+        age = self.age(t, now)
+        if age <= self.soft_age_s:
+            return 1.0
+        if age >= self.max_age_s:
+            return 0.0
+        return 1.0 - (age - self.soft_age_s) / (self.max_age_s - self.soft_age_s)
+
+    def report(self):
+        h = self.ages
+        if not h.count:
+            return f"{self.source:10s} no samples"
+        return (
+            f"{self.source:10s} n={h.count:6d} mean={h.sum / h.count * 1000.0:7.1f} ms "
+            f"p50<={h.quantile(0.5) * 1000.0:.0f} ms p95<={h.quantile(0.95) * 1000.0:.0f} ms "
+            f"stale={int(self.stale.value)}"
+        )
+
+
+def age_report(*gates):
+    return "\n".join(g.report() for g in gates)
@@ -0,0 +1,218 @@
+"""Table-driven finite state machine for the avoidance behaviors.
+
+The avoidance scripts used to re-derive their state from scratch every tick
+with if/elif chains. A reading hovering around a threshold then flipped the
+state (and re-issued the motor and servo commands) every 50 ms. Here the
+behavior is declared as data instead:
+
+    machine = StateMachine(
+        "fsm",
+        states={
+            Zone.SAFE: State(on_enter=lambda ctx: drive.set(FAST_SPEED, 0)),
+            Zone.CAUTION: State(on_enter=lambda ctx: drive.set(SLOW_SPEED, -10), min_dwell_s=0.3),
+            Zone.DANGER: State(on_tick=evade),
+        },
+        transitions=[
+            Transition(ANY, Zone.DANGER, below("dist", 30.0), min_dwell_s=0.0),
+            Transition(Zone.SAFE, Zone.CAUTION, below("dist", 50.0)),
+            Transition(Zone.CAUTION, Zone.SAFE, above("dist", 55.0)),  # 5 cm hysteresis
+            Transition(Zone.DANGER, Zone.CAUTION, above("dist", 35.0)),
+        ],
+        initial=Zone.SAFE,
+    )
+    while True:
+        machine.update({"dist": read_distance()})
+
+- Transitions are checked in table order from the current state (or ANY);
+  the first whose guard passes wins, at most one per update().
+- Hysteresis is the table itself: the threshold to enter a state and the
+  one to leave it are separate rows (below()/above() build the guards).
+- A state is left only after its min_dwell_s; a transition may override
+  that (e.g. 0 for an emergency stop).
+- on_exit / on_enter run once per transition, on_tick on every update()
+  (after any transition). All take the update's context.
+- stats() keeps entries, total and longest time per state; the current
+  state and the transition count are exported as picarx_<name>_state and
+  picarx_<name>_transitions_total.
+
+LatchedDrive sits between the state actions and the car so the motor and
+steering servo are only written when the command actually changes.
+"""
+import os
+import sys
+import time
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import REGISTRY
+
+ANY = object()  # Transition source matching every state
+
+
+class State:
+    def __init__(self, on_enter=None, on_tick=None, on_exit=None, min_dwell_s=0.0):
+        self.on_enter = on_enter
+        self.on_tick = on_tick
+        self.on_exit = on_exit
+        self.min_dwell_s = float(min_dwell_s)
+
+
+class Transition:
+    def __init__(self, src, dst, when, min_dwell_s=None):
+        """min_dwell_s: overrides the source state's (None = use it)."""
+        self.src = src
+        self.dst = dst
+        self.when = when
+        self.min_dwell_s = min_dwell_s
+
+
+def below(key, threshold):
+    """Guard: ctx[key] < threshold."""
+    return lambda ctx: ctx[key] < threshold
+
+
+def above(key, threshold):
+    """Guard: ctx[key] >= threshold."""
+    return lambda ctx: ctx[key] >= threshold
+
+
+class StateStats:
+    __slots__ = ("entries", "total_s", "longest_s")
+
+    def __init__(self):
+        self.entries = 0
+        self.total_s = 0.0
+        self.longest_s = 0.0
+
+    def __repr__(self):
+        return (
+            f"{self.entries} entries, {self.total_s:.1f} s total, "
+            f"longest {self.longest_s:.1f} s"
+        )
+
+
+def _state_name(state):
+    return getattr(state, "name", str(state))
+
+
+class StateMachine:
+    def __init__(self, name, states, transitions, initial, registry=REGISTRY, clock=None):
+        if initial not in states:
+            raise ValueError(f"unknown initial state {initial!r}")
+        for t in transitions:
+            if (t.src is not ANY and t.src not in states) or t.dst not in states:
+                raise ValueError(f"transition {t.src!r} -> {t.dst!r} uses an unknown state")
+        self.name = name
+        self.states = states
+        self.initial = initial
+        self.clock = clock or time.monotonic
+        self._from = {
+            s: [t for t in transitions if (t.src is s or t.src is ANY) and t.dst is not s]
+            for s in states
+        }
+        self._codes = {s: getattr(s, "value", i) for i, s in enumerate(states)}
+        self._stats = {s: StateStats() for s in states}
+
+        self.state = None
+        self.since = None
+        self.transitions = 0
+        self._state_gauge = registry.gauge(f"picarx_{name}_state", f"{name} state machine: current state")
+        self._transitions = registry.counter(
+            f"picarx_{name}_transitions_total", f"{name} state machine: state changes"
+        )
+
+    # ---- Stepping ---------------------------------------------------------------
+
+    def update(self, ctx, now=None):
+        """Take at most one transition, then run the state's on_tick. Returns the state."""
+        now = self.clock() if now is None else now
+        if self.state is None:
+            self._enter(self.initial, ctx, now)
+        else:
+            dwell = now - self.since
+            min_dwell = self.states[self.state].min_dwell_s
+            for t in self._from[self.state]:
+                if dwell >= (min_dwell if t.min_dwell_s is None else t.min_dwell_s) and t.when(ctx):
+                    self._leave(ctx, now)
+                    self.transitions += 1
+                    self._transitions.inc()
+                    self._enter(t.dst, ctx, now)
+                    break
+        on_tick = self.states[self.state].on_tick
+        if on_tick is not None:
+            on_tick(ctx)
+        return self.state
+
+    def _enter(self, state, ctx, now):
+        self.state, self.since = state, now
+        self._stats[state].entries += 1
+        self._state_gauge.set(self._codes[state])
+        on_enter = self.states[state].on_enter
+        if on_enter is not None:
+            on_enter(ctx)
+
+    def _leave(self, ctx, now):
+        stats = self._stats[self.state]
+        stats.total_s += now - self.since
+        stats.longest_s = max(stats.longest_s, now - self.since)
+        on_exit = self.states[self.state].on_exit
+        if on_exit is not None:
+            on_exit(ctx)
+
+    # ---- Statistics -------------------------------------------------------------
+
+    def stats(self, now=None):
+        """{state: StateStats}, counting the visit in progress up to now."""
+        out = {}
+        for state, s in self._stats.items():
+            copy = StateStats()
+            copy.entries, copy.total_s, copy.longest_s = s.entries, s.total_s, s.longest_s
+            out[state] = copy
+        if self.state is not None:
+            now = self.clock() if now is None else now
+            current = out[self.state]
+            current.total_s += now - self.since
+            current.longest_s = max(current.longest_s, now - self.since)
+        return out
+
+    def report(self, now=None):
+        lines = [f"{self.transitions} transitions"]
+        for state, s in self.stats(now).items():
+            lines.append(f"  {_state_name(state):10s} {s!r}")
+        return "\n".join(lines)
+
+
+class LatchedDrive:
+    """
+    Motor and steering commands for a Picarx-like robot, written only when
+    they change. speed > 0 drives forward, < 0 backward, 0 stops.
+    """
+
+    def __init__(self, robot, on_command=None):
+        """on_command(speed, steer): called on every set() (e.g. ArcPlanner.command)."""
+        self.robot = robot
+        self.on_command = on_command
+        self.speed = None
+        self.steer = None
+        self.writes = 0
+
+    def set(self, speed, steer=None):
+        """steer None keeps the current angle."""
+        if steer is not None and steer != self.steer:
+            self.robot.set_dir_servo_angle(steer)
+            self.steer = steer
+            self.writes += 1
+        if speed != self.speed:
+            if speed > 0:
+                self.robot.forward(speed)
+            elif speed < 0:
+                self.robot.backward(-speed)
+            else:
+                self.robot.stop()
+            self.speed = speed
+            self.writes += 1
+        if self.on_command is not None:
+            self.on_command(self.speed, self.steer or 0)
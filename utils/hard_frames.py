@@ -0,0 +1,339 @@
+"""Background capture of hard frames for retraining.
+
+Opt-in from the environment: with PICARX_CAPTURE_DIR set, the aio scripts
+offer every processed frame to a HardFrameCapture, which keeps only the
+interesting ones:
+
+- "low_conf":  a detection under PICARX_CAPTURE_LOW_CONF (default 0.5)
+- "disagree":  ultrasonic and vision disagree about an obstacle ahead
+- "stop":      the frame that triggered an emergency stop / avoidance
+
+    capture = open_capture(CAPTURE_DIR)    # no-op capture when CAPTURE_DIR is None
+    while True:
+        ...
+        capture.offer(frame, detections_from_boxes(boxes), disagree=..., stop=..., dist_cm=d)
+    capture.close()                        # drains the queue, prints nothing
+
+offer() only decides and copies the frame into a bounded queue (a few
+hundred microseconds at 640x480); a background thread does the JPEG
+encode and the file writes, so a slow SD card never stalls the loop. When
+the queue is full the frame is dropped and counted. Each reason is rate
+limited (PICARX_CAPTURE_INTERVAL_S) so one long stop does not fill the
+disk with near-identical frames, and a session stops at MAX_FRAMES.
+
+Output is a YOLO-format dataset, one directory per session:
+
+    <dir>/<session>/images/<session>-00000.jpg
+    <dir>/<session>/labels/<session>-00000.txt    # "class cx cy w h", normalized
+    <dir>/<session>/manifest.csv                  # time, reasons, distance, confidences
+
+The labels are the model's own detections: a starting point for review in
+a labelling tool, not ground truth.
+
+    python3 utils/hard_frames.py --bench    # offer() cost, encode time, disk throughput
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+# Make project root importable (also when run as a CLI)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.affinity import pin_thread
+from utils.metrics import REGISTRY
+
+CAPTURE_DIR = os.environ.get("PICARX_CAPTURE_DIR")  # None = capture off
+LOW_CONF = float(os.environ.get("PICARX_CAPTURE_LOW_CONF", "0.5"))
+MIN_INTERVAL_S = float(os.environ.get("PICARX_CAPTURE_INTERVAL_S", "1.0"))
+QUEUE_SIZE = 8  # ~7 MB of 640x480 frames
+MAX_FRAMES = 5000
+JPEG_QUALITY = 90
+
+REASONS = ("low_conf", "disagree", "stop")
+
+MANIFEST_HEADER = "image,t,reasons,dist_cm,n_dets,min_conf\n"
+
+
+class HardFrameCapture:
+    def __init__(
+        self,
+        directory,
+        session=None,
+        queue_size=QUEUE_SIZE,
+        min_interval_s=MIN_INTERVAL_S,
+        max_frames=MAX_FRAMES,
+        low_conf=LOW_CONF,
+        jpeg_quality=JPEG_QUALITY,
+        encode=None,
+        registry=REGISTRY,
+        clock=None,
+    ):
+        """
+        encode(frame) -> bytes: defaults to cv2.imencode at jpeg_quality.
+        clock: for the rate limit; time.monotonic by default.
+        """
+        self.session = session or time.strftime("%Y%m%d-%H%M%S")
+        self.directory = os.path.join(os.path.expanduser(directory), self.session)
+        self.images_dir = os.path.join(self.directory, "images")
+        self.labels_dir = os.path.join(self.directory, "labels")
+        os.makedirs(self.images_dir, exist_ok=True)
+        os.makedirs(self.labels_dir, exist_ok=True)
+        self.min_interval_s = float(min_interval_s)
+        self.max_frames = int(max_frames)
+        self.low_conf = float(low_conf)
+        self.encode = encode or (lambda frame: _encode_jpeg(frame, jpeg_quality))
+        self.clock = clock or time.monotonic
+
+        # Caller side
+        self.offered = 0
+        self.queued = 0
+        self.dropped = 0
+        self.by_reason = {r: 0 for r in REASONS}
+        self._last = {r: float("-inf") for r in REASONS}
+
+        # Writer side
+        self.saved = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.encode_s = 0.0
+        self.write_s = 0.0
+
+        self._dropped = registry.counter(
+            "picarx_hardframes_dropped_total", "Hard frames dropped because the writer queue was full"
+        )
+        self._saved = registry.counter("picarx_hardframes_saved_total", "Hard frames written to disk")
+        self._bytes = registry.counter("picarx_hardframes_bytes_total", "Bytes of JPEG and labels written")
+        self._encode_hist = registry.histogram("picarx_hardframes_encode_seconds", "JPEG encode time")
+
+        self._queue = queue.Queue(maxsize=int(queue_size))
+        self._manifest = open(os.path.join(self.directory, "manifest.csv"), "a", buffering=1)
+        if self._manifest.tell() == 0:
+            self._manifest.write(MANIFEST_HEADER)
+        self._t0 = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="hard-frames", daemon=True)
+        self._thread.start()
+
+    # ---- Caller side --------------------------------------------------------
+
+    def reasons(self, detections=(), disagree=False, stop=False):
+        """Why this frame is worth keeping (a tuple of REASONS, possibly empty)."""
+        out = []
+        if any(d[1] < self.low_conf for d in detections):
+            out.append("low_conf")
+        if disagree:
+            out.append("disagree")
+        if stop:
+            out.append("stop")
+        return tuple(out)
+
+    def offer(self, frame, detections=(), disagree=False, stop=False, dist_cm=-1.0, t=None):
+        """
+        Queue the frame if it is a hard one. Never blocks.
+        detections: (class, conf, x1, y1, x2, y2) in pixels, e.g. from
+        detections_from_boxes(). Returns True if the frame was queued.
+        """
+        self.offered += 1
+        reasons = self.reasons(detections, disagree, stop)
+        if not reasons or frame is None:
+            return False
+        now = self.clock()
+        # Rate limit per reason; a frame goes in if any of its reasons is due
+        due = [r for r in reasons if now - self._last[r] >= self.min_interval_s]
+        if not due or self.queued >= self.max_frames:
+            return False
+        name = f"{self.session}-{self.queued:05d}"
+        item = (name, frame.copy(), tuple(detections), reasons, now if t is None else t, dist_cm)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            self._dropped.inc()
+            return False
+        for r in due:
+            self._last[r] = now
+        for r in reasons:
+            self.by_reason[r] += 1
+        self.queued += 1
+        return True
+
+    def close(self, timeout=5.0):
+        """Write out what is queued (up to timeout), then stop the writer."""
+        if self._thread is None:
+            return
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self._queue.put(None, timeout=max(0.0, deadline - time.monotonic()))
+                break
+            except queue.Full:
+                # Writer stuck past the timeout: leave it to die with the process
+                if time.monotonic() >= deadline:
+                    return
+        thread, self._thread = self._thread, None
+        thread.join(max(0.0, deadline - time.monotonic()))
+        if not thread.is_alive():
+            self._manifest.close()
+
+    # ---- Writer thread -------------------------------------------------------
+
+    def _run(self):
+        # Off the control core when a CPU layout is active (utils/affinity.py)
+        pin_thread("capture")
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self._write(*item)
+            except Exception as e:  # a bad frame or a full disk must not kill the writer
+                self.failed += 1
+                if self.failed == 1:  # the rest are counted in report()
+                    print(f"hard_frames: {item[0]}: {e!r}", file=sys.stderr)
+
+    def _write(self, name, frame, detections, reasons, t, dist_cm):
+        t0 = time.perf_counter()
+        data = self.encode(frame)
+        t1 = time.perf_counter()
+        h, w = frame.shape[:2]
+        labels = "".join(yolo_label(d, w, h) + "\n" for d in detections)
+        with open(os.path.join(self.images_dir, name + ".jpg"), "wb") as f:
+            f.write(data)
+        with open(os.path.join(self.labels_dir, name + ".txt"), "w") as f:
+            f.write(labels)
+        min_conf = min((d[1] for d in detections), default=-1.0)
+        self._manifest.write(
+            f"images/{name}.jpg,{t:.3f},{'+'.join(reasons)},{dist_cm:.1f},{len(detections)},{min_conf:.3f}\n"
+        )
+        t2 = time.perf_counter()
+
+        size = len(data) + len(labels)
+        self.encode_s += t1 - t0
+        self.write_s += t2 - t1
+        self.bytes_written += size
+        self.saved += 1
+        self._encode_hist.observe(t1 - t0)
+        self._bytes.inc(size)
+        self._saved.inc()
+
+    # ---- Reporting -----------------------------------------------------------
+
+    def report(self):
+        elapsed = max(time.monotonic() - self._t0, 1e-9)
+        mb = self.bytes_written / 1e6
+        reasons = ", ".join(f"{r} {n}" for r, n in self.by_reason.items() if n)
+        return (
+            f"{self.saved} saved to {self.directory} ({reasons or 'none'}), "
+            f"{self.dropped} dropped (queue full), {self.failed} failed; "
+            f"encode {self.encode_s / max(self.saved, 1) * 1000.0:.1f} ms/frame, "
+            f"disk {mb:.1f} MB at {mb / max(self.write_s, 1e-9):.1f} MB/s "
+            f"({mb / elapsed * 1000.0:.1f} kB/s average)"
+        )
+
+    def __bool__(self):
+        return True
+
+
+class NullCapture:
+    """Stand-in when capture is off; every call is a no-op."""
+
+    def offer(self, *args, **kwargs):
+        return False
+
+    def close(self, timeout=0.0):
+        pass
+
+    def report(self):
+        return "off"
+
+    def __bool__(self):
+        return False
+
+
+def open_capture(directory, **kwargs):
+    """HardFrameCapture in `directory`, or a NullCapture if directory is falsy."""
+    if not directory:
+        return NullCapture()
+    return HardFrameCapture(directory, **kwargs)
+
+
+# ---- Helpers ------------------------------------------------------------------
+
+
+def detections_from_boxes(boxes):
+    """ultralytics Results.boxes -> [(class, conf, x1, y1, x2, y2)] in pixels."""
+    if boxes is None:
+        return []
+    out = []
+    for box in boxes:
+        x1, y1, x2, y2 = (float(v) for v in box.xyxy[0])
+        out.append((int(box.cls[0]), float(box.conf[0]), x1, y1, x2, y2))
+    return out
+
+
+def yolo_label(detection, width, height):
+    """One YOLO label line: class and normalized center / size."""
+    cls, _, x1, y1, x2, y2 = detection
+    cx = (x1 + x2) / 2.0 / width
+    cy = (y1 + y2) / 2.0 / height
+    bw = abs(x2 - x1) / width
+    bh = abs(y2 - y1) / height
+    return f"{int(cls)} {cx:.6f} {cy:.6f} {bw:.6f} {bh:.6f}"
+
+
+def _encode_jpeg(frame, quality):
+    import cv2
+
+    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise ValueError("JPEG encode failed")
+    return buf.tobytes()
+
+
+# ---- Benchmark ----------------------------------------------------------------
+
+
+def bench(n=200, period_s=0.05, directory=None):
+    """offer() latency in the caller, plus the writer's encode time and disk throughput."""
+    import tempfile
+
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    # Noise compresses badly: a worst case for encode time and file size
+    frames = [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(4)]
+    dets = [(0, 0.4, 100.0, 80.0, 300.0, 400.0)]
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        capture = HardFrameCapture(tmp, session="bench", min_interval_s=0.0)
+        times = []
+        for i in range(n):
+            t0 = time.perf_counter()
+            capture.offer(frames[i % len(frames)], dets, dist_cm=42.0)
+            times.append(time.perf_counter() - t0)
+            time.sleep(period_s)
+        capture.close(timeout=30.0)
+        times.sort()
+        print(f"offer()  mean {sum(times) / n * 1000.0:.3f} ms  p99 "
+              f"{times[int(n * 0.99)] * 1000.0:.3f} ms  max {times[-1] * 1000.0:.3f} ms")
+        print(capture.report())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hard-frame dataset capture.")
+    parser.add_argument("--bench", action="store_true", help="offer() cost and writer throughput")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--hz", type=float, default=20.0, help="offer rate (every frame is hard)")
+    parser.add_argument("--dir", default=None, help="where to write (default: a temp dir)")
+    args = parser.parse_args()
+    if not args.bench:
+        parser.print_help()
+        return
+    bench(args.frames, 1.0 / args.hz, args.dir)
+
+
+if __name__ == "__main__":
+    main()
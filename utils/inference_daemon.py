@@ -0,0 +1,589 @@
+#!/usr/bin/env python3
+
+"""
+Long-lived inference daemon shared by the scripts over a Unix socket.
+
+Every aio script loads its own YOLO at start-up, so switching scripts costs
+a full torch import + model load and running two at once doubles memory.
+The daemon loads each model once and serves frames from any number of
+client processes:
+
+    python3 utils/inference_daemon.py serve --model ~/picarx-project/models/yolov8n.pt
+    python3 aio/yolo_ultrasonic_avoidance.py      # starts without loading torch
+    python3 utils/inference_daemon.py stats       # per-client latency, queue depth
+
+Transport
+---------
+Clients connect to PICARX_INFER_SOCKET (SOCK_SEQPACKET, one message per
+request). Frames never go through the socket: each client creates a memfd,
+passes the descriptor once with SCM_RIGHTS in its hello, and writes every
+frame into that shared buffer before sending a small fixed-size request.
+The daemon copies the frame out, batches concurrent requests for the same
+model (up to MAX_BATCH, waiting at most BATCH_WAIT_S for company), and
+replies with packed detections (22 bytes each, at most MAX_DETECTIONS).
+A client that sends something malformed is disconnected; the others are
+not affected.
+
+Scripts use load_model(path): it returns a RemoteModel with the
+ultralytics call/predict/names surface when the daemon is reachable, and
+falls back to loading YOLO locally otherwise (PICARX_INFER=local|daemon
+forces one or the other). With PICARX_OFFLOAD=<host>:<port> frames go to
+another machine instead (utils/remote_inference.py), with this daemon or
+a local model as the fallback.
+"""
+
+import argparse
+import collections
+import json
+import mmap
+import os
+import selectors
+import socket
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Make project root importable (also when run as a CLI)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import REGISTRY, Histogram, serve_from_env
+
+SOCKET_PATH = os.environ.get("PICARX_INFER_SOCKET", "/tmp/picarx-infer.sock")
+INFER_MODE = os.environ.get("PICARX_INFER", "auto")  # auto | daemon | local
+OFFLOAD_ADDR = os.environ.get("PICARX_OFFLOAD")  # host:port of utils/remote_inference.py
+MAX_BATCH = 4
+BATCH_WAIT_S = 0.005
+DEFAULT_CAPACITY = 640 * 480 * 3
+MAX_DETECTIONS = 300  # per frame, highest scores first (ultralytics' max_det)
+
+# Request: magic, seq, t_capture, h, w, c, imgsz, conf
+REQ = struct.Struct("<4sIdHHHHf")
+REQ_MAGIC = b"PXIR"
+# Response: magic, seq, t_capture, queue_ms, infer_ms, batch, n, status
+RESP = struct.Struct("<4sIdffBHB")
+RESP_MAGIC = b"PXIA"
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+DET_DTYPE = np.dtype([("cls", "<i2"), ("score", "<f4"), ("xyxy", "<f4", (4,))])
+
+QUEUE_DEPTH = REGISTRY.gauge("picarx_infer_queue_depth", "Requests waiting for inference")
+BATCH_SIZE = REGISTRY.histogram(
+    "picarx_infer_batch_size", "Frames per inference batch", buckets=(1, 2, 3, 4, 6, 8)
+)
+INFER_SECONDS = REGISTRY.histogram("picarx_infer_batch_seconds", "Backend time per batch")
+CLIENTS = REGISTRY.gauge("picarx_infer_clients", "Connected clients")
+
+
+class InferenceError(RuntimeError):
+    pass
+
+
+def model_key(path):
+    return os.path.basename(os.path.expanduser(path))
+
+
+# ---- Backends ---------------------------------------------------------------
+
+
+class YoloBackend:
+    """ultralytics YOLO; predict() takes a list of frames."""
+
+    def __init__(self, model_path):
+        from ultralytics import YOLO
+
+        self.model = YOLO(os.path.expanduser(model_path))
+        self.names = {int(k): v for k, v in dict(self.model.names).items()}
+
+    def predict(self, frames, imgsz, conf):
+        out = []
+        for r in self.model.predict(frames, imgsz=imgsz, conf=conf, verbose=False, device="cpu"):
+            b = r.boxes
+            out.append((b.cls.cpu().numpy(), b.conf.cpu().numpy(), b.xyxy.cpu().numpy()))
+        return out
+
+
+def pack_detections(cls, score, xyxy):
+    dets = np.empty(len(cls), dtype=DET_DTYPE)
+    dets["cls"] = cls
+    dets["score"] = score
+    dets["xyxy"] = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+    if len(dets) > MAX_DETECTIONS:
+        # The reply has to fit the client's fixed receive buffer
+        dets = dets[np.argsort(-dets["score"], kind="stable")[:MAX_DETECTIONS]]
+    return dets
+
+
+# ---- Daemon -----------------------------------------------------------------
+
+
+class _Client:
+    def __init__(self, sock, cid):
+        self.sock = sock
+        self.id = cid
+        self.name = f"client-{cid}"
+        self.pid = None
+        self.model = None
+        self.mm = None
+        self.requests = 0
+        self.in_flight = 0
+        self.closed = False
+        self.latency = Histogram(f"client_{cid}_latency_seconds")
+
+    def close(self):
+        self.closed = True
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        self.sock.close()
+
+    def stats(self):
+        h = self.latency
+        return {
+            "id": self.id,
+            "name": self.name,
+            "pid": self.pid,
+            "model": self.model,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "latency_mean_ms": h.sum / h.count * 1000.0 if h.count else None,
+            "latency_p95_ms": h.quantile(0.95) * 1000.0 if h.count else None,
+        }
+
+
+class _Request:
+    __slots__ = ("client", "seq", "t_capture", "shape", "imgsz", "conf", "t_recv", "frame")
+
+    def __init__(self, client, seq, t_capture, shape, imgsz, conf):
+        self.client = client
+        self.seq = seq
+        self.t_capture = t_capture
+        self.shape = shape
+        self.imgsz = imgsz
+        self.conf = conf
+        self.t_recv = time.monotonic()
+        self.frame = None
+
+
+class InferenceDaemon:
+    def __init__(self, backends, socket_path=SOCKET_PATH, max_batch=MAX_BATCH,
+                 batch_wait_s=BATCH_WAIT_S):
+        """backends: {model key: backend with .names and .predict(frames, imgsz, conf)}."""
+        self.backends = dict(backends)
+        self.socket_path = socket_path
+        self.max_batch = int(max_batch)
+        self.batch_wait_s = float(batch_wait_s)
+        self.clients = {}
+        self.batches = 0
+
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._next_id = 1
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self._listener.bind(socket_path)
+        self._listener.listen(16)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ)
+        self._worker = threading.Thread(target=self._run_worker, name="infer-worker", daemon=True)
+        self._worker.start()
+
+    # -- socket side (caller's thread) --
+
+    def serve_forever(self, poll_s=0.2):
+        while not self._closed:
+            self.poll(poll_s)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="infer-daemon", daemon=True).start()
+        return self
+
+    def poll(self, timeout=0.0):
+        for key, _ in self._selector.select(timeout):
+            if key.fileobj is self._listener:
+                self._accept()
+            else:
+                self._on_message(key.data)
+
+    def _accept(self):
+        sock, _ = self._listener.accept()
+        client = _Client(sock, self._next_id)
+        self._next_id += 1
+        try:
+            creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+            client.pid = struct.unpack("3i", creds)[0]
+        except (OSError, AttributeError):
+            pass
+        self.clients[client.id] = client
+        CLIENTS.set(len(self.clients))
+        self._selector.register(sock, selectors.EVENT_READ, client)
+
+    def _drop(self, client):
+        self._selector.unregister(client.sock)
+        self.clients.pop(client.id, None)
+        CLIENTS.set(len(self.clients))
+        with self._cond:  # the worker may be reading its buffer
+            client.close()
+
+    def _on_message(self, client):
+        try:
+            msg, fds, _, _ = socket.recv_fds(client.sock, 4096, 1)
+        except OSError:
+            msg, fds = b"", []
+        if not msg:
+            self._drop(client)
+            return
+        try:
+            if msg[:4] == REQ_MAGIC:
+                self._on_request(client, msg)
+            else:
+                self._on_control(client, json.loads(msg), fds)
+        except (ValueError, TypeError, struct.error, KeyError) as e:
+            # A broken client must not take the daemon down for the others
+            sys.stderr.write(f"[infer] dropping {client.name}: bad message ({e!r})\n")
+            for fd in fds:
+                os.close(fd)
+            self._drop(client)
+
+    def _on_request(self, client, msg):
+        _, seq, t_capture, h, w, c, imgsz, conf = REQ.unpack(msg)
+        if client.mm is None or client.model is None or not 0 < h * w * c <= len(client.mm):
+            self._reply(client, seq, t_capture, 0.0, 0.0, 0, STATUS_ERROR)
+            return
+        client.requests += 1
+        client.in_flight += 1
+        with self._cond:
+            self._queue.append(_Request(client, seq, t_capture, (h, w, c), imgsz, conf))
+            QUEUE_DEPTH.set(len(self._queue))
+            self._cond.notify()
+
+    def _on_control(self, client, msg, fds):
+        if not isinstance(msg, dict):
+            raise ValueError("control message is not a JSON object")
+        op = msg.get("op")
+        if op == "hello":
+            key = model_key(msg.get("model", ""))
+            if key not in self.backends:
+                for fd in fds:
+                    os.close(fd)
+                self._send_json(client, {"ok": False, "error": f"model {key!r} not loaded",
+                                         "models": sorted(self.backends)})
+                return
+            if fds:
+                mm = mmap.mmap(fds[0], int(msg["capacity"]))
+                os.close(fds.pop(0))
+                with self._cond:
+                    if client.mm is not None:
+                        client.mm.close()
+                    client.mm = mm
+            client.name = msg.get("name") or client.name
+            client.model = key
+            self._send_json(client, {"ok": True, "model": key, "names": self.backends[key].names})
+        elif op == "stats":
+            self._send_json(client, self.stats())
+        else:
+            self._send_json(client, {"ok": False, "error": f"unknown op {op!r}"})
+        for fd in fds:  # descriptors nothing asked for
+            os.close(fd)
+
+    def _send_json(self, client, obj):
+        try:
+            client.sock.send(json.dumps(obj).encode())
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._cond:
+            depth = len(self._queue)
+        return {
+            "ok": True,
+            "models": sorted(self.backends),
+            "queue_depth": depth,
+            "batches": self.batches,
+            "batch_mean": BATCH_SIZE.sum / BATCH_SIZE.count if BATCH_SIZE.count else None,
+            "clients": [c.stats() for c in list(self.clients.values())],
+        }
+
+    # -- inference side (worker thread) --
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            first = self._queue.popleft()
+            group = (first.client.model, first.imgsz, first.conf)
+            batch = [first]
+            deadline = time.monotonic() + self.batch_wait_s
+            while len(batch) < self.max_batch:
+                match = next((r for r in self._queue if
+                              (r.client.model, r.imgsz, r.conf) == group), None)
+                if match is not None:
+                    self._queue.remove(match)
+                    batch.append(match)
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            QUEUE_DEPTH.set(len(self._queue))
+            # Copy frames out while holding the lock, so a disconnect
+            # cannot close a buffer mid-read
+            live = []
+            for r in batch:
+                h, w, c = r.shape
+                if r.client.closed or r.client.mm is None:
+                    continue
+                if h * w * c > len(r.client.mm):  # buffer replaced by a smaller one since
+                    self._reply(r.client, r.seq, r.t_capture, 0.0, 0.0, 0, STATUS_ERROR)
+                    r.client.in_flight -= 1
+                    continue
+                r.frame = np.frombuffer(r.client.mm, np.uint8, h * w * c).reshape(h, w, c).copy()
+                live.append(r)
+            return live
+
+    def _run_worker(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if not batch:
+                continue
+            first = batch[0]
+            t0 = time.monotonic()
+            try:
+                outputs = self.backends[first.client.model].predict(
+                    [r.frame for r in batch], first.imgsz, first.conf
+                )
+                status = STATUS_OK
+            except Exception as e:  # a bad frame must not kill the daemon
+                sys.stderr.write(f"[infer] predict failed: {e}\n")
+                outputs, status = [None] * len(batch), STATUS_ERROR
+            infer_s = time.monotonic() - t0
+            self.batches += 1
+            BATCH_SIZE.observe(len(batch))
+            INFER_SECONDS.observe(infer_s)
+            for r, out in zip(batch, outputs):
+                payload = b"" if out is None else pack_detections(*out).tobytes()
+                queue_ms = (t0 - r.t_recv) * 1000.0
+                self._reply(r.client, r.seq, r.t_capture, queue_ms, infer_s * 1000.0,
+                            len(batch), status, payload, len(payload) // DET_DTYPE.itemsize)
+                r.client.in_flight -= 1
+                r.client.latency.observe(time.monotonic() - r.t_recv)
+
+    def _reply(self, client, seq, t_capture, queue_ms, infer_ms, batch, status, payload=b"", n=0):
+        header = RESP.pack(RESP_MAGIC, seq, t_capture, queue_ms, infer_ms, batch, n, status)
+        try:
+            client.sock.send(header + payload)
+        except OSError:
+            pass
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join()
+        for client in list(self.clients.values()):
+            self._drop(client)
+        self._selector.close()
+        self._listener.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+# ---- Client -----------------------------------------------------------------
+
+
+class InferenceClient:
+    def __init__(self, model_path, socket_path=SOCKET_PATH, name=None, timeout=5.0,
+                 capacity=DEFAULT_CAPACITY):
+        self.model = model_key(model_path)
+        self.name = name or f"{os.path.basename(sys.argv[0]) or 'python'}:{os.getpid()}"
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(socket_path)
+        except OSError as e:
+            self.sock.close()
+            raise ConnectionError(f"inference daemon not reachable at {socket_path}: {e}") from e
+        self._fd = os.memfd_create("picarx-frame")
+        self._mm = None
+        self._capacity = 0
+        self._seq = 0
+        self.names = {}
+        self.last = None  # (rtt_s, queue_ms, infer_ms, batch) of the newest reply
+        self._hello(capacity)
+
+    def _hello(self, capacity):
+        os.ftruncate(self._fd, capacity)
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = mmap.mmap(self._fd, capacity)
+        self._capacity = capacity
+        msg = {"op": "hello", "model": self.model, "name": self.name, "capacity": capacity}
+        socket.send_fds(self.sock, [json.dumps(msg).encode()], [self._fd])
+        reply = json.loads(self.sock.recv(65536))
+        if not reply.get("ok"):
+            raise InferenceError(reply.get("error", "hello rejected"))
+        self.names = {int(k): v for k, v in reply["names"].items()}
+
+    def predict(self, frame, imgsz=320, conf=0.25, t_capture=None):
+        """Run one frame (HxWxC uint8); returns a DET_DTYPE array."""
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        if frame.ndim == 2:
+            frame = frame[..., None]
+        if frame.nbytes > self._capacity:
+            self._hello(frame.nbytes)
+        h, w, c = frame.shape
+        self._mm[: frame.nbytes] = frame.data.cast("B")
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+        t0 = time.monotonic()
+        t_capture = t0 if t_capture is None else t_capture
+        self.sock.send(REQ.pack(REQ_MAGIC, self._seq, t_capture, h, w, c, imgsz, conf))
+        while True:
+            msg = self.sock.recv(RESP.size + MAX_DETECTIONS * DET_DTYPE.itemsize)
+            if not msg:
+                raise ConnectionError("inference daemon closed the connection")
+            _, seq, _, queue_ms, infer_ms, batch, n, status = RESP.unpack_from(msg)
+            if seq == self._seq:
+                break
+        self.last = (time.monotonic() - t0, queue_ms, infer_ms, batch)
+        if status != STATUS_OK:
+            raise InferenceError("daemon failed to run the frame")
+        return np.frombuffer(msg, DET_DTYPE, n, RESP.size)
+
+    def close(self):
+        self.sock.close()
+        if self._mm is not None:
+            self._mm.close()
+        os.close(self._fd)
+
+
+class _Box:
+    """One detection with the ultralytics Boxes element surface."""
+
+    __slots__ = ("cls", "conf", "xyxy")
+
+    def __init__(self, det):
+        self.cls = np.array([det["cls"]], dtype=np.float32)
+        self.conf = np.array([det["score"]], dtype=np.float32)
+        self.xyxy = det["xyxy"].reshape(1, 4)
+
+
+class _Result:
+    def __init__(self, dets, names):
+        self.boxes = [_Box(d) for d in dets]
+        self.names = names
+
+
+class RemoteModel:
+    """Drop-in for ultralytics.YOLO in the scripts: model(frame) / model.predict(frame)."""
+
+    def __init__(self, client):
+        self.client = client
+        self.names = client.names
+
+    def predict(self, source, imgsz=640, conf=0.25, verbose=False, device=None, **kwargs):
+        return [_Result(self.client.predict(source, imgsz=imgsz, conf=conf), self.names)]
+
+    __call__ = predict
+
+    def close(self):
+        self.client.close()
+
+
+def load_model(model_path, socket_path=SOCKET_PATH, mode=INFER_MODE, offload=OFFLOAD_ADDR):
+    """
+    RemoteModel if the daemon serves model_path, else a local YOLO.
+    mode "daemon" raises instead of falling back; "local" skips the daemon.
+    offload: "host:port" of an offload server; the model chosen above
+    becomes its fallback (PICARX_OFFLOAD_FALLBACK).
+    """
+    if offload:
+        from utils.remote_inference import open_offload
+
+        return open_offload(offload, model_path,
+                            local_factory=lambda: load_model(model_path, socket_path, mode, offload=None))
+    if mode != "local" and (mode == "daemon" or os.path.exists(socket_path)):
+        try:
+            return RemoteModel(InferenceClient(model_path, socket_path))
+        except (ConnectionError, InferenceError, OSError) as e:
+            if mode == "daemon":
+                raise
+            sys.stderr.write(f"[infer] {e}; loading the model locally\n")
+    from ultralytics import YOLO
+
+    return YOLO(os.path.expanduser(model_path))
+
+
+def request_stats(socket_path=SOCKET_PATH, timeout=5.0):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.send(json.dumps({"op": "stats"}).encode())
+        return json.loads(sock.recv(1 << 20))
+
+
+# ---- CLI --------------------------------------------------------------------
+
+
+def _print_stats(stats):
+    print(f"models={','.join(stats['models'])} queue={stats['queue_depth']} "
+          f"batches={stats['batches']} mean batch={stats['batch_mean'] or 0:.2f}")
+    for c in stats["clients"]:
+        mean = c["latency_mean_ms"]
+        p95 = c["latency_p95_ms"]
+        print(f"  {c['name']:28s} pid={c['pid']} model={c['model']} req={c['requests']} "
+              f"in_flight={c['in_flight']} "
+              f"latency mean={'-' if mean is None else f'{mean:.1f}'} ms "
+              f"p95<={'-' if p95 is None else f'{p95:.0f}'} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared inference daemon.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    serve = sub.add_parser("serve")
+    serve.add_argument("--model", action="append", required=True, help="weights (repeatable)")
+    serve.add_argument("--socket", default=SOCKET_PATH)
+    serve.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    serve.add_argument("--batch-wait-ms", type=float, default=BATCH_WAIT_S * 1000.0)
+    serve.add_argument("--report-every", type=float, default=0.0, help="print stats every N s")
+    stats = sub.add_parser("stats")
+    stats.add_argument("--socket", default=SOCKET_PATH)
+    args = parser.parse_args()
+
+    if args.cmd == "stats":
+        _print_stats(request_stats(args.socket))
+        return
+
+    backends = {}
+    for path in args.model:
+        print(f"[infer] loading {path}")
+        backends[model_key(path)] = YoloBackend(path)
+    daemon = InferenceDaemon(backends, args.socket, args.max_batch, args.batch_wait_ms / 1000.0)
+    serve_from_env()
+    print(f"[infer] serving {', '.join(backends)} on {args.socket} (Ctrl+C to stop)")
+    try:
+        next_report = time.monotonic() + args.report_every
+        while True:
+            daemon.poll(0.2)
+            if args.report_every and time.monotonic() >= next_report:
+                _print_stats(daemon.stats())
+                next_report += args.report_every
+    except KeyboardInterrupt:
+        print("\n[infer] stopping")
+    finally:
+        daemon.close()
+
+
+if __name__ == "__main__":
+    main()
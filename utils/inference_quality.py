@@ -0,0 +1,152 @@
+"""Adaptive inference input size: trade resolution for detection rate.
+
+A fixed imgsz=320 means that when the Pi throttles or another process
+takes the cores, predict() slows down and the car reacts late. A
+QualityController watches the achieved inference latency against a budget
+and moves through a ladder of input sizes, ending at an ultrasonic-only
+level where vision is paused and the car slows down:
+
+    level   0    1    2    3    4
+    imgsz   320  256  192  160  - (ultrasonic only, SPEED_SCALE_BLIND)
+
+    quality = QualityController(budget_s=0.2)
+    imgsz = quality.next_imgsz()        # None -> skip vision this loop
+    if imgsz is not None:
+        t0 = time.monotonic()
+        results = model.predict(frame, imgsz=imgsz, ...)
+        quality.observe(time.monotonic() - t0)
+    speed = FORWARD_SPEED * quality.speed_scale
+
+Hysteresis: a step down needs the median of the last WINDOW latencies over
+budget; a step up needs HOLD_S at the current level and the median, scaled
+by the pixel ratio of the next size up, under UP_MARGIN of the budget. At
+the ultrasonic-only level one probe frame at the smallest size runs every
+PROBE_INTERVAL_S to find out whether headroom came back.
+
+Exported as picarx_quality_level, picarx_quality_imgsz and
+picarx_quality_steps_{down,up}_total.
+
+Configurable per process:
+    PICARX_INFER_BUDGET_MS  (default 200)
+    PICARX_INFER_SIZES      (default "320,256,192,160"; one size disables adapting)
+"""
+import os
+import statistics
+import sys
+import time
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import REGISTRY
+
+BUDGET_S = float(os.environ.get("PICARX_INFER_BUDGET_MS", "200")) / 1000.0
+SIZES = tuple(int(s) for s in os.environ.get("PICARX_INFER_SIZES", "320,256,192,160").split(","))
+WINDOW = 5  # latencies per decision
+HOLD_S = 3.0  # minimum time at a level before stepping up
+UP_MARGIN = 0.8  # predicted latency at the next size must fit in this much budget
+PROBE_INTERVAL_S = 2.0  # ultrasonic-only level: one probe inference this often
+SPEED_SCALE_BLIND = 0.6  # speed factor while vision is paused
+
+
+class QualityController:
+    def __init__(self, budget_s=BUDGET_S, sizes=SIZES, allow_ultrasonic_only=True,
+                 window=WINDOW, hold_s=HOLD_S, up_margin=UP_MARGIN,
+                 probe_interval_s=PROBE_INTERVAL_S, registry=REGISTRY, clock=None):
+        self.budget_s = float(budget_s)
+        self.sizes = tuple(sorted(sizes, reverse=True))
+        self.blind_level = len(self.sizes) if allow_ultrasonic_only else None
+        self.window = int(window)
+        self.hold_s = float(hold_s)
+        self.up_margin = float(up_margin)
+        self.probe_interval_s = float(probe_interval_s)
+        self.clock = clock or time.monotonic
+
+        self.level = 0
+        self.transitions = []  # (t, from level, to level, median latency)
+        self._samples = []
+        self._since = self.clock()
+        self._next_probe = 0.0
+        self._probing = False
+
+        self._level_gauge = registry.gauge("picarx_quality_level", "0 = full size; max = ultrasonic only")
+        self._imgsz_gauge = registry.gauge("picarx_quality_imgsz", "Inference input size (0 = paused)")
+        self._down = registry.counter("picarx_quality_steps_down_total", "Quality reductions")
+        self._up = registry.counter("picarx_quality_steps_up_total", "Quality increases")
+        self._publish()
+
+    # ---- State ---------------------------------------------------------------
+
+    @property
+    def vision_enabled(self):
+        return self.level != self.blind_level
+
+    @property
+    def imgsz(self):
+        """Input size at the current level; None at the ultrasonic-only level."""
+        return self.sizes[self.level] if self.vision_enabled else None
+
+    @property
+    def speed_scale(self):
+        return 1.0 if self.vision_enabled else SPEED_SCALE_BLIND
+
+    def describe(self):
+        return f"imgsz={self.imgsz}" if self.vision_enabled else "ultrasonic only"
+
+    # ---- Loop interface -------------------------------------------------------
+
+    def next_imgsz(self, now=None):
+        """Size to run this loop's frame at, or None to skip inference."""
+        if self.vision_enabled:
+            return self.imgsz
+        now = self.clock() if now is None else now
+        if now < self._next_probe:
+            return None
+        self._next_probe = now + self.probe_interval_s
+        self._probing = True
+        return self.sizes[-1]
+
+    def observe(self, latency_s, now=None):
+        """Feed one inference latency; returns True if the level changed."""
+        now = self.clock() if now is None else now
+        if self._probing:
+            self._probing = False
+            if latency_s < self.budget_s * self.up_margin:
+                return self._move(len(self.sizes) - 1, now, latency_s)
+            return False
+
+        self._samples.append(float(latency_s))
+        if len(self._samples) > self.window:
+            del self._samples[0]
+        if len(self._samples) < self.window:
+            return False
+        median = statistics.median(self._samples)
+
+        last = self.blind_level if self.blind_level is not None else len(self.sizes) - 1
+        if median > self.budget_s and self.level < last:
+            return self._move(self.level + 1, now, median)
+        if self.level > 0 and now - self._since >= self.hold_s:
+            # Inference cost grows with the pixel count
+            scale = (self.sizes[self.level - 1] / self.sizes[self.level]) ** 2
+            if median * scale < self.budget_s * self.up_margin:
+                return self._move(self.level - 1, now, median)
+        return False
+
+    def _move(self, level, now, median):
+        if level > self.level:
+            self._down.inc()
+        else:
+            self._up.inc()
+        self.transitions.append((now, self.level, level, median))
+        self.level = level
+        self._samples.clear()
+        self._since = now
+        self._next_probe = now + self.probe_interval_s
+        self._publish()
+        return True
+
+    def _publish(self):
+        self._level_gauge.set(self.level)
+        self._imgsz_gauge.set(self.imgsz or 0)
@@ -1,12 +1,18 @@
 """Wrapper for SunFounder PiCar-X."""
 from picarx import Picarx
 
+from utils.freshness import Stamped, read_stamped
+
 
 class PX:
     """Unified wrapper for SunFounder PiCar-X."""
 
-    def __init__(self):
-        self.robot = Picarx()
+    def __init__(self, robot=None):
+        """
+        robot: optional Picarx-compatible object (e.g. sim.car.SimPicarx);
+        a real Picarx is created when omitted.
+        """
+        self.robot = robot if robot is not None else Picarx()
 
     # --- Motion -----------------------------------------------------------
 
@@ -38,7 +44,13 @@ class PX:
             d = -1
         return d
 
+    def get_distance_sample(self) -> Stamped:
+        """get_distance_cm() stamped with its monotonic capture time."""
+        return read_stamped(self.get_distance_cm)
+
     # --- Cleanup ----------------------------------------------------------
 
     def cleanup(self):
-        s
+        self.robot.stop()
+        self.robot.set_dir_servo_angle(0)
+        self.robot.close()
@@ -0,0 +1,271 @@
+"""Activity-aware power saving while the car stands still.
+
+A stopped car (teleop with motion "stop", or the avoidance loop holding
+speed 0) used to keep grabbing frames, running YOLO and pinging the
+ultrasonic sensor at full rate, draining the battery and heating the Pi.
+A PowerGovernor tracks activity and, after IDLE_AFTER_S without any,
+switches the loop to idle rates:
+
+    kind         active        idle
+    camera       every loop    every 0.5 s
+    inference    every loop    every 1.0 s
+    ultrasonic   every loop    every 0.2 s
+    loop         SLEEP_DT      0.25 s wait (select()/sleep timeout)
+
+    governor = PowerGovernor()
+    while True:
+        key = read_key(timeout=governor.wait_s(SLEEP_DT))   # a key still wakes select() at once
+        if key:
+            governor.wake("key")
+        governor.drive(motion != "stop")                    # moving keeps it active
+        if governor.due("ultrasonic"):
+            dist = px.get_distance()
+            governor.observe_distance(dist)                 # a scene change wakes it too
+        ...
+
+Any drive command, key or scene change (ultrasonic reading moving by
+SCENE_DELTA_CM, or a camera thumbnail differing by SCENE_DIFF from the one
+taken when the car went idle) restores full rate on the same loop
+iteration. report() gives the process CPU utilisation in each mode and the
+wake-ups; picarx_power_mode and picarx_power_wakeups_total are exported.
+
+The keyboard teleop scripts have no camera, so idling there slows only the
+ultrasonic polling and loop wake-ups, and any key restores full rate at
+once. The YOLO text/picam demos never drive: once their scene stops
+changing, frames, YOLO and ultrasonic all drop to idle rates.
+
+PICARX_IDLE_AFTER_S=0 disables idling.
+
+    python3 utils/power_save.py --bench     # CPU per mode and wake-up latency
+"""
+import argparse
+import collections
+import os
+import select
+import sys
+import threading
+import time
+
+# Make project root importable (also when run as a CLI)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import REGISTRY
+
+ACTIVE = "active"
+IDLE = "idle"
+
+IDLE_AFTER_S = float(os.environ.get("PICARX_IDLE_AFTER_S", "3.0"))
+# Seconds between samples of each kind in each mode; 0 = every loop
+PERIODS = {
+    ACTIVE: {"camera": 0.0, "inference": 0.0, "ultrasonic": 0.0, "loop": 0.0},
+    IDLE: {"camera": 0.5, "inference": 1.0, "ultrasonic": 0.2, "loop": 0.25},
+}
+SCENE_DELTA_CM = 10.0
+SCENE_DIFF = 12.0  # mean absolute difference of 0-255 thumbnail pixels
+THUMB_STEP = 16  # thumbnail = every 16th pixel (40x30 from 640x480)
+
+
+class PowerGovernor:
+    def __init__(self, idle_after_s=IDLE_AFTER_S, periods=PERIODS, scene_delta_cm=SCENE_DELTA_CM,
+                 scene_diff=SCENE_DIFF, registry=REGISTRY, clock=None, cpu_clock=None):
+        """
+        clock: monotonic seconds (time.monotonic). cpu_clock: process CPU
+        seconds (time.process_time).
+        """
+        self.idle_after_s = float(idle_after_s)
+        self.periods = periods
+        self.scene_delta_cm = float(scene_delta_cm)
+        self.scene_diff = float(scene_diff)
+        self.clock = clock or time.monotonic
+        self.cpu_clock = cpu_clock or time.process_time
+
+        now = self.clock()
+        self.mode = ACTIVE
+        self.wakeups = collections.Counter()  # reason -> count
+        self._last_activity = now
+        self._next = {}
+        self._ref_cm = None
+        self._ref_thumb = None
+        # Wall and CPU seconds per mode, accounted at each switch
+        self._wall = {ACTIVE: 0.0, IDLE: 0.0}
+        self._cpu = {ACTIVE: 0.0, IDLE: 0.0}
+        self._mode_t = now
+        self._mode_cpu = self.cpu_clock()
+
+        self._mode_gauge = registry.gauge("picarx_power_mode", "0 = active, 1 = idle (power save)")
+        self._wakeups = registry.counter("picarx_power_wakeups_total", "Idle -> active switches")
+        self._mode_gauge.set(0)
+
+    # ---- Activity -------------------------------------------------------------
+
+    def wake(self, reason="activity", now=None):
+        """Record activity; returns True if this ended an idle period."""
+        now = self.clock() if now is None else now
+        self._last_activity = now
+        if self.mode != IDLE:
+            return False
+        self.wakeups[reason] += 1
+        self._wakeups.inc()
+        self._switch(ACTIVE, now)
+        return True
+
+    def drive(self, moving, now=None):
+        """Call every loop with whether the car is commanded to move."""
+        if moving:
+            self.wake("drive", now)
+        return self.update(now)
+
+    def observe_distance(self, cm, now=None):
+        """An ultrasonic reading; a large change while idle is a scene change."""
+        if cm is None or cm <= 0:
+            return False
+        if self.mode == IDLE and self._ref_cm is not None:
+            if abs(cm - self._ref_cm) >= self.scene_delta_cm:
+                return self.wake("scene", now)
+            return False
+        self._ref_cm = cm
+        return False
+
+    def observe_frame(self, frame, now=None):
+        """A camera frame; a thumbnail differing from the idle reference wakes the loop."""
+        if frame is None:
+            return False
+        thumb = frame[::THUMB_STEP, ::THUMB_STEP].astype("int16")
+        if self.mode == IDLE and self._ref_thumb is not None and self._ref_thumb.shape == thumb.shape:
+            diff = float(abs(thumb - self._ref_thumb).mean())
+            if diff >= self.scene_diff:
+                return self.wake("scene", now)
+            return False
+        self._ref_thumb = thumb
+        return False
+
+    def update(self, now=None):
+        """Go idle once nothing happened for idle_after_s. Returns the mode."""
+        now = self.clock() if now is None else now
+        if (self.mode == ACTIVE and self.idle_after_s > 0
+                and now - self._last_activity >= self.idle_after_s):
+            self._switch(IDLE, now)
+        return self.mode
+
+    # ---- Rates ----------------------------------------------------------------
+
+    def due(self, kind, now=None):
+        """True if a sample of `kind` should run this loop at the current mode's rate."""
+        period = self.periods[self.mode].get(kind, 0.0)
+        if period <= 0:
+            return True
+        now = self.clock() if now is None else now
+        if now >= self._next.get(kind, 0.0):
+            self._next[kind] = now + period
+            return True
+        return False
+
+    def wait_s(self, active_s):
+        """Loop wait: active_s normally, the idle loop period while idle."""
+        return max(active_s, self.periods[self.mode].get("loop", 0.0))
+
+    def _switch(self, mode, now):
+        cpu = self.cpu_clock()
+        self._wall[self.mode] += now - self._mode_t
+        self._cpu[self.mode] += cpu - self._mode_cpu
+        self._mode_t, self._mode_cpu = now, cpu
+        self.mode = mode
+        self._next.clear()  # waking up: every kind is due immediately
+        if mode == IDLE:
+            # Scene references are taken at the first samples after going idle
+            self._ref_cm = None
+            self._ref_thumb = None
+        self._mode_gauge.set(1 if mode == IDLE else 0)
+
+    # ---- Reporting ------------------------------------------------------------
+
+    def utilisation(self, now=None):
+        """{mode: (wall seconds, CPU fraction of one core)} including the current stretch."""
+        now = self.clock() if now is None else now
+        wall, cpu = dict(self._wall), dict(self._cpu)
+        wall[self.mode] += now - self._mode_t
+        cpu[self.mode] += self.cpu_clock() - self._mode_cpu
+        return {m: (wall[m], cpu[m] / wall[m] if wall[m] > 0 else 0.0) for m in (ACTIVE, IDLE)}
+
+    def report(self, now=None):
+        parts = [f"{m} {wall:.0f} s at {frac * 100.0:.0f}% CPU"
+                 for m, (wall, frac) in self.utilisation(now).items()]
+        reasons = ", ".join(f"{r} {n}" for r, n in self.wakeups.items())
+        return f"{'; '.join(parts)}; {sum(self.wakeups.values())} wake-ups ({reasons or 'none'})"
+
+
+# ---- Benchmark ----------------------------------------------------------------
+
+
+def bench(seconds=6.0, idle_after_s=1.0, infer_ms=40.0, wakes=5):
+    """
+    A stand-in camera + inference + ultrasonic loop, stationary the whole
+    time; another thread "presses a key" now and then while it is idle.
+    Reports CPU per mode and the latency from key press to the start of
+    the first full-rate inference.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    governor = PowerGovernor(idle_after_s=idle_after_s)
+    r, w = os.pipe()
+    pressed = []
+    latencies = []
+    stop = threading.Event()
+
+    def presser():
+        while not stop.is_set():
+            time.sleep(idle_after_s + 1.5)
+            if governor.mode == IDLE:
+                pressed.append(time.monotonic())
+                os.write(w, b"w")
+
+    def infer():
+        t_end = time.perf_counter() + infer_ms / 1000.0
+        x = 0
+        while time.perf_counter() < t_end:  # busy, like predict() on the CPU
+            x += 1
+
+    threading.Thread(target=presser, daemon=True).start()
+    t_end = time.monotonic() + seconds
+    while time.monotonic() < t_end and len(latencies) < wakes:
+        rlist, _, _ = select.select([r], [], [], governor.wait_s(0.0))
+        if rlist:
+            os.read(r, 1)
+            governor.wake("key")
+        governor.update()
+        if governor.due("camera"):
+            governor.observe_frame(frame.copy())
+        if governor.due("inference"):
+            if pressed and governor.mode == ACTIVE:
+                latencies.append(time.monotonic() - pressed.pop())
+            infer()
+        if governor.due("ultrasonic"):
+            time.sleep(0.002)  # the sensor's echo wait
+    stop.set()
+    os.close(r)
+    os.close(w)
+    print(governor.report())
+    if latencies:
+        print(f"wake-up latency (key -> full-rate inference starts): "
+              f"mean {sum(latencies) / len(latencies) * 1000.0:.2f} ms  "
+              f"max {max(latencies) * 1000.0:.2f} ms over {len(latencies)} wake-ups")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Idle power-save governor.")
+    parser.add_argument("--bench", action="store_true", help="CPU per mode and wake-up latency")
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--infer-ms", type=float, default=40.0, help="stand-in inference cost")
+    args = parser.parse_args()
+    if not args.bench:
+        parser.print_help()
+        return
+    bench(args.seconds, infer_ms=args.infer_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""Hot-path timing spans and an on-demand sampling profiler.
+
+Spans
+-----
+Wrap the hot stages of a loop so their cost shows up as histograms in the
+metrics registry (utils/metrics.py) as `picarx_span_<name>_seconds`:
+
+    with span("predict"):
+        results = model.predict(frame)
+
+    @spanned("decide")
+    def decide(...): ...
+
+Spans are off by default; span() then returns a shared no-op context
+manager, so a disabled span costs one function call. Enable them with
+PICARX_SPANS=1 at start-up, or toggle them on a running process with
+`kill -USR2 <pid>`.
+
+Sampling profiler
+-----------------
+install() (called by the loop scripts at start-up) arms two triggers that
+need no restart:
+
+    kill -USR1 <pid>                         # profile PICARX_PROFILE_SECONDS (10 s)
+    python3 utils/profiling.py <pid> 5       # same, over the control socket
+
+A background thread then samples every thread's stack with
+sys._current_frames() and writes collapsed stacks ("a;b;c 42" per line) to
+PICARX_PROFILE_DIR (default /tmp). The file feeds straight into
+flamegraph.pl or speedscope.app.
+"""
+import atexit
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+# Make project root importable (also when run as a CLI)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import REGISTRY
+
+PROFILE_DIR = os.environ.get("PICARX_PROFILE_DIR", "/tmp")
+PROFILE_SECONDS = float(os.environ.get("PICARX_PROFILE_SECONDS", "10"))
+SAMPLE_INTERVAL_S = 0.005  # 200 Hz
+
+
+# ---- Spans ----------------------------------------------------------------
+
+_enabled = os.environ.get("PICARX_SPANS") == "1"
+_span_hists = {}
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("_hist", "_t0")
+
+    def __init__(self, hist):
+        self._hist = hist
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe(time.perf_counter() - self._t0)
+        return False
+
+
+def _hist_for(name):
+    hist = _span_hists.get(name)
+    if hist is None:
+        hist = REGISTRY.histogram(f"picarx_span_{name}_seconds", f"Time spent in span '{name}'")
+        _span_hists[name] = hist
+    return hist
+
+
+def span(name):
+    """Context manager timing one stage; a no-op unless spans are enabled."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(_hist_for(name))
+
+
+def spanned(name=None):
+    """Decorator form of span(); the name defaults to the function name."""
+
+    def decorate(fn):
+        label = name or fn.__name__
+
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(_hist_for(label)):
+                return fn(*args, **kwargs)
+
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.__wrapped__ = fn
+        return wrapper
+
+    return decorate
+
+
+def set_spans_enabled(flag):
+    global _enabled
+    _enabled = bool(flag)
+
+
+def spans_enabled():
+    return _enabled
+
+
+def span_report():
+    """One line per span: count, mean and coarse p95 (bucket bound)."""
+    lines = []
+    for name, hist in sorted(_span_hists.items()):
+        if hist.count:
+            mean_ms = hist.sum / hist.count * 1000.0
+            lines.append(
+                f"{name:12s} n={hist.count:6d} mean={mean_ms:8.3f} ms "
+                f"p95<={hist.quantile(0.95) * 1000.0:.1f} ms"
+            )
+    return "\n".join(lines) or "no spans recorded"
+
+
+# ---- Sampling profiler ----------------------------------------------------
+
+
+class SamplingProfiler:
+    """Samples all thread stacks at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, interval_s=SAMPLE_INTERVAL_S):
+        self.interval = float(interval_s)
+        self.stacks = {}
+        self.samples = 0
+
+    def sample_once(self, skip_ident=None):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == skip_ident:
+                continue
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            parts.append(names.get(ident, f"thread-{ident}"))
+            key = ";".join(reversed(parts))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+        self.samples += 1
+
+    def run(self, seconds):
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        next_t = time.monotonic()
+        while time.monotonic() < deadline:
+            self.sample_once(skip_ident=me)
+            next_t += self.interval
+            delay = next_t - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return self
+
+    def folded(self):
+        return "".join(
+            f"{stack} {count}\n"
+            for stack, count in sorted(self.stacks.items(), key=lambda kv: -kv[1])
+        )
+
+    def write(self, path):
+        with open(path, "w") as f:
+            f.write(self.folded())
+        return path
+
+
+_profile_lock = threading.Lock()
+
+
+def profile_to_file(seconds=PROFILE_SECONDS, directory=None):
+    """
+    Profile the whole process for `seconds` and write a .folded file.
+    Returns the path, or None if a capture is already running.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        prof = SamplingProfiler().run(seconds)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(directory or PROFILE_DIR, f"picarx-{os.getpid()}-{stamp}.folded")
+        prof.write(path)
+        return path
+    finally:
+        _profile_lock.release()
+
+
+def start_profile(seconds=PROFILE_SECONDS, directory=None):
+    """Run profile_to_file() on a background thread (never blocks the caller)."""
+    thread = threading.Thread(
+        target=lambda: _report(profile_to_file(seconds, directory)),
+        name="picarx-profiler",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def _report(path):
+    # stderr: the loops own stdout for their status line
+    if path:
+        sys.stderr.write(f"\n[profiling] wrote {path}\n")
+
+
+# ---- Triggers -------------------------------------------------------------
+
+
+def socket_path(pid=None):
+    return os.path.join(PROFILE_DIR, f"picarx-{pid or os.getpid()}.sock")
+
+
+def _serve_control(sock):
+    while True:
+        try:
+            conn, _ = sock.accept()
+        except OSError:
+            return
+        with conn:
+            try:
+                cmd = conn.recv(256).decode().split()
+                reply = _handle_command(cmd)
+            except Exception as e:  # never let a bad request kill the thread
+                reply = f"error: {e}"
+            try:
+                conn.sendall(reply.encode() + b"\n")
+            except OSError:
+                pass
+
+
+def _handle_command(cmd):
+    if not cmd:
+        return "commands: profile [seconds] | spans on|off | spans"
+    if cmd[0] == "profile":
+        seconds = float(cmd[1]) if len(cmd) > 1 else PROFILE_SECONDS
+        return profile_to_file(seconds) or "busy: a capture is already running"
+    if cmd[0] == "spans":
+        if len(cmd) > 1:
+            set_spans_enabled(cmd[1] == "on")
+        return f"spans {'on' if _enabled else 'off'}\n{span_report()}"
+    return f"unknown command {cmd[0]!r}"
+
+
+def start_control_socket(path=None):
+    """Listen for profiler commands on a Unix socket (one client at a time)."""
+    path = path or socket_path()
+    if os.path.exists(path):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen(1)
+    atexit.register(lambda: os.path.exists(path) and os.unlink(path))
+    threading.Thread(target=_serve_control, args=(sock,), name="picarx-profiler-ctl", daemon=True).start()
+    return sock
+
+
+def install(control_socket=True):
+    """
+    Arm the on-demand triggers: SIGUSR1 starts a capture, SIGUSR2 toggles
+    spans, and (optionally) a control socket accepts commands. Must be
+    called from the main thread.
+    """
+    signal.signal(signal.SIGUSR1, lambda signum, frame: start_profile())
+    signal.signal(signal.SIGUSR2, lambda signum, frame: set_spans_enabled(not _enabled))
+    if control_socket:
+        try:
+            return start_control_socket()
+        except OSError as e:
+            sys.stderr.write(f"[profiling] control socket unavailable: {e}\n")
+    return None
+
+
+def request(pid, *cmd, timeout=None):
+    """Send a command to a running process's control socket; returns its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path(pid))
+        sock.sendall(" ".join(str(c) for c in cmd).encode())
+        return sock.recv(65536).decode().strip()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+    pid = int(sys.argv[1])
+    args = sys.argv[2:]
+    if args and not args[0].replace(".", "", 1).isdigit():
+        print(request(pid, *args, timeout=10))
+        return
+    seconds = float(args[0]) if args else PROFILE_SECONDS
+    if os.path.exists(socket_path(pid)):
+        print(request(pid, "profile", seconds, timeout=seconds + 10))
+    else:
+        os.kill(pid, signal.SIGUSR1)
+        print(f"Sent SIGUSR1 to {pid}; it writes picarx-{pid}-*.folded to {PROFILE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""Memory-mapped binary session recorder for the control loops.
+
+Each control-loop iteration appends one fixed-size little-endian record
+(monotonic timestamp, ultrasonic distance, commanded speed/steer/pan/tilt,
+detection summary, loop timing) into a pre-sized, memory-mapped segment
+file. Writing is a single `struct.pack_into` into the map plus a header
+count update, so a record costs a few microseconds and never touches the
+filesystem API in the loop. When a segment fills up the recorder rotates
+to the next file. The header count is kept current, so a session that
+ends in a crash or power cut is still readable up to the last record.
+
+Files for one session are named `<session>-0000.pxrec`, `<session>-0001.pxrec`, ...
+
+Usage in a loop:
+    rec = open_session(RECORD_DIR)       # no-op recorder when RECORD_DIR is None
+    ...
+    rec.record(dist_cm=d, speed=s, steer=a, loop_ms=dt_ms)
+    ...
+    rec.close()
+
+Analysis:
+    python3 utils/recorder.py ~/picarx-runs            # summarize latest session
+    python3 utils/recorder.py --bench                  # per-record cost
+    arr = load_session("~/picarx-runs")                # NumPy structured array
+"""
+import glob
+import mmap
+import os
+import struct
+import sys
+import time
+
+MAGIC = b"PXREC001"
+SUFFIX = ".pxrec"
+
+# magic, record size, capacity, count, session start (monotonic), start (epoch)
+_HEADER = struct.Struct("<8sIIQdd")
+HEADER_SIZE = 64
+_COUNT_OFFSET = 16
+
+# t_mono, dist_cm, speed, steer, pan, tilt,
+# n_dets, best_class, best_score, best_cx, best_cy, loop_ms, state, flags
+_RECORD = struct.Struct("<dfffffHhffffhH")
+RECORD_SIZE = _RECORD.size
+
+RECORD_FIELDS = [
+    ("t", "<f8"),
+    ("dist_cm", "<f4"),
+    ("speed", "<f4"),
+    ("steer", "<f4"),
+    ("pan", "<f4"),
+    ("tilt", "<f4"),
+    ("n_dets", "<u2"),
+    ("best_class", "<i2"),
+    ("best_score", "<f4"),
+    ("best_cx", "<f4"),
+    ("best_cy", "<f4"),
+    ("loop_ms", "<f4"),
+    ("state", "<i2"),
+    ("flags", "<u2"),
+]
+
+# Flag bits shared by the scripts
+FLAG_VISION_OBSTACLE = 1 << 0
+FLAG_ULTRASONIC_OBSTACLE = 1 << 1
+FLAG_MANEUVER = 1 << 2
+FLAG_SAFETY_STOP = 1 << 3
+FLAG_STALE_INPUT = 1 << 4  # an input was rejected as too old (utils/freshness.py)
+FLAG_VISION_WARMUP = 1 << 5  # vision still loading; ultrasonic-only control (utils/startup.py)
+FLAG_VISION_PAUSED = 1 << 6  # over inference budget; ultrasonic-only (utils/inference_quality.py)
+
+DEFAULT_SEGMENT_RECORDS = 1 << 16  # ~3.5 MB, ~55 min at 20 Hz
+
+
+class SessionRecorder:
+    """Appends fixed-size records into rotating memory-mapped segments."""
+
+    def __init__(self, directory, session=None, segment_records=DEFAULT_SEGMENT_RECORDS):
+        self.directory = os.path.expanduser(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.session = session or time.strftime("%Y%m%d-%H%M%S")
+        self.segment_records = int(segment_records)
+        self.segment_index = -1
+        self.total = 0
+
+        self._t0 = time.monotonic()
+        self._epoch0 = time.time()
+        self._fd = None
+        self._map = None
+        self._count = 0
+        self._open_segment()
+
+    # ---- Segments ---------------------------------------------------------
+
+    def segment_path(self, index):
+        return os.path.join(self.directory, f"{self.session}-{index:04d}{SUFFIX}")
+
+    def _open_segment(self):
+        self._close_segment()
+        self.segment_index += 1
+        size = HEADER_SIZE + self.segment_records * RECORD_SIZE
+        path = self.segment_path(self.segment_index)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        _HEADER.pack_into(
+            self._map, 0, MAGIC, RECORD_SIZE, self.segment_records, 0, self._t0, self._epoch0
+        )
+        self._count = 0
+
+    def _close_segment(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._map = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    # ---- Recording --------------------------------------------------------
+
+    def record(
+        self,
+        dist_cm=-1.0,
+        speed=0.0,
+        steer=0.0,
+        pan=0.0,
+        tilt=0.0,
+        n_dets=0,
+        best_class=-1,
+        best_score=0.0,
+        best_cx=0.0,
+        best_cy=0.0,
+        loop_ms=0.0,
+        state=0,
+        flags=0,
+        t=None,
+    ):
+        if self._count >= self.segment_records:
+            self._open_segment()
+        _RECORD.pack_into(
+            self._map,
+            HEADER_SIZE + self._count * RECORD_SIZE,
+            time.monotonic() if t is None else t,
+            dist_cm,
+            speed,
+            steer,
+            pan,
+            tilt,
+            n_dets,
+            best_class,
+            best_score,
+            best_cx,
+            best_cy,
+            loop_ms,
+            state,
+            flags,
+        )
+        self._count += 1
+        self.total += 1
+        struct.pack_into("<Q", self._map, _COUNT_OFFSET, self._count)
+
+    def close(self):
+        self._close_segment()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __bool__(self):
+        return True
+
+
+class NullRecorder:
+    """Stand-in when recording is off; every call is a no-op."""
+
+    total = 0
+
+    def record(self, *args, **kwargs):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def __bool__(self):
+        return False
+
+
+def open_session(directory, session=None, segment_records=DEFAULT_SEGMENT_RECORDS):
+    """SessionRecorder in `directory`, or a NullRecorder if directory is falsy."""
+    if not directory:
+        return NullRecorder()
+    return SessionRecorder(directory, session=session, segment_records=segment_records)
+
+
+# ---- Reading --------------------------------------------------------------
+
+
+def record_dtype():
+    import numpy as np
+
+    return np.dtype(RECORD_FIELDS)
+
+
+def list_sessions(directory):
+    """Session names in `directory`, oldest first."""
+    names = set()
+    for path in glob.glob(os.path.join(os.path.expanduser(directory), "*" + SUFFIX)):
+        names.add(os.path.basename(path).rsplit("-", 1)[0])
+    return sorted(names)
+
+
+def load_segment(path):
+    """Records of one segment file as a NumPy structured array (a copy)."""
+    import numpy as np
+
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+        magic, rec_size, _, count, _, _ = _HEADER.unpack_from(header)
+        if magic != MAGIC or rec_size != RECORD_SIZE:
+            raise ValueError(f"{path}: not a recorder segment (or wrong version)")
+        return np.fromfile(f, dtype=record_dtype(), count=count)
+
+
+def load_session(directory, session=None):
+    """
+    Load a whole session (all segments, in order) as one structured array.
+    Picks the most recent session in `directory` when `session` is None.
+    Adds no columns; `arr["t"] - arr["t"][0]` gives seconds since start.
+    """
+    import numpy as np
+
+    directory = os.path.expanduser(directory)
+    if session is None:
+        sessions = list_sessions(directory)
+        if not sessions:
+            raise FileNotFoundError(f"no recorder sessions in {directory}")
+        session = sessions[-1]
+    paths = sorted(glob.glob(os.path.join(directory, f"{session}-[0-9][0-9][0-9][0-9]{SUFFIX}")))
+    if not paths:
+        raise FileNotFoundError(f"session {session} not found in {directory}")
+    parts = [load_segment(p) for p in paths]
+    return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+
+def summarize(arr):
+    import numpy as np
+
+    if len(arr) == 0:
+        return "empty session"
+    dur = float(arr["t"][-1] - arr["t"][0])
+    loop = arr["loop_ms"]
+    valid = arr["dist_cm"][arr["dist_cm"] > 0]
+    lines = [
+        f"records      : {len(arr)} over {dur:.1f} s ({len(arr) / max(dur, 1e-9):.1f} Hz)",
+        f"loop ms      : mean {loop.mean():.2f}  p50 {np.percentile(loop, 50):.2f}  "
+        f"p95 {np.percentile(loop, 95):.2f}  max {loop.max():.2f}",
+        f"distance cm  : min {valid.min() if len(valid) else -1:.1f}  "
+        f"mean {valid.mean() if len(valid) else -1:.1f}",
+        f"detections   : {int((arr['n_dets'] > 0).sum())} records with detections",
+        f"vision stops : {int((arr['flags'] & FLAG_VISION_OBSTACLE).astype(bool).sum())}  "
+        f"ultrasonic stops: {int((arr['flags'] & FLAG_ULTRASONIC_OBSTACLE).astype(bool).sum())}  "
+        f"stale inputs: {int((arr['flags'] & FLAG_STALE_INPUT).astype(bool).sum())}  "
+        f"warm-up: {int((arr['flags'] & FLAG_VISION_WARMUP).astype(bool).sum())}  "
+        f"paused: {int((arr['flags'] & FLAG_VISION_PAUSED).astype(bool).sum())}",
+    ]
+    return "\n".join(lines)
+
+
+def _bench(n=200_000):
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rec = SessionRecorder(tmp, session="bench", segment_records=50_000)
+        t0 = time.perf_counter()
+        for i in range(n):
+            rec.record(dist_cm=42.0, speed=25, steer=-10, n_dets=1, best_class=0,
+                       best_score=0.8, best_cx=0.1, loop_ms=50.0)
+        dt = time.perf_counter() - t0
+        rec.close()
+        arr = load_session(tmp, "bench")
+    print(f"{n} records, {rec.segment_index + 1} segments: {dt / n * 1e6:.2f} us/record")
+    assert len(arr) == n
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--bench":
+        _bench()
+    elif len(sys.argv) > 1:
+        directory = sys.argv[1]
+        name = sys.argv[2] if len(sys.argv) > 2 else None
+        data = load_session(directory, name)
+        print(summarize(data))
+    else:
+        print(__doc__)
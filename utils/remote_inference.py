@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+
+"""
+Remote inference offload over the LAN, with local fallback.
+
+YOLO on the Pi's CPU is the slowest stage of the aio loops, while a laptop
+on the same network sits idle. With PICARX_OFFLOAD=<host>:<port> set,
+load_model() (utils/inference_daemon.py) returns an OffloadModel that
+sends each frame to an OffloadServer instead:
+
+    python3 utils/remote_inference.py serve --model yolov8n.pt         # on the laptop
+    PICARX_OFFLOAD=192.168.1.20:9110 python3 aio/yolo_ultrasonic_avoidance.py
+
+Transport
+---------
+One TCP connection (TCP_NODELAY) per client. Frames are downscaled by an
+integer step to about the inference size, then JPEG-encoded (zlib of the
+raw pixels where cv2 is missing, e.g. in tests); a 640x480 frame at
+imgsz=320 is ~15 kB. Up to PICARX_OFFLOAD_IN_FLIGHT frames are pipelined:
+predict() sends the new frame and returns the newest result that has come
+back, so the round trip overlaps the loop's other work. `lag_s` says how
+much older than the current frame that result is (0 when synchronous),
+and `source` is the frame it was computed on.
+Boxes are scaled back to the full-size frame.
+
+Fallback
+--------
+When the link drops, a reply takes longer than TIMEOUT_FACTOR x budget,
+or the median of the last WINDOW round trips exceeds the budget
+(PICARX_OFFLOAD_BUDGET_MS), the model falls back to
+- "local":      a locally loaded model (load_model() without offload), or
+- "ultrasonic": no vision; `available` turns False and the loop must not
+  trust the (empty) results.
+Every RETRY_S it reconnects and tries the remote again. Mode, round trip,
+bytes each way and fallback events are exported as picarx_offload_*
+metrics and summarized by report().
+
+    python3 utils/remote_inference.py bench 192.168.1.20:9110     # RTT and bandwidth
+    python3 utils/remote_inference.py bench --loopback            # against a stand-in model
+"""
+
+import argparse
+import collections
+import json
+import os
+import socket
+import statistics
+import struct
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# Make project root importable (also when run as a CLI)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.inference_daemon import (
+    DET_DTYPE,
+    STATUS_ERROR,
+    STATUS_OK,
+    InferenceError,
+    YoloBackend,
+    _Result,
+    model_key,
+    pack_detections,
+)
+from utils.metrics import REGISTRY, serve_from_env
+
+PORT = 9110
+BUDGET_S = float(os.environ.get("PICARX_OFFLOAD_BUDGET_MS", "150")) / 1000.0
+FALLBACK = os.environ.get("PICARX_OFFLOAD_FALLBACK", "local")  # local | ultrasonic
+IN_FLIGHT = int(os.environ.get("PICARX_OFFLOAD_IN_FLIGHT", "2"))
+WINDOW = 5  # round trips per slow-link decision
+TIMEOUT_FACTOR = 3.0  # a single reply later than this many budgets = link down
+RETRY_S = 2.0
+JPEG_QUALITY = 80
+
+CODEC_ZLIB = 0
+CODEC_JPEG = 1
+
+# Request: magic, seq, t_send, h, w, c, codec, imgsz, conf, payload bytes
+REQ = struct.Struct("<4sIdHHBBHfI")
+REQ_MAGIC = b"PXOR"
+# Response: magic, seq, t_send (echoed), server ms (decode + infer), n, status
+RESP = struct.Struct("<4sIdfHB")
+RESP_MAGIC = b"PXOA"
+_LEN = struct.Struct("<I")
+
+MODES = ("remote", "local", "ultrasonic")
+
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if k == 0:
+            raise ConnectionError("connection closed")
+        got += k
+    return bytes(buf)
+
+
+def _send_json(sock, obj):
+    data = json.dumps(obj).encode()
+    sock.sendall(_LEN.pack(len(data)) + data)
+
+
+def _recv_json(sock):
+    (n,) = _LEN.unpack(_recv_exact(sock, _LEN.size))
+    return json.loads(_recv_exact(sock, n))
+
+
+def parse_addr(addr, default_port=PORT):
+    host, _, port = addr.rpartition(":")
+    if not host:
+        return addr, default_port
+    return host, int(port)
+
+
+# ---- Frame codec ------------------------------------------------------------
+
+
+def default_codec():
+    try:
+        import cv2  # noqa: F401
+
+        return CODEC_JPEG
+    except ImportError:
+        return CODEC_ZLIB
+
+
+def downscale(frame, imgsz):
+    """Every step-th pixel, step = the integer factor that keeps >= imgsz on the long side."""
+    step = max(1, max(frame.shape[:2]) // max(int(imgsz), 1))
+    return frame[::step, ::step] if step > 1 else frame
+
+
+def encode_frame(frame, codec, quality=JPEG_QUALITY):
+    if codec == CODEC_JPEG:
+        import cv2
+
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        if not ok:
+            raise ValueError("JPEG encode failed")
+        return buf.tobytes()
+    return zlib.compress(np.ascontiguousarray(frame).tobytes(), 1)
+
+
+def decode_frame(payload, codec, shape):
+    if codec == CODEC_JPEG:
+        import cv2
+
+        frame = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("JPEG decode failed")
+        return frame
+    return np.frombuffer(zlib.decompress(payload), np.uint8).reshape(shape)
+
+
+# ---- Server -----------------------------------------------------------------
+
+
+class OffloadServer:
+    """Serves backends (model key -> .names / .predict(frames, imgsz, conf)) over TCP."""
+
+    def __init__(self, backends, host="0.0.0.0", port=PORT):
+        self.backends = dict(backends)
+        self.frames = 0
+        self.connections = 0
+        self._lock = threading.Lock()  # one inference at a time across connections
+        self._closed = False
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((host, port))
+        self._listener.listen(8)
+        self.address = self._listener.getsockname()
+        self._conns = set()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="offload-server", daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        while not self._closed:
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._conns.add(conn)
+            self.connections += 1
+            threading.Thread(target=self._handle, args=(conn,), name="offload-conn", daemon=True).start()
+
+    def _handle(self, conn):
+        try:
+            hello = _recv_json(conn)
+            key = model_key(hello.get("model", ""))
+            if key not in self.backends:
+                _send_json(conn, {"ok": False, "error": f"model {key!r} not loaded",
+                                  "models": sorted(self.backends)})
+                return
+            backend = self.backends[key]
+            _send_json(conn, {"ok": True, "model": key, "names": backend.names})
+            while True:
+                header = _recv_exact(conn, REQ.size)
+                magic, seq, t_send, h, w, c, codec, imgsz, conf, size = REQ.unpack(header)
+                if magic != REQ_MAGIC:
+                    return
+                payload = _recv_exact(conn, size)
+                t0 = time.monotonic()
+                try:
+                    frame = decode_frame(payload, codec, (h, w, c))
+                    with self._lock:
+                        cls, score, xyxy = backend.predict([frame], imgsz, conf)[0]
+                    dets, status = pack_detections(cls, score, xyxy), STATUS_OK
+                except Exception as e:  # a bad frame must not kill the connection
+                    sys.stderr.write(f"[offload] predict failed: {e}\n")
+                    dets, status = np.empty(0, DET_DTYPE), STATUS_ERROR
+                server_ms = (time.monotonic() - t0) * 1000.0
+                self.frames += 1
+                conn.sendall(RESP.pack(RESP_MAGIC, seq, t_send, server_ms, len(dets), status)
+                             + dets.tobytes())
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            self._conns.discard(conn)
+            conn.close()
+
+    def close(self):
+        self._closed = True
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR)  # wakes the blocked accept()
+        except OSError:
+            pass
+        self._listener.close()
+        for conn in list(self._conns):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+
+# ---- Client -----------------------------------------------------------------
+
+
+class OffloadClient:
+    """One pipelined TCP connection: submit() frames, receive() replies in order."""
+
+    def __init__(self, addr, model_path, timeout=1.0, codec=None):
+        host, port = parse_addr(addr)
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.codec = default_codec() if codec is None else codec
+        self.pending = collections.deque()  # (seq, t_send, t_capture, sx, sy, frame)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._seq = 0
+        try:
+            _send_json(self.sock, {"op": "hello", "model": model_key(model_path)})
+            reply = _recv_json(self.sock)
+        except (OSError, ValueError) as e:
+            self.sock.close()
+            raise ConnectionError(f"offload hello failed: {e}") from e
+        if not reply.get("ok"):
+            self.sock.close()
+            raise InferenceError(reply.get("error", "hello rejected"))
+        self.names = {int(k): v for k, v in reply["names"].items()}
+
+    def submit(self, frame, imgsz=320, conf=0.25, t_capture=None):
+        frame = np.asarray(frame, dtype=np.uint8)
+        if frame.ndim == 2:
+            frame = frame[..., None]
+        small = downscale(frame, imgsz)
+        payload = encode_frame(small, self.codec)
+        h, w, c = small.shape
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+        t_send = time.monotonic()
+        msg = REQ.pack(REQ_MAGIC, self._seq, t_send, h, w, c, self.codec, imgsz, conf, len(payload))
+        self.sock.sendall(msg + payload)
+        self.bytes_sent += len(msg) + len(payload)
+        sx, sy = frame.shape[1] / w, frame.shape[0] / h
+        t_capture = t_send if t_capture is None else t_capture
+        self.pending.append((self._seq, t_send, t_capture, sx, sy, frame))
+        return self._seq
+
+    def ready(self):
+        """True if a reply can be read without blocking."""
+        self.sock.setblocking(False)
+        try:
+            return bool(self.sock.recv(1, socket.MSG_PEEK))
+        except BlockingIOError:
+            return False
+        finally:
+            self.sock.setblocking(True)
+
+    def receive(self, timeout):
+        """
+        Oldest reply: (DET_DTYPE array in full-frame pixels, t_capture,
+        rtt_s, server_ms, the frame submitted).
+        """
+        self.sock.settimeout(timeout)
+        header = _recv_exact(self.sock, RESP.size)
+        magic, seq, t_send, server_ms, n, status = RESP.unpack(header)
+        dets = np.frombuffer(_recv_exact(self.sock, n * DET_DTYPE.itemsize), DET_DTYPE).copy()
+        self.bytes_received += RESP.size + n * DET_DTYPE.itemsize
+        expected, _, t_capture, sx, sy, frame = self.pending.popleft()
+        if magic != RESP_MAGIC or seq != expected:
+            raise ConnectionError(f"offload reply out of order ({seq} != {expected})")
+        if status != STATUS_OK:
+            raise InferenceError("offload server failed to run the frame")
+        dets["xyxy"] *= np.array([sx, sy, sx, sy], dtype=np.float32)
+        return dets, t_capture, time.monotonic() - t_send, server_ms, frame
+
+    def close(self):
+        self.sock.close()
+
+
+class OffloadModel:
+    """
+    Drop-in for ultralytics.YOLO (model(frame) / model.predict(frame)) that
+    runs on an OffloadServer and falls back when the link is slow or down.
+    """
+
+    def __init__(self, addr, model_path, local=None, budget_s=BUDGET_S, in_flight=IN_FLIGHT,
+                 window=WINDOW, retry_s=RETRY_S, codec=None, registry=REGISTRY, clock=None):
+        """
+        local: model used while the remote is unusable (None = ultrasonic only).
+        clock: for the retry timer; time.monotonic by default.
+        """
+        self.addr = addr
+        self.model_path = model_path
+        self.local = local
+        self.budget_s = float(budget_s)
+        self.in_flight = max(1, int(in_flight))
+        self.window = int(window)
+        self.retry_s = float(retry_s)
+        self.codec = codec
+        self.clock = clock or time.monotonic
+        self.names = dict(getattr(local, "names", {}) or {})
+
+        self.client = None
+        self.mode = None
+        self.lag_s = 0.0
+        self.source = None  # frame the newest result was computed on
+        self.frames = {m: 0 for m in MODES}
+        self.fallbacks = collections.Counter()  # reason -> count
+        self.recoveries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.last_error = None
+        self._rtts = collections.deque(maxlen=window)
+        self._rtt_all = collections.deque(maxlen=1000)
+        self._last = None  # (dets, t_capture, frame)
+        self._retry_at = 0.0
+        self._t0 = self.clock()
+
+        self._mode_gauge = registry.gauge("picarx_offload_mode", "0 = remote, 1 = local, 2 = ultrasonic only")
+        self._rtt_hist = registry.histogram("picarx_offload_rtt_seconds", "Offload round trip per frame")
+        self._sent = registry.counter("picarx_offload_bytes_sent_total", "Frame bytes sent to the server")
+        self._received = registry.counter("picarx_offload_bytes_received_total", "Reply bytes received")
+        self._fallback_count = registry.counter("picarx_offload_fallbacks_total", "Switches off the remote")
+
+        if not self._connect():
+            self._fallback("connect", self.clock())
+
+    @property
+    def available(self):
+        """False while falling back to ultrasonic only: results are empty, not 'no obstacle'."""
+        return self.mode != "ultrasonic"
+
+    def describe(self):
+        if self.mode == "remote":
+            return f"remote {self.addr}"
+        return f"{self.mode} ({self.last_error})"
+
+    # ---- Inference ------------------------------------------------------------
+
+    def predict(self, source, imgsz=640, conf=0.25, verbose=False, device=None, **kwargs):
+        now = self.clock()
+        if self.mode != "remote" and now >= self._retry_at and self._connect():
+            self.recoveries += 1
+        if self.mode == "remote":
+            try:
+                dets = self._predict_remote(source, imgsz, conf, now)
+                self.frames["remote"] += 1
+                return [_Result(dets, self.names)]
+            except InferenceError as e:
+                self._fallback("error", now, e)
+            except (OSError, ConnectionError) as e:  # socket.timeout is an OSError
+                self._fallback("timeout" if isinstance(e, socket.timeout) else "link", now, e)
+            except _SlowLink as e:
+                self._fallback("slow", now, e)
+        self.lag_s = 0.0
+        self.source = source
+        if self.mode == "local":
+            self.frames["local"] += 1
+            return self.local.predict(source, imgsz=imgsz, conf=conf, verbose=verbose, device=device)
+        self.frames["ultrasonic"] += 1
+        return [_Result([], self.names)]
+
+    __call__ = predict
+
+    def _predict_remote(self, frame, imgsz, conf, now):
+        client = self.client
+        client.submit(frame, imgsz, conf, t_capture=now)
+        # Block only when the pipeline is full (or nothing has come back yet)
+        while client.pending and (len(client.pending) > self.in_flight - 1 or self._last is None
+                                  or client.ready()):
+            dets, t_capture, rtt, _, frame = client.receive(self.budget_s * TIMEOUT_FACTOR)
+            self._last = (dets, t_capture, frame)
+            self._rtts.append(rtt)
+            self._rtt_all.append(rtt)
+            self._rtt_hist.observe(rtt)
+        self._account()
+        if len(self._rtts) >= self.window and statistics.median(self._rtts) > self.budget_s:
+            raise _SlowLink(f"median round trip {statistics.median(self._rtts) * 1000.0:.0f} ms")
+        dets, t_capture, self.source = self._last
+        self.lag_s = max(0.0, now - t_capture)
+        return dets
+
+    # ---- Link state -----------------------------------------------------------
+
+    def _connect(self):
+        try:
+            # A short connect timeout: this runs inside the control loop on retries
+            self.client = OffloadClient(self.addr, self.model_path,
+                                        timeout=max(self.budget_s, 0.05), codec=self.codec)
+        except (OSError, ConnectionError, InferenceError) as e:
+            self.last_error = str(e)
+            self._retry_at = self.clock() + self.retry_s
+            return False
+        self.names = self.client.names
+        self._rtts.clear()
+        self._last = None
+        self._set_mode("remote")
+        return True
+
+    def _fallback(self, reason, now, error=None):
+        if self.client is not None:
+            self._account()
+            self.client.close()
+            self.client = None
+        if error is not None:
+            self.last_error = f"{reason}: {error}"
+        elif self.last_error is None:
+            self.last_error = reason
+        self.fallbacks[reason] += 1
+        self._fallback_count.inc()
+        self._retry_at = now + self.retry_s
+        self._set_mode("local" if self.local is not None else "ultrasonic")
+
+    def _set_mode(self, mode):
+        self.mode = mode
+        self._mode_gauge.set(MODES.index(mode))
+
+    def _account(self):
+        client = self.client
+        sent, received = client.bytes_sent, client.bytes_received
+        self._sent.inc(sent)
+        self._received.inc(received)
+        self.bytes_sent += sent
+        self.bytes_received += received
+        client.bytes_sent = client.bytes_received = 0
+
+    # ---- Reporting ------------------------------------------------------------
+
+    def report(self):
+        elapsed = max(self.clock() - self._t0, 1e-9)
+        rtts = sorted(self._rtt_all)
+        if rtts:
+            rtt = (f"rtt p50 {rtts[len(rtts) // 2] * 1000.0:.1f} ms "
+                   f"p95 {rtts[int(len(rtts) * 0.95)] * 1000.0:.1f} ms")
+        else:
+            rtt = "rtt -"
+        reasons = ", ".join(f"{r} {n}" for r, n in self.fallbacks.items())
+        return (
+            f"{self.frames['remote']} remote / {self.frames['local']} local / "
+            f"{self.frames['ultrasonic']} ultrasonic-only frames; {rtt}; "
+            f"up {self.bytes_sent * 8 / elapsed / 1000.0:.0f} kbit/s "
+            f"down {self.bytes_received * 8 / elapsed / 1000.0:.0f} kbit/s; "
+            f"{sum(self.fallbacks.values())} fallbacks ({reasons or 'none'}), "
+            f"{self.recoveries} recoveries"
+        )
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+        if self.local is not None and hasattr(self.local, "close"):
+            self.local.close()
+
+
+class _SlowLink(Exception):
+    pass
+
+
+def open_offload(addr, model_path, local_factory=None, fallback=None):
+    """
+    OffloadModel for addr; local_factory() builds the fallback model when
+    fallback (default PICARX_OFFLOAD_FALLBACK) is "local".
+    """
+    fallback = fallback or FALLBACK
+    local = local_factory() if fallback == "local" and local_factory is not None else None
+    return OffloadModel(addr, model_path, local=local)
+
+
+# ---- CLI --------------------------------------------------------------------
+
+
+class _StandInBackend:
+    """Loopback bench model: a fixed inference time, one box per frame."""
+
+    names = {0: "person"}
+
+    def __init__(self, infer_s):
+        self.infer_s = infer_s
+
+    def predict(self, frames, imgsz, conf):
+        time.sleep(self.infer_s)
+        h, w = frames[0].shape[:2]
+        return [(np.array([0]), np.array([0.9]), np.array([[0.0, 0.0, w / 2.0, h / 2.0]]))]
+
+
+def bench(addr, model_path, n=200, period_s=0.05, imgsz=320, in_flight=IN_FLIGHT):
+    rng = np.random.default_rng(0)
+    # Smooth gradients plus noise: compresses roughly like a camera frame
+    base = np.linspace(0, 255, 640, dtype=np.float32)[None, :, None]
+    frame = np.clip(base + rng.normal(0, 8, (480, 640, 3)), 0, 255).astype(np.uint8)
+    model = OffloadModel(addr, model_path, local=None, in_flight=in_flight, budget_s=10.0)
+    loop = []
+    for _ in range(n):
+        t0 = time.monotonic()
+        model.predict(frame, imgsz=imgsz)
+        loop.append(time.monotonic() - t0)
+        time.sleep(period_s)
+    loop.sort()
+    print(f"predict() in the loop: p50 {loop[n // 2] * 1000.0:.1f} ms  "
+          f"p95 {loop[int(n * 0.95)] * 1000.0:.1f} ms")
+    print(model.report())
+    model.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remote inference offload.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    serve = sub.add_parser("serve")
+    serve.add_argument("--model", action="append", required=True, help="weights (repeatable)")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=PORT)
+    b = sub.add_parser("bench")
+    b.add_argument("addr", nargs="?", help="host:port of a running server")
+    b.add_argument("--loopback", action="store_true", help="start a stand-in server here")
+    b.add_argument("--infer-ms", type=float, default=30.0, help="stand-in inference time")
+    b.add_argument("--model", default="yolov8n.pt")
+    b.add_argument("--frames", type=int, default=200)
+    b.add_argument("--hz", type=float, default=20.0)
+    b.add_argument("--in-flight", type=int, default=IN_FLIGHT)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        server = None
+        if args.loopback:
+            server = OffloadServer({model_key(args.model): _StandInBackend(args.infer_ms / 1000.0)},
+                                   "127.0.0.1", 0).start()
+            args.addr = "%s:%d" % server.address
+        elif not args.addr:
+            parser.error("bench needs host:port or --loopback")
+        try:
+            bench(args.addr, args.model, args.frames, 1.0 / args.hz, in_flight=args.in_flight)
+        finally:
+            if server is not None:
+                server.close()
+        return
+
+    backends = {}
+    for path in args.model:
+        print(f"[offload] loading {path}")
+        backends[model_key(path)] = YoloBackend(path)
+    server = OffloadServer(backends, args.host, args.port)
+    serve_from_env()
+    print(f"[offload] serving {', '.join(backends)} on {args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n[offload] stopping after {server.frames} frames")
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
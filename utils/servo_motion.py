@@ -0,0 +1,221 @@
+"""Concurrent servo motion planner with slew-rate limits.
+
+The PiCar-X servos are position servos with no feedback: a write jumps the
+setpoint and the horn gets there at whatever speed it manages, so scripts
+have been padding every move with `time.sleep(1)`. ServoPlanner instead
+owns the three servos (steering, camera pan, camera tilt), walks each one
+toward its target from a background thread at UPDATE_HZ, limited to a
+per-servo slew rate, and keeps an arrival estimate:
+
+    arrival = time the interpolated setpoint reaches the target + SETTLE_S
+
+Callers wait for "arrived" instead of sleeping, and all servos move at the
+same time, so centering takes as long as the slowest servo rather than the
+sum of fixed sleeps.
+
+Usage:
+    from utils.servo_motion import ServoPlanner
+
+    planner = ServoPlanner(px)
+    planner.move(dir=0, pan=0, tilt=0)
+    planner.wait()                    # or: planner.arrived()
+    ...
+    planner.close()
+"""
+import os
+import sys
+import threading
+import time
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.affinity import pin_thread
+
+SERVOS = {
+    "dir": "set_dir_servo_angle",
+    "pan": "set_cam_pan_angle",
+    "tilt": "set_cam_tilt_angle",
+}
+
+# Degrees per second. SG90-class servos manage ~600 deg/s unloaded; the
+# limits stay well below that so the setpoint never outruns the horn and
+# the camera does not jerk the image.
+SLEW_DEG_S = {"dir": 240.0, "pan": 180.0, "tilt": 120.0}
+UPDATE_HZ = 50.0
+SETTLE_S = 0.08  # mechanical settle after the last setpoint write
+WRITE_RESOLUTION = 0.5  # degrees; smaller changes are not written
+UNKNOWN_TRAVEL_DEG = 90.0  # assumed travel when the start angle is unknown
+
+
+class ServoPlanner:
+    def __init__(self, px, slew=None, update_hz=UPDATE_HZ, settle_s=SETTLE_S,
+                 initial=None, background=True, clock=None):
+        """
+        px: Picarx-compatible object.
+        slew: per-servo limits in deg/s, merged over SLEW_DEG_S.
+        initial: assumed starting angles (Picarx() centers its servos); None
+            marks an unknown angle, which jumps on the first move and is
+            budgeted UNKNOWN_TRAVEL_DEG of travel.
+        background=False leaves stepping to the caller (tests, sim loops).
+        """
+        self.px = px
+        self.slew = dict(SLEW_DEG_S, **(slew or {}))
+        self.period = 1.0 / float(update_hz)
+        self.settle_s = float(settle_s)
+        self.clock = clock or time.monotonic
+        self.writes = 0
+
+        start = dict.fromkeys(SERVOS, 0.0)
+        start.update(initial or {})
+        self._position = dict(start)  # current interpolated setpoint
+        self._target = dict(start)
+        self._written = {}
+        self._arrive_at = dict.fromkeys(SERVOS, 0.0)
+        self._last_step = None
+
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name="servo-planner", daemon=True)
+            self._thread.start()
+
+    # ---- Public API ----
+
+    def move(self, **targets):
+        """
+        Set new targets, e.g. move(pan=30, tilt=-10). Returns the estimated
+        seconds until every moved servo has arrived.
+        """
+        now = self.clock()
+        with self._cond:
+            for servo, angle in targets.items():
+                if servo not in SERVOS:
+                    raise ValueError(f"unknown servo {servo!r}")
+                angle = float(angle)
+                if angle == self._target[servo] == self._written.get(servo):
+                    continue
+                self._target[servo] = angle
+                if self._position[servo] is None:
+                    self._position[servo] = angle
+                    travel = UNKNOWN_TRAVEL_DEG / self.slew[servo]
+                else:
+                    travel = abs(angle - self._position[servo]) / self.slew[servo]
+                self._arrive_at[servo] = now + travel + self.settle_s
+            if self._last_step is None:
+                self._last_step = now
+            self._cond.notify_all()
+            return max(0.0, max(self._arrive_at[s] for s in targets) - now) if targets else 0.0
+
+    def center(self):
+        return self.move(**dict.fromkeys(SERVOS, 0.0))
+
+    def target(self, servo):
+        return self._target[servo]
+
+    def position(self, servo):
+        return self._position[servo]
+
+    def _remaining(self, servos, now):
+        remaining = max(self._arrive_at[s] for s in servos) - now
+        if remaining <= 0 and any(self._position[s] != self._target[s] for s in servos):
+            # Estimate has run out but the stepper is behind; one more period
+            return self.period
+        return max(0.0, remaining)
+
+    def eta(self, *servos):
+        """Seconds until the given servos (default: all) have settled."""
+        with self._cond:
+            return self._remaining(servos or SERVOS, self.clock())
+
+    def arrived(self, *servos):
+        return self.eta(*servos) == 0.0
+
+    def wait(self, *servos, timeout=None):
+        """Block until the servos have settled. Returns False on timeout."""
+        deadline = None if timeout is None else self.clock() + timeout
+        with self._cond:
+            while True:
+                now = self.clock()
+                remaining = self._remaining(servos or SERVOS, now)
+                if remaining <= 0:
+                    return True
+                if deadline is not None:
+                    if now >= deadline:
+                        return False
+                    remaining = min(remaining, deadline - now)
+                self._cond.wait(remaining)
+
+    def step(self, now=None):
+        """
+        Advance every setpoint toward its target by one slew-limited step and
+        write the servos that changed. Returns True while still moving.
+        """
+        now = self.clock() if now is None else now
+        with self._cond:
+            dt = 0.0 if self._last_step is None else now - self._last_step
+            self._last_step = now
+            writes = []
+            moving = False
+            for servo in SERVOS:
+                pos, target = self._position[servo], self._target[servo]
+                if pos != target:
+                    limit = self.slew[servo] * dt
+                    pos = target if abs(target - pos) <= limit else pos + limit * (1 if target > pos else -1)
+                    self._position[servo] = pos
+                    moving = moving or pos != target
+                if pos is None:
+                    continue
+                last = self._written.get(servo)
+                if last is None or abs(pos - last) >= WRITE_RESOLUTION or (pos == target and pos != last):
+                    self._written[servo] = pos
+                    writes.append((servo, pos))
+            if not moving:
+                self._cond.notify_all()
+        for servo, angle in writes:
+            getattr(self.px, SERVOS[servo])(round(angle, 1))
+            self.writes += 1
+        return moving
+
+    def close(self, center=False):
+        if center:
+            self.center()
+            self.wait(timeout=2.0)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    # ---- Background thread ----
+
+    def _idle(self):
+        return all(
+            self._position[s] == self._target[s] and self._written.get(s) == self._target[s]
+            for s in SERVOS
+        )
+
+    def _run(self):
+        pin_thread("control")
+        next_t = self.clock()
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                if self._idle():
+                    self._last_step = None
+                    self._cond.wait()
+                    next_t = self.clock()
+                    continue
+            self.step()
+            next_t += self.period
+            delay = next_t - self.clock()
+            if delay > 0:
+                with self._cond:
+                    if not self._closed:
+                        self._cond.wait(delay)
+            else:
+                next_t = self.clock()
@@ -0,0 +1,118 @@
+"""Staged start-up: run the safety loop first, load the heavy parts behind it.
+
+Importing torch/ultralytics and loading a model takes seconds on a Pi, and
+a script that does it before anything else is blind for that long. Instead
+start the loader in the background, run the cheap loop at once, and switch
+modes when the loader is done:
+
+    STARTUP = StartupLog()
+    vision = BackgroundLoader(load_vision, name="vision").start()
+    while True:
+        STARTUP.mark("first_safe_loop")
+        if vision.ready:
+            model, cap = vision.result
+            ...                                # fused
+        else:
+            ...                                # ultrasonic only
+
+StartupLog times milestones from process start (interpreter start-up and
+imports included, from /proc on Linux), prints each one once and exports it
+as `picarx_startup_<milestone>_seconds`.
+"""
+import os
+import sys
+import threading
+import time
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import REGISTRY
+
+
+def process_age():
+    """Seconds since this process started; 0.0 where /proc is unavailable."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 (starttime, in clock ticks since boot); the command
+            # name in field 2 may contain spaces, so split after its ')'
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class StartupLog:
+    def __init__(self, t0=None, registry=REGISTRY, quiet=False):
+        """t0: monotonic time of process start (default: from /proc)."""
+        self.t0 = time.monotonic() - process_age() if t0 is None else t0
+        self.registry = registry
+        self.quiet = quiet
+        self.marks = {}
+
+    def mark(self, milestone, now=None):
+        """Record the first time milestone is reached; later calls are no-ops."""
+        if milestone in self.marks:
+            return self.marks[milestone]
+        elapsed = (time.monotonic() if now is None else now) - self.t0
+        self.marks[milestone] = elapsed
+        self.registry.gauge(
+            f"picarx_startup_{milestone}_seconds", f"Process start to {milestone}"
+        ).set(elapsed)
+        if not self.quiet:
+            sys.stderr.write(f"[startup] {milestone}: {elapsed:.2f} s\n")
+        return elapsed
+
+    def report(self):
+        return "  ".join(f"{name}={s:.2f}s" for name, s in self.marks.items())
+
+
+class BackgroundLoader:
+    """
+    Runs fn() once on a daemon thread. ready turns True when it returned
+    (result holds its value); failed when it raised (error holds it).
+    """
+
+    def __init__(self, fn, name="loader"):
+        self.fn = fn
+        self.name = name
+        self.result = None
+        self.error = None
+        self.seconds = None
+        self._done = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        t0 = time.monotonic()
+        try:
+            self.result = self.fn()
+        except BaseException as e:  # reported to the owner, not lost in the thread
+            self.error = e
+        self.seconds = time.monotonic() - t0
+        self._done.set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def ready(self):
+        return self._done.is_set() and self.error is None
+
+    @property
+    def failed(self):
+        return self._done.is_set() and self.error is not None
+
+    def wait(self, timeout=None):
+        """Block until done; returns ready."""
+        self._done.wait(timeout)
+        return self.ready
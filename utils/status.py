@@ -0,0 +1,237 @@
+"""Non-blocking, rate-limited console status line.
+
+The loops used to print a status line every iteration with end="\\r" and
+flush=True. Over a slow SSH session (or when stdout is piped into something
+that reads slowly) that write blocks, and the control loop blocks with it.
+StatusLine moves all terminal output to a background thread, so the teleop,
+ultrasonic and avoidance scripts draw their status and key/safety messages
+without a slow terminal ever stalling their safety loop:
+
+    status = StatusLine("Dist: {dist:6.1f} cm | State: {state:7}").start()
+    while True:
+        status.set(dist=dist, state=state.name)   # a dict update, never writes
+        if stopped:
+            status.event("[SAFETY] Obstacle -> STOPPED")
+    ...
+    status.close()                                # flushes pending events
+
+- set() only updates the shared field dict; the thread redraws the line at
+  most PICARX_STATUS_HZ times per second (default 5), and only when a field
+  changed.
+- event() queues a message printed on its own line above the status line.
+  The queue holds MAX_EVENTS; on overflow the oldest message is dropped and
+  counted (picarx_status_events_dropped_total), so a stalled terminal never
+  grows memory or back-pressures the caller.
+- Lines end in "\\r\\n", so output stays aligned when the terminal is in raw
+  mode (the keyboard teleop scripts).
+
+Only the render thread ever writes to the stream; if the consumer stalls,
+that thread blocks and the caller keeps running. With PICARX_STATUS_HZ=0
+the status line is off and events are written directly.
+
+    python3 utils/status.py --bench     # loop latency with stdout piped to a slow reader
+"""
+import argparse
+import collections
+import os
+import sys
+import threading
+import time
+
+# Make project root importable (also when run as a CLI)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import REGISTRY
+
+RATE_HZ = float(os.environ.get("PICARX_STATUS_HZ", "5"))
+MAX_EVENTS = 64
+CLEAR_LINE = "\r\x1b[K"
+
+EVENTS_DROPPED = REGISTRY.counter(
+    "picarx_status_events_dropped_total", "Status events dropped because the terminal fell behind"
+)
+
+
+class StatusLine:
+    def __init__(self, template=None, stream=None, rate_hz=RATE_HZ, max_events=MAX_EVENTS):
+        """
+        template: str.format template over the fields; None renders them as
+        "key=value" pairs. A field missing from set() renders as "?".
+        stream: defaults to sys.stdout at start().
+        """
+        self.template = template
+        self.stream = stream
+        self.rate_hz = float(rate_hz)
+        self.fields = {}
+        self.events = collections.deque(maxlen=int(max_events))
+        self.dropped = 0
+        self._version = 0
+        self._drawn = -1
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+
+    # ---- Caller side (never touches the stream) -------------------------------
+
+    def set(self, **fields):
+        self.fields.update(fields)
+        self._version += 1
+
+    def event(self, message):
+        if self._thread is None:
+            self._write(CLEAR_LINE + str(message) + "\r\n")
+            return
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+            EVENTS_DROPPED.inc()
+        self.events.append(str(message))
+
+    # ---- Render thread ----------------------------------------------------------
+
+    def start(self):
+        if self.stream is None:
+            self.stream = sys.stdout
+        if self.rate_hz > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="status", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout=1.0):
+        """Stop the thread after a last redraw; ends the status line with a newline."""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop = True
+        self._wake.set()
+        thread.join(timeout)
+
+    def render(self):
+        """The status line for the current fields."""
+        fields = dict(self.fields)
+        if self.template is None:
+            return " | ".join(f"{k}={v}" for k, v in fields.items())
+        try:
+            return self.template.format_map(_Missing(fields))
+        except (ValueError, TypeError):
+            # A value that does not fit its format spec (e.g. None for {:.1f})
+            return " | ".join(f"{k}={v}" for k, v in fields.items())
+
+    def _run(self):
+        period = 1.0 / self.rate_hz
+        while True:
+            # At most one write per period; close() wakes the thread early
+            self._wake.wait(period)
+            stop = self._stop
+            out = []
+            while self.events:
+                out.append(CLEAR_LINE + self.events.popleft() + "\r\n")
+            if out or self._version != self._drawn:
+                self._drawn = self._version
+                out.append(CLEAR_LINE + self.render())
+            if stop:
+                out.append("\r\n")
+            if out:
+                self._write("".join(out))
+            if stop:
+                return
+
+    def _write(self, text):
+        stream = self.stream or sys.stdout
+        try:
+            stream.write(text)
+            stream.flush()
+        except (OSError, ValueError):
+            pass  # closed or broken terminal: keep the loop running
+
+
+class _Placeholder:
+    """Formats as "?" under any format spec, keeping the spec's width."""
+
+    def __format__(self, spec):
+        width = "".join(c for c in spec.split(".")[0] if c.isdigit())
+        return "?".rjust(int(width)) if width else "?"
+
+
+class _Missing(dict):
+    def __missing__(self, key):
+        return _Placeholder()
+
+
+# ---- Benchmark ----------------------------------------------------------------
+
+
+def _slow_pipe(bytes_per_s):
+    """A text stream whose reader drains it at bytes_per_s (a slow SSH link)."""
+    import fcntl
+
+    r, w = os.pipe()
+    try:
+        fcntl.fcntl(w, fcntl.F_SETPIPE_SZ, 4096)  # small buffer, like a congested pty
+    except (AttributeError, OSError):  # F_SETPIPE_SZ is Linux-only
+        pass
+    chunk = 64
+
+    def drain():
+        while True:
+            try:
+                data = os.read(r, chunk)
+            except OSError:
+                return
+            if not data:
+                return
+            time.sleep(len(data) / bytes_per_s)
+
+    threading.Thread(target=drain, name="slow-reader", daemon=True).start()
+    return os.fdopen(w, "w", buffering=1)
+
+
+def bench(n=1000, period_s=0.005, bytes_per_s=2000):
+    """Loop-body latency (ms) printing every iteration vs StatusLine, both to a slow pipe."""
+
+    def run(update):
+        times = []
+        for i in range(n):
+            t0 = time.perf_counter()
+            update(i)
+            times.append(time.perf_counter() - t0)
+            time.sleep(period_s)
+        mean = sum(times) / len(times)
+        times.sort()
+        return (mean * 1000.0, times[len(times) // 2] * 1000.0,
+                times[int(len(times) * 0.99)] * 1000.0, times[-1] * 1000.0)
+
+    stream = _slow_pipe(bytes_per_s)
+    printed = run(lambda i: print(f"Dist: {i % 300:6.1f} cm | State: SAFE   ", end="\r",
+                                  flush=True, file=stream))
+    status = StatusLine("Dist: {dist:6.1f} cm | State: {state:7}", stream=_slow_pipe(bytes_per_s)).start()
+
+    def update(i):
+        status.set(dist=float(i % 300), state="SAFE")
+        if i % 100 == 0:
+            status.event(f"event {i}")
+
+    latched = run(update)
+    status.close(timeout=0.0)
+    return printed, latched, status.dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Non-blocking console status line.")
+    parser.add_argument("--bench", action="store_true", help="loop latency against a slow stdout")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--bytes-per-s", type=int, default=2000, help="reader speed")
+    args = parser.parse_args()
+    if not args.bench:
+        parser.print_help()
+        return
+    printed, latched, dropped = bench(args.iterations, bytes_per_s=args.bytes_per_s)
+    for name, (mean, p50, p99, worst) in (("print per loop", printed), ("StatusLine", latched)):
+        print(f"{name:15s} mean {mean:8.3f} ms  p50 {p50:7.3f} ms  p99 {p99:8.3f} ms  "
+              f"max {worst:8.3f} ms")
+    print(f"events dropped: {dropped}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils import affinity
+
+
+def test_layouts_on_a_four_core_pi():
+    cpus = [0, 1, 2, 3]
+    assert affinity.make_layout("shared", cpus) == dict.fromkeys(affinity.ROLES, {0, 1, 2, 3})
+    assert affinity.make_layout("split", cpus) == {
+        "control": {0}, "capture": {1}, "inference": {2, 3},
+    }
+    assert affinity.make_layout("paired", cpus)["inference"] == {1, 2, 3}
+    assert affinity.make_layout("control", cpus)["capture"] == {1, 2, 3}
+
+
+def test_layouts_degrade_on_small_machines():
+    assert affinity.make_layout("split", [0, 1]) == {
+        "control": {0}, "capture": {1}, "inference": {1},
+    }
+    assert affinity.make_layout("split", [5]) == dict.fromkeys(affinity.ROLES, {5})
+    with pytest.raises(ValueError):
+        affinity.make_layout("bogus", [0])
+
+
+def test_setup_sizes_thread_pools_and_pins_threads(monkeypatch):
+    for var in affinity._THREAD_ENV:
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setattr(affinity, "_active", None)
+    cpus = affinity.available_cpus()
+    plan = affinity.setup("paired", cpus=cpus, control_priority=None)
+    assert os.environ["OMP_NUM_THREADS"] == str(plan.threads("inference"))
+
+    if not hasattr(os, "sched_getaffinity"):
+        return
+    seen = []
+
+    def worker():
+        affinity.pin_thread("control")
+        seen.append(os.sched_getaffinity(0))
+
+    t = threading.Thread(target=worker)
+    t.start()
+    t.join()
+    assert seen == [plan.cpus["control"]]
+    monkeypatch.setattr(affinity, "_active", None)
+
+
+def test_pin_thread_is_a_noop_without_a_plan(monkeypatch):
+    monkeypatch.setattr(affinity, "_active", None)
+    before = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+    affinity.pin_thread("inference")
+    if before is not None:
+        assert os.sched_getaffinity(0) == before
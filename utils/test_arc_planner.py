@@ -0,0 +1,86 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.arc_planner import MEMORY_S, SENSOR_OFFSET_CM, ArcPlanner
+
+
+class FakeFreeSpace:
+    def __init__(self, cm, max_cm=300.0):
+        self.cm = np.asarray(cm, dtype=np.float32)
+        self.bearings_deg = np.linspace(-42.0, 42.0, len(self.cm))
+        self.max_cm = max_cm
+
+
+@pytest.fixture
+def planner():
+    return ArcPlanner(speeds=(10, 25), clock=lambda: 0.0)
+
+
+def test_open_floor_goes_straight_at_full_speed(planner):
+    planner.observe_ultrasonic(-1, now=0.0)
+    plan = planner.plan(now=0.0)
+    assert plan.steer == 0 and plan.speed == 25 and not plan.blocked
+
+
+def test_steers_away_from_an_obstacle_on_one_side(planner):
+    # A post 50 cm ahead, slightly left
+    planner.observe([-8.0], [50.0], now=0.0)
+    plan = planner.plan(now=0.0)
+    assert plan.steer > 0 and not plan.blocked
+
+
+def test_slows_down_when_the_free_arc_is_short():
+    planner = ArcPlanner(speeds=(10, 40), clock=lambda: 0.0)
+    planner.observe(np.linspace(-45, 45, 19), np.full(19, 30.0), now=0.0)
+    plan = planner.plan(now=0.0)
+    assert not plan.blocked and plan.speed == 10
+
+
+def test_boxed_in_backs_up_towards_the_open_side(planner):
+    # Wall at the bumper, more room on the right
+    planner.observe(np.linspace(-45, 45, 19), np.linspace(8.0, 14.0, 19), now=0.0)
+    plan = planner.plan(now=0.0)
+    assert plan.blocked and plan.speed < 0
+    assert plan.steer < 0  # reversing with the wheels left swings the nose right
+
+
+def test_memory_follows_the_car_and_expires(planner):
+    planner.observe([0.0], [50.0], now=0.0)
+    x0 = float(planner.points[0, 0])
+    planner.command(25, 0, now=0.0)
+    planner.plan(now=1.0)  # 15 cm forward
+    assert float(planner.points[0, 0]) == pytest.approx(x0 - 15.0, abs=0.1)
+    planner.plan(now=1.0 + MEMORY_S)
+    assert len(planner.points) == 0
+
+
+def test_turning_away_keeps_the_obstacle_beside_the_car(planner):
+    planner.observe([0.0], [40.0], now=0.0)
+    planner.command(10, 30, now=0.0)  # turning right
+    planner.plan(now=1.0)
+    x, y = planner.points[0]
+    assert y < 0.0  # the obstacle is now to the left
+    assert planner.heading_to_goal > 0.0
+
+
+def test_a_clear_reading_forgets_stale_points(planner):
+    planner.observe([0.0], [30.0], now=0.0)
+    planner.observe_ultrasonic(120.0, now=0.1)
+    assert not np.any(planner.points[:, 0] < SENSOR_OFFSET_CM + 100.0)
+
+
+def test_free_space_boundary_and_carving(planner):
+    cm = np.full(16, 300.0)
+    cm[7:9] = 40.0
+    planner.observe_free_space(FakeFreeSpace(cm), now=0.0)
+    assert len(planner.points) == 2  # bins at max range are not obstacles
+    planner.observe_free_space(FakeFreeSpace(np.full(16, 300.0)), now=0.1)
+    assert len(planner.points) == 0
@@ -0,0 +1,87 @@
+import os
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.bus import Bus, Command
+from utils.metrics import Registry
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_latest_value_skips_to_the_newest_unseen_message():
+    bus = Bus(registry=Registry())
+    sub = bus.subscribe("ranges")
+    assert sub.poll() is None
+    for cm in (30.0, 20.0, 10.0):
+        bus.publish("ranges", cm)
+    msg = sub.poll()
+    assert (msg.value, msg.seq) == (10.0, 3)
+    assert sub.poll() is None and sub.last is msg
+
+
+def test_queue_keeps_order_and_counts_drops():
+    registry = Registry()
+    bus = Bus(registry=registry)
+    sub = bus.subscribe("commands", maxsize=2)
+    for speed in (1, 2, 3):
+        bus.publish("commands", Command(speed, 0, 0))
+    assert [m.value.speed for m in sub.drain()] == [2, 3]
+    assert registry.get("picarx_bus_commands_dropped_total").value == 1
+    sub.close()
+    bus.publish("commands", Command(4, 0, 0))
+    assert sub.poll() is None
+
+
+def test_typed_topics_reject_other_payloads():
+    bus = Bus(registry=Registry())
+    bus.topic("ranges", (int, float))
+    with pytest.raises(TypeError):
+        bus.publish("ranges", "25cm")
+    with pytest.raises(TypeError):
+        bus.topic("ranges", str)
+
+
+def test_frames_are_passed_by_reference():
+    np = pytest.importorskip("numpy")
+    bus = Bus(registry=Registry())
+    frames = bus.topic("frames", np.ndarray)
+    a, b = bus.subscribe("frames"), bus.subscribe("frames", maxsize=1)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    frames.publish(frame, t=12.5)
+    assert a.poll().value is frame and b.poll().value is frame
+    assert a.last.t == 12.5
+
+
+def test_stats_use_the_bus_clock():
+    registry, clock = Registry(), FakeClock()
+    bus = Bus(registry=registry, clock=clock)
+    sub = bus.subscribe("frames")
+    for _ in range(5):
+        bus.publish("frames", object())
+        clock.t += 0.05
+        sub.poll()
+    topic = bus.topic("frames")
+    assert topic.rate_hz == pytest.approx(20.0)
+    assert topic.latency.count == 5 and topic.latency.sum == pytest.approx(0.25)
+    assert registry.get("picarx_bus_frames_messages_total").value == 5
+    assert bus.report().startswith("frames: 5 msgs, 20.0 Hz")
+
+
+def test_wait_wakes_on_publish_from_another_thread():
+    bus = Bus(registry=Registry())
+    sub = bus.subscribe("detections")
+    threading.Timer(0.05, bus.publish, ("detections", "boxes")).start()
+    assert sub.wait(timeout=2.0).value == "boxes"
+    assert sub.wait(timeout=0.01) is None
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.freshness import FreshnessGate, Stamped, TimestampedCapture, read_stamped
+from utils.metrics import Registry
+
+
+class SlowDecodeCapture:
+    def __init__(self, decode_s=0.02):
+        self.decode_s = decode_s
+        self.grabbed_at = None
+
+    def grab(self):
+        self.grabbed_at = time.monotonic()
+        return True
+
+    def retrieve(self):
+        time.sleep(self.decode_s)
+        return True, "frame"
+
+    def release(self):
+        return "released"
+
+
+def test_capture_is_stamped_at_grab_not_after_decode():
+    inner = SlowDecodeCapture()
+    cap = TimestampedCapture(inner)
+    ret, frame, t = cap.read()
+    assert ret and frame == "frame"
+    assert inner.grabbed_at <= t < inner.grabbed_at + inner.decode_s / 2
+    assert cap.release() == "released"  # passthrough
+
+
+def test_sensor_read_is_stamped_mid_call():
+    def ping():
+        time.sleep(0.02)
+        return 42.0
+
+    t0 = time.monotonic()
+    sample = read_stamped(ping)
+    assert sample.value == 42.0
+    assert t0 + 0.005 < sample.t < time.monotonic() - 0.005
+
+
+def test_gate_rejects_old_inputs_and_records_ages():
+    gate = FreshnessGate("vision", max_age_s=0.3, registry=Registry())
+    now = 100.0
+    assert gate.check(now - 0.1, now)
+    assert not gate.check(now - 0.5, now)
+    assert not gate.check(None, now)
+    assert gate.ages.count == 2
+    assert gate.stale.value == 2
+    assert "stale=2" in gate.report()
+
+
+def test_gate_weight_falls_off_between_soft_and_hard_age():
+    gate = FreshnessGate("ultrasonic", max_age_s=0.4, soft_age_s=0.2, registry=Registry())
+    assert gate.weight(10.0 - 0.1, 10.0) == 1.0
+    assert gate.weight(10.0 - 0.3, 10.0) == pytest.approx(0.5)
+    assert gate.weight(10.0 - 0.5, 10.0) == 0.0
+    assert Stamped(1, t=5.0).age(now=5.25) == pytest.approx(0.25)
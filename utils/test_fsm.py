@@ -0,0 +1,166 @@
+import os
+import sys
+from enum import Enum
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.fsm import ANY, LatchedDrive, State, StateMachine, Transition, above, below
+from utils.metrics import Registry
+
+
+class Zone(Enum):
+    SAFE = 0
+    CAUTION = 1
+    DANGER = 2
+
+
+class CountingRobot:
+    def __init__(self):
+        self.calls = []
+
+    def forward(self, speed):
+        self.calls.append(("forward", speed))
+
+    def backward(self, speed):
+        self.calls.append(("backward", speed))
+
+    def stop(self):
+        self.calls.append(("stop",))
+
+    def set_dir_servo_angle(self, angle):
+        self.calls.append(("steer", angle))
+
+
+def zones(drive, log=None, hysteresis=5.0, dwell=0.3, registry=None):
+    def entered(name, speed):
+        def on_enter(ctx):
+            if log is not None:
+                log.append(("enter", name))
+            drive.set(speed, 0)
+
+        return on_enter
+
+    return StateMachine(
+        "test",
+        states={
+            Zone.SAFE: State(on_enter=entered("SAFE", 15), min_dwell_s=dwell),
+            Zone.CAUTION: State(
+                on_enter=entered("CAUTION", 8),
+                on_exit=lambda ctx: log is not None and log.append(("exit", "CAUTION")),
+                min_dwell_s=dwell,
+            ),
+            Zone.DANGER: State(on_enter=entered("DANGER", 0)),
+        },
+        transitions=[
+            Transition(ANY, Zone.DANGER, below("dist", 30.0), min_dwell_s=0.0),
+            Transition(Zone.SAFE, Zone.CAUTION, below("dist", 50.0)),
+            Transition(Zone.CAUTION, Zone.SAFE, above("dist", 50.0 + hysteresis)),
+            Transition(Zone.DANGER, Zone.CAUTION, above("dist", 30.0 + hysteresis)),
+        ],
+        initial=Zone.SAFE,
+        registry=registry or Registry(),
+        clock=lambda: 0.0,
+    )
+
+
+def run(machine, trace, dt=0.05):
+    for i, dist in enumerate(trace):
+        machine.update({"dist": dist}, now=i * dt)
+
+
+def hovering(center, amplitude=2.0, n=200):
+    """A reading jittering around a threshold, 20 Hz."""
+    return [center + (amplitude if i % 3 else -amplitude) for i in range(n)]
+
+
+def test_hysteresis_stops_chatter_around_a_threshold():
+    robot = CountingRobot()
+    machine = zones(LatchedDrive(robot))
+    run(machine, [80.0] * 10 + hovering(50.0))
+    assert machine.state is Zone.CAUTION
+    assert machine.transitions == 1
+    # Centre + cruise, then one speed change
+    assert robot.calls == [("steer", 0), ("forward", 15), ("forward", 8)]
+
+
+def test_without_hysteresis_and_dwell_the_same_trace_chatters():
+    robot = CountingRobot()
+    machine = zones(LatchedDrive(robot), hysteresis=0.0, dwell=0.0)
+    run(machine, [80.0] * 10 + hovering(50.0))
+    assert machine.transitions > 100
+    assert len(robot.calls) > 100
+
+
+def test_danger_skips_the_dwell_time():
+    machine = zones(LatchedDrive(CountingRobot()))
+    machine.update({"dist": 80.0}, now=0.0)
+    assert machine.update({"dist": 45.0}, now=0.35) is Zone.CAUTION
+    # Only 50 ms in CAUTION, well under its dwell time
+    assert machine.update({"dist": 20.0}, now=0.4) is Zone.DANGER
+
+
+def test_dwell_holds_a_state_then_lets_go():
+    machine = zones(LatchedDrive(CountingRobot()))
+    machine.update({"dist": 45.0}, now=0.0)  # enters SAFE
+    assert machine.update({"dist": 45.0}, now=0.1) is Zone.SAFE
+    assert machine.update({"dist": 45.0}, now=0.3) is Zone.CAUTION
+    assert machine.update({"dist": 80.0}, now=0.4) is Zone.CAUTION
+    assert machine.update({"dist": 80.0}, now=0.6) is Zone.SAFE
+
+
+def test_entry_and_exit_actions_run_once_per_transition():
+    log = []
+    machine = zones(LatchedDrive(CountingRobot()), log=log)
+    run(machine, [80.0] * 10 + [40.0] * 10 + [60.0] * 10)
+    assert log == [("enter", "SAFE"), ("enter", "CAUTION"), ("exit", "CAUTION"), ("enter", "SAFE")]
+
+
+def test_on_tick_runs_every_update_after_the_transition():
+    seen = []
+    machine = StateMachine(
+        "tick",
+        states={"a": State(on_tick=lambda ctx: seen.append("a")),
+                "b": State(on_tick=lambda ctx: seen.append("b"))},
+        transitions=[Transition("a", "b", lambda ctx: ctx["go"])],
+        initial="a",
+        registry=Registry(),
+        clock=lambda: 0.0,
+    )
+    for go in (False, False, True, False):
+        machine.update({"go": go})
+    assert seen == ["a", "a", "b", "b"]
+
+
+def test_per_state_stats_and_metrics():
+    registry = Registry()
+    machine = zones(LatchedDrive(CountingRobot()), registry=registry)
+    run(machine, [80.0] * 20 + [40.0] * 40 + [20.0] * 10 + [40.0] * 10)  # 4 s at 20 Hz
+    stats = machine.stats(now=4.0)
+    assert stats[Zone.SAFE].entries == 1 and stats[Zone.SAFE].total_s == pytest.approx(1.0)
+    assert stats[Zone.CAUTION].entries == 2
+    assert stats[Zone.CAUTION].total_s == pytest.approx(2.5)
+    assert stats[Zone.CAUTION].longest_s == pytest.approx(2.0)
+    assert stats[Zone.DANGER].total_s == pytest.approx(0.5)
+    assert registry.get("picarx_test_transitions_total").value == 3
+    assert registry.get("picarx_test_state").value == Zone.CAUTION.value
+    assert "CAUTION" in machine.report(now=4.0)
+
+
+def test_rejects_unknown_states():
+    with pytest.raises(ValueError):
+        StateMachine("bad", {"a": State()}, [Transition("a", "b", lambda ctx: True)], "a",
+                     registry=Registry())
+
+
+def test_latched_drive_reports_every_command():
+    commands = []
+    drive = LatchedDrive(CountingRobot(), on_command=lambda speed, steer: commands.append((speed, steer)))
+    drive.set(10, 5)
+    drive.set(10, 5)
+    drive.set(-10)
+    assert drive.writes == 3
+    assert commands == [(10, 5), (10, 5), (-10, 5)]
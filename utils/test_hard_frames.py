@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.hard_frames import HardFrameCapture, NullCapture, open_capture, yolo_label
+from utils.metrics import Registry
+
+FRAME = np.zeros((480, 640, 3), dtype=np.uint8)
+PERSON = (0, 0.9, 160.0, 120.0, 480.0, 360.0)
+FAINT = (2, 0.3, 0.0, 0.0, 64.0, 48.0)
+
+
+def make(tmp_path, **kwargs):
+    kwargs.setdefault("encode", lambda frame: b"jpeg")
+    kwargs.setdefault("clock", lambda: 0.0)
+    return HardFrameCapture(tmp_path, session="run", registry=Registry(), **kwargs)
+
+
+def test_selects_only_hard_frames(tmp_path):
+    capture = make(tmp_path)
+    assert capture.reasons([PERSON]) == ()
+    assert capture.reasons([PERSON, FAINT]) == ("low_conf",)
+    assert capture.reasons(disagree=True, stop=True) == ("disagree", "stop")
+    assert not capture.offer(FRAME, [PERSON])
+    capture.close()
+    assert capture.saved == 0
+
+
+def test_writes_a_yolo_dataset(tmp_path):
+    capture = make(tmp_path)
+    assert capture.offer(FRAME, [PERSON, FAINT], stop=True, dist_cm=21.5, t=3.0)
+    capture.close()
+    root = tmp_path / "run"
+    assert (root / "images" / "run-00000.jpg").read_bytes() == b"jpeg"
+    labels = (root / "labels" / "run-00000.txt").read_text().splitlines()
+    assert labels[0] == "0 0.500000 0.500000 0.500000 0.500000"
+    assert labels[1] == yolo_label(FAINT, 640, 480) == "2 0.050000 0.050000 0.100000 0.100000"
+    manifest = (root / "manifest.csv").read_text().splitlines()
+    assert manifest[1] == "images/run-00000.jpg,3.000,low_conf+stop,21.5,2,0.300"
+    assert capture.saved == 1 and capture.bytes_written == 4 + len("\n".join(labels)) + 1
+
+
+def test_each_reason_is_rate_limited(tmp_path):
+    now = [0.0]
+    capture = make(tmp_path, min_interval_s=1.0, clock=lambda: now[0])
+    assert capture.offer(FRAME, stop=True)
+    now[0] = 0.5
+    assert not capture.offer(FRAME, stop=True)
+    assert capture.offer(FRAME, disagree=True)  # a different reason is not held back
+    now[0] = 1.0
+    assert capture.offer(FRAME, stop=True)
+    capture.close()
+    assert capture.saved == 3
+    assert capture.by_reason == {"low_conf": 0, "disagree": 1, "stop": 2}
+
+
+def test_a_stalled_writer_drops_frames_instead_of_blocking(tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_encode(frame):
+        started.set()
+        release.wait()
+        return b"jpeg"
+
+    capture = make(tmp_path, queue_size=2, min_interval_s=0.0, encode=slow_encode)
+    assert capture.offer(FRAME, stop=True)
+    assert started.wait(2.0)  # the writer is now stuck on the first frame
+    t0 = time.monotonic()
+    results = [capture.offer(FRAME, stop=True) for _ in range(5)]
+    assert time.monotonic() - t0 < 0.5
+    assert results == [True, True, False, False, False]
+    assert capture.dropped == 3
+    release.set()
+    capture.close()
+    assert capture.saved == 3
+    assert "3 dropped" in capture.report()
+
+
+def test_the_queued_frame_is_a_copy(tmp_path):
+    seen = []
+    capture = make(tmp_path, encode=lambda frame: seen.append(frame.max()) or b"jpeg")
+    frame = FRAME.copy()
+    capture.offer(frame, stop=True)
+    frame[:] = 255  # the loop reuses its buffer
+    capture.close()
+    assert seen == [0]
+
+
+def test_stops_at_max_frames(tmp_path):
+    capture = make(tmp_path, min_interval_s=0.0, max_frames=2)
+    assert [capture.offer(FRAME, stop=True) for _ in range(4)] == [True, True, False, False]
+    capture.close()
+    assert capture.saved == 2
+
+
+def test_open_capture_without_directory_is_a_no_op(tmp_path):
+    capture = open_capture(None)
+    assert isinstance(capture, NullCapture) and not capture
+    assert not capture.offer(FRAME, stop=True)
+    capture.close()
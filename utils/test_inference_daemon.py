@@ -0,0 +1,180 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import utils.inference_daemon as inf
+
+
+class FakeBackend:
+    """One box per frame whose class is the frame's first pixel."""
+
+    names = {0: "person", 1: "bicycle", 2: "car"}
+
+    def __init__(self, delay_s=0.0):
+        self.delay_s = delay_s
+        self.batches = []
+        self.shapes = []
+        self.gate = None  # threading.Event every predict() waits on
+
+    def predict(self, frames, imgsz, conf):
+        self.batches.append((len(frames), imgsz, conf))
+        self.shapes.extend(f.shape for f in frames)
+        if self.gate is not None:
+            self.gate.wait(5.0)
+        time.sleep(self.delay_s)
+        out = []
+        for f in frames:
+            h, w = f.shape[:2]
+            out.append((np.array([f[0, 0, 0]]), np.array([0.9]),
+                        np.array([[0.0, 0.0, w / 2, h / 2]])))
+        return out
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    backend = FakeBackend(delay_s=0.05)
+    d = inf.InferenceDaemon({"yolov8n.pt": backend}, str(tmp_path / "infer.sock"),
+                            max_batch=4, batch_wait_s=0.02).start()
+    d.backend = backend
+    yield d
+    d.close()
+
+
+def frame(value, h=48, w=64):
+    return np.full((h, w, 3), value, dtype=np.uint8)
+
+
+def test_remote_model_matches_ultralytics_result_shape(daemon):
+    model = inf.load_model("~/models/yolov8n.pt", daemon.socket_path)
+    try:
+        assert isinstance(model, inf.RemoteModel)
+        assert model.names[2] == "car"
+        boxes = model(frame(2), imgsz=320, verbose=False)[0].boxes
+        assert len(boxes) == 1
+        box = boxes[0]
+        assert int(box.cls[0]) == 2
+        assert float(box.conf[0]) == pytest.approx(0.9)
+        assert box.xyxy[0].tolist() == [0.0, 0.0, 32.0, 24.0]
+        # A larger frame re-sizes the shared buffer transparently
+        big = model.predict(frame(1, 720, 1280), imgsz=320)[0].boxes[0]
+        assert big.xyxy[0].tolist() == [0.0, 0.0, 640.0, 360.0]
+    finally:
+        model.close()
+
+
+def test_unknown_model_is_rejected(daemon):
+    with pytest.raises(inf.InferenceError):
+        inf.InferenceClient("yolov8s.pt", daemon.socket_path)
+    with pytest.raises(inf.InferenceError):
+        inf.load_model("yolov8s.pt", daemon.socket_path, mode="daemon")
+
+
+def test_concurrent_clients_are_batched_and_reported(daemon):
+    clients = [inf.InferenceClient("yolov8n.pt", daemon.socket_path, name=f"c{i}")
+               for i in range(3)]
+    results = {}
+
+    def run(i, client):
+        for _ in range(3):
+            results.setdefault(i, []).append(int(client.predict(frame(i), imgsz=320)["cls"][0]))
+
+    # Hold the worker until every client's first frame has reached it, so
+    # the batch that follows is a real batch whatever the thread timing
+    daemon.backend.gate = threading.Event()
+    threads = [threading.Thread(target=run, args=(i, c)) for i, c in enumerate(clients)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 5.0
+    while (sum(n for n, _, _ in daemon.backend.batches) + len(daemon._queue) < 3
+           and time.monotonic() < deadline):
+        time.sleep(0.001)
+    daemon.backend.gate.set()
+    for t in threads:
+        t.join()
+    try:
+        # Every client got its own frame's answer back
+        assert results == {0: [0, 0, 0], 1: [1, 1, 1], 2: [2, 2, 2]}
+        assert max(n for n, _, _ in daemon.backend.batches) > 1
+        assert sum(n for n, _, _ in daemon.backend.batches) == 9
+
+        stats = inf.request_stats(daemon.socket_path)
+        per_client = {c["name"]: c for c in stats["clients"]}
+        assert {"c0", "c1", "c2"} <= set(per_client)
+        assert per_client["c1"]["requests"] == 3
+        assert per_client["c1"]["in_flight"] == 0
+        assert per_client["c1"]["latency_mean_ms"] > 0
+        assert per_client["c1"]["pid"] == os.getpid()
+        assert stats["queue_depth"] == 0
+    finally:
+        for c in clients:
+            c.close()
+
+
+def test_daemon_mode_requires_a_running_daemon(tmp_path):
+    with pytest.raises(ConnectionError):
+        inf.load_model("yolov8n.pt", str(tmp_path / "none.sock"), mode="daemon")
+
+
+def test_malformed_messages_drop_only_that_client(daemon):
+    import json
+    import socket
+
+    good = inf.InferenceClient("yolov8n.pt", daemon.socket_path, name="good")
+    try:
+        fd = os.memfd_create("bad")
+        os.ftruncate(fd, 64)
+        hello = json.dumps({"op": "hello", "model": "yolov8n.pt"}).encode()  # no capacity
+        for send in (lambda s: s.send(b"not json"),
+                     lambda s: s.send(inf.REQ_MAGIC + b"short"),
+                     lambda s: socket.send_fds(s, [hello], [fd])):
+            bad = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            bad.settimeout(2.0)
+            bad.connect(daemon.socket_path)
+            send(bad)
+            assert bad.recv(64) == b""  # disconnected
+            bad.close()
+        os.close(fd)
+        assert int(good.predict(frame(1))["cls"][0]) == 1
+        # Left: the good client and the stats connection asking
+        clients = inf.request_stats(daemon.socket_path)["clients"]
+        assert len(clients) == 2 and "good" in {c["name"] for c in clients}
+    finally:
+        good.close()
+
+
+def test_frame_larger_than_the_shared_buffer_is_refused(daemon):
+    client = inf.InferenceClient("yolov8n.pt", daemon.socket_path, capacity=64)
+    try:
+        client.sock.send(inf.REQ.pack(inf.REQ_MAGIC, 7, 0.0, 480, 640, 3, 320, 0.25))
+        _, seq, _, _, _, _, _, status = inf.RESP.unpack_from(client.sock.recv(4096))
+        assert (seq, status) == (7, inf.STATUS_ERROR)
+        # The worker is still alive
+        assert int(client.predict(frame(2))["cls"][0]) == 2
+    finally:
+        client.close()
+
+
+def test_replies_are_capped_to_fit_the_client_buffer(tmp_path):
+    class ManyBoxes(FakeBackend):
+        def predict(self, frames, imgsz, conf):
+            n = inf.MAX_DETECTIONS + 50
+            return [(np.zeros(n), np.linspace(0.0, 1.0, n), np.zeros((n, 4))) for _ in frames]
+
+    d = inf.InferenceDaemon({"yolov8n.pt": ManyBoxes()}, str(tmp_path / "infer.sock")).start()
+    client = inf.InferenceClient("yolov8n.pt", d.socket_path)
+    try:
+        dets = client.predict(frame(0))
+        assert len(dets) == inf.MAX_DETECTIONS
+        assert dets["score"].min() > 50 / (inf.MAX_DETECTIONS + 49) - 1e-6
+    finally:
+        client.close()
+        d.close()
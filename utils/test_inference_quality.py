@@ -0,0 +1,92 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.inference_quality import SPEED_SCALE_BLIND, QualityController
+from utils.metrics import Registry
+
+
+class SyntheticModel:
+    """Latency proportional to pixel count, times a load factor."""
+
+    def __init__(self, s_at_320=0.12):
+        self.s_at_320 = s_at_320
+        self.load = 1.0
+
+    def latency(self, imgsz):
+        return self.s_at_320 * (imgsz / 320.0) ** 2 * self.load
+
+
+def run(quality, model, seconds, t0, dt=0.1):
+    """Drive the controller at 10 Hz; returns the time reached."""
+    t = t0
+    while t < t0 + seconds:
+        imgsz = quality.next_imgsz(t)
+        if imgsz is not None:
+            quality.observe(model.latency(imgsz), t)
+        t += dt
+    return t
+
+
+@pytest.fixture
+def quality():
+    return QualityController(budget_s=0.2, registry=Registry(), clock=lambda: 0.0)
+
+
+def test_steps_down_under_load_and_back_up_with_headroom(quality):
+    model = SyntheticModel()
+    t = run(quality, model, 5.0, 0.0)
+    assert quality.imgsz == 320 and not quality.transitions
+
+    model.load = 2.5  # throttled: 320 -> 0.30 s, 256 -> 0.19 s
+    t = run(quality, model, 1.0, t)
+    assert quality.imgsz == 256
+    assert [(a, b) for _, a, b, _ in quality.transitions] == [(0, 1)]
+
+    model.load = 1.0
+    t = run(quality, model, 1.5, t)
+    assert quality.imgsz == 256  # held: not enough time at this level yet
+    run(quality, model, 5.0, t)
+    assert quality.imgsz == 320
+    assert quality._up.value == 1 and quality._down.value == 1
+
+
+def test_no_oscillation_when_full_size_would_not_fit(quality):
+    model = SyntheticModel()
+    model.load = 1.5  # 320 -> 0.18 s fits the budget but not the step-up margin
+    quality.level = 1
+    run(quality, model, 30.0, 0.0)
+    assert quality.imgsz == 256 and not quality.transitions
+
+
+def test_falls_back_to_ultrasonic_only_and_probes_to_recover(quality):
+    model = SyntheticModel()
+    model.load = 10.0  # even 160 px takes 0.3 s
+    t = run(quality, model, 5.0, 0.0)
+    assert not quality.vision_enabled
+    assert quality.imgsz is None and quality.speed_scale == SPEED_SCALE_BLIND
+    assert quality._imgsz_gauge.value == 0
+
+    # Paused: only one probe frame per interval
+    probes = [t + i * 0.1 for i in range(20) if quality.next_imgsz(t + i * 0.1) is not None]
+    assert len(probes) == 1
+    quality.observe(model.latency(160), probes[0])
+    assert not quality.vision_enabled
+
+    model.load = 1.0
+    run(quality, model, 3.0, t + 2.0)
+    assert quality.imgsz == 160 and quality.speed_scale == 1.0
+
+
+def test_single_size_never_leaves_vision():
+    quality = QualityController(budget_s=0.1, sizes=(320,), allow_ultrasonic_only=False,
+                                registry=Registry(), clock=lambda: 0.0)
+    model = SyntheticModel()
+    model.load = 5.0
+    run(quality, model, 5.0, 0.0)
+    assert quality.imgsz == 320 and not quality.transitions
@@ -0,0 +1,116 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import Registry
+from utils.power_save import ACTIVE, IDLE, PowerGovernor
+
+
+def make(now, cpu=None, **kwargs):
+    kwargs.setdefault("idle_after_s", 3.0)
+    return PowerGovernor(
+        registry=Registry(),
+        clock=lambda: now[0],
+        cpu_clock=(lambda: cpu[0]) if cpu is not None else None,
+        **kwargs,
+    )
+
+
+def idle(governor, now):
+    now[0] += 3.0
+    assert governor.update() == IDLE
+
+
+def test_goes_idle_only_after_a_quiet_period():
+    now = [0.0]
+    governor = make(now)
+    now[0] = 2.0
+    assert governor.drive(False) == ACTIVE
+    governor.wake("key")
+    now[0] = 4.5
+    assert governor.drive(False) == ACTIVE  # 2.5 s since the key
+    now[0] = 5.0
+    assert governor.drive(False) == IDLE
+
+
+def test_moving_keeps_it_active():
+    now = [0.0]
+    governor = make(now)
+    for t in range(10):
+        now[0] = float(t)
+        assert governor.drive(True) == ACTIVE
+    assert sum(governor.wakeups.values()) == 0
+
+
+def test_idle_rates_and_immediate_wake():
+    now = [0.0]
+    governor = make(now)
+    assert governor.due("camera") and governor.due("camera")  # every loop when active
+    assert governor.wait_s(0.05) == 0.05
+    idle(governor, now)
+    assert governor.wait_s(0.05) == 0.25
+    assert governor.due("inference")
+    now[0] += 0.5
+    assert not governor.due("inference")
+    now[0] += 0.5
+    assert governor.due("inference")
+
+    assert not governor.due("inference")
+    assert governor.drive(True) == ACTIVE  # a drive command on the same loop...
+    assert governor.due("inference")  # ...restores full rate at once
+    assert governor.wakeups == {"drive": 1}
+
+
+def test_scene_change_by_distance_wakes_it():
+    now = [0.0]
+    governor = make(now)
+    idle(governor, now)
+    assert not governor.observe_distance(80.0)  # reference
+    assert not governor.observe_distance(85.0)
+    assert not governor.observe_distance(-1)  # no echo is not a change
+    assert governor.observe_distance(60.0)
+    assert governor.mode == ACTIVE and governor.wakeups == {"scene": 1}
+
+
+def test_scene_change_by_frame_wakes_it():
+    now = [0.0]
+    governor = make(now)
+    idle(governor, now)
+    frame = np.full((480, 640, 3), 100, dtype=np.uint8)
+    assert not governor.observe_frame(frame)  # reference
+    frame[:8, :8] = 255  # sensor noise / a few pixels
+    assert not governor.observe_frame(frame)
+    frame[:, :320] = 0  # someone walks in
+    assert governor.observe_frame(frame)
+    assert governor.mode == ACTIVE
+
+
+def test_reports_cpu_per_mode():
+    now, cpu = [0.0], [0.0]
+    registry = Registry()
+    governor = PowerGovernor(idle_after_s=3.0, registry=registry, clock=lambda: now[0],
+                             cpu_clock=lambda: cpu[0])
+    now[0], cpu[0] = 3.0, 2.7
+    governor.update()
+    assert registry.get("picarx_power_mode").value == 1
+    now[0], cpu[0] = 13.0, 3.2
+    governor.wake("key")
+    assert registry.get("picarx_power_wakeups_total").value == 1
+    usage = governor.utilisation()
+    assert usage[ACTIVE] == pytest.approx((3.0, 0.9))
+    assert usage[IDLE] == pytest.approx((10.0, 0.05))
+    assert governor.report() == "active 3 s at 90% CPU; idle 10 s at 5% CPU; 1 wake-ups (key 1)"
+
+
+def test_zero_idle_after_disables_idling():
+    now = [0.0]
+    governor = make(now, idle_after_s=0)
+    now[0] = 1000.0
+    assert governor.update() == ACTIVE
@@ -0,0 +1,77 @@
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils import profiling
+from utils.profiling import SamplingProfiler, span, spanned
+
+
+def test_disabled_span_is_shared_no_op():
+    profiling.set_spans_enabled(False)
+    assert span("a") is span("b")
+
+
+def test_enabled_spans_feed_histograms():
+    profiling.set_spans_enabled(True)
+    try:
+        with span("unit_test"):
+            pass
+
+        @spanned()
+        def work():
+            return 42
+
+        assert work() == 42
+        assert profiling._span_hists["unit_test"].count == 1
+        assert profiling._span_hists["work"].count == 1
+        assert "unit_test" in profiling.span_report()
+    finally:
+        profiling.set_spans_enabled(False)
+
+
+def _busy_worker(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampler_captures_other_threads_as_folded_stacks(tmp_path):
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_worker, args=(stop,), name="busy")
+    worker.start()
+    try:
+        prof = SamplingProfiler(interval_s=0.002).run(0.2)
+    finally:
+        stop.set()
+        worker.join()
+    path = prof.write(tmp_path / "out.folded")
+    lines = open(path).read().splitlines()
+    assert prof.samples > 10
+    assert any(l.startswith("busy;") and "_busy_worker" in l for l in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+
+
+def test_control_socket_runs_a_capture(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    sock = profiling.start_control_socket()
+    try:
+        reply = profiling.request(os.getpid(), "profile", 0.05, timeout=5)
+    finally:
+        sock.close()
+    assert reply.startswith(str(tmp_path)) and reply.endswith(".folded")
+    assert os.path.exists(reply)
+
+
+def test_disabled_span_overhead_is_tiny():
+    profiling.set_spans_enabled(False)
+    n = 100_000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with span("x"):
+            pass
+    assert (time.perf_counter() - t0) / n < 5e-6
@@ -0,0 +1,155 @@
+import os
+import sys
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import utils.remote_inference as ri
+from utils.inference_daemon import load_model
+from utils.metrics import Registry
+from utils.test_inference_daemon import FakeBackend
+
+
+class FakeLocal:
+    names = FakeBackend.names
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, source, **kwargs):
+        self.calls += 1
+        return ["local"]
+
+
+def serve(delay_s=0.0):
+    backend = FakeBackend(delay_s)
+    server = ri.OffloadServer({"yolov8n.pt": backend}, "127.0.0.1", 0).start()
+    server.backend = backend
+    return server
+
+
+def addr(server):
+    return "%s:%d" % server.address
+
+
+def offload(server_addr, **kwargs):
+    kwargs.setdefault("codec", ri.CODEC_ZLIB)
+    kwargs.setdefault("registry", Registry())
+    return ri.OffloadModel(server_addr, "~/models/yolov8n.pt", **kwargs)
+
+
+def frame(value, h=480, w=640):
+    return np.full((h, w, 3), value, dtype=np.uint8)
+
+
+@pytest.fixture
+def server():
+    s = serve()
+    yield s
+    s.close()
+
+
+def test_downscaled_frames_come_back_in_full_frame_pixels(server):
+    model = offload(addr(server), in_flight=1)
+    try:
+        box = model(frame(2), imgsz=320, verbose=False)[0].boxes[0]
+        assert server.backend.shapes == [(240, 320, 3)]
+        assert int(box.cls[0]) == 2 and model.names[2] == "car"
+        assert box.xyxy[0].tolist() == [0.0, 0.0, 320.0, 240.0]
+        assert model.mode == "remote" and model.lag_s == 0.0
+    finally:
+        model.close()
+
+
+def test_pipelined_results_lag_one_frame(server):
+    now = [0.0]
+    model = offload(addr(server), in_flight=2, clock=lambda: now[0])
+    try:
+        classes = []
+        for i in range(4):
+            now[0] = i * 0.1
+            classes.append(int(model.predict(frame(i), imgsz=320)[0].boxes[0].cls[0]))
+            # The frame the boxes belong to comes back with them
+            assert model.source[0, 0, 0] == classes[-1]
+            time.sleep(0.05)  # the reply to this frame arrives during the "loop"
+        # The first call waits for its own frame, later ones get the previous one
+        assert classes[0] == 0
+        assert classes[-1] >= 2
+        assert model.lag_s == pytest.approx(0.1 * (3 - classes[-1]))
+    finally:
+        model.close()
+
+
+def test_link_drop_falls_back_to_local_and_recovers():
+    server = serve()
+    port = server.address[1]
+    now = [0.0]
+    local = FakeLocal()
+    model = offload(addr(server), local=local, in_flight=1, retry_s=1.0, clock=lambda: now[0])
+    try:
+        assert model.predict(frame(1), imgsz=320)[0].boxes
+        server.close()
+        time.sleep(0.05)
+        assert model.predict(frame(1), imgsz=320) == ["local"]
+        assert model.mode == "local" and model.fallbacks["link"] == 1
+        assert model.available
+
+        server = ri.OffloadServer({"yolov8n.pt": FakeBackend()}, "127.0.0.1", port).start()
+        now[0] = 0.5
+        assert model.predict(frame(1), imgsz=320) == ["local"]  # not retried yet
+        now[0] = 1.5
+        assert model.predict(frame(1), imgsz=320)[0].boxes
+        assert model.mode == "remote" and model.recoveries == 1
+        assert "1 fallbacks (link 1)" in model.report()
+    finally:
+        model.close()
+        server.close()
+
+
+def test_slow_server_falls_back_to_ultrasonic_only():
+    server = serve(delay_s=0.03)
+    model = offload(addr(server), in_flight=1, budget_s=0.01, window=3)
+    try:
+        for _ in range(3):
+            results = model.predict(frame(1), imgsz=320)
+        assert model.mode == "ultrasonic" and not model.available
+        assert model.fallbacks["slow"] == 1 or model.fallbacks["timeout"] == 1
+        assert len(results[0].boxes) == 0
+    finally:
+        model.close()
+        server.close()
+
+
+def test_unreachable_server_starts_in_fallback(tmp_path):
+    model = offload("127.0.0.1:1", local=FakeLocal())
+    assert model.mode == "local" and model.fallbacks["connect"] == 1
+
+
+def test_reports_round_trip_and_bandwidth(server):
+    registry = Registry()
+    model = offload(addr(server), registry=registry)
+    try:
+        for i in range(5):
+            model.predict(frame(i), imgsz=320)
+        report = model.report()
+        assert "rtt p50" in report and "kbit/s" in report
+        assert model.bytes_sent > 0 and model.bytes_received > 0
+        assert registry.get("picarx_offload_bytes_sent_total").value == model.bytes_sent
+        assert registry.get("picarx_offload_rtt_seconds").count >= 4
+    finally:
+        model.close()
+
+
+def test_load_model_offloads_when_an_address_is_given(server, monkeypatch):
+    monkeypatch.setattr(ri, "FALLBACK", "ultrasonic")  # no local YOLO to load
+    model = load_model("yolov8n.pt", offload=addr(server))
+    try:
+        assert isinstance(model, ri.OffloadModel) and model.mode == "remote"
+    finally:
+        model.close()
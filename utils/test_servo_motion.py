@@ -0,0 +1,97 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.servo_motion import SERVOS, ServoPlanner
+
+
+class FakeServos:
+    def __init__(self):
+        self.log = []
+
+    def set_dir_servo_angle(self, a):
+        self.log.append(("dir", a))
+
+    def set_cam_pan_angle(self, a):
+        self.log.append(("pan", a))
+
+    def set_cam_tilt_angle(self, a):
+        self.log.append(("tilt", a))
+
+    def last(self, servo):
+        return [a for s, a in self.log if s == servo][-1]
+
+
+def run(planner, now, until, dt=0.02):
+    while now[0] < until:
+        now[0] += dt
+        planner.step()
+
+
+def test_servos_move_concurrently_and_finish_with_the_slowest():
+    px, now = FakeServos(), [0.0]
+    slew = {"dir": 100.0, "pan": 100.0, "tilt": 50.0}
+    planner = ServoPlanner(px, slew=slew, settle_s=0.1, background=False, clock=lambda: now[0])
+    planner.step()
+    eta = planner.move(dir=20, pan=-30, tilt=25)
+    # Slowest: tilt 25 deg at 50 deg/s = 0.5 s, plus settle -- not 0.2 + 0.3 + 0.5
+    assert eta == pytest.approx(0.6)
+
+    run(planner, now, 0.1)
+    # All three are in motion at once, each capped by its own slew rate
+    assert planner.position("dir") == pytest.approx(10.0)
+    assert planner.position("pan") == pytest.approx(-10.0)
+    assert planner.position("tilt") == pytest.approx(5.0)
+    assert not planner.arrived()
+
+    run(planner, now, 0.55)
+    assert planner.arrived("dir", "pan")
+    assert not planner.arrived("tilt")
+    run(planner, now, 0.61)
+    assert planner.arrived()
+    assert [px.last(s) for s in SERVOS] == [20.0, -30.0, 25.0]
+
+
+def test_setpoints_are_interpolated_and_redundant_writes_skipped():
+    px, now = FakeServos(), [0.0]
+    planner = ServoPlanner(px, slew={"pan": 100.0}, background=False, clock=lambda: now[0])
+    planner.step()
+    px.log.clear()
+    planner.move(pan=10)
+    run(planner, now, 0.2)
+    pan = [a for s, a in px.log if s == "pan"]
+    assert pan == sorted(pan) and pan[-1] == 10.0
+    assert 4 <= len(pan) <= 6  # ~2 deg per 20 ms tick
+    assert all(s == "pan" for s, _ in px.log)
+
+    px.log.clear()
+    planner.move(pan=10)
+    run(planner, now, 0.4)
+    assert px.log == []
+
+
+def test_unknown_start_jumps_and_budgets_worst_case_travel():
+    px, now = FakeServos(), [0.0]
+    planner = ServoPlanner(
+        px, slew={"dir": 90.0}, settle_s=0.0, initial={"dir": None},
+        background=False, clock=lambda: now[0],
+    )
+    assert planner.move(dir=0) == pytest.approx(1.0)
+    planner.step()
+    assert px.last("dir") == 0.0
+
+
+def test_background_thread_reaches_target_and_wait_returns():
+    px = FakeServos()
+    planner = ServoPlanner(px, slew=dict.fromkeys(SERVOS, 2000.0), settle_s=0.0)
+    try:
+        planner.move(pan=40, tilt=-20)
+        assert planner.wait(timeout=2.0)
+        assert px.last("pan") == 40.0 and px.last("tilt") == -20.0
+    finally:
+        planner.close()
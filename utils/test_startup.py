@@ -0,0 +1,48 @@
+import os
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import Registry
+from utils.startup import BackgroundLoader, StartupLog, process_age
+
+
+def test_milestones_are_recorded_once_and_exported():
+    reg = Registry()
+    log = StartupLog(t0=100.0, registry=reg, quiet=True)
+    assert log.mark("first_safe_loop", now=100.25) == pytest.approx(0.25)
+    assert log.mark("first_safe_loop", now=105.0) == pytest.approx(0.25)
+    log.mark("first_detection", now=103.0)
+    assert reg.get("picarx_startup_first_safe_loop_seconds").get() == pytest.approx(0.25)
+    assert log.report() == "first_safe_loop=0.25s  first_detection=3.00s"
+
+
+def test_process_age_covers_interpreter_startup():
+    age = process_age()
+    assert 0.0 <= age < 3600.0
+    if os.path.exists("/proc/self/stat"):
+        assert StartupLog(quiet=True).mark("now") >= age
+
+
+def test_loader_runs_in_background_and_reports_result():
+    release = threading.Event()
+    loader = BackgroundLoader(lambda: release.wait(1.0) and "model").start()
+    assert not loader.done and not loader.ready  # the caller is not blocked
+    release.set()
+    assert loader.wait(1.0)
+    assert loader.result == "model" and loader.seconds >= 0.0
+
+
+def test_loader_failure_is_kept_for_the_owner():
+    def boom():
+        raise RuntimeError("no camera")
+
+    loader = BackgroundLoader(boom).start()
+    assert not loader.wait(1.0)
+    assert loader.failed
+    assert str(loader.error) == "no camera"
@@ -0,0 +1,113 @@
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.status import CLEAR_LINE, StatusLine
+
+
+class Recorder:
+    """A stream that records writes and which thread made them."""
+
+    def __init__(self, block=None):
+        self.writes = []
+        self.threads = set()
+        self.block = block
+
+    def write(self, text):
+        if self.block is not None:
+            self.block.wait()
+        self.threads.add(threading.get_ident())
+        self.writes.append(text)
+
+    def flush(self):
+        pass
+
+    @property
+    def text(self):
+        return "".join(self.writes)
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return predicate()
+
+
+def test_set_never_writes_from_the_caller():
+    stream = Recorder()
+    status = StatusLine("d={dist:.0f}", stream=stream, rate_hz=50).start()
+    for i in range(100):
+        status.set(dist=i)
+    assert threading.get_ident() not in stream.threads
+    assert wait_for(lambda: "d=99" in stream.text)
+    status.close()
+    assert threading.get_ident() not in stream.threads
+
+
+def test_redraws_at_a_capped_rate_and_only_on_change():
+    stream = Recorder()
+    status = StatusLine("d={dist}", stream=stream, rate_hz=20).start()
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < 0.5:
+        status.set(dist=round(time.monotonic(), 3))
+        time.sleep(0.001)
+    time.sleep(0.1)  # let the last change draw
+    draws = len(stream.writes)
+    assert 3 <= draws <= 14  # ~10 at 20 Hz, not ~500
+    time.sleep(0.2)  # nothing changed since: no redraws
+    assert len(stream.writes) == draws
+    status.close()
+
+
+def test_events_come_out_in_order_above_the_status_line():
+    stream = Recorder()
+    status = StatusLine("state={state}", stream=stream, rate_hz=50).start()
+    status.set(state="SAFE")
+    for i in range(5):
+        status.event(f"event {i}")
+    status.close()
+    text = stream.text
+    positions = [text.index(f"event {i}\r\n") for i in range(5)]
+    assert positions == sorted(positions)
+    assert text.endswith(CLEAR_LINE + "state=SAFE\r\n")
+
+
+def test_a_stalled_terminal_drops_the_oldest_events():
+    gate = threading.Event()
+    stream = Recorder(block=gate)
+    status = StatusLine(stream=stream, rate_hz=100, max_events=4).start()
+    status.event("first")
+    time.sleep(0.05)  # the render thread is now stuck writing "first"
+    t0 = time.monotonic()
+    for i in range(10):
+        status.event(f"event {i}")
+    assert time.monotonic() - t0 < 0.05  # the caller never waited
+    assert status.dropped == 6
+    gate.set()
+    status.close()
+    assert "event 5" not in stream.text
+    assert all(f"event {i}\r\n" in stream.text for i in range(6, 10))
+
+
+def test_missing_fields_render_as_placeholders():
+    status = StatusLine("Dist: {dist:6.1f} cm | {state}")
+    status.set(state="SAFE")
+    assert "?" in status.render() and "SAFE" in status.render()
+    status.set(dist=12.0)
+    assert status.render() == "Dist:   12.0 cm | SAFE"
+    assert StatusLine().render() == ""
+
+
+def test_disabled_rate_writes_events_directly():
+    stream = Recorder()
+    status = StatusLine(stream=stream, rate_hz=0).start()
+    status.set(dist=1.0)
+    status.event("Stopping.")
+    assert stream.writes == [CLEAR_LINE + "Stopping.\r\n"]
+    status.close()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+"""
+Camera intrinsics calibration from checkerboard images.
+
+Print a checkerboard (e.g. 9x6 inner corners, 25 mm squares), then either
+point the script at 15-30 photos of it taken with the car's camera, or let
+it take them: it keeps a frame whenever the board is found, so move the
+board around the whole field of view, corners included, and tilt it.
+
+    python3 vision/calibrate_camera.py --capture 25 --save-dir ~/calib-shots
+    python3 vision/calibrate_camera.py ~/calib-shots/*.jpg --pattern 9x6 --square-mm 25 \\
+        -o ~/.config/picarx/camera.json
+
+The output is a vision/camera_model.py calibration (camera matrix and
+distortion coefficients); with PICARX_CAMERA_CALIB pointing at it,
+OpponentTracker takes bearings from the model's precomputed tables.
+The report shows how far the old linear 90 deg formula is from the
+calibrated bearings across the frame.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from vision.camera_model import CameraModel, linear_bearing
+
+DEFAULT_OUTPUT = "~/.config/picarx/camera.json"
+MIN_VIEWS = 10  # fewer usable images give an unreliable distortion fit
+CAPTURE_INTERVAL_S = 1.0  # between kept frames, so the board has moved
+
+
+def parse_pattern(text):
+    """'9x6' -> (9, 6) inner corners per row and column."""
+    try:
+        cols, rows = (int(n) for n in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected COLSxROWS inner corners, got {text!r}")
+    return cols, rows
+
+
+def board_points(pattern, square_mm):
+    """The board's inner corners in its own plane (z = 0), in mm."""
+    cols, rows = pattern
+    grid = np.zeros((rows * cols, 3), np.float32)
+    grid[:, :2] = np.mgrid[0:cols, 0:rows].T.reshape(-1, 2) * float(square_mm)
+    return grid
+
+
+def find_corners(image, pattern):
+    """Sub-pixel corner positions, or None if the whole board is not visible."""
+    import cv2
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    flags = cv2.CALIB_CB_ADAPTIVE_THRESH | cv2.CALIB_CB_NORMALIZE_IMAGE
+    found, corners = cv2.findChessboardCorners(gray, pattern, flags)
+    if not found:
+        return None
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+    return cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria)
+
+
+def calibrate(paths, pattern, square_mm):
+    """
+    Fit intrinsics and distortion to the images at `paths`.
+    Returns (CameraModel, RMS reprojection error in px, images used).
+    """
+    import cv2
+
+    objp = board_points(pattern, square_mm)
+    object_points, image_points, used, size = [], [], [], None
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            print(f"  {path}: unreadable, skipped")
+            continue
+        h, w = image.shape[:2]
+        if size is None:
+            size = (w, h)
+        elif size != (w, h):
+            print(f"  {path}: {w}x{h}, expected {size[0]}x{size[1]}, skipped")
+            continue
+        corners = find_corners(image, pattern)
+        if corners is None:
+            print(f"  {path}: board not found, skipped")
+            continue
+        object_points.append(objp)
+        image_points.append(corners)
+        used.append(path)
+    if len(used) < MIN_VIEWS:
+        raise SystemExit(f"Only {len(used)} usable images; need at least {MIN_VIEWS}.")
+
+    rms, matrix, dist, _, _ = cv2.calibrateCamera(object_points, image_points, size, None, None)
+    (fx, _, cx), (_, fy, cy), _ = matrix.tolist()
+    return CameraModel(size[0], size[1], fx, fy, cx, cy, dist.ravel()[:5].tolist()), float(rms), used
+
+
+def capture(n, directory, pattern, device=0, interval_s=CAPTURE_INTERVAL_S):
+    """Save n frames from the camera in which the whole board is visible."""
+    import cv2
+
+    os.makedirs(directory, exist_ok=True)
+    cap = cv2.VideoCapture(device)
+    if not cap.isOpened():
+        raise SystemExit(f"Could not open camera {device}.")
+    saved, last = [], 0.0
+    try:
+        while len(saved) < n:
+            ret, frame = cap.read()
+            if not ret:
+                raise SystemExit("Failed to grab frame.")
+            if time.monotonic() - last < interval_s or find_corners(frame, pattern) is None:
+                continue
+            last = time.monotonic()
+            path = os.path.join(directory, f"calib-{len(saved):03d}.jpg")
+            cv2.imwrite(path, frame)
+            saved.append(path)
+            print(f"  {len(saved)}/{n}: {path}  (move the board)")
+    finally:
+        cap.release()
+    return saved
+
+
+def report(model, rms=None):
+    """Calibrated vs linear-90° azimuth along the centre row and the top row."""
+    lines = [repr(model)]
+    if rms is not None:
+        lines.append(f"RMS reprojection error {rms:.3f} px")
+    if model.saturated:
+        lines.append(f"{model.saturated * 100.0:.1f}% of the frame is past the fitted range "
+                     "(bearings saturate there); add views with the board in the corners")
+    cols = np.linspace(0, model.width, 9)
+    for name, v in (("centre row", model.cy), ("top row", 0.0)):
+        cal = [model.bearing(u, v)[0] for u in cols]
+        lin = [linear_bearing(u, model.width) for u in cols]
+        lines.append(f"{name:10s} calibrated " + " ".join(f"{a:6.1f}" for a in cal))
+        lines.append(f"{'':10s} linear 90° " + " ".join(f"{a:6.1f}" for a in lin))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the camera from checkerboard images.")
+    parser.add_argument("images", nargs="*", help="checkerboard photos (globs are expanded)")
+    parser.add_argument("--pattern", type=parse_pattern, default=(9, 6), help="inner corners, COLSxROWS")
+    parser.add_argument("--square-mm", type=float, default=25.0, help="checkerboard square size")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="calibration file to write")
+    parser.add_argument("--capture", type=int, metavar="N", help="first take N board photos from the camera")
+    parser.add_argument("--save-dir", default="calib-shots", help="where --capture puts the photos")
+    parser.add_argument("--device", type=int, default=0, help="camera index for --capture")
+    args = parser.parse_args()
+
+    paths = sorted(p for pattern in args.images for p in glob.glob(os.path.expanduser(pattern)))
+    if args.capture:
+        paths += capture(args.capture, os.path.expanduser(args.save_dir), args.pattern, args.device)
+    if not paths:
+        parser.error("no images; pass photos or use --capture N")
+
+    print(f"Calibrating from {len(paths)} images ({args.pattern[0]}x{args.pattern[1]} corners)...")
+    model, rms, used = calibrate(paths, args.pattern, args.square_mm)
+    model.save(args.output, rms=rms, images=len(used), pattern=list(args.pattern))
+    print(report(model, rms))
+    print(f"Wrote {os.path.expanduser(args.output)}; use it with PICARX_CAMERA_CALIB={args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+
+"""
+Calibrated camera model with precomputed bearing lookup tables.
+
+OpponentTracker used to turn a detection's centre into a bearing with a
+linear ~90 deg HFOV (cx_norm * 45). The PiCar-X camera is wide-angle with
+noticeable barrel distortion, so that is off by several degrees towards the
+frame edges. CameraModel holds the OpenCV intrinsics (fx, fy, cx, cy) and
+distortion (k1, k2, p1, p2, k3) from vision/calibrate_camera.py and, once
+at load, undistorts a grid of pixel positions into azimuth/elevation
+tables. A detection's bearing is then one table lookup; frames are never
+undistorted.
+
+    model = load_camera_model("~/.config/picarx/camera.json", 640, 480)
+    azimuth_deg, elevation_deg = model.bearing(u, v)    # + = right / up
+
+OpponentTracker loads PICARX_CAMERA_CALIB when set and keeps the linear
+formula otherwise.
+
+    python3 vision/camera_model.py --bench      # accuracy and cost vs the linear formula
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+CALIB_PATH = os.environ.get("PICARX_CAMERA_CALIB")
+TABLE_STEP = 2  # table spacing in pixels; nearest entry is within 1 px
+UNDISTORT_ITERATIONS = 8  # Newton steps; converges to < 1e-6 px well before
+
+
+class CameraModel:
+    def __init__(self, width, height, fx, fy, cx, cy, dist=(0.0, 0.0, 0.0, 0.0, 0.0), step=TABLE_STEP):
+        """dist: OpenCV (k1, k2, p1, p2[, k3]); missing terms are zero."""
+        self.width = int(width)
+        self.height = int(height)
+        self.fx, self.fy, self.cx, self.cy = float(fx), float(fy), float(cx), float(cy)
+        self.dist = tuple(float(d) for d in (list(dist) + [0.0] * 5)[:5])
+        self.step = int(step)
+        self._build_tables()
+
+    @classmethod
+    def from_fov(cls, width, height, hfov_deg, **kwargs):
+        """An ideal pinhole camera with the given horizontal field of view."""
+        f = (width / 2.0) / math.tan(math.radians(hfov_deg) / 2.0)
+        return cls(width, height, f, f, width / 2.0, height / 2.0, **kwargs)
+
+    def scaled(self, width, height):
+        """The same lens at another capture resolution (same aspect ratio)."""
+        if (width, height) == (self.width, self.height):
+            return self
+        sx, sy = width / self.width, height / self.height
+        return CameraModel(width, height, self.fx * sx, self.fy * sy, self.cx * sx, self.cy * sy,
+                           self.dist, self.step)
+
+    # ---- Lens model -----------------------------------------------------------
+
+    def _distortion(self, x, y):
+        k1, k2, p1, p2, k3 = self.dist
+        r2 = x * x + y * y
+        radial = 1.0 + r2 * (k1 + r2 * (k2 + r2 * k3))
+        dx = 2.0 * p1 * x * y + p2 * (r2 + 2.0 * x * x)
+        dy = p1 * (r2 + 2.0 * y * y) + 2.0 * p2 * x * y
+        return radial, dx, dy
+
+    def undistort_points(self, u, v):
+        """
+        Pixel coordinates -> ideal normalised coordinates (x right, y down).
+        Newton's method on the distortion polynomial: cv2.undistortPoints'
+        fixed-point iteration diverges in the corners of a wide-angle lens.
+        """
+        k1, k2, p1, p2, k3 = self.dist
+        xd = (np.asarray(u, dtype=np.float64) - self.cx) / self.fx
+        yd = (np.asarray(v, dtype=np.float64) - self.cy) / self.fy
+        x, y = xd, yd
+        for _ in range(UNDISTORT_ITERATIONS):
+            radial, dx, dy = self._distortion(x, y)
+            fx = x * radial + dx - xd
+            fy = y * radial + dy - yd
+            # Jacobian of the distorted point w.r.t. (x, y)
+            r2 = x * x + y * y
+            dradial = 2.0 * (k1 + r2 * (2.0 * k2 + 3.0 * k3 * r2))  # d radial / d r, over r
+            jxx = radial + x * x * dradial + 2.0 * p1 * y + 6.0 * p2 * x
+            jxy = x * y * dradial + 2.0 * p1 * x + 2.0 * p2 * y
+            jyx = x * y * dradial + 2.0 * p1 * x + 2.0 * p2 * y
+            jyy = radial + y * y * dradial + 6.0 * p1 * y + 2.0 * p2 * x
+            det = jxx * jyy - jxy * jyx
+            x = x - (jyy * fx - jxy * fy) / det
+            y = y - (jxx * fy - jyx * fx) / det
+        return x, y
+
+    def project(self, x, y):
+        """Ideal normalised coordinates -> distorted pixel coordinates."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        radial, dx, dy = self._distortion(x, y)
+        return self.fx * (x * radial + dx) + self.cx, self.fy * (y * radial + dy) + self.cy
+
+    # ---- Bearing tables -------------------------------------------------------
+
+    def _inverted(self, u, v, x, y):
+        """True where (x, y) is the lens model's preimage of pixel (u, v)."""
+        k1, k2, p1, p2, k3 = self.dist
+        with np.errstate(invalid="ignore", over="ignore"):
+            pu, pv = self.project(x, y)
+            r2 = x * x + y * y
+            radial = 1.0 + r2 * (k1 + r2 * (k2 + r2 * k3))
+            # d(r * radial)/dr > 0: still on the rising branch of the polynomial
+            rising = radial + 2.0 * r2 * (k1 + r2 * (2.0 * k2 + 3.0 * k3 * r2)) > 0
+            return np.isfinite(x) & np.isfinite(y) & rising & (np.hypot(pu - u, pv - v) < 0.01)
+
+    def _saturate(self, u, v, iterations=24):
+        """
+        Pixels beyond the range a fitted polynomial can invert (often the
+        corners, outside the checkerboard's coverage) get the bearing of
+        the last invertible point on the ray from the principal point.
+        """
+        lo, hi = np.zeros_like(u), np.ones_like(u)
+        for _ in range(iterations):
+            mid = (lo + hi) / 2.0
+            mu, mv = self.cx + mid * (u - self.cx), self.cy + mid * (v - self.cy)
+            with np.errstate(invalid="ignore", over="ignore", divide="ignore"):
+                ok = self._inverted(mu, mv, *self.undistort_points(mu, mv))
+            lo = np.where(ok, mid, lo)
+            hi = np.where(ok, hi, mid)
+        return self.undistort_points(self.cx + lo * (u - self.cx), self.cy + lo * (v - self.cy))
+
+    def _build_tables(self):
+        us = np.arange(0, self.width + self.step, self.step, dtype=np.float64)
+        vs = np.arange(0, self.height + self.step, self.step, dtype=np.float64)
+        uu, vv = np.meshgrid(us, vs)
+        with np.errstate(invalid="ignore", over="ignore", divide="ignore"):
+            x, y = self.undistort_points(uu, vv)
+        bad = ~self._inverted(uu, vv, x, y)
+        if bad.any():
+            x[bad], y[bad] = self._saturate(uu[bad], vv[bad])
+        self.saturated = float(bad.mean())  # fraction of the frame past the model's range
+        self.azimuth_deg = np.degrees(np.arctan(x)).astype(np.float32)
+        self.elevation_deg = np.degrees(-np.arctan2(y, np.sqrt(1.0 + x * x))).astype(np.float32)
+        self._rows, self._cols = self.azimuth_deg.shape
+        self._inv_step = 1.0 / self.step
+
+    def bearing(self, u, v):
+        """(azimuth, elevation) in degrees of pixel (u, v); + = right / up. O(1)."""
+        j = int(u * self._inv_step + 0.5)
+        i = int(v * self._inv_step + 0.5)
+        j = 0 if j < 0 else (self._cols - 1 if j >= self._cols else j)
+        i = 0 if i < 0 else (self._rows - 1 if i >= self._rows else i)
+        return float(self.azimuth_deg[i, j]), float(self.elevation_deg[i, j])
+
+    def bearing_exact(self, u, v):
+        """bearing() without the table: undistorts the one point (slow path)."""
+        u, v = np.atleast_1d(np.asarray(u, dtype=np.float64)), np.atleast_1d(np.asarray(v, dtype=np.float64))
+        with np.errstate(invalid="ignore", over="ignore", divide="ignore"):
+            x, y = self.undistort_points(u, v)
+        if not self._inverted(u, v, x, y).all():
+            x, y = self._saturate(u, v)
+        x, y = x[0], y[0]
+        return float(np.degrees(np.arctan(x))), float(np.degrees(-np.arctan2(y, np.sqrt(1.0 + x * x))))
+
+    @property
+    def hfov_deg(self):
+        """Full horizontal field of view along the principal row."""
+        return float(self.bearing_exact(self.width, self.cy)[0] - self.bearing_exact(0, self.cy)[0])
+
+    # ---- Persistence ----------------------------------------------------------
+
+    def to_dict(self):
+        return {
+            "width": self.width,
+            "height": self.height,
+            "camera_matrix": [[self.fx, 0.0, self.cx], [0.0, self.fy, self.cy], [0.0, 0.0, 1.0]],
+            "dist_coeffs": list(self.dist),
+        }
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        (fx, _, cx), (_, fy, cy), _ = data["camera_matrix"]
+        return cls(data["width"], data["height"], fx, fy, cx, cy, data.get("dist_coeffs", ()), **kwargs)
+
+    def save(self, path, **extra):
+        """Write the calibration as JSON (extra keys, e.g. rms, are kept alongside)."""
+        data = dict(extra)
+        data.update(self.to_dict())
+        path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+            f.write("\n")
+
+    def __repr__(self):
+        return (f"<CameraModel {self.width}x{self.height} f=({self.fx:.1f}, {self.fy:.1f}) "
+                f"c=({self.cx:.1f}, {self.cy:.1f}) hfov={self.hfov_deg:.1f}°>")
+
+
+def load_camera_model(path=CALIB_PATH, width=None, height=None):
+    """The calibration at `path` scaled to width x height; None without a path."""
+    if not path:
+        return None
+    with open(os.path.expanduser(path)) as f:
+        model = CameraModel.from_dict(json.load(f))
+    if width is not None and height is not None:
+        model = model.scaled(width, height)
+    return model
+
+
+def linear_bearing(u, width, hfov_deg=90.0):
+    """The previous formula: azimuth linear in the pixel column."""
+    return (u - width / 2.0) / (width / 2.0) * hfov_deg / 2.0
+
+
+# ---- Benchmark ----------------------------------------------------------------
+
+# A wide-angle lens with barrel distortion (~105 deg HFOV)
+BENCH_MODEL = dict(width=640, height=480, fx=330.0, fy=330.0, cx=322.0, cy=236.0,
+                   dist=(-0.25, 0.06, 0.0005, -0.0008, 0.0))
+
+
+def bench(n=20000):
+    """Azimuth error against exact undistortion, and cost per detection."""
+    model = CameraModel(**BENCH_MODEL)
+    hfov = model.hfov_deg
+    rng = np.random.default_rng(0)
+    us = rng.uniform(0, model.width, n)
+    vs = rng.uniform(0, model.height, n)
+    truth = np.degrees(np.arctan(model.undistort_points(us, vs)[0]))
+
+    def cost(fn, reps=5, k=2000):
+        best = float("inf")
+        for _ in range(reps):
+            t0 = time.perf_counter()
+            for u, v in zip(us[:k], vs[:k]):
+                fn(u, v)
+            best = min(best, (time.perf_counter() - t0) / k)
+        return best * 1e6
+
+    t0 = time.perf_counter()
+    CameraModel(**BENCH_MODEL)
+    build_ms = (time.perf_counter() - t0) * 1000.0
+    print(f"lens: HFOV {hfov:.1f}°, k1 {model.dist[0]}; tables {model.azimuth_deg.shape} "
+          f"built in {build_ms:.0f} ms")
+    methods = (
+        ("linear 90°", lambda u, v: linear_bearing(u, model.width)),
+        (f"linear {hfov:.0f}°", lambda u, v: linear_bearing(u, model.width, hfov)),
+        ("table", lambda u, v: model.bearing(u, v)[0]),
+        ("undistort", lambda u, v: model.bearing_exact(u, v)[0]),
+    )
+    for name, fn in methods:
+        est = np.array([fn(u, v) for u, v in zip(us[:5000], vs[:5000])])
+        err = np.abs(est - truth[:5000])
+        print(f"{name:12s} error mean {err.mean():5.2f}°  max {err.max():5.2f}°   "
+              f"{cost(fn):6.2f} µs/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrated camera model and bearing tables.")
+    parser.add_argument("--bench", action="store_true", help="accuracy and cost vs the linear formula")
+    parser.add_argument("--show", metavar="CALIB", help="print a calibration file's model")
+    args = parser.parse_args()
+    if args.show:
+        print(load_camera_model(args.show))
+    elif args.bench:
+        bench()
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
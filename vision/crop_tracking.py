@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+
+"""
+Target-centered crop inference for a locked opponent.
+
+A detector with a fixed input (vision/tflite_detector.py's SSD: 300x300)
+sees a 640x480 frame shrunk ~2x, and a 1280x720 one ~4x, so a distant
+opponent is a few pixels in the model input and drops out. Once
+OpponentTracker has a target, CropDetector runs the detector on a window
+around where the target is predicted to be instead, sized to the model
+input so it is seen at native resolution, and maps the boxes back to
+full-frame pixels:
+
+    crop = CropDetector(TFLiteDetector(...), tracker)
+    DetectorThread(crop, get_frame, on_result=tracker.update_from_detections).start()
+
+It is a drop-in detector (detect(frame) -> Vilib-format dicts in frame
+pixels), so CombatState, the pan/tilt servo and everything downstream are
+unchanged. A full-frame search still runs
+  * while there is no target,
+  * every `search_every` frames, so a new or closer opponent is noticed
+    (if it finds nothing, the crop runs on the same frame and the lock is
+    kept), and
+  * on the same frame when the crop comes back empty (target lost).
+The window grows to `margin` times the target box when the target is big,
+so close targets are never cut off.
+
+Time per frame: an SSD's invoke() costs the same for any input, so with
+TFLite the saving is the resize of the full frame; with YoloDetector the
+input size follows the crop (imgsz 320 instead of 640: ~4x fewer pixels).
+
+    python3 vision/crop_tracking.py --bench                     # synthetic receding target
+    python3 vision/crop_tracking.py --bench --video clip.mp4 --model /opt/vilib/detect.tflite
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.metrics import REGISTRY
+
+SEARCH_EVERY = int(os.environ.get("PICARX_CROP_SEARCH_EVERY", "10"))  # frames between full searches
+CROP_MARGIN = 3.0  # window at least this many times the target box
+DEFAULT_CROP = (320, 320)  # for detectors without a fixed input size
+
+CROP_FRAMES = REGISTRY.counter("picarx_crop_frames_total", "Detector runs on a target crop")
+CROP_SEARCHES = REGISTRY.counter("picarx_crop_searches_total", "Detector runs on the full frame")
+CROP_LOSSES = REGISTRY.counter("picarx_crop_losses_total", "Crops that lost the target")
+
+
+class CropDetector:
+    def __init__(self, detector, tracker, crop_size=None, search_every=SEARCH_EVERY, margin=CROP_MARGIN):
+        """
+        detector: detect(frame) -> Vilib-format detections in that frame's
+        pixels (TFLiteDetector, YoloDetector). tracker: the OpponentTracker
+        its results feed. crop_size: (w, h) of the window; by default the
+        detector's input size, so the crop is not resized.
+        """
+        self.detector = detector
+        self.tracker = tracker
+        if crop_size is None:
+            w, h = getattr(detector, "input_w", None), getattr(detector, "input_h", None)
+            crop_size = (int(w), int(h)) if w and h else DEFAULT_CROP
+        self.crop_w, self.crop_h = crop_size
+        self.search_every = int(search_every)
+        self.margin = float(margin)
+        self.window = None  # (x0, y0, x1, y1) of the last crop, None after a full search
+        self._since_search = 0
+        self._seen = None  # tracker state the prediction was last updated from
+        self._center = None
+        self._velocity = (0.0, 0.0)  # px per detector run
+
+    # ---- Prediction ---------------------------------------------------------
+
+    def _predict(self, sx, sy):
+        """Predicted target center and box size in frame pixels, or None without a lock."""
+        state = self.tracker.state
+        if not state.has_target:
+            self._forget()
+            return None
+        xmin, ymin, xmax, ymax = state.bbox
+        if state is not self._seen:
+            self._seen = state
+            center = ((xmin + xmax) / 2.0 * sx, (ymin + ymax) / 2.0 * sy)
+            if self._center is not None:
+                self._velocity = (center[0] - self._center[0], center[1] - self._center[1])
+            self._center = center
+        cx = self._center[0] + self._velocity[0]
+        cy = self._center[1] + self._velocity[1]
+        return (cx, cy), ((xmax - xmin) * sx, (ymax - ymin) * sy)
+
+    def _forget(self):
+        self._seen, self._center, self._velocity = None, None, (0.0, 0.0)
+
+    def crop_window(self, center, box_size, frame_w, frame_h):
+        """Window around `center`, grown to fit `margin` x the box, inside the frame."""
+        scale = max(1.0, self.margin * box_size[0] / self.crop_w, self.margin * box_size[1] / self.crop_h)
+        w = min(frame_w, int(round(self.crop_w * scale)))
+        h = min(frame_h, int(round(self.crop_h * scale)))
+        x0 = min(max(int(round(center[0] - w / 2.0)), 0), frame_w - w)
+        y0 = min(max(int(round(center[1] - h / 2.0)), 0), frame_h - h)
+        return x0, y0, x0 + w, y0 + h
+
+    # ---- Detection ----------------------------------------------------------
+
+    def _full(self, frame):
+        CROP_SEARCHES.inc()
+        self._since_search = 0
+        return self.detector.detect(frame)
+
+    def _crop(self, frame, window):
+        x0, y0, x1, y1 = window
+        CROP_FRAMES.inc()
+        self._since_search += 1
+        dets = self.detector.detect(frame[y0:y1, x0:x1])
+        out = []
+        for det in dets:
+            xmin, ymin, xmax, ymax = det["bbox"]
+            det = dict(det)
+            det["bbox"] = [xmin + x0, ymin + y0, xmax + x0, ymax + y0]
+            out.append(det)
+        return out
+
+    def detect(self, frame):
+        """Detections in full-frame pixels, from a target crop when locked."""
+        h, w = frame.shape[:2]
+        predicted = self._predict(w / self.tracker.w, h / self.tracker.h)
+        self.window = None
+        if predicted is None:
+            return self._full(frame)
+        if self._since_search >= self.search_every:
+            dets = self._full(frame)
+            if dets:
+                return dets
+        self.window = self.crop_window(predicted[0], predicted[1], w, h)
+        dets = self._crop(frame, self.window)
+        if not dets:
+            CROP_LOSSES.inc()
+            self.window = None
+            self._forget()
+            dets = self._full(frame)
+        return dets
+
+
+class YoloDetector:
+    """
+    ultralytics model as a detect(frame) detector in Vilib's format. imgsz
+    follows the input (rounded up to 32 px), so a crop runs at its own size.
+    """
+
+    input_w = input_h = None
+
+    def __init__(self, model, conf=0.35, max_imgsz=640):
+        self.model = model
+        self.conf = conf
+        self.max_imgsz = int(max_imgsz)
+
+    def detect(self, frame):
+        h, w = frame.shape[:2]
+        imgsz = min(self.max_imgsz, -(-max(h, w) // 32) * 32)
+        results = self.model.predict(frame, imgsz=imgsz, conf=self.conf, verbose=False, device="cpu")
+        boxes = results[0].boxes if len(results) > 0 else []
+        return [
+            {
+                "bbox": [int(v) for v in box.xyxy[0]],
+                "class_id": int(box.cls[0]),
+                "score": float(box.conf[0]),
+            }
+            for box in boxes
+        ]
+
+
+# ---- Benchmark ----------------------------------------------------------------
+
+TARGET_BGR = (40, 160, 40)  # sim/camera.py's "person" colour
+
+
+class BlobDetector:
+    """
+    Resolution-limited stand-in for the SSD, for the synthetic benchmark:
+    resizes to a fixed input like TFLiteDetector.preprocess(), then finds
+    the target-coloured blob and only reports it with at least `min_px`
+    pixels of height in the model input (SSD anchors miss smaller objects).
+    """
+
+    def __init__(self, input_w=300, input_h=300, min_px=12):
+        from vision.tflite_detector import _resize_nearest
+
+        self._resize = _resize_nearest
+        self.input_w, self.input_h = input_w, input_h
+        self.min_px = min_px
+
+    def detect(self, frame):
+        h, w = frame.shape[:2]
+        img = frame
+        if (h, w) != (self.input_h, self.input_w):
+            img = self._resize(frame, self.input_w, self.input_h)
+        mask = (img[..., 1] > 120) & (img[..., 2] < 80)
+        rows = np.flatnonzero(mask.any(axis=1))
+        if len(rows) < self.min_px:
+            return []
+        cols = np.flatnonzero(mask.any(axis=0))
+        sx, sy = w / self.input_w, h / self.input_h
+        bbox = [int(cols[0] * sx), int(rows[0] * sy), int((cols[-1] + 1) * sx), int((rows[-1] + 1) * sy)]
+        return [{"bbox": bbox, "class_id": 0, "score": 0.9}]
+
+
+def synthetic_footage(n=240, width=1280, height=720, near_px=240.0, far_px=4.0, seed=0):
+    """
+    A person-coloured target walking away and sideways on a noisy
+    background; yields (frame, true box height in px). Its height falls
+    as 1/distance from near_px to far_px.
+    """
+    rng = np.random.default_rng(seed)
+    background = rng.integers(60, 110, (height, width, 3), dtype=np.uint8)
+    for i in range(n):
+        dist = 1.0 + (near_px / far_px - 1.0) * i / (n - 1)
+        th = near_px / dist
+        tw = max(1.0, 0.4 * th)
+        cx = width * (0.5 + 0.3 * np.sin(i / 25.0))
+        cy = height * 0.55
+        frame = background.copy()
+        x0, x1 = int(cx - tw / 2), int(np.ceil(cx + tw / 2))
+        y0, y1 = int(cy - th / 2), int(np.ceil(cy + th / 2))
+        frame[y0:y1, x0:x1] = TARGET_BGR
+        yield frame, th
+
+
+def run_footage(frames, detector, tracker, use_crop, search_every=SEARCH_EVERY):
+    """Track through `frames`; returns detect() times, per-frame hits and true heights."""
+    det = CropDetector(detector, tracker, search_every=search_every) if use_crop else detector
+    times, hits, heights = [], [], []
+    for frame, true_h in frames:
+        t0 = time.perf_counter()
+        dets = det.detect(frame)
+        times.append(time.perf_counter() - t0)
+        tracker.update_from_detections(dets)
+        state = tracker.state
+        hits.append(state.has_target)
+        if true_h is None:  # recorded footage: the tracked box stands in
+            true_h = state.bbox[3] - state.bbox[1] if state.has_target else 0
+        heights.append(true_h)
+    return np.asarray(times), np.asarray(hits), np.asarray(heights, dtype=float)
+
+
+def summarize(name, times, hits, heights):
+    """Per-frame time, share of frames tracked, and the smallest target still tracked."""
+    seen = heights[hits]
+    smallest = float(seen.min()) if len(seen) else float("nan")
+    # Last frame with a target; on receding footage, where the lock ends
+    last = int(np.flatnonzero(hits)[-1]) + 1 if hits.any() else 0
+    return (name, float(np.median(times)) * 1000.0, float(times.mean()) * 1000.0,
+            100.0 * hits.mean(), last, smallest)
+
+
+def load_video(path, limit=None):
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"Could not open {path}.")
+    frames = []
+    while limit is None or len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append((frame, None))
+    cap.release()
+    return frames
+
+
+def bench(frames, make_detector, search_every=SEARCH_EVERY):
+    from vision.camera_model import CameraModel
+    from vision.opponent_tracking import OpponentTracker
+
+    h, w = frames[0][0].shape[:2]
+    rows = []
+    for name, use_crop in (("full frame", False), ("target crop", True)):
+        tracker = OpponentTracker(w, h, camera_model=CameraModel.from_fov(w, h, 90.0))
+        rows.append(summarize(name, *run_footage(frames, make_detector(), tracker, use_crop, search_every)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Target-centered crop inference.")
+    parser.add_argument("--bench", action="store_true", help="full-frame vs crop tracking")
+    parser.add_argument("--video", help="recorded footage (anything cv2.VideoCapture opens)")
+    parser.add_argument("--model", help="TFLite SSD model for --video")
+    parser.add_argument("--frames", type=int, default=240)
+    parser.add_argument("--search-every", type=int, default=SEARCH_EVERY)
+    args = parser.parse_args()
+    if not args.bench:
+        parser.print_help()
+        return
+
+    if args.video:
+        if not args.model:
+            parser.error("--video needs --model")
+        from vision.tflite_detector import TFLiteDetector
+
+        frames = load_video(args.video, args.frames)
+        make_detector = lambda: TFLiteDetector(args.model)
+        print(f"{args.video}: {len(frames)} frames, {args.model}")
+    else:
+        frames = list(synthetic_footage(args.frames))
+        make_detector = BlobDetector
+        print(f"synthetic: {len(frames)} frames 1280x720, target 240 -> 4 px tall, 300x300 stand-in detector")
+
+    print(f"{'mode':12s} {'p50 ms':>7s} {'mean ms':>8s} {'tracked':>8s} {'last frame':>10s} {'smallest px':>12s}")
+    for name, p50, mean, tracked, last, smallest in bench(frames, make_detector, args.search_every):
+        print(f"{name:12s} {p50:7.2f} {mean:8.2f} {tracked:7.1f}% {last:10d} {smallest:12.1f}")
+    if not args.video:
+        print("Target height falls as 1/distance: range gain = full-frame smallest / crop smallest.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+"""
+Floor free-space segmentation in NumPy, fast enough for every camera frame.
+
+YOLO only knows COCO classes, so walls, boxes and furniture edges are
+invisible to it, and it runs at inference speed. FreeSpaceDetector instead
+models what the floor looks like and reports how far the floor continues
+in each direction:
+
+    floor = FreeSpaceDetector()
+    free = floor.update(frame)              # BGR frame from cv2 / Vilib
+    if free.front_cm(0.3) < 30:             # central 30% of the image
+        stop()
+
+Per frame, on a downsampled view of the part of the image below the horizon
+(~80x30 pixels for 640x480):
+
+1. Each pixel gets four features: normalised blue and green chromaticity,
+   brightness and local gradient (texture).
+2. A diagonal Gaussian floor model is seeded from the patch just ahead of
+   the bumper and tracked with an EMA. The patch only updates the model
+   when most of it already looks like floor, so an obstacle at the bumper
+   does not become "floor"; after RESEED_FRAMES rejections in a row the
+   model is rebuilt (e.g. the lighting changed).
+3. Pixels within THRESHOLD_D2 (squared Mahalanobis) of the model are floor.
+   Scanning each column upwards from the bottom, the first two non-floor
+   rows mark the obstacle boundary, which flat-ground geometry (camera
+   height, tilt, focal length) turns into a forward distance in cm.
+4. Columns are grouped into N_BINS bearings, keeping each bin's minimum.
+
+The geometry defaults match the PiCar-X camera at 640x480 (90 deg HFOV, as
+in pan_tilt_servo.py, 12 cm above the floor).
+
+    python3 vision/free_space.py --bench        # frames per second on this CPU
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+HFOV_DEG = 90.0
+CAMERA_HEIGHT_CM = 12.0
+STRIDE = 8  # downsampling step in pixels
+MAX_RANGE_CM = 300.0  # rows seeing floor further away than this are ignored
+N_BINS = 16
+SEED_ROWS = 0.2  # bottom fraction of the region of interest
+SEED_COLS = 0.4  # central fraction of the image width
+THRESHOLD_D2 = 13.0  # ~99% of floor pixels for a 4-feature Gaussian
+ADAPT = 0.1  # EMA weight of each accepted seed patch
+SEED_AGREEMENT = 0.6  # fraction of the seed that must match the model to update it
+RESEED_FRAMES = 30
+# Lower bounds on the model's per-feature spread (chroma b, chroma g,
+# brightness, texture) so a very uniform floor does not make it brittle
+MIN_STD = np.array([0.015, 0.015, 0.04, 0.03], dtype=np.float32)
+
+
+class FreeSpace:
+    """One frame's result: free distance per bearing bin."""
+
+    def __init__(self, cm, bearings_deg, mask, model_ok, max_cm=MAX_RANGE_CM):
+        self.cm = cm  # max_cm = no floor boundary seen in range
+        self.bearings_deg = bearings_deg
+        self.mask = mask  # floor mask of the downsampled region of interest
+        self.model_ok = model_ok
+        self.max_cm = max_cm
+
+    def front_cm(self, center_fraction=0.3):
+        """Nearest obstacle across the central fraction of the image width."""
+        n = len(self.cm)
+        half = max(1, int(round(n * center_fraction / 2.0)))
+        return float(self.cm[n // 2 - half : n // 2 + half].min())
+
+    def clearest_bearing(self):
+        """Bearing (deg, + = right) of the bin with the most free floor."""
+        return float(self.bearings_deg[int(np.argmax(self.cm))])
+
+
+class FreeSpaceDetector:
+    def __init__(self, hfov_deg=HFOV_DEG, camera_height_cm=CAMERA_HEIGHT_CM, tilt_deg=0.0,
+                 stride=STRIDE, max_range_cm=MAX_RANGE_CM, n_bins=N_BINS,
+                 threshold_d2=THRESHOLD_D2, adapt=ADAPT):
+        """tilt_deg: camera tilt, positive = up (set_cam_tilt_angle convention)."""
+        self.hfov_deg = float(hfov_deg)
+        self.camera_height_cm = float(camera_height_cm)
+        self.tilt_deg = float(tilt_deg)
+        self.stride = int(stride)
+        self.max_range_cm = float(max_range_cm)
+        self.n_bins = int(n_bins)
+        self.threshold_d2 = float(threshold_d2)
+        self.adapt = float(adapt)
+
+        self.mean = None
+        self.std = None
+        self.rejected = 0
+        self._shape = None
+
+    # ---- Geometry ---------------------------------------------------------
+
+    def _prepare(self, h, w):
+        """Row distances and bin layout for a frame size (cached)."""
+        s = self.stride
+        f = (w / 2.0) / math.tan(math.radians(self.hfov_deg) / 2.0)
+        rows = np.arange(0, h, s) + 0.5  # the pixel rows features() samples
+        depression = np.arctan((rows - h / 2.0) / f) - math.radians(self.tilt_deg)
+        with np.errstate(divide="ignore"):
+            dist = np.where(depression > 0, self.camera_height_cm / np.tan(depression), np.inf)
+        roi = np.flatnonzero(dist <= self.max_range_cm)
+        if not len(roi):
+            raise ValueError("no floor in view: camera tilted too far up")
+        self._row0 = int(roi[0])
+        self._row_cm = dist[self._row0 :].astype(np.float32)
+
+        cols = len(range(0, w, s))
+        self._bin_of_col = np.minimum(np.arange(cols) * self.n_bins // cols, self.n_bins - 1)
+        centers = (np.arange(self.n_bins) + 0.5) * w / self.n_bins
+        self.bearings_deg = np.degrees(np.arctan((centers - w / 2.0) / f))
+
+        n_rows = len(self._row_cm)
+        seed_h = max(2, int(round(n_rows * SEED_ROWS)))
+        seed_w = max(2, int(round(cols * SEED_COLS)))
+        c0 = (cols - seed_w) // 2
+        self._seed = (slice(n_rows - seed_h, n_rows), slice(c0, c0 + seed_w))
+        self._shape = (h, w)
+
+    # ---- Per frame --------------------------------------------------------
+
+    def features(self, frame):
+        """(rows, cols, 4) float32 features of the downsampled region of interest."""
+        s = self.stride
+        small = frame[self._row0 * s :: s, ::s].astype(np.float32)
+        total = small.sum(axis=2) + 1.0
+        feats = np.empty(small.shape[:2] + (4,), dtype=np.float32)
+        feats[..., 0] = small[..., 0] / total
+        feats[..., 1] = small[..., 1] / total
+        feats[..., 2] = total * (1.0 / (3 * 255.0))
+        bright = feats[..., 2]
+        grad = np.zeros_like(bright)
+        grad[:, 1:] += np.abs(np.diff(bright, axis=1))
+        grad[1:, :] += np.abs(np.diff(bright, axis=0))
+        feats[..., 3] = grad
+        return feats
+
+    def _update_model(self, seed, seed_floor_fraction):
+        mean = seed.reshape(-1, 4).mean(axis=0)
+        std = np.maximum(seed.reshape(-1, 4).std(axis=0), MIN_STD)
+        if self.mean is None or self.rejected >= RESEED_FRAMES:
+            self.mean, self.std, self.rejected = mean, std, 0
+            return True
+        if seed_floor_fraction < SEED_AGREEMENT:
+            self.rejected += 1
+            return False
+        self.rejected = 0
+        self.mean += self.adapt * (mean - self.mean)
+        self.std += self.adapt * (std - self.std)
+        return True
+
+    def update(self, frame):
+        h, w = frame.shape[:2]
+        if self._shape != (h, w):
+            self._prepare(h, w)
+        feats = self.features(frame)
+        if self.mean is None:
+            self._update_model(feats[self._seed], 1.0)
+
+        z = (feats - self.mean) / self.std
+        floor = np.einsum("...i,...i->...", z, z) < self.threshold_d2
+        # The model learns from this frame's seed only if the seed still
+        # looks like floor; the classification uses the model as it was
+        model_ok = self._update_model(feats[self._seed], float(floor[self._seed].mean()))
+
+        # Boundary: lowest pair of consecutive non-floor rows in each column
+        blocked = ~floor
+        blocked[1:] &= blocked[:-1]
+        blocked[0] = False
+        from_bottom = blocked[::-1]
+        hit = from_bottom.any(axis=0)
+        first = len(blocked) - 1 - np.argmax(from_bottom, axis=0)
+        col_cm = np.where(hit, self._row_cm[first], np.inf)
+
+        cm = np.full(self.n_bins, np.inf, dtype=np.float32)
+        np.minimum.at(cm, self._bin_of_col, col_cm)
+        np.minimum(cm, self.max_range_cm, out=cm)
+        return FreeSpace(cm, self.bearings_deg, floor, model_ok, self.max_range_cm)
+
+
+# ---- Benchmark --------------------------------------------------------------
+
+
+def bench(seconds=3.0, width=640, height=480):
+    rng = np.random.default_rng(0)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = (90, 110, 130)
+    frame += rng.integers(0, 12, frame.shape, dtype=np.uint8)
+    frame[height // 2 : height * 2 // 3, width // 3 : width // 2] = (200, 200, 200)
+    det = FreeSpaceDetector()
+    det.update(frame)
+    times = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        det.update(frame)
+        times.append(time.perf_counter() - t0)
+    times = np.asarray(times) * 1000.0
+    return len(times) / times.sum() * 1000.0, float(np.median(times)), float(np.percentile(times, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Floor free-space segmentation.")
+    parser.add_argument("--bench", action="store_true", help="measure update() rate")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    if not args.bench:
+        parser.print_help()
+        return
+    fps, p50, p99 = bench(args.seconds)
+    print(f"640x480 stride {STRIDE}: {fps:.0f} fps  p50 {p50:.2f} ms  p99 {p99:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
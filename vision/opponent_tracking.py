@@ -9,12 +9,38 @@ This module:
 - exposes a clean CombatState for the rest of the robot (AI / control).
 """
 
+import os
+import sys
 import time
-from vilib import Vilib
+
+try:
+    from vilib import Vilib
+except ImportError:  # off the Pi: update_from_detections() still works
+    Vilib = None
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.freshness import MAX_VISION_AGE_S, FreshnessGate
+from utils.metrics import REGISTRY, LoopMetrics
+from vision.camera_model import CALIB_PATH, load_camera_model
 
 # Classes we'll treat as "opponents" for now
 ENEMY_CLASS_IDS = {0, 1, 2, 3, 7}  # person, bicycle, car, motorcycle, truck
 
+# Runtime metrics (utils/metrics.py)
+TRACKER_UPDATES = REGISTRY.counter("picarx_tracker_updates_total", "Tracker updates")
+TRACKER_UPDATE_SECONDS = REGISTRY.histogram(
+    "picarx_tracker_update_seconds", "Time spent in one tracker update"
+)
+TRACKER_DETECTIONS = REGISTRY.gauge(
+    "picarx_tracker_detections", "Detections in the latest Vilib result list"
+)
+TRACKER_HAS_TARGET = REGISTRY.gauge("picarx_tracker_has_target", "1 while a target is tracked")
+TRACKER_GATE = FreshnessGate("tracker", MAX_VISION_AGE_S)
+
 
 class CombatState:
     def __init__(self):
@@ -23,9 +49,17 @@ class CombatState:
         self.cx_norm = 0.0  # [-1, 1], 0 = center
         self.cy_norm = 0.0  # [-1, 1]
         self.angle_deg = 0.0  # left negative, right positive
+        self.elevation_deg = 0.0  # down negative, up positive
         self.distance_hint = None  # arbitrary scale for now
         self.class_id = None
         self.score = None
+        self.stamp = None  # monotonic capture time if known, else when first seen
+
+    def age(self, now=None):
+        """Seconds since the detection was first seen (inf without one)."""
+        if self.stamp is None:
+            return float("inf")
+        return (time.monotonic() if now is None else now) - self.stamp
 
     def __repr__(self):
         if not self.has_target:
@@ -38,14 +72,23 @@ class CombatState:
 
 
 class OpponentTracker:
-    def __init__(self, camera_width=640, camera_height=480):
+    def __init__(self, camera_width=640, camera_height=480, camera_model=None):
+        """
+        camera_model: vision/camera_model.py CameraModel for bearings; by
+        default the PICARX_CAMERA_CALIB calibration, if set. Without one,
+        bearings assume a linear ~90° horizontal FOV.
+        """
         self.w = camera_width
         self.h = camera_height
+        if camera_model is None:
+            camera_model = load_camera_model(CALIB_PATH)
+        self.camera = camera_model.scaled(self.w, self.h) if camera_model is not None else None
         self.state = CombatState()
+        self._last_dets = None
 
     # ---- Internal helpers -------------------------------------------------
 
-    def _update_from_bbox(self, xmin, ymin, xmax, ymax, class_id=None, score=None):
+    def _update_from_bbox(self, xmin, ymin, xmax, ymax, class_id=None, score=None, stamp=None):
         # Clamp
         xmin = max(0, min(self.w, xmin))
         xmax = max(0, min(self.w, xmax))
@@ -61,39 +104,85 @@ class OpponentTracker:
         cx_norm = (cx - self.w / 2.0) / (self.w / 2.0)
         cy_norm = (cy - self.h / 2.0) / (self.h / 2.0)
 
-        # Approx angle: assume ~90° FOV horizontally
-        angle_deg = cx_norm * 45.0
+        if self.camera is not None:
+            # Calibrated lens: one table lookup, distortion included
+            angle_deg, elevation_deg = self.camera.bearing(cx, cy)
+        else:
+            # Approx angle: assume ~90° FOV horizontally, same scale vertically
+            angle_deg = cx_norm * 45.0
+            elevation_deg = -cy_norm * 45.0 * self.h / self.w
 
         # Extremely rough distance proxy; bigger bbox_h -> closer
         distance_hint = 1.0 / bbox_h
 
-        self.state.has_target = True
-        self.state.bbox = (int(xmin), int(ymin), int(xmax), int(ymax))
-        self.state.cx_norm = float(cx_norm)
-        self.state.cy_norm = float(cy_norm)
-        self.state.angle_deg = float(angle_deg)
-        self.state.distance_hint = float(distance_hint)
-        self.state.class_id = class_id
-        self.state.score = float(score) if score is not None else None
+        # Build a fresh state and swap it in, so readers on other threads
+        # (e.g. vision/pan_tilt_servo.py) never see a half-updated one
+        state = CombatState()
+        state.has_target = True
+        state.bbox = (int(xmin), int(ymin), int(xmax), int(ymax))
+        state.cx_norm = float(cx_norm)
+        state.cy_norm = float(cy_norm)
+        state.angle_deg = float(angle_deg)
+        state.elevation_deg = float(elevation_deg)
+        state.distance_hint = float(distance_hint)
+        state.class_id = class_id
+        state.score = float(score) if score is not None else None
+        state.stamp = time.monotonic() if stamp is None else stamp
+        self.state = state
 
     def _clear(self):
         self.state = CombatState()
 
     # ---- Public API -------------------------------------------------------
 
-    def get_state(self):
-        """Return the last computed combat state."""
-        return self.state
+    def get_state(self, max_age_s=None):
+        """
+        Return the last computed combat state. With max_age_s, a target
+        seen longer ago than that is reported as no target.
+        """
+        state = self.state
+        if max_age_s is not None and state.has_target:
+            age = state.age()
+            TRACKER_GATE.ages.observe(age)
+            if age > max_age_s:
+                TRACKER_GATE.stale.inc()
+                return CombatState()
+        return state
+
+    def get_fresh_state(self):
+        """get_state() with the process-wide PICARX_MAX_VISION_AGE_S limit."""
+        return self.get_state(TRACKER_GATE.max_age_s)
 
     def update_from_vilib_detections(self):
         """
         Read detection results from vilib (object_detection_list_parameter)
         and update CombatState using the best enemy detection.
         """
+        if Vilib is None:
+            raise RuntimeError("vilib not installed; use update_from_detections()")
         det_list = getattr(Vilib, "object_detection_list_parameter", None)
 
+        # Vilib assigns a new list per inference; the same object means no
+        # new detection since the last poll, so the stamp must not move
+        if det_list and det_list is self._last_dets:
+            TRACKER_UPDATES.inc()
+            return
+        self._last_dets = det_list
+        self.update_from_detections(det_list)
+
+    def update_from_detections(self, det_list, stamp=None):
+        """
+        Update CombatState from one detection result list, e.g. from Vilib
+        or vision/tflite_detector.py. stamp: monotonic capture time of the
+        frame, if known.
+        """
+        t0 = time.perf_counter()
+        TRACKER_UPDATES.inc()
+        TRACKER_DETECTIONS.set(len(det_list) if det_list else 0)
+
         if not det_list:
             self._clear()
+            TRACKER_HAS_TARGET.set(0)
             return
 
         # det_list format depends on SunFounder code, but usually something like:
@@ -116,9 +205,12 @@ class OpponentTracker:
                 ymax,
                 class_id=best.get("class_id"),
                 score=best.get("score", 0.0),
+                stamp=stamp,
             )
         else:
             self._clear()
+        TRACKER_HAS_TARGET.set(1 if self.state.has_target else 0)
+        TRACKER_UPDATE_SECONDS.observe(time.perf_counter() - t0)
 
     def run_debug_loop(self, poll_rate=0.2):
         """
@@ -126,8 +218,10 @@ class OpponentTracker:
         Use this for tuning thresholds and verifying things work.
         """
         print("[OpponentTracker] Debug tracking loop started (Ctrl+C to stop).")
+        loop_metrics = LoopMetrics(poll_rate, prefix="picarx_tracker_loop")
         try:
             while True:
+                loop_metrics.tick()
                 self.update_from_vilib_detections()
                 print(self.state)
                 time.sleep(poll_rate)
@@ -1,14 +1,60 @@
 #!/usr/bin/env python3
 
+import os
+import sys
 import time
+from picarx import Picarx
 from vilib import Vilib
 from opponent_tracking import OpponentTracker
+from pan_tilt_servo import PanTiltServo
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.affinity import pin_thread, setup_from_env
+from utils.metrics import serve_from_env
 
 MODEL_PATH = "/opt/vilib/mobilenet_v1_0.25_224_quant.tflite"
 LABELS_PATH = "/opt/vilib/labels_mobilenet_quant_v1_224.txt"
 
+# "vilib": Vilib's own detection thread; "tflite": vision/tflite_detector.py
+# on Vilib's camera frames, with our thread count (PICARX_DETECTOR_THREADS)
+DETECTOR = os.environ.get("PICARX_DETECTOR", "vilib")
+DETECTOR_THREADS = int(os.environ.get("PICARX_DETECTOR_THREADS", "4"))
+TFLITE_MODEL_PATH = os.environ.get("PICARX_DETECTOR_MODEL", "/opt/vilib/detect.tflite")
+TFLITE_LABELS_PATH = os.environ.get("PICARX_DETECTOR_LABELS", "/opt/vilib/coco_labels.txt")
+# With the tflite detector: once a target is locked, run it on a crop
+# around the target at native resolution (vision/crop_tracking.py)
+CROP_TRACKING = os.environ.get("PICARX_CROP_TRACKING", "0") == "1"
+
+
+def start_tflite_detector(tracker):
+    from tflite_detector import DetectorThread, TFLiteDetector
+
+    detector = TFLiteDetector(TFLITE_MODEL_PATH, TFLITE_LABELS_PATH, num_threads=DETECTOR_THREADS)
+    if CROP_TRACKING:
+        from crop_tracking import CropDetector
+
+        detector = CropDetector(detector, tracker)
+    last = [None, None]  # Vilib.img object, time it was first seen
+
+    def newest_frame():
+        img = Vilib.img
+        if img is not None and img is not last[0]:
+            last[0], last[1] = img, time.monotonic()
+        return img, last[1]
+
+    return DetectorThread(detector, newest_frame, on_result=tracker.update_from_detections).start()
+
 
 def main():
+    # Optional core layout (PICARX_CPU_LAYOUT); Vilib's camera threads
+    # inherit the capture cores from this thread
+    setup_from_env()
+    pin_thread("capture")
+
     # 1) Start camera
     Vilib.camera_start(vflip=False, hflip=False, size=(640, 480))
 
@@ -16,10 +62,14 @@ def main():
     Vilib.display(local=False, web=True)
 
     # 3) Configure object detection model + labels
-    print("[Demo] Setting object detection model/labels...")
-    Vilib.object_detect_set_model(MODEL_PATH)
-    Vilib.object_detect_set_labels(LABELS_PATH)
-    Vilib.object_detect_switch(True)
+    if DETECTOR != "tflite":
+        print("[Demo] Setting object detection model/labels...")
+        Vilib.object_detect_set_model(MODEL_PATH)
+        Vilib.object_detect_set_labels(LABELS_PATH)
+        Vilib.object_detect_switch(True)
+
+    # Optional Prometheus endpoint (PICARX_METRICS_PORT)
+    serve_from_env()
 
     # 4) Create tracker and run debug loop
     tracker = OpponentTracker(
@@ -27,13 +77,40 @@ def main():
         camera_height=Vilib.camera_height,
     )
 
-    print("[Demo] Opponent tracking is running.")
+    # 5) Camera follows the target; the servo loop polls the tracker itself
+    px = Picarx()
+
+    if DETECTOR == "tflite":
+        print(f"[Demo] Standalone TFLite detector, {DETECTOR_THREADS} threads"
+              + (", crop tracking" if CROP_TRACKING else ""))
+        worker = start_tflite_detector(tracker)
+        # Stamps are frame arrival times, so there is no extra latency to add
+        servo = PanTiltServo(px, tracker.get_state, latency_s=0.0).start()
+    else:
+        worker = None
+
+        def poll_state():
+            tracker.update_from_vilib_detections()
+            return tracker.get_state()
+
+        servo = PanTiltServo(px, poll_state).start()
+
+    print("[Demo] Opponent tracking is running; the camera follows the target.")
     print("Open the stream in your browser, e.g. http://<pi-ip>:9000/mjpg")
     print("Watch terminal for combat state.\n")
 
     try:
-        tracker.run_debug_loop(poll_rate=0.3)
+        while True:
+            print(f"{tracker.get_state()} pan={servo.pan.angle:.1f}° tilt={servo.tilt.angle:.1f}°")
+            time.sleep(0.3)
+    except KeyboardInterrupt:
+        print("\n[Demo] Stopped.")
     finally:
+        servo.stop()
+        if worker is not None:
+            worker.stop()
+        px.set_cam_pan_angle(0)
+        px.set_cam_tilt_angle(0)
         Vilib.camera_close()
         time.sleep(0.5)
 
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+"""
+Closed-loop camera pan/tilt that keeps the tracked opponent centred.
+
+PanTiltServo reads a CombatState (vision/opponent_tracking.py) at a fixed
+control rate, independent of how often detections arrive, and drives
+set_cam_pan_angle / set_cam_tilt_angle with a PID loop per axis.
+
+Detections are old by the time they are read (camera exposure + inference),
+and the camera has moved since. Each detection is therefore converted to an
+absolute target angle using the servo angle commanded at capture time,
+filtered with an alpha-beta filter (angle + angular rate), and extrapolated
+to the moment the next servo write takes effect. The PID acts on that
+predicted error, with the filtered rate as feed-forward.
+
+Usage:
+    servo = PanTiltServo(px, tracker.get_state)
+    servo.start()          # background thread at RATE_HZ
+    ...
+    servo.stop()
+"""
+
+import collections
+import os
+import sys
+import threading
+import time
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.affinity import pin_thread
+
+# ===== Config =====
+RATE_HZ = 30.0
+CAM_PAN_MAX = 45  # same limits as the teleop scripts
+CAM_TILT_MAX = 45
+HFOV_DEG = 90.0  # OpponentTracker assumes ~90 deg horizontally
+VFOV_DEG = 73.7  # 4:3 sensor at 90 deg HFOV
+
+DETECTION_LATENCY_S = 0.15  # capture -> CombatState, Vilib TFLite on a Pi 4
+ACTUATION_S = 0.05  # servo write -> camera actually pointing there
+LOST_TARGET_S = 0.6  # hold position after this long without a target
+DEADBAND_DEG = 0.5
+MAX_TARGET_RATE = 180.0  # deg/s, clamps the filter's rate estimate
+
+# The output is a pan/tilt rate, so the servo angle already integrates it; an
+# I term would only add overshoot. kp [1/s], ki [1/s^2], kd [-]
+PID_GAINS = (4.0, 0.0, 0.1)
+FILTER_GAINS = (0.6, 0.25)  # alpha, beta
+
+
+class PID:
+    """PID with integrator clamping and derivative on the error."""
+
+    def __init__(self, kp, ki, kd, i_limit=30.0):
+        self.kp, self.ki, self.kd = kp, ki, kd
+        self.i_limit = i_limit
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.prev_error = None
+
+    def update(self, error, dt, integrate=True):
+        if integrate:
+            self.integral = max(-self.i_limit, min(self.i_limit, self.integral + error * dt))
+        deriv = 0.0 if self.prev_error is None or dt <= 0 else (error - self.prev_error) / dt
+        self.prev_error = error
+        return self.kp * error + self.ki * self.integral + self.kd * deriv
+
+
+class AlphaBeta:
+    """Angle + angular-rate estimate from irregular, timestamped observations."""
+
+    def __init__(self, alpha, beta, max_rate=MAX_TARGET_RATE):
+        self.alpha, self.beta = alpha, beta
+        self.max_rate = max_rate
+        self.reset()
+
+    def reset(self):
+        self.angle = None
+        self.rate = 0.0
+        self.t = None
+
+    def update(self, angle, t):
+        if self.angle is None:
+            self.angle, self.rate, self.t = angle, 0.0, t
+            return
+        dt = t - self.t
+        if dt <= 0:
+            return
+        predicted = self.angle + self.rate * dt
+        residual = angle - predicted
+        self.angle = predicted + self.alpha * residual
+        self.rate += self.beta * residual / dt
+        self.rate = max(-self.max_rate, min(self.max_rate, self.rate))
+        self.t = t
+
+    def predict(self, t):
+        return self.angle + self.rate * (t - self.t)
+
+
+class _Axis:
+    def __init__(self, set_angle, limit, gains, filter_gains):
+        self.set_angle = set_angle
+        self.limit = limit
+        self.pid = PID(*gains)
+        self.filter = AlphaBeta(*filter_gains)
+        self.angle = 0.0  # commanded
+        self.written = None
+        # (time, commanded angle) so a detection can be referred back to
+        # where the camera pointed when its frame was captured
+        self.history = collections.deque(maxlen=64)
+
+    def angle_at(self, t):
+        for stamp, angle in reversed(self.history):
+            if stamp <= t:
+                return angle
+        return self.history[0][1] if self.history else self.angle
+
+    def observe(self, offset_deg, t_pointed, t_capture):
+        self.filter.update(self.angle_at(t_pointed) + offset_deg, t_capture)
+
+    def reset(self):
+        self.pid.reset()
+        self.filter.reset()
+
+    def control(self, t_actuate, dt):
+        error = self.filter.predict(t_actuate) - self.angle
+        if abs(error) < DEADBAND_DEG:
+            error = 0.0
+        # Anti-windup: stop integrating while pushing into a limit
+        saturated = abs(self.angle) >= self.limit and error * self.angle > 0
+        velocity = self.pid.update(error, dt, integrate=not saturated) + self.filter.rate
+        self.angle = max(-self.limit, min(self.limit, self.angle + velocity * dt))
+
+    def write(self, now):
+        if self.written is None or abs(self.angle - self.written) >= DEADBAND_DEG / 2:
+            self.set_angle(round(self.angle, 1))
+            self.written = self.angle
+        self.history.append((now, self.angle))
+
+
+class PanTiltServo:
+    def __init__(self, px, get_state, rate_hz=RATE_HZ, latency_s=DETECTION_LATENCY_S,
+                 actuation_s=ACTUATION_S, pan_max=CAM_PAN_MAX, tilt_max=CAM_TILT_MAX,
+                 gains=PID_GAINS, filter_gains=FILTER_GAINS, clock=None,
+                 sleep=None):
+        """
+        px: Picarx-compatible object.
+        get_state: callable returning a CombatState (has_target, cx_norm,
+            cy_norm, stamp = monotonic time the detection was read).
+        latency_s: stamp -> frame capture delay that is compensated.
+        """
+        self.get_state = get_state
+        self.period = 1.0 / float(rate_hz)
+        self.latency_s = float(latency_s)
+        self.actuation_s = float(actuation_s)
+        self.clock = clock or time.monotonic
+        self.sleep = sleep or time.sleep
+
+        self.pan = _Axis(px.set_cam_pan_angle, pan_max, gains, filter_gains)
+        self.tilt = _Axis(px.set_cam_tilt_angle, tilt_max, gains, filter_gains)
+        self.last_stamp = None
+        self.last_seen = None
+        self.last_step = None
+        self.tracking = False
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---- Control loop -----------------------------------------------------
+
+    def step(self, now=None):
+        """One control tick; returns True while a target is being followed."""
+        now = self.clock() if now is None else now
+        dt = self.period if self.last_step is None else now - self.last_step
+        self.last_step = now
+
+        state = self.get_state()
+        stamp = getattr(state, "stamp", None)
+        if state.has_target and stamp is not None and stamp != self.last_stamp:
+            self.last_stamp = stamp
+            self.last_seen = now
+            t_capture = stamp - self.latency_s
+            # Where the camera actually pointed at capture: the command
+            # issued actuation_s before then
+            t_pointed = t_capture - self.actuation_s
+            # Image right (+cx) is pan right; image down (+cy) is tilt down
+            self.pan.observe(state.cx_norm * HFOV_DEG / 2.0, t_pointed, t_capture)
+            self.tilt.observe(-state.cy_norm * VFOV_DEG / 2.0, t_pointed, t_capture)
+
+        if self.last_seen is None or now - self.last_seen > LOST_TARGET_S:
+            if self.tracking:
+                self.pan.reset()
+                self.tilt.reset()
+                self.tracking = False
+            return False
+
+        self.tracking = True
+        for axis in (self.pan, self.tilt):
+            axis.control(now + self.actuation_s, dt)
+            axis.write(now)
+        return True
+
+    def run(self):
+        pin_thread("control")
+        next_t = self.clock()
+        while not self._stop.is_set():
+            self.step()
+            next_t += self.period
+            delay = next_t - self.clock()
+            if delay > 0:
+                self.sleep(delay)
+            else:
+                next_t = self.clock()  # overran; don't try to catch up
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="pan-tilt-servo", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,97 @@
+import math
+import os
+import sys
+import timeit
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from vision.calibrate_camera import board_points, parse_pattern
+from vision.camera_model import BENCH_MODEL, CameraModel, linear_bearing, load_camera_model
+from vision.opponent_tracking import OpponentTracker
+
+
+@pytest.fixture(scope="module")
+def lens():
+    return CameraModel(**BENCH_MODEL)
+
+
+def rays(lens, n=400, seed=0):
+    """Known azimuth/elevation rays and the distorted pixels they land on."""
+    rng = np.random.default_rng(seed)
+    az = rng.uniform(-45.0, 45.0, n)
+    el = rng.uniform(-30.0, 30.0, n)
+    x = np.tan(np.radians(az))
+    y = -np.tan(np.radians(el)) * np.sqrt(1.0 + x * x)
+    u, v = lens.project(x, y)
+    keep = (u >= 0) & (u <= lens.width) & (v >= 0) & (v <= lens.height)
+    return az[keep], el[keep], u[keep], v[keep]
+
+
+def test_table_bearings_match_the_lens_and_the_linear_formula_does_not(lens):
+    az, el, u, v = rays(lens)
+    table = np.array([lens.bearing(a, b) for a, b in zip(u, v)])
+    assert np.abs(table[:, 0] - az).max() < 0.3
+    assert np.abs(table[:, 1] - el).max() < 0.3
+    # The old assumption is off by several degrees towards the edges
+    assert np.abs(linear_bearing(u, lens.width) - az).max() > 4.0
+
+
+def test_table_lookup_is_much_cheaper_than_undistorting(lens):
+    table = min(timeit.repeat(lambda: lens.bearing(600.0, 20.0), number=2000, repeat=3))
+    exact = min(timeit.repeat(lambda: lens.bearing_exact(600.0, 20.0), number=200, repeat=3)) * 10
+    assert table * 10 < exact
+
+
+def test_pinhole_model_edges_are_half_the_fov():
+    model = CameraModel.from_fov(640, 480, 90.0)
+    assert model.bearing(320, 240) == (0.0, 0.0)
+    assert model.bearing(640, 240)[0] == pytest.approx(45.0, abs=0.01)
+    assert model.hfov_deg == pytest.approx(90.0)
+
+
+def test_scaled_model_gives_the_same_bearings(lens):
+    half = lens.scaled(320, 240)
+    assert half.bearing(100, 30) == pytest.approx(lens.bearing(200, 60), abs=0.3)
+
+
+def test_bearings_saturate_past_the_fitted_range():
+    # A fit whose polynomial cannot be inverted in the corners
+    model = CameraModel(640, 480, 290.0, 290.0, 322.0, 236.0, (-0.32, 0.12, 0.0005, -0.0008, -0.02))
+    assert 0 < model.saturated < 0.5
+    assert np.isfinite(model.azimuth_deg).all()
+    row = model.azimuth_deg[model.azimuth_deg.shape[0] // 2]
+    assert (np.diff(row) > -0.1).all() and row[-1] < 90.0  # levels off, never folds back
+
+
+def test_calibration_file_round_trip(lens, tmp_path):
+    path = tmp_path / "camera.json"
+    lens.save(str(path), rms=0.21)
+    loaded = load_camera_model(str(path), 640, 480)
+    assert loaded.to_dict() == lens.to_dict()
+    assert load_camera_model(None) is None
+
+
+def test_tracker_uses_the_camera_model(lens):
+    det = {"bbox": [560, 10, 620, 70], "class_id": 0, "score": 0.9}
+    calibrated = OpponentTracker(camera_model=lens)
+    calibrated.update_from_detections([det])
+    assert calibrated.get_state().angle_deg == lens.bearing(590, 40)[0]
+    assert calibrated.get_state().elevation_deg > 0
+
+    linear = OpponentTracker()
+    linear.update_from_detections([det])
+    assert linear.get_state().angle_deg == pytest.approx(270 / 320 * 45.0)
+
+
+def test_checkerboard_helpers():
+    assert parse_pattern("9x6") == (9, 6)
+    pts = board_points((9, 6), 25.0)
+    assert pts.shape == (54, 3)
+    assert pts[1].tolist() == [25.0, 0.0, 0.0] and pts[-1].tolist() == [200.0, 125.0, 0.0]
+    assert math.isclose(float(pts[:, 2].max()), 0.0)
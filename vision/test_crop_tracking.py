@@ -0,0 +1,99 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sim.camera import _Result
+from vision.crop_tracking import BlobDetector, CropDetector, YoloDetector, bench, synthetic_footage
+from vision.opponent_tracking import OpponentTracker
+
+
+class RecordingDetector:
+    """Fixed-input detector returning preset boxes in its input frame's pixels."""
+
+    input_w, input_h = 300, 300
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.shapes = []
+
+    def detect(self, frame):
+        self.shapes.append(frame.shape[:2])
+        bboxes = self.results.pop(0)
+        return [{"bbox": list(b), "class_id": 0, "score": 0.9} for b in bboxes]
+
+
+def locked(tracker, bbox):
+    tracker.update_from_detections([{"bbox": list(bbox), "class_id": 0, "score": 0.9}])
+
+
+def test_locked_target_is_detected_in_a_native_crop_mapped_to_the_frame():
+    tracker = OpponentTracker(1280, 720)
+    locked(tracker, (900, 300, 910, 325))
+    detector = RecordingDetector([[(145, 137, 155, 162)]])
+    crop = CropDetector(detector, tracker)
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+    dets = crop.detect(frame)
+    x0, y0, x1, y1 = crop.window
+    assert detector.shapes == [(300, 300)] and (x1 - x0, y1 - y0) == (300, 300)
+    assert x0 <= 905 <= x1 and y0 <= 312 <= y1
+    assert dets[0]["bbox"] == [145 + x0, 137 + y0, 155 + x0, 162 + y0]
+
+
+def test_window_follows_the_motion_and_stays_in_the_frame():
+    tracker = OpponentTracker(640, 480)
+    crop = CropDetector(RecordingDetector([]), tracker)
+    locked(tracker, (100, 100, 110, 120))
+    crop._predict(1.0, 1.0)
+    locked(tracker, (120, 100, 130, 120))
+    center, _ = crop._predict(1.0, 1.0)
+    assert center == (145.0, 110.0)  # one more 20 px step to the right
+    assert crop.crop_window((630.0, 470.0), (10, 20), 640, 480) == (340, 180, 640, 480)
+    # A big target gets a window of margin x its size, capped at the frame
+    assert crop.crop_window((320.0, 240.0), (250, 200), 640, 480) == (0, 0, 640, 480)
+
+
+def test_full_search_on_loss_and_periodically():
+    tracker = OpponentTracker(640, 480)
+    locked(tracker, (300, 200, 310, 220))
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    # Crop comes back empty -> the same frame is searched in full
+    detector = RecordingDetector([[], [(10, 10, 20, 30)]])
+    crop = CropDetector(detector, tracker, search_every=2)
+    assert crop.detect(frame)[0]["bbox"] == [10, 10, 20, 30]
+    assert detector.shapes == [(300, 300), (480, 640)] and crop.window is None
+
+    # Every search_every crops a full search runs; finding nothing keeps the lock
+    detector.results = [[(140, 140, 150, 160)]] * 2 + [[], [(140, 140, 150, 160)]]
+    for _ in range(3):
+        tracker.update_from_detections(crop.detect(frame))
+    assert detector.shapes[2:] == [(300, 300), (300, 300), (480, 640), (300, 300)]
+    assert tracker.state.has_target
+
+
+def test_yolo_adapter_sizes_input_to_the_crop():
+    class Model:
+        def predict(self, frame, imgsz, **kwargs):
+            self.imgsz = imgsz
+            return [_Result([{"bbox": [1, 2, 3, 4], "class_id": 2, "score": 0.8}])]
+
+    yolo = YoloDetector(Model())
+    assert yolo.detect(np.zeros((300, 300, 3), np.uint8)) == [{"bbox": [1, 2, 3, 4], "class_id": 2, "score": 0.8}]
+    assert yolo.model.imgsz == 320
+    yolo.detect(np.zeros((720, 1280, 3), np.uint8))
+    assert yolo.model.imgsz == 640
+
+
+def test_crop_tracking_keeps_a_receding_target_longer():
+    frames = list(synthetic_footage(120))
+    (_, _, _, full_tracked, full_last, full_px), (_, _, _, crop_tracked, crop_last, crop_px) = bench(
+        frames, BlobDetector
+    )
+    assert crop_last > 2 * full_last
+    assert crop_px < full_px / 2
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sim.camera import SimCamera
+from sim.car import SimPicarx
+from sim.world import World
+from vision.free_space import MAX_RANGE_CM, RESEED_FRAMES, FreeSpaceDetector
+
+
+def sim_frame(world):
+    """What the car at x=40 (camera at x=50) facing +x sees."""
+    return SimCamera(SimPicarx(world, x=40, y=150)).render()
+
+
+def noisy_floor(seed=0, h=480, w=640):
+    rng = np.random.default_rng(seed)
+    frame = np.empty((h, w, 3), dtype=np.uint8)
+    frame[:] = (90, 110, 130)
+    frame += rng.integers(0, 10, frame.shape, dtype=np.uint8)
+    return frame
+
+
+def test_wall_distance_from_flat_ground_geometry():
+    world = World(walls=False)
+    world.add_wall(130, 0, 130, 300)  # 80 cm ahead of the camera
+    free = FreeSpaceDetector().update(sim_frame(world))
+    # Conservative by at most one sampled row
+    assert 70.0 <= free.front_cm() <= 80.0
+    assert free.cm.max() <= 80.0
+
+
+def test_box_only_blocks_its_bearings():
+    world = World(walls=False)
+    world.add_box(100, 150, 20, 20)  # front face 40 cm ahead, dead centre
+    free = FreeSpaceDetector().update(sim_frame(world))
+    assert 35.0 <= free.front_cm(0.2) <= 50.0
+    assert free.cm[0] == MAX_RANGE_CM and free.cm[-1] == MAX_RANGE_CM
+    assert abs(free.clearest_bearing()) > 10.0
+
+
+def test_textured_floor_is_free_space():
+    free = FreeSpaceDetector().update(noisy_floor())
+    assert free.model_ok
+    assert np.all(free.cm == MAX_RANGE_CM)
+    assert free.mask.mean() > 0.95
+
+
+def test_obstacle_at_the_bumper_does_not_become_floor():
+    det = FreeSpaceDetector()
+    det.update(noisy_floor(0))
+    mean = det.mean.copy()
+
+    blocked = noisy_floor(1)
+    blocked[300:, 160:480] = (200, 200, 200)  # grey box filling the seed patch
+    free = det.update(blocked)
+    assert not free.model_ok
+    assert free.front_cm() < 30.0
+    assert np.allclose(det.mean, mean)
+
+    # A lasting change (e.g. new lighting) is eventually learned
+    for _ in range(RESEED_FRAMES):
+        det.update(blocked)
+    assert det.update(blocked).model_ok
@@ -1,18 +1,77 @@
-from opponent_tracking import OpponentTracker
+import os
+import sys
 
-# from OpponentTracking import OpponentTracker
-from vilib import Vilib
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
 
-# Start camera + web stream
-Vilib.camera_start()
-Vilib.display(local=False, web=True)
+import vision.opponent_tracking as tracking
+from vision.opponent_tracking import OpponentTracker
 
-# Enable vilib detection model (optional)
-Vilib.object_detect_set_model(
-    "/home/primal/vilib/workspace/mobilenet_v1_0.25_224_quant.tflite"
-)
-Vilib.object_detect_set_labels("/home/primal/vilib/workspace/coco_labels.txt")
-Vilib.object_detect_switch(True)
+PERSON = {"bbox": [280, 120, 360, 360], "class_id": 0, "score": 0.6}
+CUP = {"bbox": [0, 0, 40, 40], "class_id": 41, "score": 0.9}
 
-tracker = OpponentTracker()
-tracker.run_with_vilib()
+
+class FakeVilib:
+    object_detection_list_parameter = []
+
+
+def test_picks_the_best_enemy_over_other_classes():
+    tracker = OpponentTracker()
+    tracker.update_from_detections([CUP, PERSON], stamp=5.0)
+    state = tracker.get_state()
+    assert state.has_target and state.class_id == 0
+    assert state.bbox == (280, 120, 360, 360)
+    assert state.cx_norm == 0.0 and state.angle_deg == 0.0
+    assert state.stamp == 5.0
+
+
+def test_clamps_boxes_to_the_frame():
+    tracker = OpponentTracker()
+    tracker.update_from_detections([{"bbox": [-50, -10, 700, 500], "class_id": 2, "score": 0.5}])
+    assert tracker.get_state().bbox == (0, 0, 640, 480)
+
+
+def test_an_empty_result_clears_the_target():
+    tracker = OpponentTracker()
+    tracker.update_from_detections([PERSON])
+    tracker.update_from_detections([])
+    assert not tracker.get_state().has_target
+
+
+def test_a_stale_target_is_reported_as_none():
+    tracker = OpponentTracker()
+    tracker.update_from_detections([PERSON], stamp=0.0)
+    assert not tracker.get_state(max_age_s=0.5).has_target
+
+
+def test_polling_the_same_vilib_list_keeps_the_stamp(monkeypatch):
+    monkeypatch.setattr(tracking, "Vilib", FakeVilib)
+    FakeVilib.object_detection_list_parameter = [PERSON]
+    tracker = OpponentTracker()
+    tracker.update_from_vilib_detections()
+    stamp = tracker.get_state().stamp
+    tracker.update_from_vilib_detections()
+    assert tracker.get_state().stamp == stamp
+
+    FakeVilib.object_detection_list_parameter = [dict(PERSON)]  # a new inference
+    tracker.update_from_vilib_detections()
+    assert tracker.get_state().stamp > stamp
+
+
+if __name__ == "__main__":
+    # On the car: print the tracker state from Vilib's own detector
+    from vilib import Vilib
+
+    # Start camera + web stream
+    Vilib.camera_start()
+    Vilib.display(local=False, web=True)
+
+    # Enable vilib detection model (optional)
+    Vilib.object_detect_set_model(
+        "/home/primal/vilib/workspace/mobilenet_v1_0.25_224_quant.tflite"
+    )
+    Vilib.object_detect_set_labels("/home/primal/vilib/workspace/coco_labels.txt")
+    Vilib.object_detect_switch(True)
+
+    OpponentTracker().run_debug_loop()
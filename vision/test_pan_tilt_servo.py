@@ -0,0 +1,130 @@
+import math
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from vision.pan_tilt_servo import CAM_PAN_MAX, HFOV_DEG, VFOV_DEG, PanTiltServo
+
+
+class State:
+    def __init__(self, cx_norm, cy_norm, stamp):
+        self.has_target = True
+        self.cx_norm = cx_norm
+        self.cy_norm = cy_norm
+        self.stamp = stamp
+
+
+class NoTarget:
+    has_target = False
+    stamp = None
+
+
+class SimTargetRig:
+    """
+    A target moving along target_fn(t) -> (pan_deg, tilt_deg), a camera on
+    servos that reach the commanded angle `actuation_s` after the write, and
+    a detector that delivers a frame's result `latency_s` after capture
+    every `detect_period_s`.
+    """
+
+    def __init__(self, target_fn, latency_s=0.15, actuation_s=0.05, detect_period_s=0.1):
+        self.target_fn = target_fn
+        self.latency_s = latency_s
+        self.actuation_s = actuation_s
+        self.detect_period_s = detect_period_s
+        self.now = 0.0
+        self.writes = {"pan": [(-1.0, 0.0)], "tilt": [(-1.0, 0.0)]}
+        self.state = NoTarget()
+        self.next_capture = 0.0
+        self.in_flight = []
+
+    def set_cam_pan_angle(self, a):
+        self.writes["pan"].append((self.now, a))
+
+    def set_cam_tilt_angle(self, a):
+        self.writes["tilt"].append((self.now, a))
+
+    def actual(self, axis, t):
+        angle = 0.0
+        for stamp, a in self.writes[axis]:
+            if stamp + self.actuation_s <= t:
+                angle = a
+        return angle
+
+    def error(self, t):
+        pan, tilt = self.target_fn(t)
+        return pan - self.actual("pan", t), tilt - self.actual("tilt", t)
+
+    def advance(self, t):
+        self.now = t
+        while self.next_capture <= t:
+            ep, et = self.error(self.next_capture)
+            self.in_flight.append((self.next_capture + self.latency_s, ep, et))
+            self.next_capture += self.detect_period_s
+        while self.in_flight and self.in_flight[0][0] <= t:
+            ready, ep, et = self.in_flight.pop(0)
+            if abs(ep) < HFOV_DEG / 2 and abs(et) < VFOV_DEG / 2:
+                self.state = State(ep / (HFOV_DEG / 2), -et / (VFOV_DEG / 2), ready)
+            else:
+                self.state = NoTarget()
+
+
+def simulate(target_fn, seconds=6.0, **kwargs):
+    rig = SimTargetRig(target_fn)
+    servo = PanTiltServo(rig, lambda: rig.state, clock=lambda: rig.now, **kwargs)
+    errors = []
+    t = 0.0
+    while t < seconds:
+        rig.advance(t)
+        servo.step(t)
+        if t > 2.0:
+            errors.append(rig.error(t))
+        t += servo.period
+    rms = [math.sqrt(sum(e[i] ** 2 for e in errors) / max(1, len(errors))) for i in (0, 1)]
+    return rig, servo, rms
+
+
+def test_centers_a_static_target():
+    rig, servo, _ = simulate(lambda t: (20.0, -10.0), seconds=3.0)
+    ep, et = rig.error(3.0)
+    assert abs(ep) < 1.0 and abs(et) < 1.0
+
+
+def test_latency_compensation_reduces_error_on_a_moving_target():
+    def sweep(t):
+        return 25.0 * math.sin(0.8 * t), 10.0 * math.sin(0.5 * t)
+
+    _, _, rms = simulate(sweep)
+    _, _, rms_naive = simulate(sweep, latency_s=0.0, actuation_s=0.0, filter_gains=(0.6, 0.0))
+    assert rms[0] < 3.0
+    assert rms[0] < 0.6 * rms_naive[0]
+
+
+def test_respects_pan_limit_without_windup():
+    def beyond_then_back(t):
+        # Visible throughout, but 75 deg is past the 45 deg pan limit
+        return (40.0 if t < 1.0 else 75.0 if t < 3.0 else 10.0), 0.0
+
+    rig, servo, _ = simulate(beyond_then_back, seconds=3.0)
+    assert max(a for _, a in rig.writes["pan"]) == pytest.approx(CAM_PAN_MAX)
+
+    t = 3.0
+    while t < 5.0:
+        rig.advance(t)
+        servo.step(t)
+        t += servo.period
+    assert abs(rig.error(5.0)[0]) < 2.0
+
+
+def test_holds_position_when_target_is_lost():
+    rig, servo, _ = simulate(lambda t: (15.0, 0.0), seconds=2.0)
+    rig.state = NoTarget()
+    held = servo.pan.angle
+    for i in range(30):
+        assert not servo.step(2.0 + 0.7 + i * servo.period)
+    assert servo.pan.angle == held
@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import vision.tflite_detector as td
+
+
+class FakeSSDInterpreter:
+    """Interpreter with a 300x300 uint8 input and TF2-ordered SSD outputs."""
+
+    def __init__(self, model_path, num_threads=1, **kwargs):
+        self.num_threads = num_threads
+        self.kwargs = kwargs
+        self.inputs = []
+        self.tensors = {
+            10: np.array([[0.9, 0.3, 0.6]], dtype=np.float32),  # scores
+            11: np.array([[[0.1, 0.25, 0.5, 0.75], [0, 0, 1, 1], [0.5, 0.5, 0.6, 0.6]]],
+                         dtype=np.float32),  # boxes (ymin, xmin, ymax, xmax)
+            12: np.array([3.0], dtype=np.float32),  # count
+            13: np.array([[0.0, 2.0, 16.0]], dtype=np.float32),  # classes
+        }
+
+    def allocate_tensors(self):
+        pass
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": np.array([1, 300, 300, 3]), "dtype": np.uint8}]
+
+    def get_output_details(self):
+        return [
+            {"index": 10, "name": "StatefulPartitionedCall:1", "shape": np.array([1, 3])},
+            {"index": 11, "name": "StatefulPartitionedCall:3", "shape": np.array([1, 3, 4])},
+            {"index": 12, "name": "StatefulPartitionedCall:2", "shape": np.array([1])},
+            {"index": 13, "name": "StatefulPartitionedCall:0", "shape": np.array([1, 3])},
+        ]
+
+    def set_tensor(self, index, value):
+        self.inputs.append(value)
+
+    def invoke(self):
+        pass
+
+    def get_tensor(self, index):
+        return self.tensors[index]
+
+
+@pytest.fixture
+def fake_tflite(monkeypatch):
+    module = types.SimpleNamespace(
+        Interpreter=FakeSSDInterpreter,
+        experimental=types.SimpleNamespace(
+            OpResolverType=types.SimpleNamespace(BUILTIN_WITHOUT_DEFAULT_DELEGATES="no-delegates")
+        ),
+    )
+    monkeypatch.setattr(td, "tflite", module)
+    return module
+
+
+def test_detect_returns_vilib_format_in_frame_pixels(fake_tflite, tmp_path):
+    labels = tmp_path / "coco_labels.txt"
+    labels.write_text("0  person\n1  bicycle\n2  car\n")
+    det = td.TFLiteDetector("model.tflite", str(labels), num_threads=2, score_threshold=0.5)
+    assert det.interpreter.num_threads == 2
+
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    frame[..., 2] = 255  # BGR red
+    dets = det.detect(frame)
+
+    fed = det.interpreter.inputs[-1]
+    assert fed.shape == (1, 300, 300, 3) and fed.dtype == np.uint8
+    assert fed[0, 0, 0].tolist() == [255, 0, 0]  # converted to RGB
+    # Score 0.3 is below threshold; the rest come out best-first
+    assert [d["class_id"] for d in dets] == [0, 16]
+    assert dets[0]["bbox"] == [160, 48, 480, 240]
+    assert dets[0]["class_name"] == "person"
+    assert dets[0]["score"] == pytest.approx(0.9)
+
+
+def test_xnnpack_can_be_disabled(fake_tflite):
+    det = td.TFLiteDetector("model.tflite", None, use_xnnpack=False)
+    assert det.interpreter.kwargs["experimental_op_resolver_type"] == "no-delegates"
+
+
+def test_classifier_models_are_rejected(fake_tflite, monkeypatch):
+    monkeypatch.setattr(
+        FakeSSDInterpreter, "get_output_details",
+        lambda self: [{"index": 0, "name": "output", "shape": np.array([1, 1001])}],
+    )
+    with pytest.raises(ValueError):
+        td.TFLiteDetector("mobilenet_v1_0.25_224_quant.tflite", None)
+
+
+def test_detector_thread_runs_each_new_frame_once():
+    class CountingDetector:
+        calls = 0
+
+        def detect(self, frame):
+            self.calls += 1
+            return [{"bbox": [0, 0, 1, 1], "class_id": 0, "score": 1.0}]
+
+    frames = {"t": 1.0}
+    results = []
+    detector = CountingDetector()
+    worker = td.DetectorThread(
+        detector, lambda: (np.zeros((4, 4, 3)), frames["t"]),
+        on_result=lambda dets, t: results.append(t),
+    ).start()
+    try:
+        time.sleep(0.05)
+        frames["t"] = 2.0
+        time.sleep(0.05)
+    finally:
+        worker.stop()
+    assert results == [1.0, 2.0]
+    assert detector.calls == 2
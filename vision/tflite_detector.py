@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+"""
+Standalone TFLite object detector, independent of Vilib's detection thread.
+
+Vilib runs its own detection thread at its own rate and publishes results
+through a global list. TFLiteDetector loads the same MobileNet-SSD TFLite
+model directly with tflite-runtime, with our own thread count and XNNPACK
+setting, and runs on frames we hand it. Its results use Vilib's dict format
+({"bbox", "class_id", "score"}), so they feed OpponentTracker through
+update_from_detections():
+
+    detector = TFLiteDetector(MODEL_PATH, LABELS_PATH, num_threads=4)
+    worker = DetectorThread(detector, get_frame,   # -> (frame, capture time)
+                            on_result=tracker.update_from_detections).start()
+
+opponent_tracking_demo.py uses it with PICARX_DETECTOR=tflite.
+
+Only SSD-style models with the TFLite_Detection_PostProcess outputs
+(boxes, classes, scores, count) are supported; an image classifier such as
+mobilenet_v1_*_quant has no boxes and is rejected at load time.
+
+Throughput at 1/2/4 interpreter threads:
+    python3 vision/tflite_detector.py --bench --model /opt/vilib/detect.tflite
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Make project root importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.affinity import pin_thread
+from utils.metrics import REGISTRY
+
+try:
+    import tflite_runtime.interpreter as tflite
+except ImportError:
+    try:
+        import tensorflow.lite as tflite
+    except ImportError:
+        tflite = None
+
+# Vilib's bundled COCO SSD model (what object_detect_switch() runs)
+MODEL_PATH = "/opt/vilib/detect.tflite"
+LABELS_PATH = "/opt/vilib/coco_labels.txt"
+NUM_THREADS = 4
+SCORE_THRESHOLD = 0.5
+MAX_RESULTS = 10
+
+DETECT_SECONDS = REGISTRY.histogram("picarx_detector_seconds", "TFLite detector time per frame")
+DETECT_FRAMES = REGISTRY.counter("picarx_detector_frames_total", "Frames run through the detector")
+DETECT_SKIPPED = REGISTRY.counter(
+    "picarx_detector_skipped_total", "Frames not run because no new frame was available"
+)
+
+
+def load_labels(path):
+    """One label per line; 'N  label' lines are keyed by N."""
+    labels = {}
+    if not path or not os.path.exists(path):
+        return labels
+    with open(path) as f:
+        for i, line in enumerate(f):
+            parts = line.strip().split(maxsplit=1)
+            if len(parts) == 2 and parts[0].isdigit():
+                labels[int(parts[0])] = parts[1]
+            elif parts:
+                labels[i] = line.strip()
+    return labels
+
+
+def _resize_nearest(frame, width, height):
+    """Nearest-neighbour resize with numpy (no cv2 dependency)."""
+    h, w = frame.shape[:2]
+    ys = (np.arange(height) * (h / height)).astype(np.intp)
+    xs = (np.arange(width) * (w / width)).astype(np.intp)
+    return frame[ys[:, None], xs]
+
+
+class TFLiteDetector:
+    def __init__(self, model_path=MODEL_PATH, labels_path=LABELS_PATH, num_threads=NUM_THREADS,
+                 use_xnnpack=True, score_threshold=SCORE_THRESHOLD, max_results=MAX_RESULTS,
+                 rgb_input=False):
+        """
+        num_threads: interpreter threads (XNNPACK uses the same pool).
+        use_xnnpack: False runs the reference kernels (no default delegates).
+        rgb_input: True for RGB frames (picamera2); False for BGR (cv2, Vilib).
+        """
+        if tflite is None:
+            raise ImportError("tflite-runtime not installed. Run: pip3 install tflite-runtime")
+        kwargs = {"model_path": model_path, "num_threads": int(num_threads)}
+        if not use_xnnpack:
+            kwargs["experimental_op_resolver_type"] = (
+                tflite.experimental.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+            )
+        self.interpreter = tflite.Interpreter(**kwargs)
+        self.interpreter.allocate_tensors()
+        self.num_threads = int(num_threads)
+        self.use_xnnpack = use_xnnpack
+        self.score_threshold = float(score_threshold)
+        self.max_results = int(max_results)
+        self.rgb_input = rgb_input
+        self.labels = load_labels(labels_path)
+
+        inp = self.interpreter.get_input_details()[0]
+        self._input_index = inp["index"]
+        self._input_dtype = inp["dtype"]
+        _, self.input_h, self.input_w, _ = inp["shape"]
+        self._outputs = self._map_outputs(self.interpreter.get_output_details())
+        self._order_checked = False
+
+    @staticmethod
+    def _map_outputs(details):
+        if len(details) < 4:
+            raise ValueError(
+                "model has no detection post-processing outputs (boxes/classes/scores); "
+                "is it an image classifier?"
+            )
+        boxes = next(d for d in details if len(d["shape"]) == 3 and d["shape"][-1] == 4)
+        count = next(d for d in details if int(np.prod(d["shape"])) == 1)
+        rest = [d for d in details if d is not boxes and d is not count]
+        # TFLite_Detection_PostProcess order is boxes, classes, scores, count;
+        # TF2 exports shuffle it, which detect() checks on the first frame
+        return [boxes["index"], rest[0]["index"], rest[1]["index"], count["index"]]
+
+    def _check_output_order(self, classes, scores):
+        # Class ids are whole numbers; scores are fractions in [0, 1]
+        if np.any(classes != np.round(classes)) and not np.any(scores != np.round(scores)):
+            self._outputs[1], self._outputs[2] = self._outputs[2], self._outputs[1]
+            return scores, classes
+        return classes, scores
+
+    def preprocess(self, frame):
+        img = frame if self.rgb_input else frame[..., ::-1]
+        if img.shape[0] != self.input_h or img.shape[1] != self.input_w:
+            img = _resize_nearest(img, self.input_w, self.input_h)
+        if self._input_dtype == np.float32:
+            img = (img.astype(np.float32) - 127.5) / 127.5
+        else:
+            img = img.astype(self._input_dtype, copy=False)
+        return np.ascontiguousarray(img[None])
+
+    def invoke(self, tensor):
+        self.interpreter.set_tensor(self._input_index, tensor)
+        self.interpreter.invoke()
+
+    def detect(self, frame):
+        """Run one frame; returns Vilib-format detections in frame pixels."""
+        t0 = time.perf_counter()
+        h, w = frame.shape[:2]
+        self.invoke(self.preprocess(frame))
+        get = self.interpreter.get_tensor
+        i_boxes, i_classes, i_scores, i_count = self._outputs
+        boxes, classes, scores = get(i_boxes)[0], get(i_classes)[0], get(i_scores)[0]
+        n = min(int(get(i_count).flat[0]), len(scores))
+        if not self._order_checked and n:
+            classes, scores = self._check_output_order(classes[:n], scores[:n])
+            self._order_checked = True
+
+        results = []
+        for i in np.argsort(-scores[:n])[: self.max_results]:
+            score = float(scores[i])
+            if score < self.score_threshold:
+                break
+            ymin, xmin, ymax, xmax = np.clip(boxes[i], 0.0, 1.0)
+            class_id = int(classes[i])
+            results.append(
+                {
+                    "bbox": [int(xmin * w), int(ymin * h), int(xmax * w), int(ymax * h)],
+                    "class_id": class_id,
+                    "class_name": self.labels.get(class_id, str(class_id)),
+                    "score": score,
+                }
+            )
+        DETECT_FRAMES.inc()
+        DETECT_SECONDS.observe(time.perf_counter() - t0)
+        return results
+
+
+class DetectorThread:
+    """
+    Runs a detector on the newest frame as fast as it can, on its own
+    thread. get_frame() returns (frame, capture_time) or (None, _);
+    on_result(detections, capture_time) is called after every inference.
+    A frame whose capture time has not changed is not run twice.
+    """
+
+    def __init__(self, detector, get_frame, on_result=None, idle_s=0.005):
+        self.detector = detector
+        self.get_frame = get_frame
+        self.on_result = on_result
+        self.idle_s = idle_s
+        self.latest = ([], None)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run(self):
+        pin_thread("inference")
+        last_t = None
+        while not self._stop.is_set():
+            frame, t = self.get_frame()
+            if frame is None or t == last_t:
+                DETECT_SKIPPED.inc()
+                time.sleep(self.idle_s)
+                continue
+            last_t = t
+            dets = self.detector.detect(frame)
+            self.latest = (dets, t)
+            if self.on_result is not None:
+                self.on_result(dets, t)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="tflite-detector", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+# ---- Benchmark --------------------------------------------------------------
+
+
+def bench(model_path, threads=(1, 2, 4), seconds=5.0, use_xnnpack=True):
+    """invoke() throughput per thread count on a synthetic frame."""
+    rows = []
+    frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    for n in threads:
+        det = TFLiteDetector(model_path, None, num_threads=n, use_xnnpack=use_xnnpack,
+                             score_threshold=1.1)
+        tensor = det.preprocess(frame)
+        det.invoke(tensor)  # warm-up: XNNPACK packs weights on first run
+        times = []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            det.invoke(tensor)
+            times.append(time.perf_counter() - t0)
+        times = np.asarray(times) * 1000.0
+        rows.append((n, len(times) / times.sum() * 1000.0, float(np.median(times)),
+                     float(np.percentile(times, 95))))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Standalone TFLite detector.")
+    parser.add_argument("--bench", action="store_true", help="measure throughput per thread count")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--no-xnnpack", action="store_true")
+    args = parser.parse_args()
+    if not args.bench:
+        parser.print_help()
+        return
+
+    print(f"{args.model}  xnnpack={'off' if args.no_xnnpack else 'on'}  cpus={os.cpu_count()}")
+    print(f"{'threads':>7} {'fps':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for n, fps, p50, p95 in bench(args.model, args.threads, args.seconds, not args.no_xnnpack):
+        print(f"{n:7d} {fps:8.1f} {p50:8.2f} {p95:8.2f}")
+
+
+if __name__ == "__main__":
+    main()